@@ -0,0 +1 @@
+"""Benchmarks and test doubles for measuring ollama-chat performance without a live Ollama server."""
@@ -0,0 +1,153 @@
+"""Micro-benchmark of the plugin hook dispatch on the token streaming path.
+
+Streams synthetic tokens through on_llm_token_response and on_stdout_flush, checking the
+stop_generation hooks before each token as ask_ollama_with_conversation does, with 0, 5 and
+20 plugins loaded. Each configuration is measured with the hook table, with the table and
+token batching, and with the previous dispatch looking up every plugin method on each call.
+
+Usage:
+    python -m benchmarks.bench_hooks --tokens 100000 --output bench_hooks.json
+"""
+
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+
+from ollama_chat_lib import state
+from ollama_chat_lib.io_hooks import on_llm_token_response, on_stdout_flush, on_token_flush, _buffered, _capture
+from ollama_chat_lib.llm_core import _stop_requested
+
+TOKENS = ("The", " quick", " brown", " fox", " jumps", " over", " the", " lazy", " dog", ".\n")
+
+
+class TokenCounterPlugin:
+    """Observes every streamed token without handling it."""
+
+    def __init__(self):
+        self.tokens = 0
+
+    def on_llm_token_response(self, token):
+        self.tokens += 1
+        return False
+
+    def on_stdout_flush(self):
+        return False
+
+    def stop_generation(self):
+        return False
+
+
+class PrintOnlyPlugin:
+    """Implements no token hook: only its lookup costs on the streaming path."""
+
+    def on_print(self, message):
+        return False
+
+    def on_user_input(self, input_prompt=None):
+        return None
+
+
+def make_plugins(count):
+    return [TokenCounterPlugin() if index % 2 == 0 else PrintOnlyPlugin() for index in range(count)]
+
+
+def legacy_on_llm_token_response(token):
+    """on_llm_token_response before the hook table: every plugin is inspected on each call."""
+    if _buffered('on_llm_token_response', token, "", ""):
+        return
+    function_handled = False
+    for plugin in state.plugins:
+        if hasattr(plugin, "on_llm_token_response") and callable(getattr(plugin, "on_llm_token_response")):
+            plugin_response = getattr(plugin, "on_llm_token_response")(token)
+            function_handled = function_handled or plugin_response
+    if not function_handled:
+        sys.stdout.write(token)
+
+
+def legacy_on_stdout_flush():
+    if getattr(_capture, 'buffer', None) is not None:
+        return
+    function_handled = False
+    for plugin in state.plugins:
+        if hasattr(plugin, "on_stdout_flush") and callable(getattr(plugin, "on_stdout_flush")):
+            plugin_response = getattr(plugin, "on_stdout_flush")()
+            function_handled = function_handled or plugin_response
+    if not function_handled:
+        sys.stdout.flush()
+
+
+def stream_legacy(tokens):
+    for index in range(tokens):
+        continue_response_generation = True
+        for plugin in state.plugins:
+            if hasattr(plugin, "stop_generation") and callable(getattr(plugin, "stop_generation")):
+                if getattr(plugin, "stop_generation")():
+                    continue_response_generation = False
+                    break
+        if not continue_response_generation:
+            return
+        legacy_on_llm_token_response(TOKENS[index % len(TOKENS)])
+        legacy_on_stdout_flush()
+
+
+def stream_hook_table(tokens):
+    for index in range(tokens):
+        if _stop_requested():
+            return
+        on_llm_token_response(TOKENS[index % len(TOKENS)])
+        on_token_flush()
+    on_stdout_flush()
+
+
+def measure(stream, tokens, plugin_count, token_batch_ms=0):
+    state.plugins = make_plugins(plugin_count)
+    state.token_batch_ms = token_batch_ms
+    output = io.StringIO()
+    stdout = sys.stdout
+    sys.stdout = output
+    try:
+        start = time.perf_counter()
+        stream(tokens)
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+        state.plugins = []
+        state.token_batch_ms = 0
+    return round(tokens / elapsed) if elapsed else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plugin hook dispatch benchmark")
+    parser.add_argument('--tokens', type=int, default=100000)
+    parser.add_argument('--plugins', type=str, help='Comma-separated numbers of loaded plugins', default="0,5,20")
+    parser.add_argument('--token-batch-ms', type=int, help='Token batching interval of the batched scenario', default=20)
+    parser.add_argument('--output', type=str, help='Write the results to this JSON file', default=None)
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "tokens_per_second": {},
+    }
+    for plugin_count in [int(count) for count in args.plugins.split(",") if count.strip()]:
+        scenario = {
+            "legacy": measure(stream_legacy, args.tokens, plugin_count),
+            "hook_table": measure(stream_hook_table, args.tokens, plugin_count),
+            "hook_table_batched": measure(stream_hook_table, args.tokens, plugin_count, args.token_batch_ms),
+        }
+        results["tokens_per_second"][plugin_count] = scenario
+        print(f"{plugin_count} plugins: {json.dumps(scenario)}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""End-to-end document indexing benchmark against the fake Ollama server.
+
+Generates a synthetic corpus of mixed formats (txt, md, pdf, docx, csv, xlsx, html), indexes
+it into a temporary ChromaDB PersistentClient and reports files/s, chunks/s, Ollama requests
+and peak RSS. Results are written as JSON so that runs can be compared between commits.
+
+Usage:
+    python -m benchmarks.bench_indexing --files-per-format 20 --output bench.json
+    python -m benchmarks.bench_indexing --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.fake_ollama_server import FakeOllamaServer
+
+FORMATS = ("txt", "md", "pdf", "docx", "csv", "xlsx", "html")
+
+WORDS = (
+    "vector database retrieval embedding model context window latency throughput chunk "
+    "document summary index query answer token server request cache batch pipeline "
+    "parser table column header paragraph section report analysis result metric"
+).split()
+
+
+def _sentence(rng, length=12):
+    words = [rng.choice(WORDS) for _ in range(length)]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng, sentences=6):
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_minimal_pdf(path, lines):
+    """Write a single-page PDF showing the given lines, without any PDF library."""
+    content_lines = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+    for line in lines:
+        content_lines.append(f"({_pdf_escape(line)}) Tj T*")
+    content_lines.append("ET")
+    stream = "\n".join(content_lines).encode("latin-1", errors="replace")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(stream)).encode("ascii") + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n".encode("ascii")
+    output += b"0000000000 65535 f \n"
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("ascii")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+    with open(path, "wb") as file:
+        file.write(output)
+
+
+def generate_corpus(folder, files_per_format, paragraphs_per_file, formats=FORMATS, seed=42):
+    """
+    Generate a deterministic synthetic corpus.
+
+    :return: The number of files written.
+    """
+    rng = random.Random(seed)
+    count = 0
+    for index in range(files_per_format):
+        paragraphs = [_paragraph(rng) for _ in range(paragraphs_per_file)]
+        rows = [[f"item-{index}-{row}", rng.choice(WORDS), rng.randint(0, 1000), round(rng.random(), 3)] for row in range(paragraphs_per_file * 10)]
+        name = f"doc_{index:04d}"
+
+        for fmt in formats:
+            path = os.path.join(folder, f"{name}_{fmt}.{fmt}")
+            if fmt == "txt":
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write("\n\n".join(paragraphs))
+            elif fmt == "md":
+                with open(path, "w", encoding="utf-8") as file:
+                    for number, paragraph in enumerate(paragraphs):
+                        file.write(f"## Section {number}\n\n{paragraph}\n\n")
+            elif fmt == "html":
+                with open(path, "w", encoding="utf-8") as file:
+                    body = "".join(f"<h2>Section {number}</h2><p>{paragraph}</p>" for number, paragraph in enumerate(paragraphs))
+                    file.write(f"<!DOCTYPE html><html><head><title>{name}</title></head><body>{body}</body></html>")
+            elif fmt == "pdf":
+                lines = []
+                for paragraph in paragraphs:
+                    words = paragraph.split()
+                    lines.extend(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+                write_minimal_pdf(path, lines[:60])
+            elif fmt == "docx":
+                from docx import Document
+                document = Document()
+                for number, paragraph in enumerate(paragraphs):
+                    document.add_heading(f"Section {number}", level=2)
+                    document.add_paragraph(paragraph)
+                document.save(path)
+            elif fmt == "csv":
+                with open(path, "w", encoding="utf-8") as file:
+                    file.write("id,category,quantity,score\n")
+                    file.writelines(",".join(str(value) for value in row) + "\n" for row in rows)
+            elif fmt == "xlsx":
+                from openpyxl import Workbook
+                workbook = Workbook()
+                sheet = workbook.active
+                sheet.append(["id", "category", "quantity", "score"])
+                for row in rows:
+                    sheet.append(row)
+                workbook.save(path)
+            count += 1
+    return count
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process and its children, in megabytes."""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(max(own, children) / divisor, 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_scenario(name, corpus_folder, work_folder, server, options):
+    """Index the corpus into a fresh collection and return the measurements."""
+    import chromadb
+    import ollama_chat
+    from ollama_chat_lib import state
+
+    chroma_path = os.path.join(work_folder, f"chroma_{name}")
+    client = chromadb.PersistentClient(path=chroma_path)
+    state.chroma_db_path = chroma_path
+    state.current_model = "fake-chat"
+    state.embedding_cache = None
+    if options["embedding_cache"]:
+        from ollama_chat_lib.embeddings import EmbeddingCache
+        state.embedding_cache = EmbeddingCache(os.path.join(work_folder, f"embeddings_{name}.sqlite"))
+
+    indexer = ollama_chat.DocumentIndexer(corpus_folder, f"bench_{name}", client, "fake-embed", summary_model="fake-chat")
+    server.reset_stats()
+    start = time.perf_counter()
+    indexer.index_documents(
+        no_chunking_confirmation=True,
+        add_summary=options["add_summary"],
+        embed_batch_size=options["embed_batch_size"],
+        upsert_batch_size=options["upsert_batch_size"],
+        pipeline=options["pipeline"],
+        extraction_workers=options["extraction_workers"],
+        inference_workers=options["inference_workers"],
+        use_manifest=options["manifest"],
+    )
+    elapsed = time.perf_counter() - start
+
+    files = len(indexer.get_text_files())
+    chunks = indexer.collection.count()
+    server_stats = json.loads(json.dumps(server.stats))
+    return {
+        "seconds": round(elapsed, 3),
+        "files": files,
+        "chunks": chunks,
+        "files_per_second": round(files / elapsed, 2) if elapsed else None,
+        "chunks_per_second": round(chunks / elapsed, 2) if elapsed else None,
+        "embedding_requests": server_stats["requests"].get("embed", 0) + server_stats["requests"].get("embeddings", 0),
+        "embedded_inputs": server_stats["embedded_inputs"],
+        "chat_requests": server_stats["requests"].get("chat", 0),
+        "requests": server_stats["requests"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(baseline, current):
+    """Print the relative change of the throughput metrics between two result files."""
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            print(f"{name}: no baseline")
+            continue
+        for metric in ("files_per_second", "chunks_per_second", "embedding_requests", "peak_rss_mb"):
+            old, new = base.get(metric), result.get(metric)
+            if old and new is not None:
+                print(f"{name} {metric}: {old} -> {new} ({(new - old) / old:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Document indexing throughput benchmark")
+    parser.add_argument('--files-per-format', type=int, default=10)
+    parser.add_argument('--paragraphs-per-file', type=int, default=8)
+    parser.add_argument('--formats', type=str, default=",".join(FORMATS))
+    parser.add_argument('--scenarios', type=str, help='Comma-separated: sequential, pipeline', default="sequential,pipeline")
+    parser.add_argument('--latency', type=float, help='Fake server latency per request (seconds)', default=0.005)
+    parser.add_argument('--embed-latency', type=float, help='Fake server latency per embedded input (seconds)', default=0.001)
+    parser.add_argument('--dimensions', type=int, default=384)
+    parser.add_argument('--add-summary', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--embedding-cache', action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument('--manifest', action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument('--embed-batch-size', type=int, default=32)
+    parser.add_argument('--upsert-batch-size', type=int, default=256)
+    parser.add_argument('--extraction-workers', type=int, default=None)
+    parser.add_argument('--inference-workers', type=int, default=4)
+    parser.add_argument('--output', type=str, help='Write the results to this JSON file', default=None)
+    parser.add_argument('--compare', type=str, help='Compare the results with a previous JSON file', default=None)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(latency=args.latency, embed_latency=args.embed_latency, dimensions=args.dimensions).start()
+    # The ollama package reads OLLAMA_HOST when it is imported
+    os.environ["OLLAMA_HOST"] = server.url
+
+    work_folder = tempfile.mkdtemp(prefix="ollama_chat_bench_")
+    try:
+        corpus_folder = os.path.join(work_folder, "corpus")
+        os.makedirs(corpus_folder)
+        formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+        generate_corpus(corpus_folder, args.files_per_format, args.paragraphs_per_file, formats)
+
+        results = {
+            "timestamp": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+            "scenarios": {},
+        }
+        for name in [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]:
+            options = {
+                "pipeline": name == "pipeline",
+                "add_summary": args.add_summary,
+                "embedding_cache": args.embedding_cache,
+                "manifest": args.manifest,
+                "embed_batch_size": args.embed_batch_size,
+                "upsert_batch_size": args.upsert_batch_size,
+                "extraction_workers": args.extraction_workers,
+                "inference_workers": args.inference_workers,
+            }
+            results["scenarios"][name] = run_scenario(name, corpus_folder, work_folder, server, options)
+            print(f"{name}: {json.dumps(results['scenarios'][name])}")
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as file:
+                compare(json.load(file), results)
+    finally:
+        server.stop()
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
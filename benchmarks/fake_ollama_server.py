@@ -0,0 +1,350 @@
+"""Local stand-in for the Ollama HTTP API, for benchmarks and tests that cannot reach a live server.
+
+Implements /api/chat, /api/generate, /api/embed, /api/embeddings, /api/tags, /api/show,
+/api/ps and /api/version with configurable latency. Embeddings are deterministic: the same
+text always yields the same unit vector, so retrieval results are reproducible.
+
+Usage:
+    python -m benchmarks.fake_ollama_server --port 11434 --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = {
+    "fake-chat": {"capabilities": ["completion", "tools"], "context_length": 8192, "family": "llama"},
+    "fake-embed": {"capabilities": ["embedding"], "context_length": 2048, "family": "bert"},
+}
+
+
+def deterministic_embedding(text, dimensions):
+    """Return a unit vector derived from the SHA-256 of the text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big')
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def _timestamp():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeOllamaServer:
+    """
+    Threaded HTTP server mimicking the Ollama API.
+
+    :param host: Interface to bind.
+    :param port: Port to bind (0 picks a free port).
+    :param latency: Seconds added to every request.
+    :param embed_latency: Seconds added per embedded input.
+    :param token_latency: Seconds added per streamed chat chunk.
+    :param dimensions: Size of the embedding vectors.
+    :param models: Dictionary model name -> {"capabilities": [...], "context_length": int, "family": str}.
+    :param chat_response: Fixed chat reply; by default the reply echoes the last user message.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, embed_latency=0.0, token_latency=0.0,
+                 dimensions=384, models=None, chat_response=None):
+        self.latency = latency
+        self.embed_latency = embed_latency
+        self.token_latency = token_latency
+        self.dimensions = dimensions
+        self.models = dict(models or DEFAULT_MODELS)
+        self.chat_response = chat_response
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        server = self
+
+        class Handler(_FakeOllamaHandler):
+            fake = server
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": {}, "embedded_inputs": 0, "chat_messages": 0}
+
+    def record(self, endpoint, embedded_inputs=0):
+        with self._lock:
+            self.stats["requests"][endpoint] = self.stats["requests"].get(endpoint, 0) + 1
+            self.stats["embedded_inputs"] += embedded_inputs
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reply_for(self, messages):
+        if self.chat_response is not None:
+            return self.chat_response
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                return f"Echo: {str(message.get('content', ''))[:200]}"
+        return "Echo:"
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body or b"{}")
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json({"error": message}, status=status)
+
+    def _model_or_error(self, request):
+        model = request.get("model", "")
+        if model in self.fake.models:
+            return model
+        # Accept names with or without the ":latest" tag
+        base = model.split(":")[0]
+        if base in self.fake.models:
+            return base
+        self._send_error(404, f"model '{model}' not found")
+        return None
+
+    def do_GET(self):
+        time.sleep(self.fake.latency)
+        if self.path == "/api/tags":
+            self.fake.record("tags")
+            self._send_json({"models": [self._model_entry(name) for name in self.fake.models]})
+        elif self.path == "/api/ps":
+            self.fake.record("ps")
+            self._send_json({"models": []})
+        elif self.path == "/api/version":
+            self.fake.record("version")
+            self._send_json({"version": "0.0.0-fake"})
+        elif self.path == "/":
+            self._send_json({"status": "Ollama is running"})
+        else:
+            self._send_error(404, "not found")
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        handlers = {
+            "/api/chat": self._chat,
+            "/api/generate": self._generate,
+            "/api/embed": self._embed,
+            "/api/embeddings": self._embeddings,
+            "/api/show": self._show,
+        }
+        handler = handlers.get(self.path)
+        if handler is None:
+            self._send_error(404, "not found")
+            return
+        try:
+            request = self._read_json()
+        except ValueError:
+            self._send_error(400, "invalid JSON")
+            return
+        time.sleep(self.fake.latency)
+        handler(request)
+
+    def _model_entry(self, name):
+        info = self.fake.models[name]
+        return {
+            "name": f"{name}:latest",
+            "model": name,
+            "modified_at": _timestamp(),
+            "size": 1024 * 1024,
+            "digest": hashlib.sha256(name.encode('utf-8')).hexdigest(),
+            "details": {
+                "format": "gguf",
+                "family": info.get("family", "llama"),
+                "families": [info.get("family", "llama")],
+                "parameter_size": "1B",
+                "quantization_level": "Q4_0",
+            },
+        }
+
+    def _show(self, request):
+        self.fake.record("show")
+        model = self._model_or_error(request)
+        if model is None:
+            return
+        info = self.fake.models[model]
+        family = info.get("family", "llama")
+        self._send_json({
+            "modelfile": f"FROM {model}",
+            "template": "{{ .Prompt }}",
+            "parameters": "",
+            "modified_at": _timestamp(),
+            "details": self._model_entry(model)["details"],
+            "model_info": {f"{family}.context_length": info.get("context_length", 2048)},
+            "capabilities": info.get("capabilities", ["completion"]),
+        })
+
+    def _embed(self, request):
+        model = self._model_or_error(request)
+        if model is None:
+            self.fake.record("embed")
+            return
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self.fake.record("embed", embedded_inputs=len(inputs))
+        time.sleep(self.fake.embed_latency * len(inputs))
+        self._send_json({
+            "model": model,
+            "embeddings": [deterministic_embedding(text, self.fake.dimensions) for text in inputs],
+            "total_duration": 0,
+            "load_duration": 0,
+            "prompt_eval_count": sum(max(1, len(text) // 4) for text in inputs),
+        })
+
+    def _embeddings(self, request):
+        model = self._model_or_error(request)
+        if model is None:
+            self.fake.record("embeddings")
+            return
+        self.fake.record("embeddings", embedded_inputs=1)
+        time.sleep(self.fake.embed_latency)
+        self._send_json({"embedding": deterministic_embedding(request.get("prompt", ""), self.fake.dimensions)})
+
+    def _final_stats(self, prompt_chars, reply):
+        return {
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": 0,
+            "load_duration": 0,
+            "prompt_eval_count": max(1, prompt_chars // 4),
+            "prompt_eval_duration": 0,
+            "eval_count": max(1, len(reply) // 4),
+            "eval_duration": 0,
+        }
+
+    def _stream(self, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            data = (json.dumps(chunk) + "\n").encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chat(self, request):
+        self.fake.record("chat")
+        model = self._model_or_error(request)
+        if model is None:
+            return
+        if request.get("tools") and "tools" not in self.fake.models[model].get("capabilities", []):
+            self._send_error(400, f"registry.ollama.ai/library/{model}:latest does not support tools")
+            return
+
+        messages = request.get("messages", [])
+        with self.fake._lock:
+            self.fake.stats["chat_messages"] += len(messages)
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+        reply = self.fake.reply_for(messages)
+
+        if not request.get("stream", True):
+            payload = {"model": model, "created_at": _timestamp(), "message": {"role": "assistant", "content": reply}}
+            payload.update(self._final_stats(prompt_chars, reply))
+            self._send_json(payload)
+            return
+
+        def chunks():
+            for word in reply.split(" "):
+                time.sleep(self.fake.token_latency)
+                yield {"model": model, "created_at": _timestamp(), "message": {"role": "assistant", "content": word + " "}, "done": False}
+            final = {"model": model, "created_at": _timestamp(), "message": {"role": "assistant", "content": ""}}
+            final.update(self._final_stats(prompt_chars, reply))
+            yield final
+
+        self._stream(chunks())
+
+    def _generate(self, request):
+        self.fake.record("generate")
+        model = self._model_or_error(request)
+        if model is None:
+            return
+        prompt = request.get("prompt", "")
+        reply = self.fake.reply_for([{"role": "user", "content": prompt}])
+        if not request.get("stream", True):
+            payload = {"model": model, "created_at": _timestamp(), "response": reply}
+            payload.update(self._final_stats(len(prompt), reply))
+            self._send_json(payload)
+            return
+
+        def chunks():
+            for word in reply.split(" "):
+                time.sleep(self.fake.token_latency)
+                yield {"model": model, "created_at": _timestamp(), "response": word + " ", "done": False}
+            final = {"model": model, "created_at": _timestamp(), "response": ""}
+            final.update(self._final_stats(len(prompt), reply))
+            yield final
+
+        self._stream(chunks())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for benchmarks")
+    parser.add_argument('--host', type=str, default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, help='Seconds added to every request', default=0.0)
+    parser.add_argument('--embed-latency', type=float, help='Seconds added per embedded input', default=0.0)
+    parser.add_argument('--token-latency', type=float, help='Seconds added per streamed chunk', default=0.0)
+    parser.add_argument('--dimensions', type=int, help='Embedding vector size', default=384)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, latency=args.latency, embed_latency=args.embed_latency,
+                              token_latency=args.token_latency, dimensions=args.dimensions)
+    print(f"Fake Ollama server listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
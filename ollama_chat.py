@@ -60,7 +60,7 @@ from ollama_chat_lib.constants import (
     min_quality_results_threshold, min_average_bm25_threshold,
     min_hybrid_score_threshold, distance_percentile_threshold,
     semantic_weight, adaptive_distance_multiplier,
-    stop_words, COMMANDS,
+    stop_words, COMMANDS, tool_cache_ttls,
 )
 from ollama_chat_lib.splitters import TabularDataSplitter, MarkdownSplitter
 from ollama_chat_lib.text_extraction import (
@@ -73,7 +73,7 @@ from ollama_chat_lib.utils import (
     find_latest_user_message, render_tools,
     try_parse_json, try_merge_concatenated_json,
     bytes_to_gibibytes, get_personal_info,
-    extract_json,
+    extract_json, not_concurrency_safe, cached_tool, file_fingerprint,
 )
 from ollama_chat_lib import state
 from ollama_chat_lib.io_hooks import (
@@ -97,7 +97,7 @@ from ollama_chat_lib.vector_db import (
 from ollama_chat_lib.model_selection import (
     select_ollama_model_if_available, select_openai_model_if_available,
     prompt_for_openai_model, prompt_for_ollama_model,
-    is_model_an_ollama_model, prompt_for_model,
+    is_model_an_ollama_model, prompt_for_model, ModelRegistry,
 )
 from ollama_chat_lib.conversation import (
     colorize, print_spinning_wheel, encode_file_to_base64_with_mime,
@@ -118,10 +118,10 @@ from ollama_chat_lib.web_crawler import SimpleWebCrawler as _SimpleWebCrawler, S
 
 class SimpleWebCrawler(_SimpleWebCrawler):
     """Thin compatibility shim that auto-injects ask_fn=ask_ollama."""
-    def __init__(self, urls, llm_enabled=False, system_prompt='', selected_model='', temperature=0.1, verbose=False, plugins=[], num_ctx=None, ask_fn=None):
+    def __init__(self, urls, llm_enabled=False, system_prompt='', selected_model='', temperature=0.1, verbose=False, plugins=None, num_ctx=None, ask_fn=None, **kwargs):
         super().__init__(urls, llm_enabled=llm_enabled, system_prompt=system_prompt, selected_model=selected_model,
                          temperature=temperature, verbose=verbose, plugins=plugins, num_ctx=num_ctx,
-                         ask_fn=ask_fn or ask_ollama)
+                         ask_fn=ask_fn or ask_ollama, **kwargs)
 
 from ollama_chat_lib.plugin_manager import discover_plugins as _discover_plugins  # noqa: E402
 
@@ -133,16 +133,16 @@ from ollama_chat_lib.memory import MemoryManager as _MemoryManager, LongTermMemo
 
 class MemoryManager(_MemoryManager):
     """Thin shim that auto-injects ask_fn=ask_ollama."""
-    def __init__(self, collection_name, chroma_client, selected_model, embedding_model_name, verbose=False, num_ctx=None, long_term_memory_file="long_term_memory.json", ask_fn=None):
+    def __init__(self, collection_name, chroma_client, selected_model, embedding_model_name, verbose=False, num_ctx=None, long_term_memory_file="long_term_memory.json", ask_fn=None, **kwargs):
         super().__init__(collection_name, chroma_client, selected_model, embedding_model_name,
                          verbose=verbose, num_ctx=num_ctx, long_term_memory_file=long_term_memory_file,
-                         ask_fn=ask_fn or ask_ollama)
+                         ask_fn=ask_fn or ask_ollama, **kwargs)
 
 class LongTermMemoryManager(_LongTermMemoryManager):
     """Thin shim that auto-injects ask_fn=ask_ollama."""
-    def __init__(self, selected_model, verbose=False, num_ctx=None, memory_file="long_term_memory.json", ask_fn=None):
+    def __init__(self, selected_model, verbose=False, num_ctx=None, memory_file="long_term_memory.json", ask_fn=None, embedding_model_name=None):
         super().__init__(selected_model, verbose=verbose, num_ctx=num_ctx, memory_file=memory_file,
-                         ask_fn=ask_fn or ask_ollama)
+                         ask_fn=ask_fn or ask_ollama, embedding_model_name=embedding_model_name)
 
 def retrieve_relevant_memory(query_text, top_k=3):
 
@@ -181,16 +181,20 @@ from ollama_chat_lib.llm_core import (
     instantiate_agent_with_tools_and_process_task as _instantiate_agent_with_tools_and_process_task,
 )
 
+# Agents stream their work to the terminal, so they never run alongside other tool calls
+@not_concurrency_safe
 def create_new_agent_with_tools(system_prompt: str, tools: list[str], agent_name: str, agent_description: str, task: str = None):
     return _create_new_agent_with_tools(system_prompt, tools, agent_name, agent_description, task=task,
                                          get_available_tools_fn=get_available_tools, load_chroma_client_fn=load_chroma_client, agent_cls=Agent)
 
+@not_concurrency_safe
 def instantiate_agent_with_tools_and_process_task(task: str, system_prompt: str, tools: list[str], agent_name: str, agent_description: str = None, process_task=True):
     return _instantiate_agent_with_tools_and_process_task(task, system_prompt, tools, agent_name, agent_description=agent_description, process_task=process_task,
                                                            get_available_tools_fn=get_available_tools, load_chroma_client_fn=load_chroma_client, agent_cls=Agent)
 
 from ollama_chat_lib.file_ops import read_file, create_file, delete_file, expand_env_vars, run_command  # noqa: E402
 
+@cached_tool(tool_cache_ttls["web_search"])
 def web_search(query=None, n_results=5, region="wt-wt", web_embedding_model=None, num_ctx=None, return_intermediate=False):
     return _web_search(query=query, n_results=n_results, region=region, web_embedding_model=web_embedding_model, num_ctx=num_ctx, return_intermediate=return_intermediate,
                        ask_fn=ask_ollama, query_vector_database_fn=query_vector_database, web_crawler_cls=SimpleWebCrawler,
@@ -202,6 +206,8 @@ state.chatbots = list(DEFAULT_CHATBOTS)
 
 # vector_db functions → imported from ollama_chat_lib.vector_db
 
+# Queries of the current collection depend on which collection is current
+@cached_tool(tool_cache_ttls["query_vector_database"], fingerprint=lambda parameters: parameters.get("collection_name") or state.current_collection_name)
 def query_vector_database(question, collection_name=None, n_results=None, answer_distance_threshold=0, query_embeddings_model=None, expand_query=True, question_context=None, use_adaptive_filtering=True, return_metadata=False):
     return _query_vector_database(question, collection_name=collection_name, n_results=n_results, answer_distance_threshold=answer_distance_threshold, query_embeddings_model=query_embeddings_model, expand_query=expand_query, question_context=question_context, use_adaptive_filtering=use_adaptive_filtering, return_metadata=return_metadata, ask_fn=ask_ollama)
 
@@ -229,6 +235,7 @@ def generate_tool_response(user_input, tools, selected_model, temperature=0.1, p
 def summarize_chunk(text_chunk, model, max_summary_words, previous_summary=None, num_ctx=None, language='English'):
     return _summarize_chunk(text_chunk, model, max_summary_words, previous_summary=previous_summary, num_ctx=num_ctx, language=language, ask_fn=ask_ollama)
 
+@cached_tool(tool_cache_ttls["summarize_text_file"], fingerprint=file_fingerprint("file_path"))
 def summarize_text_file(file_path, model=None, chunk_size=400, overlap=50, max_final_words=500, num_ctx=None, language='English'):
     return _summarize_text_file(file_path, model=model, chunk_size=chunk_size, overlap=overlap, max_final_words=max_final_words, num_ctx=num_ctx, language=language, ask_fn=ask_ollama)
 
@@ -5,6 +5,7 @@ import re
 from colorama import Fore, Style
 
 from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib.telemetry import telemetry_purpose
 from ollama_chat_lib.utils import render_tools
 
 
@@ -77,7 +78,8 @@ class Agent:
             on_print(f"User prompt:\n{prompt}", Fore.WHITE + Style.DIM)
             on_print(f"Model: {model}", Fore.WHITE + Style.DIM)
 
-        llm_response = self._ask_fn(system_prompt, prompt, model, temperature=self.temperature, no_bot_prompt=True, stream_active=False, tools=tools, num_ctx=self.num_ctx)
+        with telemetry_purpose("agent"):
+            llm_response = self._ask_fn(system_prompt, prompt, model, temperature=self.temperature, no_bot_prompt=True, stream_active=False, tools=tools, num_ctx=self.num_ctx)
 
         if self.verbose:
             on_print(f"Response:\n{llm_response}", Fore.WHITE + Style.DIM)
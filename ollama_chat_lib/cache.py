@@ -0,0 +1,161 @@
+"""Size-bounded, persistent key/value cache backed by SQLite."""
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Persistent bytes cache with least-recently-used eviction.
+
+    Entries are stored in a single SQLite table. The cache can be bounded by total value
+    size (max_bytes), by number of entries (max_entries) and by age (ttl, in seconds).
+    The least recently accessed entries are evicted first. All methods are thread-safe.
+    """
+
+    def __init__(self, path, max_bytes=None, max_entries=None, ttl=None):
+        """
+        :param path: The SQLite database file (created if needed), or ":memory:".
+        :param max_bytes: Maximum total size of the stored values, or None for no limit.
+        :param max_entries: Maximum number of entries, or None for no limit.
+        :param ttl: Maximum age of an entry in seconds, or None for no expiry.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            if path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON cache (accessed_at)")
+
+    def _is_expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key):
+        """Return the value stored for a key, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Return a dictionary of the values found for the given keys. Expired entries are
+        deleted and counted as misses.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        now = time.time()
+        found = {}
+        expired = []
+        with self._lock, self._connection:
+            # Stay below SQLite's default limit on the number of query parameters
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT key, value, created_at FROM cache WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if self._is_expired(created_at, now):
+                        expired.append((key,))
+                    else:
+                        found[key] = value
+
+            if expired:
+                self._connection.executemany("DELETE FROM cache WHERE key = ?", expired)
+            if found:
+                self._connection.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?", [(now, key) for key in found])
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        """Store a value (bytes) for a key."""
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """Store several key/value pairs at once, then evict entries over the limits."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, sqlite3.Binary(value), len(value), now, now) for key, value in items.items()]
+            )
+            self._evict()
+
+    def delete(self, key):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM cache")
+
+    def _evict(self):
+        """Delete the least recently accessed entries until the cache fits its limits."""
+        if self.ttl is not None:
+            cursor = self._connection.execute("DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,))
+            self.evictions += max(cursor.rowcount, 0)
+
+        count, total_bytes = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if self.max_entries is not None and count > self.max_entries:
+            excess = count - self.max_entries
+            self._connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)", (excess,)
+            )
+            self.evictions += excess
+            count, total_bytes = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+
+        if self.max_bytes is not None and total_bytes > self.max_bytes:
+            to_free = total_bytes - self.max_bytes
+            victims = []
+            for key, size in self._connection.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+                victims.append((key,))
+                to_free -= size
+                if to_free <= 0:
+                    break
+            self._connection.executemany("DELETE FROM cache WHERE key = ?", victims)
+            self.evictions += len(victims)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def total_bytes(self):
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def stats(self):
+        """Return the hit/miss/eviction counters and the current size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'bytes': self.total_bytes(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
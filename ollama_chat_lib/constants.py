@@ -21,16 +21,120 @@ distance_percentile_threshold = 75
 # Weight for semantic similarity vs BM25 in hybrid scoring (0.0 to 1.0)
 # 0.5 = equal weight, higher = more semantic, lower = more lexical
 semantic_weight = 0.5
+# Reciprocal rank fusion constant used to merge the vector and lexical (BM25) result lists
+# Higher values flatten the difference between top and lower ranks
+rrf_k = 60
 # Maximum distance multiplier for adaptive threshold
 # Results beyond min_distance * this multiplier are filtered
 adaptive_distance_multiplier = 2.5
 
+# Document indexing batch sizes
+# Number of texts sent to the Ollama embed endpoint in a single request
+default_embed_batch_size = 32
+# Number of records written to ChromaDB in a single upsert
+default_upsert_batch_size = 256
+
+# Maximum size of the on-disk embedding cache, in megabytes
+default_embedding_cache_size_mb = 512
+
+# Cache of non-streamed LLM responses
+# Maximum size of the on-disk response cache, in megabytes
+default_response_cache_size_mb = 256
+# In "on" mode, only requests at this temperature or below are cached (record and replay cache all requests)
+response_cache_max_temperature = 0.2
+
+# Ollama model catalog cache
+# Seconds after which the cached list of installed models is reloaded
+default_model_registry_ttl = 600
+# Minimum seconds between two reloads triggered by looking up an unknown model name
+model_registry_miss_refresh_interval = 30
+
+# Query expansion cache limits
+default_query_expansion_cache_entries = 5000
+default_query_expansion_cache_ttl_hours = 168
+
+# Pipelined document indexing
+# Number of concurrent summary/embedding requests (match OLLAMA_NUM_PARALLEL on the server)
+default_inference_workers = 4
+# Maximum number of documents waiting between two pipeline stages
+default_pipeline_queue_size = 16
+
+# Web search cache limits (0 disables a limit)
+default_web_cache_max_chunks = 5000
+default_web_cache_max_size_mb = 50
+default_web_cache_ttl_hours = 168
+# "lru" (least recently used) or "lfu" (least frequently used)
+default_web_cache_eviction = "lru"
+# Seconds between two full scans of the web cache when no limit is exceeded
+web_cache_scan_interval = 3600
+# Fraction of a limit freed by an eviction, so that the next searches do not scan the cache again
+web_cache_eviction_headroom = 0.1
+
+# Concurrent tool calls
+default_max_tool_workers = 4
+# Seconds to wait for a tool running concurrently with others
+default_tool_timeout = 300
+
+# Session tool result cache: maximum entries and time to live (seconds) of each cacheable tool
+default_tool_cache_entries = 256
+tool_cache_ttls = {
+    "web_search": 600,
+    "query_vector_database": 300,
+    "read_file": 300,
+    "summarize_text_file": 3600,
+}
+
+# Concurrent web page fetching (SimpleWebCrawler)
+default_web_crawler_workers = 8
+# Maximum number of simultaneous requests to the same host
+default_web_crawler_per_host_limit = 2
+# Seconds allowed for each page request
+default_web_crawler_timeout = 10
+# Seconds after which a crawl returns the pages fetched so far
+default_web_crawler_deadline = 20
+
+# Conversation context window management
+# Ollama context window used when none is specified
+default_context_window = 2048
+# Fraction of the context window the conversation may use, the rest is left to the response
+default_context_budget_ratio = 0.75
+# Once over budget, trim the conversation down to this fraction of the budget
+context_trim_target_ratio = 0.6
+# Tool outputs of past turns are shortened to this number of tokens
+context_tool_output_max_tokens = 512
+# Token estimation: average characters per token, tokens added per message and per image
+context_chars_per_token = 4
+context_message_overhead_tokens = 4
+context_image_tokens = 768
+context_token_cache_entries = 4096
+
+# Long-term memory facts injected for each user query: maximum number and estimated tokens
+default_long_term_memory_top_k = 8
+default_long_term_memory_max_tokens = 256
+
+# Memory collection compaction: merge memories whose embeddings are at least this similar (cosine)
+memory_merge_similarity = 0.9
+# Compact automatically once the collection holds more memories than this, then every few new memories
+default_memory_compaction_threshold = 100
+memory_compaction_interval = 20
+
+# Background memory worker: attempts before a memory job is marked as failed
+memory_job_max_attempts = 3
+# Seconds a claimed memory job stays reserved without a heartbeat before another session may claim it
+memory_job_lease = 300
+
+# Telemetry of LLM calls and retrievals
+# Number of latest calls per purpose over which percentiles are computed
+telemetry_window = 500
+# Model load duration (seconds) above which a call is counted as stalled by a model load
+model_load_stall_seconds = 1.0
+
 stop_words = ['i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", "you've", "you'll", "you'd", 'your', 'yours', 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', "she's", 'her', 'hers', 'herself', 'it', "it's", 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves', 'what', 'which', 'who', 'whom', 'this', 'that', "that'll", 'these', 'those', 'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for', 'with', 'about', 'against', 'between', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'don', "don't", 'should', "should've", 'now', 'd', 'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren', "aren't", 'couldn', "couldn't", 'didn', "didn't", 'doesn', "doesn't", 'hadn', "hadn't", 'hasn', "hasn't", 'haven', "haven't", 'isn', "isn't", 'ma', 'mightn', "mightn't", 'mustn', "mustn't", 'needn', "needn't", 'shan', "shan't", 'shouldn', "shouldn't", 'wasn', "wasn't", 'weren', "weren't", 'won', "won't", 'wouldn', "wouldn't"]
 
 # List of available commands to autocomplete
 COMMANDS = [
     "/context", "/index", "/verbose", "/cot", "/search", "/web", "/model",
-    "/thinking_model", "/model2", "/tools", "/load", "/save", "/collection", "/memory", "/remember",
+    "/thinking_model", "/model2", "/tools", "/load", "/save", "/collection", "/memory", "/memory_status", "/compact_memory", "/stats", "/remember",
     "/memorize", "/forget", "/editcollection", "/rmcollection", "/deletecollection", "/chatbot",
     "/think", "/cb", "/file", "/quit", "/exit", "/bye"
 ]
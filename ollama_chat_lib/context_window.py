@@ -0,0 +1,274 @@
+"""Token-aware trimming of the conversation sent to the model."""
+
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+
+from colorama import Fore, Style
+
+from ollama_chat_lib.constants import (
+    context_chars_per_token,
+    context_image_tokens,
+    context_message_overhead_tokens,
+    context_token_cache_entries,
+    context_tool_output_max_tokens,
+    context_trim_target_ratio,
+    default_context_budget_ratio,
+    default_context_window,
+)
+from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib.telemetry import telemetry_purpose
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+SUMMARY_SYSTEM_PROMPT = """
+You are maintaining the memory of an ongoing conversation between a user and an assistant, whose oldest messages no longer fit in the model context window.
+Update the summary of the earlier conversation with the messages below: keep the user's goals, questions, facts and personal details they shared, decisions made and open tasks.
+Drop greetings, repetitions and the details of tool outputs. Answer with the summary only, in the conversation language, in a few short paragraphs or bullet points.
+"""
+
+
+def _message_text(message):
+    content = message.get('content') or ''
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    tool_calls = message.get('tool_calls')
+    if tool_calls:
+        content += json.dumps(tool_calls, default=lambda o: vars(o) if hasattr(o, '__dict__') else str(o))
+    return content
+
+
+class ContextWindowManager:
+    """
+    Keep the conversation sent to the model within a token budget below num_ctx.
+
+    The leading system messages are pinned. When the conversation exceeds the budget, bulky tool
+    outputs of past turns are shortened first, then the oldest turns are folded into a running
+    summary (or dropped when no summarizer is available) until the conversation is back under a
+    lower target, so that trimming, and the summarization request it costs, happens only every
+    few turns. The current turn (the latest user message and what follows it) is never trimmed.
+    Token counts are estimated from the message length and cached per message.
+
+    The conversation itself is left untouched, so that /save and memory see the whole history:
+    the manager keeps the running summary and the number of turns it covers, and builds the
+    trimmed copy sent to the model from them, with the same prefix from one request to the next.
+    """
+
+    def __init__(self, budget_ratio=default_context_budget_ratio, summarize=True, model=None, ask_fn=None, verbose=False):
+        """
+        :param budget_ratio: Fraction of the context window the conversation may use; the rest is left to the response.
+        :param summarize: Summarize the dropped turns instead of discarding them.
+        :param model: The model used to write summaries.
+        :param ask_fn: Callable matching the ask_ollama signature, used to write summaries.
+        """
+        self.budget_ratio = budget_ratio
+        self.summarize = summarize
+        self.model = model
+        self.verbose = verbose
+        self._ask_fn = ask_fn
+        self._token_cache = OrderedDict()
+        self._lock = threading.Lock()
+        # Running summary message, the number of past turns it covers and a hash of these turns
+        self._summary = None
+        self._folded_turns = 0
+        self._folded_key = None
+
+    def count_message_tokens(self, message):
+        """Estimated number of tokens of a message, cached by its role and content."""
+        text = _message_text(message)
+        key = hashlib.sha1(f"{message.get('role', '')}\0{text}".encode('utf-8', errors='replace')).digest()
+        with self._lock:
+            tokens = self._token_cache.get(key)
+            if tokens is not None:
+                self._token_cache.move_to_end(key)
+        if tokens is None:
+            tokens = math.ceil(len(text) / context_chars_per_token) + context_message_overhead_tokens
+            with self._lock:
+                self._token_cache[key] = tokens
+                while len(self._token_cache) > context_token_cache_entries:
+                    self._token_cache.popitem(last=False)
+        return tokens + context_image_tokens * len(message.get('images') or [])
+
+    def count_tokens(self, conversation):
+        return sum(self.count_message_tokens(message) for message in conversation)
+
+    def get_budget(self, num_ctx=None, context_length=None):
+        """
+        :param num_ctx: The context window requested from the server, or None for the Ollama default.
+        :param context_length: The maximum context length of the model, if known: the server does not go beyond it.
+        """
+        num_ctx = num_ctx or default_context_window
+        if context_length:
+            num_ctx = min(num_ctx, context_length)
+        return int(num_ctx * self.budget_ratio)
+
+    def reset(self):
+        """Forget the running summary, e.g. when the conversation is cleared."""
+        self._summary = None
+        self._folded_turns = 0
+        self._folded_key = None
+
+    @staticmethod
+    def _split(conversation):
+        """Split a conversation into its pinned system prefix, past turns and current turn."""
+        prefix_length = 0
+        while prefix_length < len(conversation) and conversation[prefix_length].get('role') == 'system':
+            prefix_length += 1
+        prefix = conversation[:prefix_length]
+
+        turns = []
+        for message in conversation[prefix_length:]:
+            if message.get('role') == 'user' or not turns:
+                # The memories injected before a user message belong to its turn
+                leading = []
+                while turns and turns[-1] and turns[-1][-1].get('role') == 'system':
+                    leading.insert(0, turns[-1].pop())
+                turns.append(leading)
+            turns[-1].append(message)
+        current_turn = turns.pop() if turns else []
+        return prefix, turns, current_turn
+
+    @staticmethod
+    def _turns_key(turns):
+        digest = hashlib.sha1()
+        for turn in turns:
+            for message in turn:
+                digest.update(f"{message.get('role', '')}\0{_message_text(message)}\0".encode('utf-8', errors='replace'))
+        return digest.digest()
+
+    def _shorten_tool_output(self, message):
+        if message.get('role') != 'tool' or self.count_message_tokens(message) <= context_tool_output_max_tokens:
+            return message
+        content = str(message.get('content') or '')
+        kept_chars = int(context_tool_output_max_tokens * context_chars_per_token)
+        omitted_tokens = math.ceil((len(content) - kept_chars) / context_chars_per_token)
+        return dict(message, content=f"{content[:kept_chars]}\n[... {omitted_tokens} tokens of tool output omitted ...]")
+
+    def _summarize(self, summary, dropped_turns, num_ctx):
+        if not self.summarize or self._ask_fn is None or not self.model:
+            return summary
+        lines = []
+        if summary is not None:
+            lines.append(summary['content'])
+        for turn in dropped_turns:
+            for message in turn:
+                if message.get('role') in ('user', 'assistant') and message.get('content'):
+                    lines.append(f"{message['role']}: {message['content']}")
+        try:
+            with telemetry_purpose("summary"):
+                text = self._ask_fn(SUMMARY_SYSTEM_PROMPT, "\n".join(lines), self.model, temperature=0.1, no_bot_prompt=True, stream_active=False, num_ctx=num_ctx)
+        except Exception as e:
+            on_print(f"Could not summarize the earlier conversation: {e}", Fore.YELLOW + Style.DIM)
+            return summary
+        if not text or not text.strip():
+            return summary
+        if text.startswith(SUMMARY_PREFIX):
+            text = text[len(SUMMARY_PREFIX):]
+        return {"role": "system", "content": f"{SUMMARY_PREFIX}\n{text.strip()}"}
+
+    def fit(self, conversation, num_ctx=None, context_length=None):
+        """
+        Return the conversation to send to the model, trimmed to fit the token budget.
+
+        :param conversation: The conversation (list of role/content dictionaries), which is not modified.
+        :param num_ctx: The context window of the model, or None for the Ollama default.
+        :param context_length: The maximum context length of the model, if known.
+        :return: The conversation itself when it fits and nothing was trimmed before, else a trimmed copy.
+        """
+        budget = self.get_budget(num_ctx, context_length)
+        prefix, turns, current_turn = self._split(conversation)
+
+        # Turns already folded into the summary, unless the history was replaced (/reset, /load...)
+        if self._folded_turns and (self._folded_turns > len(turns) or self._turns_key(turns[:self._folded_turns]) != self._folded_key):
+            self.reset()
+
+        total = self.count_tokens(conversation)
+        if budget <= 0 or (total <= budget and not self._folded_turns):
+            if self.verbose:
+                on_print(f"Context window: {total}/{budget} tokens", Fore.WHITE + Style.DIM)
+            return conversation
+
+        summary = self._summary
+        kept_turns = [[self._shorten_tool_output(message) for message in turn] for turn in turns[self._folded_turns:]]
+
+        target = int(budget * context_trim_target_ratio)
+        fixed_tokens = self.count_tokens(prefix) + self.count_tokens(current_turn)
+        turns_tokens = [self.count_tokens(turn) for turn in kept_turns]
+        summary_tokens = self.count_message_tokens(summary) if summary is not None else 0
+
+        dropped = []
+        if fixed_tokens + summary_tokens + sum(turns_tokens) > budget:
+            while kept_turns and fixed_tokens + summary_tokens + sum(turns_tokens) > target:
+                dropped.append(kept_turns.pop(0))
+                turns_tokens.pop(0)
+
+        summarized = False
+        if dropped:
+            new_summary = self._summarize(summary, dropped, num_ctx)
+            summarized = new_summary is not summary
+            self._summary = summary = new_summary
+            self._folded_turns += len(dropped)
+            self._folded_key = self._turns_key(turns[:self._folded_turns])
+
+        trimmed = list(prefix)
+        if summary is not None:
+            trimmed.append(summary)
+        for turn in kept_turns:
+            trimmed.extend(turn)
+        trimmed.extend(current_turn)
+
+        if self.verbose:
+            new_total = self.count_tokens(trimmed)
+            if dropped:
+                on_print(f"Context window: {total} tokens over the budget of {budget}, {len(dropped)} oldest turns {'summarized' if summarized else 'dropped'}, now {new_total} tokens", Fore.WHITE + Style.DIM)
+            else:
+                on_print(f"Context window: {new_total}/{budget} tokens, {self._folded_turns} oldest turns left out", Fore.WHITE + Style.DIM)
+        return trimmed
+
+
+class PromptCacheStats:
+    """
+    Estimate how much of each prompt Ollama reused from its prompt (KV) cache.
+
+    Ollama reports in prompt_eval_count the number of prompt tokens it actually evaluated, which
+    excludes the prefix it reused from the previous request to the same model. Comparing it with
+    the estimated size of the prompt gives the share of the prompt served from the cache.
+    """
+
+    def __init__(self, token_counter=None):
+        """
+        :param token_counter: Object with a count_tokens(conversation) method, a ContextWindowManager by default.
+        """
+        self.token_counter = token_counter or ContextWindowManager()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.evaluated_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, conversation, prompt_eval_count):
+        """
+        Record the prompt_eval_count of a response to the given conversation.
+
+        :return: The estimated share of this prompt reused from the cache, or None if it is unknown.
+        """
+        if not isinstance(prompt_eval_count, int):
+            return None
+        prompt_tokens = max(self.token_counter.count_tokens(conversation), prompt_eval_count)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.evaluated_tokens += prompt_eval_count
+        return 1 - prompt_eval_count / prompt_tokens if prompt_tokens else None
+
+    @property
+    def hit_rate(self):
+        with self._lock:
+            return 1 - self.evaluated_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def format_stats(self):
+        """Return a one-line summary of the prompt cache hit rate of the session."""
+        with self._lock:
+            requests, prompt_tokens, evaluated_tokens = self.requests, self.prompt_tokens, self.evaluated_tokens
+        return f"Prompt cache: {prompt_tokens - evaluated_tokens}/~{prompt_tokens} prompt tokens reused ({self.hit_rate:.0%}) over {requests} requests"
@@ -14,22 +14,22 @@ import mimetypes
 
 from colorama import Fore, Style
 from pygments import highlight
-from pygments.lexers import get_lexer_by_name
-from pygments.formatters import Terminal256Formatter
 
 from ollama_chat_lib import state
 from ollama_chat_lib.io_hooks import on_print, on_stdout_write, on_stdout_flush, on_user_input
+from ollama_chat_lib.markdown_renderer import get_lexer, get_formatter
+from ollama_chat_lib.telemetry import telemetry_purpose
 
 
 # ── UI helpers ────────────────────────────────────────────────────────────
 
 def colorize(input_text, language='md'):
     try:
-        lexer = get_lexer_by_name(language)
+        lexer = get_lexer(language)
     except ValueError:
         return input_text  # Unknown language, return unchanged
 
-    formatter = Terminal256Formatter(style='default')
+    formatter = get_formatter()
 
     if input_text is None:
         return ""
@@ -268,7 +268,8 @@ def summarize_chunk(text_chunk, model, max_summary_words, previous_summary=None,
     if ask_fn is None:
         raise ValueError("ask_fn must be provided for summarize_chunk")
 
-    summary = ask_fn(system_prompt, user_prompt, model, no_bot_prompt=True, stream_active=False, num_ctx=num_ctx)
+    with telemetry_purpose("summary"):
+        summary = ask_fn(system_prompt, user_prompt, model, no_bot_prompt=True, stream_active=False, num_ctx=num_ctx)
     return summary or ""
 
 
@@ -1,28 +1,35 @@
 """DocumentIndexer: index and search documents with ChromaDB embeddings."""
 
 import hashlib
+import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from urllib.parse import urljoin
 
-import ollama
 from colorama import Fore, Style
-from PyPDF2 import PdfReader
 from tqdm import tqdm
 
 from ollama_chat_lib import state
+from ollama_chat_lib.constants import (
+    default_embed_batch_size,
+    default_inference_workers,
+    default_pipeline_queue_size,
+    default_upsert_batch_size,
+)
+from ollama_chat_lib.embeddings import embed_texts
+from ollama_chat_lib.index_manifest import IndexManifest, hash_file, hash_text
 from ollama_chat_lib.io_hooks import on_print, on_user_input
+from ollama_chat_lib.lexical_index import get_lexical_index
 from ollama_chat_lib.splitters import MarkdownSplitter, TabularDataSplitter
 from ollama_chat_lib.text_extraction import (
-    extract_text_from_csv,
-    extract_text_from_docx,
+    extract_text_from_file,
     extract_text_from_html,
-    extract_text_from_pptx,
-    extract_text_from_xlsx,
     is_html,
     is_markdown,
 )
+from ollama_chat_lib.telemetry import telemetry_purpose
 
 
 class DocumentIndexer:
@@ -36,6 +43,15 @@ class DocumentIndexer:
         self.verbose = verbose
         self._ask_fn = ask_fn
 
+        # Incremental indexing state, set up by index_documents
+        self._manifest = None
+        self._manifest_options = None
+        self._lexical_index = None
+        self._skip_existing = True
+        self._store_full_docs = False
+        self._file_fingerprints = {}
+        self._failed_record_ids = set()
+
         if verbose:
             on_print(f"DocumentIndexer initialized with embedding model: {self.model}", Fore.WHITE + Style.DIM)
             if self.summary_model:
@@ -140,37 +156,7 @@ class DocumentIndexer:
         Supports plain text, PDF, DOCX, PPTX, and XLSX files.
         """
         try:
-            lower_path = file_path.lower()
-
-            # Handle PDF files
-            if lower_path.endswith('.pdf'):
-                reader = PdfReader(file_path)
-                text = ''
-                for page in reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text
-                return re.sub(r'\n+', '\n', text)
-
-            # Handle DOCX files
-            if lower_path.endswith('.docx'):
-                return extract_text_from_docx(file_path)
-
-            # Handle PPTX files
-            if lower_path.endswith('.pptx'):
-                return extract_text_from_pptx(file_path)
-
-            # Handle XLSX files
-            if lower_path.endswith('.xlsx'):
-                return extract_text_from_xlsx(file_path)
-
-            # Handle CSV files
-            if lower_path.endswith('.csv'):
-                return extract_text_from_csv(file_path)
-
-            # Default: read as text
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+            return extract_text_from_file(file_path)
         except Exception as e:
             if self.verbose:
                 on_print(f"Error reading file {file_path}: {e}", Fore.RED)
@@ -210,7 +196,530 @@ class DocumentIndexer:
             
         return extracted_text
 
-    def index_documents(self, allow_chunks=True, no_chunking_confirmation=False, split_paragraphs=False, additional_metadata=None, num_ctx=None, skip_existing=True, extract_start=None, extract_end=None, add_summary=True, store_full_docs=None):
+
+    def _build_file_metadata(self, file_path, document_id, additional_metadata=None):
+        """
+        Build the metadata dictionary stored with every record of a file.
+
+        :param file_path: The absolute path to the file.
+        :param document_id: The document ID generated for the file.
+        :param additional_metadata: Optional dictionary of additional metadata by file name.
+        :return: The metadata dictionary.
+        """
+        # Extract file name and base file information
+        file_name = os.path.basename(file_path)
+        file_name_without_ext = os.path.splitext(file_name)[0]
+        current_date = datetime.now().isoformat()
+
+        # Create a more comprehensive metadata structure
+        file_metadata = {
+            'published': current_date,
+            'docSource': os.path.dirname(file_path),
+            'docAuthor': 'Unknown',
+            'description': f"Document from {file_path}",
+            'title': file_name_without_ext,
+            'id': document_id,
+            'filePath': file_path
+        }
+
+        # Convert the file path to url and add it to the metadata
+        file_metadata['url'] = urljoin("file://", file_path)
+
+        # If windows, convert the file path to a URI
+        if os.name == 'nt':
+            file_metadata['url'] = file_metadata['url'].replace("\\", "/")
+
+            # Replace the drive letter with "file:///" prefix
+            file_metadata['url'] = file_metadata['url'].replace("file://", "file:///")
+
+        if additional_metadata and file_path in additional_metadata:
+            file_metadata.update(additional_metadata[file_path])
+
+        return file_metadata
+
+    def _split_into_chunks(self, file_path, content_to_chunk, text_splitter, split_paragraphs=False):
+        """
+        Split the content of a file into chunks, using the splitter matching its format.
+
+        DOCX, PPTX, and XLSX are extracted as Markdown, so MarkdownSplitter is used for them too.
+        CSV and XLSX are split by rows with TabularDataSplitter.
+
+        :return: The list of chunks.
+        """
+        lower_file_path = file_path.lower()
+        if self._is_tabular_file(file_path):
+            # Use TabularDataSplitter to chunk by rows while
+            # repeating the header on each chunk for context
+            tabular_splitter = TabularDataSplitter(content_to_chunk, rows_per_chunk=50)
+            return tabular_splitter.split()
+        if is_html(file_path):
+            # Convert to Markdown before splitting
+            markdown_splitter = MarkdownSplitter(extract_text_from_html(content_to_chunk), split_paragraphs=split_paragraphs)
+            return markdown_splitter.split()
+        if is_markdown(file_path) or lower_file_path.endswith('.docx') or lower_file_path.endswith('.pptx'):
+            markdown_splitter = MarkdownSplitter(content_to_chunk, split_paragraphs=split_paragraphs)
+            return markdown_splitter.split()
+        return text_splitter.split_text(content_to_chunk)
+
+    @staticmethod
+    def _is_tabular_file(file_path):
+        lower_file_path = file_path.lower()
+        return lower_file_path.endswith('.csv') or lower_file_path.endswith('.xlsx')
+
+    def _generate_document_summary(self, document_id, file_path, content_to_chunk, no_chunking_confirmation=False, num_ctx=None):
+        """
+        Generate the summary prepended to every chunk of a document.
+
+        For CSV/Excel files, auto-summary is rarely meaningful: the user is asked for
+        context instead (unless running in automated mode).
+
+        :param file_path: The path of the document, or None for in-memory documents.
+        :return: The formatted summary prefix, or None if no summary was generated.
+        """
+        # Use summary_model for summary generation, fallback to current_model if available
+        summary_model = self.summary_model
+        if summary_model is None:
+            try:
+                summary_model = state.current_model
+            except NameError:
+                summary_model = None
+        if not summary_model:
+            return None
+
+        if file_path is not None and self._is_tabular_file(file_path):
+            # Extract column headers and first data row from the markdown table,
+            # then optionally ask the user for context to produce a useful summary.
+            table_header_line = ""
+            table_first_row = ""
+            _all_lines = content_to_chunk.splitlines()
+            for _j, _line in enumerate(_all_lines):
+                if _line.startswith('|') and _j + 1 < len(_all_lines):
+                    _next = _all_lines[_j + 1]
+                    if re.match(r'^\|\s*-{3,}', _next):
+                        table_header_line = _line
+                        if _j + 2 < len(_all_lines) and _all_lines[_j + 2].startswith('|'):
+                            table_first_row = _all_lines[_j + 2]
+                        break
+
+            user_context = ""
+            if not no_chunking_confirmation:
+                on_print(f"\nTabular file detected: {os.path.basename(file_path)}", Fore.CYAN)
+                if table_header_line:
+                    on_print(f"Columns : {table_header_line}", Fore.WHITE + Style.DIM)
+                if table_first_row:
+                    on_print(f"First row: {table_first_row}", Fore.WHITE + Style.DIM)
+                on_print("Auto-generated summaries for tabular data are usually not meaningful.")
+                user_context = on_user_input(
+                    "Provide context about what this data represents (press Enter to skip summary): "
+                ).strip()
+
+            if not user_context:
+                if self.verbose:
+                    on_print(f"Skipping summary for tabular document {document_id} (no context provided)", Fore.WHITE + Style.DIM)
+                return None
+
+            # Build an enriched prompt combining user context with column/row info
+            tabular_info = ""
+            if table_header_line:
+                tabular_info += f"\nColumn headers: {table_header_line}"
+            if table_first_row:
+                tabular_info += f"\nFirst data row: {table_first_row}"
+            if self.verbose:
+                on_print(f"Generating context-enhanced summary for {document_id}", Fore.WHITE + Style.DIM)
+            system_prompt = "You are a helpful assistant that creates concise, informative dataset summaries."
+            summary_prompt = (
+                f"A user provided the following context about a tabular data file:\n"
+                f"{user_context}\n"
+                f"{tabular_info}\n\n"
+                f"Based on this information, write a concise summary (2-5 sentences) describing "
+                f"what this dataset contains, what each column likely represents, and what kind "
+                f"of queries it would be useful to answer."
+            )
+        else:
+            if self.verbose:
+                on_print(f"Generating summary for document {document_id} using model: {summary_model}", Fore.WHITE + Style.DIM)
+            system_prompt = "You are a helpful assistant that creates concise document summaries."
+            summary_prompt = f"""Provide a brief summary (2-5 sentences) of the following document. Focus on the main topic and key points:
+{content_to_chunk[:2000]}"""  # Limit to first 2000 chars for summary generation
+
+        try:
+            with telemetry_purpose("summary"):
+                summary_response = self._ask_fn(
+                    system_prompt,
+                    summary_prompt,
+                    summary_model,
+                    temperature=0.3,
+                    no_bot_prompt=True,
+                    stream_active=False,
+                    num_ctx=num_ctx
+                )
+            if self.verbose:
+                on_print(f"Summary generated: {summary_response.strip()}", Fore.GREEN)
+            return f"[Document Summary: {summary_response.strip()}]\n\n"
+        except Exception as e:
+            if self.verbose:
+                on_print(f"Failed to generate summary: {e}", Fore.YELLOW)
+            return None
+
+    def _document_exists(self, document_id):
+        """
+        Check whether a whole (non-chunked) document is already indexed.
+        """
+        existing_doc = self.collection.get(ids=[document_id])
+        return bool(existing_doc and len(existing_doc.get('ids', [])) > 0)
+
+    def _prepare_document(self, file_path, document_id, content, text_splitter=None, split_paragraphs=False, additional_metadata=None, skip_existing=True, extract_start=None, extract_end=None):
+        """
+        Build the metadata, embedding text and chunks of a document whose content has been read.
+
+        :return: A dictionary describing the document, or None if it is already fully indexed.
+        """
+        file_metadata = self._build_file_metadata(file_path, document_id, additional_metadata)
+
+        # Extract text for embedding if start and end strings are provided
+        embedding_content = content
+        if extract_start and extract_end:
+            embedding_content = self.extract_text_between_strings(content, extract_start, extract_end)
+            # Add metadata to indicate partial extraction was used
+            file_metadata['extraction_used'] = True
+            file_metadata['extract_start'] = extract_start
+            file_metadata['extract_end'] = extract_end
+            file_metadata['extracted_length'] = len(embedding_content)
+            file_metadata['original_length'] = len(content)
+
+        document = {
+            'document_id': document_id,
+            'file_path': file_path,
+            'content': content,
+            'metadata': file_metadata,
+            'embedding_content': embedding_content,
+            'chunks': None,
+            'existing_ids': set(),
+            'reused_ids': {},
+            'stale_ids': [],
+        }
+
+        if text_splitter is not None:
+            # Use embedding_content for chunking (which may be extracted text)
+            document['chunks'] = self._split_into_chunks(file_path, embedding_content, text_splitter, split_paragraphs=split_paragraphs)
+        chunks = document['chunks']
+
+        manifest_entry = None
+        if self._manifest is not None:
+            if chunks is None:
+                document['chunk_hashes'] = {document_id: hash_text(embedding_content)}
+            else:
+                document['chunk_hashes'] = {f"{document_id}_{i}": hash_text(chunk) for i, chunk in enumerate(chunks)}
+            manifest_entry = self._manifest.get(os.path.abspath(file_path))
+
+        if manifest_entry is not None:
+            # The file was indexed before: only write the chunks whose text changed
+            self._diff_against_manifest(document, manifest_entry)
+            if chunks is not None and set(document['chunk_hashes']) <= document['existing_ids']:
+                if self.verbose:
+                    on_print(f"No changed chunks in document: {document_id}", Fore.WHITE + Style.DIM)
+                self._finish_document(document, [])
+                return None
+        elif skip_existing and chunks:
+            # When skip_existing is enabled, fetch the IDs of all chunks of the document
+            # with a single request. This avoids the expensive LLM summary generation for
+            # documents that are already fully indexed, and one probe per chunk otherwise.
+            all_chunk_ids = [f"{document_id}_{i}" for i in range(len(chunks))]
+            existing_chunks = self.collection.get(ids=all_chunk_ids)
+            document['existing_ids'] = set(existing_chunks.get('ids', []))
+            if document['existing_ids'] == set(all_chunk_ids):
+                if self.verbose:
+                    on_print(f"Skipping fully indexed document: {document_id} ({len(chunks)} chunks)", Fore.WHITE + Style.DIM)
+                self._finish_document(document, [])
+                return None
+
+        return document
+
+    def _check_manifest(self, file_path):
+        """
+        Check a file against the index manifest before reading it. A file is unchanged when
+        its size and modification time match the manifest, or else when its content hash does.
+
+        :return: True if the file must be read and indexed, False if it is unchanged.
+        """
+        if self._manifest is None:
+            return True
+
+        manifest_path = os.path.abspath(file_path)
+        file_stat = os.stat(file_path)
+        entry = self._manifest.get(manifest_path)
+        if not self._skip_existing or not self._manifest.is_current(entry, self.model, self._manifest_options):
+            self._file_fingerprints[file_path] = (file_stat, None)
+            return True
+
+        if self._manifest.matches_stat(entry, file_stat):
+            if self.verbose:
+                on_print(f"Skipping unchanged file: {file_path}", Fore.WHITE + Style.DIM)
+            return False
+
+        sha256 = hash_file(file_path)
+        if sha256 == entry.get('sha256'):
+            if self.verbose:
+                on_print(f"Skipping file with unchanged content: {file_path}", Fore.WHITE + Style.DIM)
+            self._manifest.touch(manifest_path, file_stat)
+            return False
+
+        self._file_fingerprints[file_path] = (file_stat, sha256)
+        return True
+
+    def _diff_against_manifest(self, document, entry):
+        """
+        Compare the chunks of a document with those recorded in the manifest.
+
+        Sets on the document:
+        - existing_ids: chunks stored with the same text, which are left untouched,
+        - reused_ids: new chunk ID -> old chunk ID for chunks whose text moved, so the stored
+          embedding is copied instead of being computed again,
+        - stale_ids: old chunk IDs that are no longer part of the document.
+        """
+        old_chunks = entry.get('chunks', {})
+        new_chunks = document['chunk_hashes']
+        document['stale_ids'] = [chunk_id for chunk_id in old_chunks if chunk_id not in new_chunks]
+
+        # Embeddings can only be reused if they were computed the same way
+        if not self._skip_existing or not self._manifest.is_current(entry, self.model, self._manifest_options):
+            return
+
+        # The summary prepended to every chunk is generated from the whole document, so
+        # all the chunks of a changed document are stored and embedded again
+        if self._add_summary and document['chunks'] is not None:
+            return
+
+        old_ids_by_hash = {}
+        for chunk_id, chunk_hash in old_chunks.items():
+            old_ids_by_hash.setdefault(chunk_hash, chunk_id)
+
+        # Whole documents and full-document chunks store the (changed) file content,
+        # so their text must be written again even when the embedding is unchanged.
+        rewrite_unchanged = document['chunks'] is None or self._store_full_docs
+        for chunk_id, chunk_hash in new_chunks.items():
+            if old_chunks.get(chunk_id) == chunk_hash and not rewrite_unchanged:
+                document['existing_ids'].add(chunk_id)
+            elif chunk_hash in old_ids_by_hash:
+                document['reused_ids'][chunk_id] = old_ids_by_hash[chunk_hash]
+
+    def _finish_document(self, document, records):
+        """
+        Copy the embeddings of moved chunks, delete stale chunks and record the document in
+        the index manifest.
+
+        :param records: The records built for the document.
+        :return: The records that still need an embedding.
+        """
+        if self._manifest is None:
+            return records
+
+        reused_ids = document['reused_ids']
+        to_embed = [record for record in records if record[0] not in reused_ids]
+        reused_records = [record for record in records if record[0] in reused_ids]
+
+        if reused_records:
+            old_ids = [reused_ids[record[0]] for record in reused_records]
+            existing = self.collection.get(ids=old_ids, include=['embeddings'])
+            existing_embeddings = existing.get('embeddings')
+            if existing_embeddings is None:
+                existing_embeddings = []
+            embeddings_by_id = dict(zip(existing.get('ids', []), existing_embeddings))
+
+            ready = [record for record in reused_records if embeddings_by_id.get(reused_ids[record[0]]) is not None]
+            to_embed.extend(record for record in reused_records if embeddings_by_id.get(reused_ids[record[0]]) is None)
+            if ready:
+                if self.verbose:
+                    on_print(f"Reusing {len(ready)} embeddings for document {document['document_id']}", Fore.WHITE + Style.DIM)
+                try:
+                    self._upsert_records(ready, [embeddings_by_id[reused_ids[record[0]]] for record in ready])
+                except Exception as e:
+                    on_print(f"Error indexing batch of {len(ready)} records: {e}", Fore.RED)
+                    self._failed_record_ids.update(record[0] for record in ready)
+
+        if document['stale_ids']:
+            if self.verbose:
+                on_print(f"Deleting {len(document['stale_ids'])} stale chunks of document {document['document_id']}", Fore.WHITE + Style.DIM)
+            self.collection.delete(ids=document['stale_ids'])
+            if self._lexical_index is not None:
+                self._lexical_index.remove_documents(document['stale_ids'])
+
+        file_path = document['file_path']
+        file_stat, sha256 = self._file_fingerprints.pop(file_path, (None, None))
+        if file_stat is None:
+            file_stat = os.stat(file_path)
+        if sha256 is None:
+            sha256 = hash_file(file_path)
+        self._manifest.set(
+            os.path.abspath(file_path),
+            file_stat,
+            sha256,
+            document['document_id'],
+            self.model,
+            self._manifest_options,
+            document['chunk_hashes']
+        )
+        return to_embed
+
+    def _remove_deleted_files(self, text_files):
+        """
+        Delete the chunks of files recorded in the manifest that no longer exist in the root folder.
+
+        Files of different folders with the same name share their chunk IDs: chunks still
+        claimed by another file of the manifest are kept.
+        """
+        current_paths = {os.path.abspath(file_path) for file_path in text_files}
+        deleted_paths = [path for path in self._manifest.paths_under(self.root_folder) if path not in current_paths]
+        claimed_ids = set()
+        for manifest_path, entry in self._manifest.entries.items():
+            if manifest_path not in deleted_paths:
+                claimed_ids.update(entry.get('chunks', {}))
+        for manifest_path in deleted_paths:
+            chunk_ids = [chunk_id for chunk_id in self._manifest.get(manifest_path).get('chunks', {}) if chunk_id not in claimed_ids]
+            if self.verbose:
+                on_print(f"Removing {len(chunk_ids)} chunks of deleted file: {manifest_path}", Fore.WHITE + Style.DIM)
+            try:
+                if chunk_ids:
+                    self.collection.delete(ids=chunk_ids)
+                    if self._lexical_index is not None:
+                        self._lexical_index.remove_documents(chunk_ids)
+                self._manifest.remove(manifest_path)
+            except Exception as e:
+                on_print(f"Error removing chunks of deleted file {manifest_path}: {e}", Fore.RED)
+
+    def _build_records(self, document, document_summary=None, store_full_docs=False):
+        """
+        Build the (id, stored document, metadata, embedding text) records of a prepared document.
+        """
+        document_id = document['document_id']
+        if document['chunks'] is None:
+            if self.verbose:
+                embedding_info = "using extracted text" if document['metadata'].get('extraction_used') else "using full content"
+                on_print(f"Queuing document {document_id} for embedding ({embedding_info})", Fore.WHITE + Style.DIM)
+            # Store the full document content but use embedding from extracted text
+            return [(document_id, document['content'], document['metadata'], document['embedding_content'])]
+
+        records = []
+        for i, chunk in enumerate(document['chunks']):
+            chunk_id = f"{document_id}_{i}"
+
+            # Check if skipping existing chunks and if the chunk ID exists
+            if chunk_id in document['existing_ids']:
+                if self.verbose:
+                    on_print(f"Skipping existing chunk: {chunk_id}", Fore.WHITE + Style.DIM)
+                continue
+
+            # Prepend document summary to chunk if available
+            chunk_with_summary = chunk
+            if document_summary:
+                chunk_with_summary = document_summary + chunk
+
+            chunk_metadata = document['metadata'].copy()
+            chunk_metadata['chunk_index'] = i
+            if document_summary:
+                chunk_metadata['has_summary'] = True
+            if store_full_docs:
+                chunk_metadata['store_full_docs'] = True
+                # Keeps the lexical index rebuildable from the collection
+                chunk_metadata['embedded_text'] = chunk_with_summary
+
+            # Determine what to store as the document text:
+            # - If store_full_docs is enabled, store the full original document content
+            #   so that retrieved results contain the complete document.
+            # - Otherwise, store the chunk (with summary prepended if available).
+            # In both cases, the embedding is computed from the chunk with summary.
+            stored_document = document['content'] if store_full_docs else chunk_with_summary
+            records.append((chunk_id, stored_document, chunk_metadata, chunk_with_summary))
+        return records
+
+    def _queue_record(self, record_id, document, metadata, embedding_text):
+        """
+        Queue a record for embedding and upsert. Records are flushed to Ollama and
+        ChromaDB in batches once enough of them are pending.
+
+        :param record_id: The ChromaDB ID of the record.
+        :param document: The text stored in ChromaDB.
+        :param metadata: The metadata stored in ChromaDB.
+        :param embedding_text: The text the embedding is computed from.
+        """
+        self._pending_records.append((record_id, document, metadata, embedding_text))
+        if len(self._pending_records) >= max(self._embed_batch_size, self._upsert_batch_size):
+            self._flush_pending_records()
+
+    def _embed_batch(self, texts):
+        """
+        Compute the embeddings of a list of texts with as few requests as possible,
+        using Ollama's multi-input embed endpoint.
+
+        :return: The list of embedding vectors, in the same order as the texts.
+        """
+        ollama_options = {}
+        if self._num_ctx:
+            ollama_options["num_ctx"] = self._num_ctx
+
+        prepared_texts = [self._prepare_text_for_embedding(text, num_ctx=self._num_ctx) for text in texts]
+        if self.verbose:
+            on_print(f"Generating {len(prepared_texts)} embeddings using {self.model}", Fore.WHITE + Style.DIM)
+        return embed_texts(prepared_texts, self.model, options=ollama_options, batch_size=self._embed_batch_size)
+
+    def _upsert_records(self, records, embeddings=None):
+        """
+        Write records to ChromaDB, one upsert per batch.
+
+        :param records: The (id, stored document, metadata, embedding text) records.
+        :param embeddings: Optional embeddings, in the same order as the records.
+        """
+        for start in range(0, len(records), self._upsert_batch_size):
+            batch = records[start:start + self._upsert_batch_size]
+            upsert_kwargs = {
+                'documents': [record[1] for record in batch],
+                'metadatas': [record[2] for record in batch],
+                'ids': [record[0] for record in batch],
+            }
+            if embeddings:
+                upsert_kwargs['embeddings'] = embeddings[start:start + self._upsert_batch_size]
+            self.collection.upsert(**upsert_kwargs)
+            if self._lexical_index is not None:
+                # Index the chunk text the embedding is computed from, even when full documents are stored
+                self._lexical_index.add_documents(upsert_kwargs['ids'], [record[3] for record in batch])
+
+        if self.verbose:
+            on_print(f"Upserted {len(records)} records into collection {self.collection_name}", Fore.WHITE + Style.DIM)
+
+    def _flush_pending_records(self):
+        """
+        Embed all pending records and write them to ChromaDB.
+        """
+        records = self._pending_records
+        self._pending_records = []
+        if not records:
+            return
+
+        try:
+            embeddings = None
+            if self.model:
+                embeddings = self._embed_batch([record[3] for record in records])
+            self._upsert_records(records, embeddings)
+        except Exception as e:
+            on_print(f"Error indexing batch of {len(records)} records: {e}", Fore.RED)
+            self._failed_record_ids.update(record[0] for record in records)
+
+    def _open_lexical_index(self, use_lexical_index=None):
+        """
+        Open the collection's LexicalIndex if hybrid retrieval is enabled, backfilling it once
+        for collections indexed before the lexical index existed.
+        """
+        if use_lexical_index is None:
+            use_lexical_index = state.use_lexical_index
+        self._lexical_index = None
+        if use_lexical_index:
+            self._lexical_index = get_lexical_index(self.collection_name)
+            if not self._lexical_index.is_in_sync(self.collection):
+                added, removed = self._lexical_index.sync(self.collection)
+                if self.verbose:
+                    on_print(f"Lexical index synchronized: {added} documents added, {removed} removed", Fore.WHITE + Style.DIM)
+
+    def index_documents(self, allow_chunks=True, no_chunking_confirmation=False, split_paragraphs=False, additional_metadata=None, num_ctx=None, skip_existing=True, extract_start=None, extract_end=None, add_summary=True, store_full_docs=None, embed_batch_size=default_embed_batch_size, upsert_batch_size=default_upsert_batch_size, pipeline=False, extraction_workers=None, inference_workers=default_inference_workers, pipeline_queue_size=default_pipeline_queue_size, use_manifest=False, use_lexical_index=None):
         """
         Index all text files in the root folder.
         
@@ -224,6 +733,16 @@ class DocumentIndexer:
         :param add_summary: Whether to generate and prepend a summary to each chunk (default: True).
         :param store_full_docs: Whether to store the full document content for each chunk in chunking mode.
                                 Embeddings are still computed from chunks. If None and not in automated mode, the user is prompted.
+        :param embed_batch_size: Number of texts sent to the Ollama embed endpoint per request.
+        :param upsert_batch_size: Number of records written to ChromaDB per upsert.
+        :param pipeline: Whether to run extraction, summaries and embeddings concurrently (see IngestionPipeline).
+        :param extraction_workers: Number of processes used for text extraction in pipeline mode (default: CPU count, 0 to extract in a thread).
+        :param inference_workers: Number of concurrent summary/embedding requests in pipeline mode.
+        :param pipeline_queue_size: Maximum number of documents waiting between pipeline stages.
+        :param use_manifest: Whether to track indexed files in the collection's IndexManifest, so that unchanged
+                             files are skipped, only changed chunks are embedded and stale chunks are deleted.
+        :param use_lexical_index: Whether to keep the collection's BM25 LexicalIndex up to date for hybrid
+                                  retrieval (default: state.use_lexical_index).
         """
         # Ask the user to confirm if they want to allow chunking of large documents
         if allow_chunks and not no_chunking_confirmation:
@@ -260,15 +779,81 @@ class DocumentIndexer:
         if store_full_docs is None:
             store_full_docs = False
 
+        text_splitter = None
         if allow_chunks:
             from langchain_text_splitters import RecursiveCharacterTextSplitter
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+
+        # Records are embedded and upserted in batches to avoid one round-trip per chunk
+        self._embed_batch_size = max(1, int(embed_batch_size or 1))
+        self._upsert_batch_size = max(1, int(upsert_batch_size or 1))
+        self._num_ctx = num_ctx
+        self._pending_records = []
 
         # Get the list of text files
         text_files = self.get_text_files()
 
-        if allow_chunks:
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-
+        self._skip_existing = skip_existing
+        self._store_full_docs = store_full_docs
+        self._add_summary = bool(allow_chunks and add_summary and (self.summary_model or state.current_model))
+        self._file_fingerprints = {}
+        self._failed_record_ids = set()
+
+        self._open_lexical_index(use_lexical_index)
+
+        self._manifest = None
+        if use_manifest:
+            self._manifest = IndexManifest.for_collection(self.collection_name)
+            # Files indexed with different options must be indexed again
+            self._manifest_options = json.dumps({
+                'allow_chunks': bool(allow_chunks),
+                'split_paragraphs': bool(split_paragraphs),
+                'extract_start': extract_start,
+                'extract_end': extract_end,
+                'add_summary': bool(add_summary),
+                'store_full_docs': bool(store_full_docs),
+            }, sort_keys=True)
+            self._remove_deleted_files(text_files)
+
+        prepare_options = {
+            'text_splitter': text_splitter,
+            'split_paragraphs': split_paragraphs,
+            'additional_metadata': additional_metadata,
+            'skip_existing': skip_existing,
+            'extract_start': extract_start,
+            'extract_end': extract_end,
+        }
+
+        if pipeline:
+            from ollama_chat_lib.ingestion_pipeline import IngestionPipeline
+            ingestion_pipeline = IngestionPipeline(
+                self,
+                extraction_workers=extraction_workers,
+                inference_workers=inference_workers,
+                queue_size=pipeline_queue_size,
+                verbose=self.verbose
+            )
+            ingestion_pipeline.run(
+                text_files,
+                prepare_options,
+                add_summary=add_summary,
+                store_full_docs=store_full_docs,
+                no_chunking_confirmation=no_chunking_confirmation,
+                num_ctx=num_ctx
+            )
+        else:
+            self._index_sequentially(text_files, prepare_options, allow_chunks, skip_existing, add_summary, store_full_docs, no_chunking_confirmation, num_ctx)
+
+        if self._manifest is not None:
+            self._manifest.discard_entries_with_ids(self._failed_record_ids)
+            self._manifest.save()
+            self._manifest = None
+        self._lexical_index = None
+
+    def _index_sequentially(self, text_files, prepare_options, allow_chunks, skip_existing, add_summary, store_full_docs, no_chunking_confirmation, num_ctx):
+        """
+        Index files one after another, batching embeddings and upserts.
+        """
         progress_bar = None
         if self.verbose:
             # Progress bar for indexing
@@ -281,313 +866,147 @@ class DocumentIndexer:
             try:
                 document_id = self._generate_document_id(file_path)
 
+                if not self._check_manifest(file_path):
+                    continue
+
                 # Check if skipping existing documents and if the document ID exists (for non-chunked case)
-                if not allow_chunks and skip_existing:
-                    existing_doc = self.collection.get(ids=[document_id])
-                    if existing_doc and len(existing_doc.get('ids', [])) > 0:
-                        if self.verbose:
-                            on_print(f"Skipping existing document: {document_id}", Fore.WHITE + Style.DIM)
-                        continue
+                if not allow_chunks and skip_existing and self._manifest is None and self._document_exists(document_id):
+                    if self.verbose:
+                        on_print(f"Skipping existing document: {document_id}", Fore.WHITE + Style.DIM)
+                    continue
 
                 content = self.read_file(file_path)
 
                 if not content:
                     on_print(f"An error occurred while reading file: {file_path}", Fore.RED)
                     continue
-                
-                # Add any additional metadata for the file
-                # Extract file name and base file information
-                file_name = os.path.basename(file_path)
-                file_name_without_ext = os.path.splitext(file_name)[0]
-                current_date = datetime.now().isoformat()
-                
-                # Create a more comprehensive metadata structure
-                file_metadata = {
-                    'published': current_date,
-                    'docSource': os.path.dirname(file_path),
-                    'docAuthor': 'Unknown',
-                    'description': f"Document from {file_path}",
-                    'title': file_name_without_ext,
-                    'id': document_id,
-                    'filePath': file_path
-                }
-                
-                # Convert the file path to url and add it to the metadata
-                file_metadata['url'] = urljoin("file://", file_path)
-                
-                # If windows, convert the file path to a URI
-                if os.name == 'nt':
-                    file_metadata['url'] = file_metadata['url'].replace("\\", "/")
-                    
-                    # Replace the drive letter with "file:///" prefix
-                    file_metadata['url'] = file_metadata['url'].replace("file://", "file:///")
-                
-                if additional_metadata and file_path in additional_metadata:
-                    file_metadata.update(additional_metadata[file_path])
-
-                # Extract text for embedding if start and end strings are provided
-                embedding_content = content
-                if extract_start and extract_end:
-                    embedding_content = self.extract_text_between_strings(content, extract_start, extract_end)
-                    # Add metadata to indicate partial extraction was used
-                    file_metadata['extraction_used'] = True
-                    file_metadata['extract_start'] = extract_start
-                    file_metadata['extract_end'] = extract_end
-                    file_metadata['extracted_length'] = len(embedding_content)
-                    file_metadata['original_length'] = len(content)
-
-                if allow_chunks:
-                    chunks = []
-                    # Use embedding_content for chunking (which may be extracted text)
-                    content_to_chunk = embedding_content
-                    
-                    # Split Markdown files into sections if needed
-                    # DOCX, PPTX, and XLSX are extracted as Markdown, so use MarkdownSplitter for them too
-                    lower_file_path = file_path.lower()
-                    is_tabular_content = (
-                        lower_file_path.endswith('.csv') or
-                        lower_file_path.endswith('.xlsx')
-                    )
-                    is_markdown_content = (
-                        is_markdown(file_path) or 
-                        lower_file_path.endswith('.docx') or 
-                        lower_file_path.endswith('.pptx')
-                    )
-                    if is_tabular_content:
-                        # Use TabularDataSplitter to chunk by rows while
-                        # repeating the header on each chunk for context
-                        tabular_splitter = TabularDataSplitter(content_to_chunk, rows_per_chunk=50)
-                        chunks = tabular_splitter.split()
-                    elif is_html(file_path):
-                        # Convert to Markdown before splitting
-                        markdown_splitter = MarkdownSplitter(extract_text_from_html(content_to_chunk), split_paragraphs=split_paragraphs)
-                        chunks = markdown_splitter.split()
-                    elif is_markdown_content:
-                        markdown_splitter = MarkdownSplitter(content_to_chunk, split_paragraphs=split_paragraphs)
-                        chunks = markdown_splitter.split()
-                    else:
-                        chunks = text_splitter.split_text(content_to_chunk)
-                    
-                    # When skip_existing is enabled, check upfront if ALL chunks already
-                    # exist in the collection. This avoids the expensive LLM summary
-                    # generation for documents that are already fully indexed.
-                    if skip_existing and chunks:
-                        all_chunk_ids = [f"{document_id}_{i}" for i in range(len(chunks))]
-                        existing_chunks = self.collection.get(ids=all_chunk_ids)
-                        existing_ids_set = set(existing_chunks.get('ids', []))
-                        if existing_ids_set == set(all_chunk_ids):
-                            if self.verbose:
-                                on_print(f"Skipping fully indexed document: {document_id} ({len(chunks)} chunks)", Fore.WHITE + Style.DIM)
-                            continue
-                    
-                    # Generate document summary once if add_summary is enabled
-                    document_summary = None
-                    # Use summary_model for summary generation, fallback to current_model if available
-                    summary_model = self.summary_model
-                    if summary_model is None:
-                        try:
-                            summary_model = state.current_model
-                        except NameError:
-                            summary_model = None
-                    if add_summary and summary_model:
-                        if is_tabular_content:
-                            # For CSV/Excel files, auto-summary is rarely meaningful.
-                            # Extract column headers and first data row from the markdown table,
-                            # then optionally ask the user for context to produce a useful summary.
-                            table_header_line = ""
-                            table_first_row = ""
-                            _all_lines = content_to_chunk.splitlines()
-                            for _j, _line in enumerate(_all_lines):
-                                if _line.startswith('|') and _j + 1 < len(_all_lines):
-                                    _next = _all_lines[_j + 1]
-                                    if re.match(r'^\|\s*-{3,}', _next):
-                                        table_header_line = _line
-                                        if _j + 2 < len(_all_lines) and _all_lines[_j + 2].startswith('|'):
-                                            table_first_row = _all_lines[_j + 2]
-                                        break
-
-                            user_context = ""
-                            if not no_chunking_confirmation:
-                                on_print(f"\nTabular file detected: {file_name}", Fore.CYAN)
-                                if table_header_line:
-                                    on_print(f"Columns : {table_header_line}", Fore.WHITE + Style.DIM)
-                                if table_first_row:
-                                    on_print(f"First row: {table_first_row}", Fore.WHITE + Style.DIM)
-                                on_print("Auto-generated summaries for tabular data are usually not meaningful.")
-                                user_context = on_user_input(
-                                    "Provide context about what this data represents (press Enter to skip summary): "
-                                ).strip()
-
-                            if user_context:
-                                # Build an enriched prompt combining user context with column/row info
-                                tabular_info = ""
-                                if table_header_line:
-                                    tabular_info += f"\nColumn headers: {table_header_line}"
-                                if table_first_row:
-                                    tabular_info += f"\nFirst data row: {table_first_row}"
-                                if self.verbose:
-                                    on_print(f"Generating context-enhanced summary for {document_id}", Fore.WHITE + Style.DIM)
-                                summary_prompt = (
-                                    f"A user provided the following context about a tabular data file:\n"
-                                    f"{user_context}\n"
-                                    f"{tabular_info}\n\n"
-                                    f"Based on this information, write a concise summary (2-5 sentences) describing "
-                                    f"what this dataset contains, what each column likely represents, and what kind "
-                                    f"of queries it would be useful to answer."
-                                )
-                                try:
-                                    summary_response = self._ask_fn(
-                                        "You are a helpful assistant that creates concise, informative dataset summaries.",
-                                        summary_prompt,
-                                        summary_model,
-                                        temperature=0.3,
-                                        no_bot_prompt=True,
-                                        stream_active=False,
-                                        num_ctx=num_ctx
-                                    )
-                                    document_summary = f"[Document Summary: {summary_response.strip()}]\n\n"
-                                    if self.verbose:
-                                        on_print(f"Summary generated: {summary_response.strip()}", Fore.GREEN)
-                                except Exception as e:
-                                    if self.verbose:
-                                        on_print(f"Failed to generate summary: {e}", Fore.YELLOW)
-                                    document_summary = None
-                            else:
-                                if self.verbose:
-                                    on_print(f"Skipping summary for tabular document {document_id} (no context provided)", Fore.WHITE + Style.DIM)
-                        else:
-                            if self.verbose:
-                                on_print(f"Generating summary for document {document_id} using model: {summary_model}", Fore.WHITE + Style.DIM)
-                            summary_prompt = f"""Provide a brief summary (2-5 sentences) of the following document. Focus on the main topic and key points:
 
-{content_to_chunk[:2000]}"""  # Limit to first 2000 chars for summary generation
-                            try:
-                                ollama_options = {}
-                                if num_ctx:
-                                    ollama_options["num_ctx"] = num_ctx
-                                summary_response = self._ask_fn(
-                                    "You are a helpful assistant that creates concise document summaries.",
-                                    summary_prompt,
-                                    summary_model,
-                                    temperature=0.3,
-                                    no_bot_prompt=True,
-                                    stream_active=False,
-                                    num_ctx=num_ctx
-                                )
-                                document_summary = f"[Document Summary: {summary_response.strip()}]\n\n"
-                                if self.verbose:
-                                    on_print(f"Summary generated: {summary_response.strip()}", Fore.GREEN)
-                            except Exception as e:
-                                if self.verbose:
-                                    on_print(f"Failed to generate summary: {e}", Fore.YELLOW)
-                                document_summary = None
-                    
-                    for i, chunk in enumerate(chunks):
-                        chunk_id = f"{document_id}_{i}"
-
-                        # Check if skipping existing chunks and if the chunk ID exists
-                        if skip_existing:
-                            existing_chunk = self.collection.get(ids=[chunk_id])
-                            if existing_chunk and len(existing_chunk.get('ids', [])) > 0:
-                                if self.verbose:
-                                    on_print(f"Skipping existing chunk: {chunk_id}", Fore.WHITE + Style.DIM)
-                                continue
-                        
-                        # Prepend document summary to chunk if available
-                        chunk_with_summary = chunk
-                        if document_summary:
-                            chunk_with_summary = document_summary + chunk
-                        
-                        # Embed the chunk content (from extracted text) with summary prepended
-                        embedding = None
-                        if self.model:
-                            ollama_options = {}
-                            if num_ctx:
-                                ollama_options["num_ctx"] = num_ctx
-                                
-                            if self.verbose:
-                                embedding_info = f"using extracted text" if extract_start and extract_end else "using full content"
-                                summary_info = " with summary" if document_summary else ""
-                                on_print(f"Generating embedding for chunk {chunk_id} using {self.model} ({embedding_info}{summary_info})", Fore.WHITE + Style.DIM)
-                            # Prepare a potentially truncated string for the embedding call so we don't exceed
-                            # the model/context window and risk freezing the Ollama server. The full chunk_with_summary
-                            # remains unchanged for storage in ChromaDB.
-                            embedding_prompt = self._prepare_text_for_embedding(chunk_with_summary, num_ctx=num_ctx)
-                            response = ollama.embeddings(
-                                prompt=embedding_prompt,
-                                model=self.model,
-                                options=ollama_options
-                            )
-                            embedding = response["embedding"]
-                        
-                        # Store the chunk with summary prepended
-                        chunk_metadata = file_metadata.copy()
-                        chunk_metadata['chunk_index'] = i
-                        if document_summary:
-                            chunk_metadata['has_summary'] = True
-                        if store_full_docs:
-                            chunk_metadata['store_full_docs'] = True
-                        
-                        # Determine what to store as the document text:
-                        # - If store_full_docs is enabled, store the full original document content
-                        #   so that retrieved results contain the complete document.
-                        # - Otherwise, store the chunk (with summary prepended if available).
-                        # In both cases, the embedding is computed from the chunk with summary.
-                        stored_document = content if store_full_docs else chunk_with_summary
-                        
-                        # Upsert the chunk with summary and embedding
-                        if embedding:
-                            self.collection.upsert(
-                                documents=[stored_document],
-                                metadatas=[chunk_metadata],
-                                ids=[chunk_id],
-                                embeddings=[embedding]  # Embedding computed from chunk with summary
-                            )
-                        else:
-                            self.collection.upsert(
-                                documents=[stored_document],
-                                metadatas=[chunk_metadata],
-                                ids=[chunk_id]
-                            )
-                    
-                else:
-                    # Embed the extracted content but store the whole document
-                    embedding = None
-                    if self.model:
-                        ollama_options = {}
-                        if num_ctx:
-                            ollama_options["num_ctx"] = num_ctx
-                            
-                        if self.verbose:
-                            embedding_info = f"using extracted text" if extract_start and extract_end else "using full content"
-                            on_print(f"Generating embedding for document {document_id} using {self.model} ({embedding_info})", Fore.WHITE + Style.DIM)
-
-                        # Use extracted content for embedding computation. Truncate input to embedding API if needed
-                        # while keeping the full document content unchanged for storage.
-                        embedding_prompt = self._prepare_text_for_embedding(embedding_content, num_ctx=num_ctx)
-                        response = ollama.embeddings(
-                            prompt=embedding_prompt,
-                            model=self.model,
-                            options=ollama_options
-                        )
-                        embedding = response["embedding"]
-
-                    # Store the full document content but use embedding from extracted text
-                    if embedding:
-                        self.collection.upsert(
-                            documents=[content],  # Store full document content
-                            metadatas=[file_metadata],
-                            ids=[document_id],
-                            embeddings=[embedding]  # Embedding computed from extracted text
-                        )
-                    else:
-                        self.collection.upsert(
-                            documents=[content],  # Store full document content
-                            metadatas=[file_metadata],
-                            ids=[document_id]
-                        )
+                document = self._prepare_document(file_path, document_id, content, **prepare_options)
+                if document is None:
+                    continue
+
+                # Generate document summary once if add_summary is enabled
+                document_summary = None
+                if allow_chunks and add_summary:
+                    document_summary = self._generate_document_summary(document_id, file_path, document['embedding_content'], no_chunking_confirmation=no_chunking_confirmation, num_ctx=num_ctx)
+
+                records = self._build_records(document, document_summary, store_full_docs)
+                for record in self._finish_document(document, records):
+                    self._queue_record(*record)
             except KeyboardInterrupt:
                 break
             except Exception as e: # Catch other potential errors during processing
                 on_print(f"Error processing file {file_path}: {e}", Fore.RED)
                 continue # Continue to the next file
+
+        self._flush_pending_records()
+
+        if progress_bar:
+            progress_bar.close()
+
+    def _generate_record_id(self, source, max_length=63):
+        """
+        Generate a stable document ID from the source (e.g. the URL) of an in-memory record,
+        so that indexing the same source again skips or replaces its chunks.
+        """
+        doc_id = re.sub(r'_+', '_', re.sub(r'[^\w\-]', '_', source)).strip('_')
+        if len(doc_id) <= max_length:
+            return doc_id
+        source_hash = hashlib.md5(source.encode('utf-8')).hexdigest()[:16]
+        return f"{doc_id[:max_length - 17]}_{source_hash}"
+
+    def _prepare_record(self, text, metadata, text_splitter=None, skip_existing=True):
+        """
+        Build the metadata and chunks of an in-memory document.
+
+        :return: A dictionary describing the document, or None if it is already fully indexed.
+        """
+        source = metadata.get('url') or metadata.get('id') or hash_text(text)
+        document_id = metadata.get('id') or self._generate_record_id(source)
+        record_metadata = {
+            'published': datetime.now().isoformat(),
+            'docSource': source,
+            'docAuthor': 'Unknown',
+            'description': f"Document from {source}",
+            'title': source,
+            'id': document_id,
+        }
+        record_metadata.update(metadata)
+
+        document = {
+            'document_id': document_id,
+            'file_path': None,
+            'content': text,
+            'metadata': record_metadata,
+            'embedding_content': text,
+            'chunks': text_splitter.split_text(text) if text_splitter is not None else None,
+            'existing_ids': set(),
+            'reused_ids': {},
+            'stale_ids': [],
+        }
+
+        if skip_existing:
+            chunks = document['chunks']
+            all_ids = [f"{document_id}_{i}" for i in range(len(chunks))] if chunks is not None else [document_id]
+            existing = self.collection.get(ids=all_ids)
+            document['existing_ids'] = set(existing.get('ids', []))
+            if document['existing_ids'] == set(all_ids):
+                if self.verbose:
+                    on_print(f"Skipping fully indexed document: {document_id}", Fore.WHITE + Style.DIM)
+                return None
+        return document
+
+    def index_records(self, records, allow_chunks=True, add_summary=False, skip_existing=True, num_ctx=None, workers=default_inference_workers, embed_batch_size=default_embed_batch_size, upsert_batch_size=default_upsert_batch_size, use_lexical_index=None):
+        """
+        Index in-memory documents, e.g. crawled web pages, without reading or writing any file.
+
+        Documents are chunked and summarized concurrently; their records are embedded and
+        upserted in batches as they become ready.
+
+        :param records: Iterable of (text, metadata) tuples. The metadata is stored with every chunk of the
+                        text; its 'id' or 'url' gives the document a stable ID.
+        :param allow_chunks: Whether to chunk the documents.
+        :param add_summary: Whether to generate and prepend a summary to each chunk.
+        :param skip_existing: Whether to skip documents whose chunks are all indexed already.
+        :param workers: Number of documents prepared (and summarized) concurrently.
+        :return: The number of records written to the collection.
+        """
+        text_splitter = None
+        if allow_chunks:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+
+        self._embed_batch_size = max(1, int(embed_batch_size or 1))
+        self._upsert_batch_size = max(1, int(upsert_batch_size or 1))
+        self._num_ctx = num_ctx
+        self._pending_records = []
+        self._failed_record_ids = set()
+        self._manifest = None
+        self._open_lexical_index(use_lexical_index)
+
+        def prepare(text, metadata):
+            document = self._prepare_record(text, metadata or {}, text_splitter, skip_existing)
+            if document is None:
+                return []
+            document_summary = None
+            if allow_chunks and add_summary:
+                document_summary = self._generate_document_summary(document['document_id'], None, text, no_chunking_confirmation=True, num_ctx=num_ctx)
+            return self._build_records(document, document_summary)
+
+        records = [(text, metadata) for text, metadata in records if text]
+        queued_ids = []
+        with ThreadPoolExecutor(max_workers=max(1, min(workers or 1, len(records) or 1)), thread_name_prefix="index-records") as executor:
+            futures = {executor.submit(prepare, text, metadata): (metadata or {}).get('url') for text, metadata in records}
+            for future in as_completed(futures):
+                try:
+                    document_records = future.result()
+                except Exception as e:
+                    on_print(f"Error processing document {futures[future] or ''}: {e}", Fore.RED)
+                    continue
+                for record in document_records:
+                    queued_ids.append(record[0])
+                    self._queue_record(*record)
+
+        self._flush_pending_records()
+        self._lexical_index = None
+        return len([record_id for record_id in queued_ids if record_id not in self._failed_record_ids])
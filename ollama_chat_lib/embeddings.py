@@ -0,0 +1,127 @@
+"""Embedding service: every embedding request goes through here, backed by an optional disk cache."""
+
+import hashlib
+import json
+import os
+import struct
+
+import ollama
+from appdirs import AppDirs
+from colorama import Fore
+
+from ollama_chat_lib import state
+from ollama_chat_lib.cache import DiskCache
+from ollama_chat_lib.constants import APP_NAME, APP_AUTHOR, APP_VERSION, default_embed_batch_size
+from ollama_chat_lib.io_hooks import on_print
+
+
+class EmbeddingCache(DiskCache):
+    """
+    Content-addressed embedding cache. Keys are derived from (model, options, text) and
+    vectors are stored as packed float32 or float16 values. The model digest is part of the
+    key when known, so that a model updated by ollama pull does not get the vectors of its
+    previous version.
+    """
+
+    _DTYPES = {'float32': 'f', 'float16': 'e'}
+
+    def __init__(self, path, max_bytes=None, max_entries=None, dtype='float32'):
+        if dtype not in self._DTYPES:
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+        super().__init__(path, max_bytes=max_bytes, max_entries=max_entries)
+        self.dtype = dtype
+
+    @staticmethod
+    def make_key(model, text, options=None, model_digest=None):
+        if model_digest:
+            model = f"{model}@{model_digest}"
+        options_str = json.dumps(options or {}, sort_keys=True)
+        return hashlib.sha256(f"{model}\0{options_str}\0{text}".encode('utf-8')).hexdigest()
+
+    def _pack(self, vector):
+        code = self._DTYPES[self.dtype]
+        return code.encode('ascii') + struct.pack(f"<{len(vector)}{code}", *vector)
+
+    @staticmethod
+    def _unpack(value):
+        # The first byte records the format, so that changing dtype keeps old entries readable
+        code = chr(value[0])
+        count = (len(value) - 1) // struct.calcsize(code)
+        return list(struct.unpack(f"<{count}{code}", value[1:]))
+
+    def get_vectors(self, model, texts, options=None, model_digest=None):
+        """Return a dictionary text -> cached vector for the texts found in the cache."""
+        keys = {self.make_key(model, text, options, model_digest): text for text in texts}
+        found = self.get_many(list(keys))
+        return {keys[key]: self._unpack(value) for key, value in found.items()}
+
+    def set_vectors(self, model, vectors, options=None, model_digest=None):
+        """Store a dictionary text -> vector."""
+        self.set_many({self.make_key(model, text, options, model_digest): self._pack(vector) for text, vector in vectors.items()})
+
+
+def create_embedding_cache(max_megabytes, dtype='float32', cache_file="embeddings.sqlite"):
+    """
+    Open the embedding cache stored in the user cache directory.
+
+    :return: The EmbeddingCache, or None if it cannot be opened.
+    """
+    dirs = AppDirs(APP_NAME, APP_AUTHOR, version=APP_VERSION)
+    try:
+        return EmbeddingCache(
+            os.path.join(dirs.user_cache_dir, cache_file),
+            max_bytes=int(max_megabytes * 1024 * 1024) if max_megabytes else None,
+            dtype=dtype
+        )
+    except Exception as e:
+        on_print(f"Embedding cache disabled: {e}", Fore.YELLOW)
+        return None
+
+
+def embed_texts(texts, model, options=None, batch_size=default_embed_batch_size):
+    """
+    Compute the embeddings of a list of texts.
+
+    Cached vectors are reused; the remaining distinct texts are sent to Ollama's
+    multi-input embed endpoint, batch_size texts per request.
+
+    :param texts: The texts to embed.
+    :param model: The embedding model.
+    :param options: Optional Ollama options (e.g. num_ctx).
+    :param batch_size: Maximum number of texts per request.
+    :return: The embedding vectors, in the same order as the texts.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+
+    cache = state.embedding_cache
+    model_digest = state.model_registry.digest(model) if cache is not None and state.model_registry is not None else None
+    vectors = cache.get_vectors(model, texts, options, model_digest) if cache is not None else {}
+
+    missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+    batch_size = max(1, int(batch_size or 1))
+    request_options = {"keep_alive": state.keep_alive} if state.keep_alive is not None else {}
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        response = ollama.embed(
+            model=model,
+            input=batch,
+            options=options or {},
+            **request_options
+        )
+        computed = dict(zip(batch, response["embeddings"]))
+        vectors.update(computed)
+        if cache is not None:
+            cache.set_vectors(model, computed, options, model_digest)
+
+    return [vectors[text] for text in texts]
+
+
+def embed_text(text, model, options=None):
+    """
+    Compute the embedding of a single text.
+
+    :return: The embedding vector.
+    """
+    return embed_texts([text], model, options=options)[0]
@@ -8,8 +8,11 @@ from colorama import Fore, Style
 
 from ollama_chat_lib import state
 from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib.constants import tool_cache_ttls
+from ollama_chat_lib.utils import cached_tool, file_fingerprint, not_concurrency_safe
 
 
+@cached_tool(tool_cache_ttls["read_file"], fingerprint=file_fingerprint("file_path"))
 def read_file(file_path, encoding="utf-8"):
     """
     Read the contents of a file and return the text.
@@ -36,6 +39,7 @@ def read_file(file_path, encoding="utf-8"):
         return f"Error reading file '{file_path}': {str(e)}"
 
 
+@not_concurrency_safe
 def create_file(file_path, content, encoding="utf-8"):
     """
     Create a new file with the given content. The file will be tracked in the session for safe deletion.
@@ -67,6 +71,7 @@ def create_file(file_path, content, encoding="utf-8"):
         return f"Error creating file '{file_path}': {str(e)}"
 
 
+@not_concurrency_safe
 def delete_file(file_path):
     """
     Delete a file that was created during this session. Only files created with the create_file tool can be deleted.
@@ -103,6 +108,7 @@ def expand_env_vars(command: str) -> str:
     return os.path.expandvars(command)
 
 
+@not_concurrency_safe
 def run_command(command: str) -> Tuple[str, str]:
     command = expand_env_vars(command)
     result = subprocess.run(
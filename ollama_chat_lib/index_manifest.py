@@ -0,0 +1,144 @@
+"""Persistent per-collection manifest of indexed files, used for incremental re-indexing."""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime
+
+from appdirs import AppDirs
+
+from ollama_chat_lib import state
+from ollama_chat_lib.constants import APP_NAME, APP_AUTHOR, APP_VERSION
+
+
+def hash_text(text):
+    """Return the SHA-256 hex digest of a string."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def collection_data_file(collection_name, folder, extension, create_folder=True):
+    """
+    Return the path of a file holding per-collection data. It is stored next to the ChromaDB
+    database when a local path is used, so that both stay in sync, and in the user data
+    directory otherwise.
+    """
+    safe_name = re.sub(r'[^\w\-]', '_', collection_name)
+    if state.chroma_db_path:
+        data_dir = os.path.join(state.chroma_db_path, folder)
+    else:
+        dirs = AppDirs(APP_NAME, APP_AUTHOR, version=APP_VERSION)
+        data_dir = os.path.join(dirs.user_data_dir, folder)
+        safe_name = re.sub(r'[^\w\-]', '_', f"{state.chroma_client_host}_{state.chroma_client_port}_{collection_name}")
+    if create_folder:
+        os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, f"{safe_name}{extension}")
+
+
+class IndexManifest:
+    """
+    Record, for every indexed file, its size, modification time, content hash, embedding
+    model, indexing options and the hash of each chunk stored in the collection.
+
+    Entries are keyed by absolute file path:
+
+        {
+            "size": 1234, "mtime": 1700000000.0, "sha256": "...",
+            "document_id": "report", "embedding_model": "nomic-embed-text",
+            "options": "...", "indexed_at": "2024-01-01T00:00:00",
+            "chunks": {"report_0": "<sha256 of chunk text>", ...}
+        }
+    """
+
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self.entries = self._load()
+        self._dirty = False
+
+    @classmethod
+    def for_collection(cls, collection_name):
+        """Open the manifest of a collection."""
+        return cls(collection_data_file(collection_name, "index_manifests", ".json"))
+
+    def _load(self):
+        if os.path.exists(self.manifest_file):
+            try:
+                with open(self.manifest_file, 'r', encoding='utf-8') as file:
+                    return json.load(file).get("files", {})
+            except (OSError, ValueError):
+                return {}
+        return {}
+
+    def save(self):
+        """Write the manifest atomically, if it changed."""
+        if not self._dirty:
+            return
+        manifest_dir = os.path.dirname(self.manifest_file) or "."
+        fd, temp_path = tempfile.mkstemp(dir=manifest_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({"version": 1, "files": self.entries}, file)
+            os.replace(temp_path, self.manifest_file)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._dirty = False
+
+    def get(self, file_path):
+        return self.entries.get(file_path)
+
+    def is_current(self, entry, embedding_model, options):
+        """Check whether an entry was indexed with the same embedding model and options."""
+        return entry is not None and entry.get("embedding_model") == embedding_model and entry.get("options") == options
+
+    def matches_stat(self, entry, file_stat):
+        return entry.get("size") == file_stat.st_size and entry.get("mtime") == file_stat.st_mtime
+
+    def touch(self, file_path, file_stat):
+        """Update the size and modification time of an entry whose content did not change."""
+        entry = self.entries[file_path]
+        entry["size"] = file_stat.st_size
+        entry["mtime"] = file_stat.st_mtime
+        self._dirty = True
+
+    def set(self, file_path, file_stat, sha256, document_id, embedding_model, options, chunks):
+        self.entries[file_path] = {
+            "size": file_stat.st_size,
+            "mtime": file_stat.st_mtime,
+            "sha256": sha256,
+            "document_id": document_id,
+            "embedding_model": embedding_model,
+            "options": options,
+            "indexed_at": datetime.now().isoformat(),
+            "chunks": chunks,
+        }
+        self._dirty = True
+
+    def remove(self, file_path):
+        if self.entries.pop(file_path, None) is not None:
+            self._dirty = True
+
+    def paths_under(self, root_folder):
+        """Return the manifest paths located under a folder."""
+        root = os.path.join(os.path.abspath(root_folder), "")
+        return [path for path in self.entries if os.path.abspath(path).startswith(root)]
+
+    def discard_entries_with_ids(self, record_ids):
+        """
+        Forget the files owning any of the given record IDs, so that they are indexed again
+        on the next run (used when writing their records failed).
+        """
+        record_ids = set(record_ids)
+        for file_path in [path for path, entry in self.entries.items() if record_ids.intersection(entry.get("chunks", {}))]:
+            self.remove(file_path)
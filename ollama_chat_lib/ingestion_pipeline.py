@@ -0,0 +1,351 @@
+"""Pipelined document ingestion: text extraction, summaries, embeddings and upserts run concurrently."""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from colorama import Fore, Style
+from tqdm import tqdm
+
+from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib.text_extraction import extract_text_from_file
+
+
+def _timed_extract(file_path):
+    """
+    Extract the text of a file in a worker process.
+
+    Errors are returned as strings rather than raised, so that they survive pickling.
+
+    :return: A (text, error, elapsed seconds) tuple.
+    """
+    start = time.perf_counter()
+    try:
+        return extract_text_from_file(file_path), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+
+
+class StageStats:
+    """Throughput and back-pressure counters of one pipeline stage."""
+
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_time = 0.0
+        self.peak_queue = 0
+        self.stalls = 0
+
+    def record(self, elapsed, count=1):
+        self.items += count
+        self.busy_time += elapsed
+
+    def observe_queue(self, depth):
+        self.peak_queue = max(self.peak_queue, depth)
+
+    def summary(self, wall_time):
+        throughput = self.items / wall_time if wall_time > 0 else 0.0
+        utilization = self.busy_time / (wall_time * self.workers) if wall_time > 0 else 0.0
+        return (f"{self.name}: {self.items} items, {throughput:.1f} items/s, "
+                f"utilization {utilization:.0%}, peak queue {self.peak_queue}, stalls {self.stalls}")
+
+
+class IngestionPipeline:
+    """
+    Index documents with overlapping stages connected by bounded queues:
+
+    1. extraction: PDF/DOCX/PPTX/XLSX/CSV/text parsing in a process pool (CPU bound),
+    2. summary: per-document LLM summaries in a thread pool (GPU bound),
+    3. embedding: batched embedding requests in the same thread pool,
+    4. upsert: batched writes to ChromaDB from the calling thread.
+
+    Document preparation (metadata, chunking, existing-chunk lookups) runs in the calling
+    thread between stages. When a downstream queue is full, no new file is handed to the
+    extraction stage; each such event is counted as a stall of the stage that is full.
+    """
+
+    def __init__(self, indexer, extraction_workers=None, inference_workers=4, queue_size=16, verbose=False):
+        """
+        :param indexer: The DocumentIndexer used to prepare, summarize, embed and store documents.
+        :param extraction_workers: Number of extraction processes (default: CPU count, 0 to extract in a thread).
+        :param inference_workers: Number of concurrent summary/embedding requests sent to Ollama.
+        :param queue_size: Maximum number of documents waiting between two stages.
+        :param verbose: Whether to print progress and the per-stage report.
+        """
+        self.indexer = indexer
+        if extraction_workers is None:
+            extraction_workers = os.cpu_count() or 1
+        self.extraction_workers = max(0, int(extraction_workers))
+        self.inference_workers = max(1, int(inference_workers or 1))
+        self.queue_size = max(1, int(queue_size or 1))
+        self.verbose = verbose
+        self.stats = {
+            'extract': StageStats('extract', max(1, self.extraction_workers)),
+            'summary': StageStats('summary', self.inference_workers),
+            'embed': StageStats('embed', self.inference_workers),
+            'upsert': StageStats('upsert'),
+        }
+        self.wall_time = 0.0
+
+    def _create_extraction_executor(self):
+        if self.extraction_workers > 0:
+            try:
+                return ProcessPoolExecutor(max_workers=self.extraction_workers)
+            except (OSError, NotImplementedError, ImportError) as e:
+                on_print(f"Process pool unavailable ({e}), extracting text in a thread", Fore.YELLOW)
+        return ThreadPoolExecutor(max_workers=1)
+
+    def _submit_extraction(self, file_path):
+        try:
+            return self._extraction_executor.submit(_timed_extract, file_path)
+        except BrokenProcessPool:
+            on_print("Extraction process pool failed, extracting text in a thread", Fore.YELLOW)
+            self._extraction_executor.shutdown(wait=False, cancel_futures=True)
+            self._extraction_executor = ThreadPoolExecutor(max_workers=1)
+            return self._extraction_executor.submit(_timed_extract, file_path)
+
+    def _feed_extraction(self):
+        """
+        Hand new files to the extraction stage, as long as no downstream queue is full.
+        """
+        indexer = self.indexer
+        while self._pending_files and len(self._extract_futures) < self.queue_size:
+            if len(self._summary_futures) >= self.queue_size:
+                self.stats['summary'].stalls += 1
+                return
+            if len(self._embed_queue) >= self.queue_size * indexer._embed_batch_size:
+                self.stats['embed'].stalls += 1
+                return
+
+            file_path = self._pending_files.popleft()
+            try:
+                document_id = indexer._generate_document_id(file_path)
+
+                if not indexer._check_manifest(file_path):
+                    self._update_progress()
+                    continue
+
+                # Check if skipping existing documents and if the document ID exists (for non-chunked case)
+                if not self._chunking and self._prepare_options.get('skip_existing', True) and indexer._manifest is None and indexer._document_exists(document_id):
+                    if self.verbose:
+                        on_print(f"Skipping existing document: {document_id}", Fore.WHITE + Style.DIM)
+                    self._update_progress()
+                    continue
+
+                future = self._submit_extraction(file_path)
+                self._extract_futures[future] = (file_path, document_id)
+                self.stats['extract'].observe_queue(len(self._extract_futures))
+            except Exception as e:
+                on_print(f"Error processing file {file_path}: {e}", Fore.RED)
+                self._update_progress()
+
+    def _on_extracted(self, future, file_path, document_id):
+        self._update_progress()
+        try:
+            content, error, elapsed = future.result()
+        except BrokenProcessPool:
+            # The worker died (e.g. killed by the OS): extract the file in this thread instead
+            content, error, elapsed = _timed_extract(file_path)
+        self.stats['extract'].record(elapsed)
+
+        if not content:
+            if error and self.verbose:
+                on_print(f"Error reading file {file_path}: {error}", Fore.RED)
+            on_print(f"An error occurred while reading file: {file_path}", Fore.RED)
+            return
+
+        try:
+            document = self.indexer._prepare_document(file_path, document_id, content, **self._prepare_options)
+            if document is None:
+                return
+
+            if not (self._chunking and self._add_summary):
+                self._enqueue_records(document, None)
+            elif self.indexer._is_tabular_file(file_path) and not self._no_chunking_confirmation:
+                # Tabular summaries ask the user for context, which must happen in this thread
+                start = time.perf_counter()
+                document_summary = self._summarize(document)
+                self.stats['summary'].record(time.perf_counter() - start)
+                self._enqueue_records(document, document_summary)
+            else:
+                future = self._inference_executor.submit(self._timed_summarize, document)
+                self._summary_futures[future] = document
+                self.stats['summary'].observe_queue(len(self._summary_futures))
+        except Exception as e:
+            on_print(f"Error processing file {file_path}: {e}", Fore.RED)
+
+    def _summarize(self, document):
+        return self.indexer._generate_document_summary(
+            document['document_id'],
+            document['file_path'],
+            document['embedding_content'],
+            no_chunking_confirmation=self._no_chunking_confirmation,
+            num_ctx=self._num_ctx
+        )
+
+    def _timed_summarize(self, document):
+        start = time.perf_counter()
+        document_summary = self._summarize(document)
+        return document_summary, time.perf_counter() - start
+
+    def _on_summarized(self, future, document):
+        try:
+            document_summary, elapsed = future.result()
+            self.stats['summary'].record(elapsed)
+            self._enqueue_records(document, document_summary)
+        except Exception as e:
+            on_print(f"Error processing file {document['file_path']}: {e}", Fore.RED)
+
+    def _enqueue_records(self, document, document_summary):
+        records = self.indexer._build_records(document, document_summary, self._store_full_docs)
+        records = self.indexer._finish_document(document, records)
+        if self.indexer.model:
+            self._embed_queue.extend(records)
+            self.stats['embed'].observe_queue(len(self._embed_queue))
+        else:
+            self._upsert_queue.extend((record, None) for record in records)
+
+    def _timed_embed(self, records):
+        start = time.perf_counter()
+        embeddings = self.indexer._embed_batch([record[3] for record in records])
+        return embeddings, time.perf_counter() - start
+
+    def _submit_embeddings(self, final=False):
+        """
+        Send full batches of records to the embedding stage. When final is set, the last
+        partial batch is sent too.
+        """
+        batch_size = self.indexer._embed_batch_size
+        while self._embed_queue and (final or len(self._embed_queue) >= batch_size):
+            if len(self._embed_futures) >= self.inference_workers:
+                return
+            batch = self._embed_queue[:batch_size]
+            del self._embed_queue[:batch_size]
+            future = self._inference_executor.submit(self._timed_embed, batch)
+            self._embed_futures[future] = batch
+
+    def _on_embedded(self, future, records):
+        try:
+            embeddings, elapsed = future.result()
+            self.stats['embed'].record(elapsed, count=len(records))
+            self._upsert_queue.extend(zip(records, embeddings))
+            self.stats['upsert'].observe_queue(len(self._upsert_queue))
+        except Exception as e:
+            on_print(f"Error indexing batch of {len(records)} records: {e}", Fore.RED)
+            self.indexer._failed_record_ids.update(record[0] for record in records)
+
+    def _write(self, final=False):
+        """
+        Write full batches of embedded records to ChromaDB. When final is set, the last
+        partial batch is written too.
+        """
+        batch_size = self.indexer._upsert_batch_size
+        while self._upsert_queue and (final or len(self._upsert_queue) >= batch_size):
+            batch = self._upsert_queue[:batch_size]
+            del self._upsert_queue[:batch_size]
+            records = [record for record, _ in batch]
+            embeddings = [embedding for _, embedding in batch]
+            start = time.perf_counter()
+            try:
+                self.indexer._upsert_records(records, embeddings if self.indexer.model else None)
+                self.stats['upsert'].record(time.perf_counter() - start, count=len(records))
+            except Exception as e:
+                on_print(f"Error indexing batch of {len(records)} records: {e}", Fore.RED)
+                self.indexer._failed_record_ids.update(record[0] for record in records)
+
+    def _discard_unwritten(self):
+        """
+        Count the records of an interrupted run that will never be written as failed, so that
+        the index manifest does not record their files as indexed.
+        """
+        failed_record_ids = self.indexer._failed_record_ids
+        failed_record_ids.update(record[0] for record in self._embed_queue)
+        for records in self._embed_futures.values():
+            failed_record_ids.update(record[0] for record in records)
+        for document in self._summary_futures.values():
+            failed_record_ids.update(document.get('chunk_hashes', ()))
+
+    def _update_progress(self):
+        if self._progress_bar:
+            self._progress_bar.update(1)
+
+    def _upstream_active(self):
+        return bool(self._pending_files or self._extract_futures or self._summary_futures)
+
+    def run(self, file_paths, prepare_options, add_summary=True, store_full_docs=False, no_chunking_confirmation=True, num_ctx=None):
+        """
+        Index the given files.
+
+        :param file_paths: The files to index.
+        :param prepare_options: Keyword arguments for DocumentIndexer._prepare_document.
+        :param add_summary: Whether to generate and prepend a summary to each chunk.
+        :param store_full_docs: Whether to store the full document content for each chunk.
+        :param no_chunking_confirmation: Whether to skip interactive prompts (tabular summaries).
+        :param num_ctx: The context window passed to summary and embedding requests.
+        """
+        self._prepare_options = prepare_options
+        self._chunking = prepare_options.get('text_splitter') is not None
+        self._add_summary = add_summary
+        self._store_full_docs = store_full_docs
+        self._no_chunking_confirmation = no_chunking_confirmation
+        self._num_ctx = num_ctx
+
+        self._pending_files = deque(file_paths)
+        self._extract_futures = {}
+        self._summary_futures = {}
+        self._embed_futures = {}
+        self._embed_queue = []
+        self._upsert_queue = []
+
+        self._progress_bar = None
+        if self.verbose:
+            self._progress_bar = tqdm(total=len(file_paths), desc="Indexing files", unit="file", bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}")
+
+        start_time = time.perf_counter()
+        self._extraction_executor = self._create_extraction_executor()
+        self._inference_executor = ThreadPoolExecutor(max_workers=self.inference_workers)
+        try:
+            while self._upstream_active() or self._embed_futures or self._embed_queue:
+                self._feed_extraction()
+                self._submit_embeddings(final=not self._upstream_active())
+
+                in_flight = list(self._extract_futures) + list(self._summary_futures) + list(self._embed_futures)
+                if not in_flight:
+                    continue
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in self._extract_futures:
+                        self._on_extracted(future, *self._extract_futures.pop(future))
+                    elif future in self._summary_futures:
+                        self._on_summarized(future, self._summary_futures.pop(future))
+                    else:
+                        self._on_embedded(future, self._embed_futures.pop(future))
+
+                self._write()
+        except KeyboardInterrupt:
+            on_print("Indexing interrupted, writing the records already embedded...", Fore.YELLOW)
+        finally:
+            self._extraction_executor.shutdown(wait=False, cancel_futures=True)
+            self._inference_executor.shutdown(wait=True, cancel_futures=True)
+            self._discard_unwritten()
+            self._write(final=True)
+            self.wall_time = time.perf_counter() - start_time
+            if self._progress_bar:
+                self._progress_bar.close()
+
+        if self.verbose:
+            on_print(self.report(), Fore.WHITE + Style.DIM)
+
+    def report(self):
+        """
+        Build the per-stage throughput and back-pressure report of the last run.
+        """
+        lines = [f"Ingestion pipeline finished in {self.wall_time:.1f}s "
+                 f"({self.extraction_workers} extraction workers, {self.inference_workers} inference workers)"]
+        for stage in self.stats.values():
+            lines.append(f"  {stage.summary(self.wall_time)}")
+        return "\n".join(lines)
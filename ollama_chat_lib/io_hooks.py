@@ -1,9 +1,89 @@
 """I/O hook functions that delegate to plugins or fall back to system I/O."""
 import sys
+import threading
+import time
+from contextlib import contextmanager
 
 from ollama_chat_lib import state
 from ollama_chat_lib.constants import COMMANDS
 
+_capture = threading.local()
+_token_batch = threading.local()
+
+# Plugin methods looked up by the hooks, resolved once when the plugins are loaded
+PLUGIN_HOOKS = (
+    "on_user_input", "on_user_input_done", "on_print", "on_stdout_write", "on_llm_token_response",
+    "on_llm_thinking_token_response", "on_prompt", "on_stdout_flush", "stop_generation", "on_llm_response", "on_exit",
+)
+# (plugins list, number of plugins, {hook name: tuple of bound methods})
+_hook_table = (None, 0, {})
+
+
+def register_plugin_hooks(plugins):
+    """Build the table of the plugin methods called by each hook."""
+    global _hook_table
+    table = {}
+    for hook_name in PLUGIN_HOOKS:
+        methods = []
+        for plugin in plugins:
+            method = getattr(plugin, hook_name, None)
+            if callable(method):
+                methods.append(method)
+        table[hook_name] = tuple(methods)
+    _hook_table = (plugins, len(plugins), table)
+    return table
+
+
+def plugin_hooks(hook_name):
+    """
+    Return the bound methods of the loaded plugins implementing a hook.
+
+    The table is built again only when state.plugins is replaced or extended.
+    """
+    plugins, count, table = _hook_table
+    if plugins is state.plugins and count == len(plugins):
+        return table[hook_name]
+    return register_plugin_hooks(state.plugins)[hook_name]
+
+
+@contextmanager
+def capture_output():
+    """
+    Buffer the output of the current thread instead of writing it.
+
+    Yields the list of buffered (hook name, arguments) entries, which replay_output
+    writes once the thread is done, so that concurrent generations do not interleave.
+    """
+    previous = getattr(_capture, 'buffer', None)
+    buffer = []
+    _capture.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        _capture.buffer = previous
+
+
+def _buffered(hook_name, *args):
+    buffer = getattr(_capture, 'buffer', None)
+    if buffer is None:
+        return False
+    buffer.append((hook_name, args))
+    return True
+
+
+def replay_output(buffer):
+    """Write the output buffered by capture_output, through the regular hooks."""
+    hooks = {
+        'on_print': on_print,
+        'on_stdout_write': on_stdout_write,
+        'on_llm_token_response': on_llm_token_response,
+        'on_llm_thinking_token_response': on_llm_thinking_token_response,
+        'on_prompt': on_prompt,
+    }
+    for hook_name, args in buffer:
+        hooks[hook_name](*args)
+    on_stdout_flush()
+
 
 def completer(text, match_index):
     """Autocomplete function for readline."""
@@ -14,11 +94,11 @@ def completer(text, match_index):
 
 
 def on_user_input(input_prompt=None):
-    for plugin in state.plugins:
-        if hasattr(plugin, "on_user_input") and callable(getattr(plugin, "on_user_input")):
-            plugin_response = getattr(plugin, "on_user_input")(input_prompt)
-            if plugin_response:
-                return plugin_response
+    flush_token_batch()
+    for hook in plugin_hooks("on_user_input"):
+        plugin_response = hook(input_prompt)
+        if plugin_response:
+            return plugin_response
 
     if input_prompt:
         return input(input_prompt)
@@ -27,11 +107,12 @@ def on_user_input(input_prompt=None):
 
 
 def on_print(message, style="", prompt=""):
+    if _buffered('on_print', message, style, prompt):
+        return
+    flush_token_batch()
     function_handled = False
-    for plugin in state.plugins:
-        if hasattr(plugin, "on_print") and callable(getattr(plugin, "on_print")):
-            plugin_response = getattr(plugin, "on_print")(message)
-            function_handled = function_handled or plugin_response
+    for hook in plugin_hooks("on_print"):
+        function_handled = hook(message) or function_handled
 
     if not function_handled:
         if style or prompt:
@@ -41,11 +122,12 @@ def on_print(message, style="", prompt=""):
 
 
 def on_stdout_write(message, style="", prompt=""):
+    if _buffered('on_stdout_write', message, style, prompt):
+        return
+    flush_token_batch()
     function_handled = False
-    for plugin in state.plugins:
-        if hasattr(plugin, "on_stdout_write") and callable(getattr(plugin, "on_stdout_write")):
-            plugin_response = getattr(plugin, "on_stdout_write")(message)
-            function_handled = function_handled or plugin_response
+    for hook in plugin_hooks("on_stdout_write"):
+        function_handled = hook(message) or function_handled
 
     if not function_handled:
         if style or prompt:
@@ -54,12 +136,10 @@ def on_stdout_write(message, style="", prompt=""):
             sys.stdout.write(message)
 
 
-def on_llm_token_response(token, style="", prompt=""):
+def _write_tokens(hook_name, token, style, prompt):
     function_handled = False
-    for plugin in state.plugins:
-        if hasattr(plugin, "on_llm_token_response") and callable(getattr(plugin, "on_llm_token_response")):
-            plugin_response = getattr(plugin, "on_llm_token_response")(token)
-            function_handled = function_handled or plugin_response
+    for hook in plugin_hooks(hook_name):
+        function_handled = hook(token) or function_handled
 
     if not function_handled:
         if style or prompt:
@@ -68,26 +148,67 @@ def on_llm_token_response(token, style="", prompt=""):
             sys.stdout.write(token)
 
 
-def on_llm_thinking_token_response(token, style="", prompt=""):
-    function_handled = False
-    for plugin in state.plugins:
-        if hasattr(plugin, "on_llm_thinking_token_response") and callable(getattr(plugin, "on_llm_thinking_token_response")):
-            plugin_response = getattr(plugin, "on_llm_thinking_token_response")(token)
-            function_handled = function_handled or plugin_response
+def _batch_token(hook_name, token, style, prompt):
+    """
+    Coalesce a streamed token with the previous ones, when state.token_batch_ms is set.
 
-    if not function_handled:
-        if style or prompt:
-            sys.stdout.write(f"{style}{prompt}{token}")
-        else:
-            sys.stdout.write(token)
+    A batch is delivered once state.token_batch_ms have elapsed since its first token, at the
+    end of a line, or before any other output.
+    """
+    batch = getattr(_token_batch, 'batch', None)
+    if batch is not None and (batch[0] != hook_name or batch[1] != style or prompt):
+        flush_token_batch()
+        batch = None
+    if batch is None:
+        batch = [hook_name, style, prompt, [], time.monotonic() + state.token_batch_ms / 1000]
+        _token_batch.batch = batch
+    batch[3].append(token)
+    if "\n" in token or time.monotonic() >= batch[4]:
+        flush_token_batch()
+
+
+def flush_token_batch():
+    """Deliver the tokens coalesced in the current thread to the token hooks."""
+    if _write_token_batch():
+        _flush_stdout()
+
+
+def _write_token_batch():
+    """Write the tokens coalesced in the current thread; return False if there were none."""
+    batch = getattr(_token_batch, 'batch', None)
+    if batch is None:
+        return False
+    _token_batch.batch = None
+    hook_name, style, prompt, tokens, _ = batch
+    _write_tokens(hook_name, "".join(tokens), style, prompt)
+    return True
+
+
+def on_llm_token_response(token, style="", prompt=""):
+    if _buffered('on_llm_token_response', token, style, prompt):
+        return
+    if state.token_batch_ms > 0:
+        _batch_token('on_llm_token_response', token, style, prompt)
+    else:
+        _write_tokens('on_llm_token_response', token, style, prompt)
+
+
+def on_llm_thinking_token_response(token, style="", prompt=""):
+    if _buffered('on_llm_thinking_token_response', token, style, prompt):
+        return
+    if state.token_batch_ms > 0:
+        _batch_token('on_llm_thinking_token_response', token, style, prompt)
+    else:
+        _write_tokens('on_llm_thinking_token_response', token, style, prompt)
 
 
 def on_prompt(prompt, style=""):
+    if _buffered('on_prompt', prompt, style):
+        return
+    flush_token_batch()
     function_handled = False
-    for plugin in state.plugins:
-        if hasattr(plugin, "on_prompt") and callable(getattr(plugin, "on_prompt")):
-            plugin_response = getattr(plugin, "on_prompt")(prompt)
-            function_handled = function_handled or plugin_response
+    for hook in plugin_hooks("on_prompt"):
+        function_handled = hook(prompt) or function_handled
 
     if not function_handled:
         if style:
@@ -97,11 +218,25 @@ def on_prompt(prompt, style=""):
 
 
 def on_stdout_flush():
+    if getattr(_capture, 'buffer', None) is not None:
+        return
+    _write_token_batch()
+    _flush_stdout()
+
+
+def on_token_flush():
+    """
+    Flush the output after a streamed token. With token batching, the flush happens when the
+    batch is delivered, so that the stdout hooks are not called for every token.
+    """
+    if state.token_batch_ms <= 0:
+        on_stdout_flush()
+
+
+def _flush_stdout():
     function_handled = False
-    for plugin in state.plugins:
-        if hasattr(plugin, "on_stdout_flush") and callable(getattr(plugin, "on_stdout_flush")):
-            plugin_response = getattr(plugin, "on_stdout_flush")()
-            function_handled = function_handled or plugin_response
+    for hook in plugin_hooks("on_stdout_flush"):
+        function_handled = hook() or function_handled
 
     if not function_handled:
         sys.stdout.flush()
@@ -0,0 +1,252 @@
+"""Persistent per-collection BM25 inverted index, used for hybrid (lexical + vector) retrieval."""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from ollama_chat_lib import state
+from ollama_chat_lib.constants import stop_words
+from ollama_chat_lib.index_manifest import collection_data_file
+
+
+def preprocess_text(text):
+    if not text or len(text) == 0:
+        return []
+    text = text.lower()
+    text = re.sub(r'[^\w\s.,]', ' ', text)
+    text = re.sub(r'\. |, ', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    words = text.split()
+    words = [word[:-1] if word.endswith('.') else word for word in words]
+    words = [word for word in words if word not in stop_words]
+    return words
+
+
+class LexicalIndex:
+    """
+    BM25 (Okapi) inverted index over the documents of a collection, stored in SQLite.
+
+    Term frequencies, document frequencies, document lengths and corpus totals are kept up
+    to date as documents are added and removed, so a query only tokenizes the query itself
+    and reads the postings of its terms. IDF statistics cover the whole collection.
+    Documents are indexed with the text their embedding is computed from, which differs from
+    the stored text when full documents are stored for each chunk.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        """
+        :param path: The SQLite database file (created if needed), or ":memory:".
+        :param k1: BM25 term frequency saturation.
+        :param b: BM25 document length normalization.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.ids_verified = False  # Whether the IDs were compared with those of the collection
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            if path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, length INTEGER NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+                "PRIMARY KEY (term, doc_id)) WITHOUT ROWID"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc_id ON postings (doc_id)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS corpus (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._connection.execute("INSERT OR IGNORE INTO corpus (key, value) VALUES ('documents', 0), ('length', 0)")
+
+    def _remove_locked(self, ids):
+        removed = 0
+        removed_length = 0
+        for doc_id in ids:
+            row = self._connection.execute("SELECT length FROM documents WHERE id = ?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            terms = [(term,) for (term,) in self._connection.execute("SELECT term FROM postings WHERE doc_id = ?", (doc_id,))]
+            self._connection.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", terms)
+            self._connection.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self._connection.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+            removed += 1
+            removed_length += row[0]
+        if removed:
+            self._connection.execute("DELETE FROM terms WHERE df <= 0")
+            self._update_corpus(-removed, -removed_length)
+
+    def _update_corpus(self, documents, length):
+        self._connection.execute("UPDATE corpus SET value = value + ? WHERE key = 'documents'", (documents,))
+        self._connection.execute("UPDATE corpus SET value = value + ? WHERE key = 'length'", (length,))
+
+    def add_documents(self, ids, texts):
+        """Add or replace documents."""
+        if not ids:
+            return
+        tokenized = [(doc_id, Counter(preprocess_text(text))) for doc_id, text in zip(ids, texts)]
+        with self._lock, self._connection:
+            self._remove_locked(ids)
+            total_length = 0
+            for doc_id, counts in tokenized:
+                length = sum(counts.values())
+                total_length += length
+                self._connection.execute("INSERT INTO documents (id, length) VALUES (?, ?)", (doc_id, length))
+                self._connection.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in counts.items()]
+                )
+                self._connection.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                    [(term,) for term in counts]
+                )
+            self._update_corpus(len(tokenized), total_length)
+
+    def remove_documents(self, ids):
+        if not ids:
+            return
+        with self._lock, self._connection:
+            self._remove_locked(ids)
+
+    def get_scores(self, query):
+        """
+        Return the BM25 score of every document containing at least one query term.
+
+        :return: Dictionary document ID -> score.
+        """
+        query_terms = Counter(preprocess_text(query))
+        scores = {}
+        if not query_terms:
+            return scores
+
+        with self._lock:
+            corpus = dict(self._connection.execute("SELECT key, value FROM corpus").fetchall())
+            document_count = corpus.get('documents', 0)
+            if document_count <= 0:
+                return scores
+            average_length = corpus.get('length', 0) / document_count or 1.0
+
+            for term, query_count in query_terms.items():
+                row = self._connection.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+                if row is None:
+                    continue
+                df = row[0]
+                # Lucene's non-negative IDF variant, so that very common terms never lower a score
+                idf = math.log((document_count - df + 0.5) / (df + 0.5) + 1.0)
+                postings = self._connection.execute(
+                    "SELECT postings.doc_id, postings.tf, documents.length FROM postings "
+                    "JOIN documents ON documents.id = postings.doc_id WHERE postings.term = ?", (term,)
+                )
+                for doc_id, tf, length in postings:
+                    denominator = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + query_count * idf * tf * (self.k1 + 1) / denominator
+        return scores
+
+    def search(self, query, n_results=25):
+        """
+        Return the best matching documents.
+
+        :return: List of (document ID, score), best first.
+        """
+        scores = self.get_scores(query)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+    def ids(self):
+        with self._lock:
+            return {doc_id for (doc_id,) in self._connection.execute("SELECT id FROM documents")}
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT value FROM corpus WHERE key = 'documents'").fetchone()[0]
+
+    @staticmethod
+    def _collection_ids(collection, batch_size=1000):
+        collection_ids = set()
+        offset = 0
+        while True:
+            batch = collection.get(include=[], limit=batch_size, offset=offset)
+            batch_ids = batch.get('ids') or []
+            collection_ids.update(batch_ids)
+            if len(batch_ids) < batch_size:
+                break
+            offset += batch_size
+        return collection_ids
+
+    def is_in_sync(self, collection, compare_ids=True):
+        """
+        Check whether the index holds the same documents as a ChromaDB collection.
+
+        :param compare_ids: Compare the document IDs, which lists the whole collection. Otherwise
+                            only the number of documents is compared, which misses a document
+                            replaced by another.
+        """
+        if len(self) != collection.count():
+            return False
+        if not compare_ids:
+            return True
+        in_sync = self.ids() == self._collection_ids(collection)
+        self.ids_verified = self.ids_verified or in_sync
+        return in_sync
+
+    def sync(self, collection, batch_size=1000):
+        """
+        Make the index contain exactly the documents of a ChromaDB collection: index the
+        missing ones (e.g. from a collection created before the index existed) and drop the
+        ones no longer in the collection.
+
+        :return: The number of (added, removed) documents.
+        """
+        collection_ids = self._collection_ids(collection, batch_size)
+        indexed_ids = self.ids()
+        removed = indexed_ids - collection_ids
+        self.remove_documents(list(removed))
+
+        missing = sorted(collection_ids - indexed_ids)
+        for start in range(0, len(missing), batch_size):
+            batch = collection.get(ids=missing[start:start + batch_size], include=['documents', 'metadatas'])
+            ids = batch.get('ids') or []
+            documents = batch.get('documents') or [None] * len(ids)
+            metadatas = batch.get('metadatas') or [None] * len(ids)
+            # Chunks stored with their full document record the text their embedding was computed from
+            self.add_documents(ids, [(metadata or {}).get('embedded_text') or document or "" for document, metadata in zip(documents, metadatas)])
+        self.ids_verified = True
+        return len(missing), len(removed)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def get_lexical_index(collection_name, create=True):
+    """
+    Return the shared LexicalIndex of a collection.
+
+    :param create: Whether to create the index if it does not exist yet.
+    :return: The LexicalIndex, or None if it does not exist and create is False.
+    """
+    path = collection_data_file(collection_name, "lexical_index", ".sqlite", create_folder=create)
+    lexical_index = state.lexical_indexes.get(path)
+    if lexical_index is None:
+        if not create and not os.path.exists(path):
+            return None
+        lexical_index = LexicalIndex(path)
+        state.lexical_indexes[path] = lexical_index
+    return lexical_index
+
+
+def delete_lexical_index(collection_name):
+    """Close and delete the LexicalIndex of a collection, if any."""
+    path = collection_data_file(collection_name, "lexical_index", ".sqlite", create_folder=False)
+    lexical_index = state.lexical_indexes.pop(path, None)
+    if lexical_index is not None:
+        lexical_index.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
@@ -3,19 +3,66 @@
 
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 from colorama import Fore, Style
 import ollama
 import requests
 
 from ollama_chat_lib import state
+from ollama_chat_lib.constants import default_max_tool_workers, default_tool_timeout
 from ollama_chat_lib.io_hooks import (
-    on_print, on_stdout_write, on_stdout_flush,
-    on_llm_token_response, on_llm_thinking_token_response, on_prompt,
+    on_print, on_stdout_write, on_stdout_flush, on_token_flush,
+    on_llm_token_response, on_llm_thinking_token_response, on_prompt, plugin_hooks,
 )
 from ollama_chat_lib.utils import find_latest_user_message, extract_json, render_tools
 from ollama_chat_lib.conversation import encode_file_to_base64_with_mime, print_spinning_wheel
+from ollama_chat_lib.markdown_renderer import StreamingMarkdownRenderer
 from ollama_chat_lib.model_selection import is_model_an_ollama_model
+from ollama_chat_lib.telemetry import ollama_metrics, openai_metrics, telemetry_purpose
+
+
+_live_rendering = threading.local()
+
+
+def _create_response_renderer():
+    """Return a renderer highlighting the streamed response as it arrives, or None to show a spinner instead."""
+    if state.syntax_highlighting and state.interactive_mode and state.live_highlighting and not state.alternate_model:
+        return StreamingMarkdownRenderer()
+    return None
+
+
+def _display_rendered(text, prompt="Bot"):
+    """Write highlighted text of the streamed response, after the bot prompt for its first part."""
+    if text:
+        on_stdout_write(text, Style.RESET_ALL, "" if response_rendered_live() else f"\r{prompt}: ")
+        on_stdout_flush()
+        _live_rendering.rendered = True
+
+
+def _stop_requested():
+    """Return True if a plugin asks to stop the response being streamed."""
+    for stop_generation in plugin_hooks("stop_generation"):
+        if stop_generation():
+            return True
+    return False
+
+
+def _record_telemetry(model, started, first_token_at=None, backend="ollama", **metrics):
+    """Record the duration, time to first token and metrics of an LLM call in the session telemetry."""
+    if state.telemetry is None:
+        return
+    ttft = first_token_at - started if first_token_at is not None else None
+    record = state.telemetry.record(time.perf_counter() - started, model=model, backend=backend, ttft=ttft, **metrics)
+    if state.verbose_mode:
+        on_print(state.telemetry.format_call(record), Fore.WHITE + Style.DIM)
+
+
+def response_rendered_live():
+    """Return True if the latest response generated in this thread was displayed, highlighted, while it was streamed."""
+    return getattr(_live_rendering, 'rendered', False)
 
 
 # ---------------------------------------------------------------------------
@@ -210,9 +257,11 @@ def ask_openai_with_conversation(conversation, selected_model=None, temperature=
             on_print("File attachments detected, using Responses API...", Fore.WHITE + Style.DIM)
 
         try:
+            started = time.perf_counter()
             bot_response, bot_response_is_tool_calls, completion_done = ask_openai_responses_api(
                 conversation, selected_model, temperature, tools
             )
+            _record_telemetry(selected_model, started, backend="openai")
             return bot_response, bot_response_is_tool_calls, completion_done
         except Exception as e:
             on_print(f"Error during Responses API call: {e}", Fore.RED)
@@ -220,6 +269,8 @@ def ask_openai_with_conversation(conversation, selected_model=None, temperature=
 
     completion_done = False
     completion = None
+    started = time.perf_counter()
+    first_token_at = None
     try:
         completion = state.openai_client.chat.completions.create(
             messages=conversation,
@@ -234,6 +285,7 @@ def ask_openai_with_conversation(conversation, selected_model=None, temperature=
 
     bot_response_is_tool_calls = False
     tool_calls = []
+    usage = None if stream_active else getattr(completion, 'usage', None)
 
     if hasattr(completion, 'choices') and len(completion.choices) > 0 and hasattr(completion.choices[0], 'message') and hasattr(completion.choices[0].message, 'tool_calls'):
         tool_calls = completion.choices[0].message.tool_calls
@@ -259,18 +311,28 @@ def ask_openai_with_conversation(conversation, selected_model=None, temperature=
                 completion_done = True
         else:
             bot_response = ""
+            response_parts = []
+            renderer = _create_response_renderer()
             try:
                 chunk_count = 0
                 for chunk in completion:
                     delta = chunk.choices[0].delta.content
+                    # The usage is only reported by servers including it in the stream
+                    usage = getattr(chunk, 'usage', None) or usage
 
                     if not delta is None:
-                        if state.syntax_highlighting and state.interactive_mode:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        if renderer is not None:
+                            _display_rendered(renderer.feed(delta))
+                            if not response_rendered_live():
+                                print_spinning_wheel(chunk_count)
+                        elif state.syntax_highlighting and state.interactive_mode:
                             print_spinning_wheel(chunk_count)
                         else:
                             on_llm_token_response(delta, Style.RESET_ALL)
-                            on_stdout_flush()
-                        bot_response += delta
+                            on_token_flush()
+                        response_parts.append(delta)
                     elif isinstance(chunk.choices[0].delta.tool_calls, list) and len(chunk.choices[0].delta.tool_calls) > 0:
                         if isinstance(bot_response, str) and not bot_response_is_tool_calls:
                             bot_response = chunk.choices[0].delta.tool_calls
@@ -287,9 +349,20 @@ def ask_openai_with_conversation(conversation, selected_model=None, temperature=
 
                 if bot_response_is_tool_calls:
                     conversation.append({"role": "assistant", "tool_calls": bot_response})
+                else:
+                    bot_response = "".join(response_parts)
+                    if renderer is not None:
+                        _display_rendered(renderer.finish())
+                        on_stdout_write("\n")
 
             except KeyboardInterrupt:
                 completion.close()
+                if not bot_response_is_tool_calls:
+                    bot_response = "".join(response_parts)
+                    if renderer is not None:
+                        _display_rendered(renderer.finish())
+                        on_stdout_write("\n")
+                on_stdout_flush()
             except Exception as e:
                 on_print(f"Error during streaming completion: {e}", Fore.RED)
                 bot_response = ""
@@ -298,6 +371,11 @@ def ask_openai_with_conversation(conversation, selected_model=None, temperature=
     if not completion_done and not bot_response_is_tool_calls:
         conversation.append({"role": "assistant", "content": bot_response})
 
+    metrics = openai_metrics(usage)
+    if first_token_at is not None:
+        metrics["eval_duration"] = time.perf_counter() - first_token_at
+    _record_telemetry(selected_model, started, first_token_at, backend="openai", **metrics)
+
     return bot_response, bot_response_is_tool_calls, completion_done
 
 
@@ -305,9 +383,202 @@ def ask_openai_with_conversation(conversation, selected_model=None, temperature=
 # handle_tool_response
 # ---------------------------------------------------------------------------
 
+def _parse_tool_parameters(tool, tool_call):
+    """Return the arguments of a tool call as a dict, restricted to the parameters declared by the tool."""
+    if 'arguments' in tool_call:
+        parameters = tool_call.get('arguments', {})
+    else:
+        parameters = tool_call['function'].get('arguments', {})
+
+    if state.verbose_mode:
+        on_print(f"[DEBUG] Initial parameters: {parameters}", Fore.CYAN + Style.DIM)
+        on_print(f"[DEBUG] Parameters type: {type(parameters)}", Fore.CYAN + Style.DIM)
+
+    if isinstance(parameters, str):
+        if state.verbose_mode:
+            on_print(f"[DEBUG] Converting string parameters to dict", Fore.CYAN + Style.DIM)
+        try:
+            parameters = extract_json(parameters)
+            if state.verbose_mode:
+                on_print(f"[DEBUG] After extract_json: {parameters} (type: {type(parameters)})", Fore.CYAN + Style.DIM)
+        except Exception as e:
+            if state.verbose_mode:
+                on_print(f"[DEBUG] extract_json failed: {e}, using empty dict", Fore.CYAN + Style.DIM)
+            parameters = {}
+
+    if isinstance(parameters, list):
+        if state.verbose_mode:
+            on_print(f"[DEBUG] Parameters is a list, attempting to convert to dict", Fore.CYAN + Style.DIM)
+        if 'parameters' in tool.get('function', {}) and 'properties' in tool['function']['parameters']:
+            param_names = list(tool['function']['parameters']['properties'].keys())
+            if state.verbose_mode:
+                on_print(f"[DEBUG] Parameter names from tool definition: {param_names}", Fore.CYAN + Style.DIM)
+                on_print(f"[DEBUG] List values: {parameters}", Fore.CYAN + Style.DIM)
+            if len(param_names) > 0 and len(parameters) > 0:
+                parameters = {name: value for name, value in zip(param_names, parameters)}
+                if state.verbose_mode:
+                    on_print(f"[DEBUG] Converted list to dict: {parameters}", Fore.CYAN + Style.DIM)
+            else:
+                parameters = {}
+        else:
+            if state.verbose_mode:
+                on_print(f"[DEBUG] No parameter definition found in tool, using empty dict", Fore.CYAN + Style.DIM)
+            parameters = {}
+    elif not isinstance(parameters, dict):
+        if state.verbose_mode:
+            on_print(f"[DEBUG] Parameters is {type(parameters)}, converting to empty dict", Fore.CYAN + Style.DIM)
+        parameters = {}
+
+    if state.verbose_mode:
+        on_print(f"[DEBUG] Final parameters before tool call: {parameters} (type: {type(parameters)})", Fore.CYAN + Style.DIM)
+
+    accepted_params = set()
+    if 'parameters' in tool.get('function', {}) and 'properties' in tool['function']['parameters']:
+        accepted_params = set(tool['function']['parameters']['properties'].keys())
+
+    if state.verbose_mode and accepted_params:
+        on_print(f"[DEBUG] Accepted parameters from tool definition: {accepted_params}", Fore.CYAN + Style.DIM)
+
+    if accepted_params and isinstance(parameters, dict):
+        original_params = parameters.copy()
+        parameters = {k: v for k, v in parameters.items() if k in accepted_params}
+
+        if state.verbose_mode and original_params != parameters:
+            on_print(f"[DEBUG] Filtered parameters: removed {set(original_params.keys()) - set(parameters.keys())}", Fore.CYAN + Style.DIM)
+            on_print(f"[DEBUG] Parameters after filtering: {parameters}", Fore.CYAN + Style.DIM)
+
+    return parameters
+
+
+def _tool_is_concurrency_safe(tool_name, globals_fn=None):
+    """
+    Whether a tool may run concurrently with other tool calls. Tool functions (and plugin
+    methods) opt out with the not_concurrency_safe decorator; plugins can also opt out as a
+    whole with a ``concurrency_safe = False`` attribute.
+    """
+    _globals = globals_fn() if globals_fn else {}
+    if tool_name in _globals:
+        return getattr(_globals[tool_name], 'concurrency_safe', True)
+    for plugin in state.plugins:
+        if hasattr(plugin, tool_name) and callable(getattr(plugin, tool_name)):
+            if not getattr(plugin, 'concurrency_safe', True) or not getattr(getattr(plugin, tool_name), 'concurrency_safe', True):
+                return False
+    return True
+
+
+def _invoke_tool(tool_name, func, parameters):
+    """Call a tool function, reusing the session's cached result of an identical call if any."""
+    cache = state.tool_result_cache
+    if cache is not None:
+        hit, tool_response = cache.get(tool_name, parameters, func)
+        if hit:
+            if state.verbose_mode:
+                on_print(f"Reusing cached result of tool {tool_name} for parameters: {parameters}", Fore.WHITE + Style.DIM)
+            return tool_response
+    tool_response = func(**parameters)
+    if cache is not None:
+        cache.set(tool_name, parameters, func, tool_response)
+    return tool_response
+
+
+def _call_tool(tool_name, parameters, globals_fn=None):
+    """
+    Call a tool function, looked up in the caller's globals first and then in the plugins.
+
+    :return: (tool response or None, whether the tool was found)
+    """
+    tool_response = None
+    tool_found = False
+
+    # Look up tool in the caller's globals dict
+    _globals = globals_fn() if globals_fn else {}
+    if tool_name in _globals:
+        if state.verbose_mode:
+            on_print(f"Calling tool function: {tool_name} with parameters: {parameters}", Fore.WHITE + Style.DIM)
+        try:
+            tool_response = _invoke_tool(tool_name, _globals[tool_name], parameters)
+            if state.verbose_mode:
+                on_print(f"Tool response: {tool_response}", Fore.WHITE + Style.DIM)
+            tool_found = True
+        except Exception as e:
+            on_print(f"Error calling tool function: {tool_name} - {e}", Fore.RED + Style.NORMAL)
+    else:
+        if state.verbose_mode:
+            on_print(f"Trying to find plugin with function '{tool_name}'...", Fore.WHITE + Style.DIM)
+        for plugin in state.plugins:
+            if hasattr(plugin, tool_name) and callable(getattr(plugin, tool_name)):
+                tool_found = True
+                if state.verbose_mode:
+                    on_print(f"Calling tool function: {tool_name} from plugin: {plugin.__class__.__name__} with arguments {parameters}", Fore.WHITE + Style.DIM)
+
+                try:
+                    tool_response = _invoke_tool(tool_name, getattr(plugin, tool_name), parameters)
+                    if state.verbose_mode:
+                        on_print(f"Tool response: {tool_response}", Fore.WHITE + Style.DIM)
+                    break
+                except Exception as e:
+                    on_print(f"Error calling tool function: {tool_name} - {e}", Fore.RED + Style.NORMAL)
+
+    return tool_response, tool_found
+
+
+def _run_tool_calls(calls, globals_fn=None):
+    """
+    Run tool calls, concurrently when possible.
+
+    Consecutive concurrency-safe calls run together on a thread pool of at most
+    state.max_tool_workers threads, each with its own timeout; calls that are not
+    concurrency-safe run alone, in order.
+
+    :param calls: List of (tool name, parameters).
+    :return: List of (tool response or None, whether the tool was found), in the order of the calls.
+    """
+    max_workers = state.max_tool_workers or default_max_tool_workers
+    if not state.parallel_tool_calls or len(calls) < 2 or max_workers < 2:
+        return [_call_tool(tool_name, parameters, globals_fn) for tool_name, parameters in calls]
+
+    timeout = state.tool_timeout if state.tool_timeout is not None else default_tool_timeout
+    results = [None] * len(calls)
+
+    def run_concurrently(indexes):
+        for start in range(0, len(indexes), max_workers):
+            wave = indexes[start:start + max_workers]
+            if len(wave) == 1:
+                results[wave[0]] = _call_tool(*calls[wave[0]], globals_fn)
+                continue
+            if state.verbose_mode:
+                on_print(f"Running {len(wave)} tool calls concurrently: {', '.join(calls[i][0] for i in wave)}", Fore.WHITE + Style.DIM)
+            executor = ThreadPoolExecutor(max_workers=len(wave), thread_name_prefix="tool-call")
+            futures = {i: executor.submit(_call_tool, *calls[i], globals_fn) for i in wave}
+            deadline = time.monotonic() + timeout if timeout else None
+            for i in wave:
+                try:
+                    results[i] = futures[i].result(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+                except FutureTimeoutError:
+                    tool_name = calls[i][0]
+                    on_print(f"Tool function {tool_name} did not respond within {timeout} seconds", Fore.RED + Style.NORMAL)
+                    results[i] = (f"Error: the tool {tool_name} did not respond within {timeout} seconds.", True)
+            # Timed out calls keep running in the background
+            executor.shutdown(wait=False)
+
+    batch = []
+    for i, (tool_name, _) in enumerate(calls):
+        if _tool_is_concurrency_safe(tool_name, globals_fn):
+            batch.append(i)
+            continue
+        run_concurrently(batch)
+        batch = []
+        results[i] = _call_tool(*calls[i], globals_fn)
+    run_concurrently(batch)
+    return results
+
+
 def handle_tool_response(bot_response, model_support_tools, conversation, model, temperature, prompt_template, tools, stream_active, num_ctx=None, globals_fn=None):
     """Dispatch tool calls from the LLM response.
 
+    Independent tool calls run concurrently (see _run_tool_calls); their responses are
+    appended to the conversation in the order of the calls.
+
     Parameters
     ----------
     globals_fn : callable, optional
@@ -317,6 +588,7 @@ def handle_tool_response(bot_response, model_support_tools, conversation, model,
         found.
     """
     tool_found = False
+    pending_calls = []
     for tool_call in bot_response:
         if not 'function' in tool_call:
             tool_call = { 'function': tool_call }
@@ -326,118 +598,33 @@ def handle_tool_response(bot_response, model_support_tools, conversation, model,
         tool_name = tool_call['function']['name']
         for tool in tools:
             if 'type' in tool and tool['type'] == 'function' and 'function' in tool and 'name' in tool['function'] and tool['function']['name'] == tool_name:
-                if 'arguments' in tool_call:
-                    parameters = tool_call.get('arguments', {})
-                else:
-                    parameters = tool_call['function'].get('arguments', {})
-
-                tool_response = None
-
-                if state.verbose_mode:
-                    on_print(f"[DEBUG] Initial parameters: {parameters}", Fore.CYAN + Style.DIM)
-                    on_print(f"[DEBUG] Parameters type: {type(parameters)}", Fore.CYAN + Style.DIM)
-
-                if isinstance(parameters, str):
-                    if state.verbose_mode:
-                        on_print(f"[DEBUG] Converting string parameters to dict", Fore.CYAN + Style.DIM)
-                    try:
-                        parameters = extract_json(parameters)
-                        if state.verbose_mode:
-                            on_print(f"[DEBUG] After extract_json: {parameters} (type: {type(parameters)})", Fore.CYAN + Style.DIM)
-                    except Exception as e:
-                        if state.verbose_mode:
-                            on_print(f"[DEBUG] extract_json failed: {e}, using empty dict", Fore.CYAN + Style.DIM)
-                        parameters = {}
-
-                if isinstance(parameters, list):
-                    if state.verbose_mode:
-                        on_print(f"[DEBUG] Parameters is a list, attempting to convert to dict", Fore.CYAN + Style.DIM)
-                    if 'parameters' in tool.get('function', {}) and 'properties' in tool['function']['parameters']:
-                        param_names = list(tool['function']['parameters']['properties'].keys())
-                        if state.verbose_mode:
-                            on_print(f"[DEBUG] Parameter names from tool definition: {param_names}", Fore.CYAN + Style.DIM)
-                            on_print(f"[DEBUG] List values: {parameters}", Fore.CYAN + Style.DIM)
-                        if len(param_names) > 0 and len(parameters) > 0:
-                            parameters = {name: value for name, value in zip(param_names, parameters)}
-                            if state.verbose_mode:
-                                on_print(f"[DEBUG] Converted list to dict: {parameters}", Fore.CYAN + Style.DIM)
-                        else:
-                            parameters = {}
-                    else:
-                        if state.verbose_mode:
-                            on_print(f"[DEBUG] No parameter definition found in tool, using empty dict", Fore.CYAN + Style.DIM)
-                        parameters = {}
-                elif not isinstance(parameters, dict):
-                    if state.verbose_mode:
-                        on_print(f"[DEBUG] Parameters is {type(parameters)}, converting to empty dict", Fore.CYAN + Style.DIM)
-                    parameters = {}
-
-                if state.verbose_mode:
-                    on_print(f"[DEBUG] Final parameters before tool call: {parameters} (type: {type(parameters)})", Fore.CYAN + Style.DIM)
-
-                accepted_params = set()
-                if 'parameters' in tool.get('function', {}) and 'properties' in tool['function']['parameters']:
-                    accepted_params = set(tool['function']['parameters']['properties'].keys())
-
-                if state.verbose_mode and accepted_params:
-                    on_print(f"[DEBUG] Accepted parameters from tool definition: {accepted_params}", Fore.CYAN + Style.DIM)
-
-                if accepted_params and isinstance(parameters, dict):
-                    original_params = parameters.copy()
-                    parameters = {k: v for k, v in parameters.items() if k in accepted_params}
-
-                    if state.verbose_mode and original_params != parameters:
-                        on_print(f"[DEBUG] Filtered parameters: removed {set(original_params.keys()) - set(parameters.keys())}", Fore.CYAN + Style.DIM)
-                        on_print(f"[DEBUG] Parameters after filtering: {parameters}", Fore.CYAN + Style.DIM)
-
-                # Look up tool in the caller's globals dict
-                _globals = globals_fn() if globals_fn else {}
-                if tool_name in _globals:
-                    if state.verbose_mode:
-                        on_print(f"Calling tool function: {tool_name} with parameters: {parameters}", Fore.WHITE + Style.DIM)
-                    try:
-                        tool_response = _globals[tool_name](**parameters)
-                        if state.verbose_mode:
-                            on_print(f"Tool response: {tool_response}", Fore.WHITE + Style.DIM)
-                        tool_found = True
-                    except Exception as e:
-                        on_print(f"Error calling tool function: {tool_name} - {e}", Fore.RED + Style.NORMAL)
-                else:
-                    if state.verbose_mode:
-                        on_print(f"Trying to find plugin with function '{tool_name}'...", Fore.WHITE + Style.DIM)
-                    for plugin in state.plugins:
-                        if hasattr(plugin, tool_name) and callable(getattr(plugin, tool_name)):
-                            tool_found = True
-                            if state.verbose_mode:
-                                on_print(f"Calling tool function: {tool_name} from plugin: {plugin.__class__.__name__} with arguments {parameters}", Fore.WHITE + Style.DIM)
-
-                            try:
-                                tool_response = getattr(plugin, tool_name)(**parameters)
-                                if state.verbose_mode:
-                                    on_print(f"Tool response: {tool_response}", Fore.WHITE + Style.DIM)
-                                break
-                            except Exception as e:
-                                on_print(f"Error calling tool function: {tool_name} - {e}", Fore.RED + Style.NORMAL)
-
-                if not tool_response is None:
-                    tool_role = "tool"
-                    tool_call_id = tool_call.get('id', 0)
-
-                    if not model_support_tools:
-                        tool_role = "user"
-                    if isinstance(tool_response, str):
-                        if not model_support_tools:
-                            latest_user_message = find_latest_user_message(conversation)
-                            if latest_user_message:
-                                tool_response += "\n" + latest_user_message
-                        conversation.append({"role": tool_role, "content": tool_response, "tool_call_id": tool_call_id})
-                    else:
-                        tool_response_str = json.dumps(tool_response, indent=4)
-                        if not model_support_tools:
-                            latest_user_message = find_latest_user_message(conversation)
-                            if latest_user_message:
-                                tool_response_str += "\n" + latest_user_message
-                        conversation.append({"role": tool_role, "content": tool_response_str, "tool_call_id": tool_call_id})
+                pending_calls.append((tool_call, tool_name, _parse_tool_parameters(tool, tool_call)))
+
+    results = _run_tool_calls([(tool_name, parameters) for _, tool_name, parameters in pending_calls], globals_fn)
+    if state.verbose_mode and state.tool_result_cache is not None and pending_calls:
+        on_print(state.tool_result_cache.format_stats(), Fore.WHITE + Style.DIM)
+
+    for (tool_call, tool_name, parameters), (tool_response, found) in zip(pending_calls, results):
+        tool_found = tool_found or found
+        if not tool_response is None:
+            tool_role = "tool"
+            tool_call_id = tool_call.get('id', 0)
+
+            if not model_support_tools:
+                tool_role = "user"
+            if isinstance(tool_response, str):
+                if not model_support_tools:
+                    latest_user_message = find_latest_user_message(conversation)
+                    if latest_user_message:
+                        tool_response += "\n" + latest_user_message
+                conversation.append({"role": tool_role, "content": tool_response, "tool_call_id": tool_call_id})
+            else:
+                tool_response_str = json.dumps(tool_response, indent=4)
+                if not model_support_tools:
+                    latest_user_message = find_latest_user_message(conversation)
+                    if latest_user_message:
+                        tool_response_str += "\n" + latest_user_message
+                conversation.append({"role": tool_role, "content": tool_response_str, "tool_call_id": tool_call_id})
     if tool_found:
         bot_response = ask_ollama_with_conversation(conversation, model, temperature, prompt_template, tools=tools, no_bot_prompt=True, stream_active=stream_active, num_ctx=num_ctx, globals_fn=globals_fn)
     else:
@@ -451,8 +638,29 @@ def handle_tool_response(bot_response, model_support_tools, conversation, model,
 # ask_ollama_with_conversation
 # ---------------------------------------------------------------------------
 
+def _record_prompt_eval(conversation, response):
+    """Update the prompt cache statistics with the prompt_eval_count of a final Ollama response."""
+    if state.prompt_cache_stats is None:
+        return
+    prompt_eval_count = response.get('prompt_eval_count')
+    reused = state.prompt_cache_stats.record(conversation, prompt_eval_count)
+    if state.verbose_mode and reused is not None:
+        on_print(f"Evaluated {prompt_eval_count} prompt tokens (~{max(reused, 0):.0%} of the prompt reused from cache). {state.prompt_cache_stats.format_stats()}", Fore.WHITE + Style.DIM)
+
+
+def _response_cache_key(model, conversation, options, tools, think, stream_active):
+    """Return the response cache key of a request, or None if the request does not go through the cache."""
+    cache = state.response_cache
+    if cache is None or stream_active or not cache.accepts(options):
+        return None
+    model_digest = state.model_registry.digest(model) if state.model_registry is not None else None
+    return cache.make_key(model, conversation, options, tools, think, model_digest=model_digest)
+
+
 def ask_ollama_with_conversation(conversation, model, temperature=0.1, prompt_template=None, tools=[], no_bot_prompt=False, stream_active=True, prompt="Bot", prompt_color=None, num_ctx=None, use_think_mode=False, globals_fn=None):
 
+    _live_rendering.rendered = False
+
     if state.no_system_role and len(conversation) > 1 and conversation[0]["role"] == "system" and not conversation[0]["content"] is None and not conversation[1]["content"] is None:
         conversation[1]["content"] = conversation[0]["content"] + "\n" + conversation[1]["content"]
         conversation = conversation[1:]
@@ -498,6 +706,8 @@ def ask_ollama_with_conversation(conversation, model, temperature=0.1, prompt_te
             return None
 
     bot_response = ""
+    response_parts = []
+    renderer = None
     bot_thinking_response = ""
     bot_response_is_tool_calls = False
     ollama_options = {"temperature": temperature}
@@ -509,27 +719,49 @@ def ask_ollama_with_conversation(conversation, model, temperature=0.1, prompt_te
     if state.verbose_mode and think:
         on_print("Thinking...", Fore.WHITE + Style.DIM)
 
-    try:
-        stream = ollama.chat(
-            model=model,
-            messages=conversation,
-            stream=False if len(tools) > 0 else stream_active,
-            options=ollama_options,
-            tools=tools,
-            think=think
-        )
-    except ollama.ResponseError as e:
-        if "does not support tools" in str(e):
-            tool_response = generate_tool_response(find_latest_user_message(conversation), tools, model, temperature, prompt_template, num_ctx=num_ctx, globals_fn=globals_fn)
-
-            if not tool_response is None and len(tool_response) > 0:
-                bot_response = tool_response
-                bot_response_is_tool_calls = True
-                model_support_tools = False
+    # Models known not to support native tool calls go straight to the prompt-based fallback
+    tools_unsupported = len(tools) > 0 and state.model_registry is not None and state.model_registry.supports(model, "tools") is False
+
+    started = time.perf_counter()
+    first_token_at = None
+    response_cached = False
+    cache_key = None if tools_unsupported else _response_cache_key(model, conversation, ollama_options, tools, think, stream_active)
+    if cache_key is not None:
+        cached_message = state.response_cache.get_response(cache_key)
+        if cached_message is not None:
+            stream = {"message": cached_message}
+            response_cached = True
+        elif state.response_cache.mode == "replay":
+            on_print(f"No recorded response for this request to {model} (response cache in replay mode)", Fore.YELLOW)
+            return ""
+    if not tools_unsupported and not response_cached:
+        try:
+            stream = ollama.chat(
+                model=model,
+                messages=conversation,
+                stream=False if len(tools) > 0 else stream_active,
+                options=ollama_options,
+                tools=tools,
+                think=think,
+                keep_alive=state.keep_alive
+            )
+        except ollama.ResponseError as e:
+            if "does not support tools" in str(e):
+                tools_unsupported = True
+                if state.model_registry is not None:
+                    state.model_registry.set_capability(model, "tools", False)
             else:
+                on_print(f"An error occurred during the conversation: {e}", Fore.RED)
                 return ""
+
+    if tools_unsupported:
+        tool_response = generate_tool_response(find_latest_user_message(conversation), tools, model, temperature, prompt_template, num_ctx=num_ctx, globals_fn=globals_fn)
+
+        if not tool_response is None and len(tool_response) > 0:
+            bot_response = tool_response
+            bot_response_is_tool_calls = True
+            model_support_tools = False
         else:
-            on_print(f"An error occurred during the conversation: {e}", Fore.RED)
             return ""
 
     if not bot_response_is_tool_calls:
@@ -537,22 +769,19 @@ def ask_ollama_with_conversation(conversation, model, temperature=0.1, prompt_te
             if stream_active and len(tools) == 0:
                 if state.alternate_model:
                     on_print(f"Response from model: {model}\n")
+                renderer = _create_response_renderer()
                 chunk_count = 0
+                final_chunk = None
                 for chunk in stream:
-                    continue_response_generation = True
-                    for plugin in state.plugins:
-                        if hasattr(plugin, "stop_generation") and callable(getattr(plugin, "stop_generation")):
-                            plugin_response = getattr(plugin, "stop_generation")()
-                            if plugin_response:
-                                continue_response_generation = False
-                                break
-
-                    if not continue_response_generation:
+                    if _stop_requested():
                         stream.close()
                         break
 
                     chunk_count += 1
 
+                    if chunk.get('done'):
+                        final_chunk = chunk
+
                     thinking_delta = ""
                     if think:
                         thinking_delta = chunk['message'].get('thinking', '')
@@ -563,27 +792,46 @@ def ask_ollama_with_conversation(conversation, model, temperature=0.1, prompt_te
                             bot_thinking_response += thinking_delta
 
                     delta = chunk['message'].get('content', '')
+                    if first_token_at is None and (delta or thinking_delta):
+                        first_token_at = time.perf_counter()
 
-                    if len(bot_response) == 0 and len(thinking_delta) == 0:
+                    if not response_parts and len(thinking_delta) == 0:
                         delta = delta.strip()
 
                         if len(delta) == 0:
                             continue
 
-                    bot_response += delta
+                    response_parts.append(delta)
 
-                    if state.syntax_highlighting and state.interactive_mode:
+                    if renderer is not None:
+                        _display_rendered(renderer.feed(delta), prompt)
+                        if not response_rendered_live():
+                            print_spinning_wheel(chunk_count)
+                    elif state.syntax_highlighting and state.interactive_mode:
                         print_spinning_wheel(chunk_count)
                     else:
                         if think and len(thinking_delta) > 0:
                             on_llm_thinking_token_response(thinking_delta, Fore.WHITE + Style.DIM)
                         else:
                             on_llm_token_response(delta, Fore.WHITE + Style.NORMAL)
-                        on_stdout_flush()
+                        on_token_flush()
 
+                bot_response = "".join(response_parts)
+                if renderer is not None:
+                    _display_rendered(renderer.finish(), prompt)
                 on_llm_token_response("\n")
                 on_stdout_flush()
+                if final_chunk is not None:
+                    _record_prompt_eval(conversation, final_chunk)
+                _record_telemetry(model, started, first_token_at, **(ollama_metrics(final_chunk) if final_chunk is not None else {}))
             else:
+                if response_cached:
+                    _record_telemetry(model, started, backend="response-cache")
+                else:
+                    _record_prompt_eval(conversation, stream)
+                    _record_telemetry(model, started, **ollama_metrics(stream))
+                    if cache_key is not None:
+                        state.response_cache.set_response(cache_key, stream['message'])
                 tool_calls = stream['message'].get('tool_calls', [])
                 if tool_calls is None:
                     tool_calls = []
@@ -601,6 +849,13 @@ def ask_ollama_with_conversation(conversation, model, temperature=0.1, prompt_te
                     bot_response = stream['message']['content']
         except KeyboardInterrupt:
             stream.close()
+            _record_telemetry(model, started, first_token_at)
+            if response_parts:
+                bot_response = "".join(response_parts)
+            if renderer is not None:
+                _display_rendered(renderer.finish(), prompt)
+                on_llm_token_response("\n")
+            on_stdout_flush()
         except ollama.ResponseError as e:
             on_print(f"An error occurred during the conversation: {e}", Fore.RED)
             return ""
@@ -657,7 +912,8 @@ Given the user input, return your response as a JSON array of objects, each repr
 If no tool is relevant to answer, simply return an empty array: [].
 """
 
-    tool_response = ask_ollama(system_prompt, user_input, selected_model, temperature, prompt_template, no_bot_prompt=True, stream_active=False, num_ctx=num_ctx, globals_fn=globals_fn)
+    with telemetry_purpose("tool-fallback"):
+        tool_response = ask_ollama(system_prompt, user_input, selected_model, temperature, prompt_template, no_bot_prompt=True, stream_active=False, num_ctx=num_ctx, globals_fn=globals_fn)
 
     if state.verbose_mode:
         on_print(f"Tool response: {tool_response}", Fore.WHITE + Style.DIM)
@@ -0,0 +1,175 @@
+"""Incremental syntax highlighting of streamed Markdown responses."""
+
+import io
+import re
+from functools import lru_cache
+
+from pygments.formatters import Terminal256Formatter
+from pygments.lexers import get_lexer_by_name
+
+# Lines opening or closing a fenced code block, as recognized by the Pygments Markdown lexer
+_FENCE_OPENING = re.compile(r"\s*```(?:[\w\-]+(?:[^\S\n]+.*)?)?")
+_FENCE_CLOSING = re.compile(r"\s*```")
+_SETEXT_UNDERLINE = re.compile(r"=+|-+")
+_REFERENCE_DEFINITION_END = re.compile(r"\]:\s*$")
+# A list item or quote marker alone on its line takes the next line as its content
+_MARKER_ALONE = re.compile(r"\s*[*>-]")
+_MAX_BOUNDARY_CANDIDATES = 3
+
+
+@lru_cache(maxsize=32)
+def get_lexer(language='md', stripnl=True):
+    """Return a shared Pygments lexer for a language; raises pygments.util.ClassNotFound if unknown."""
+    return get_lexer_by_name(language, stripnl=stripnl)
+
+
+@lru_cache(maxsize=8)
+def get_formatter(style='default'):
+    """Return a shared terminal formatter for a Pygments style."""
+    return Terminal256Formatter(style=style)
+
+
+class StreamingMarkdownRenderer:
+    """
+    Highlight a Markdown response while it is streamed, with the output of colorize() on the whole response.
+
+    Token deltas are buffered until a safe boundary: a complete line, once the next line shows
+    that it does not continue it (Setext heading underline, list item or quote marker alone on
+    its line, inline markup wrapping to the next line), and the end of a closed code fence.
+    Links and reference definitions still open are held until closed. Only the lines after the
+    last safe boundary are lexed again when a line completes, and leading and trailing
+    whitespace is stripped as in the batch rendering.
+    """
+
+    def __init__(self, language='md', style='default'):
+        self._lexer = get_lexer(language, stripnl=False)
+        self._formatter = get_formatter(style)
+        self._parts = []
+        self._pending = ""
+        self._started = False
+        self._carriage_return = False
+        self._rendered = False
+
+    @property
+    def text(self):
+        """The raw response received so far."""
+        return "".join(self._parts)
+
+    def feed(self, delta):
+        """
+        Add a token delta of the response.
+
+        :return: The highlighted text that became safe to display, possibly empty.
+        """
+        if not delta:
+            return ""
+        self._parts.append(delta)
+        if not self._started:
+            delta = delta.lstrip()
+            if not delta:
+                return ""
+            self._started = True
+        if self._carriage_return:
+            delta = "\r" + delta
+            self._carriage_return = False
+        if delta.endswith("\r"):
+            delta = delta[:-1]
+            self._carriage_return = True
+        delta = delta.replace("\r\n", "\n").replace("\r", "\n")
+        self._pending += delta
+        return self._render_ready() if "\n" in delta else ""
+
+    def finish(self):
+        """
+        Signal the end of the response.
+
+        :return: The highlighted remainder of the response.
+        """
+        text = self._pending.rstrip()
+        self._pending = ""
+        self._carriage_return = False
+        if not text and self._rendered:
+            return ""
+        self._rendered = True
+        return self._format(self._lexer.get_tokens(text + "\n"))
+
+    def _format(self, tokens):
+        output = io.StringIO()
+        self._formatter.format(tokens, output)
+        return output.getvalue()
+
+    def _hold_position(self, text):
+        """Return the position from which the complete lines may still be continued by coming text."""
+        hold = len(text)
+
+        fence_start = None
+        line_start = 0
+        lines = text.splitlines()
+        for index, line in enumerate(lines):
+            if fence_start is None:
+                if _FENCE_OPENING.fullmatch(line):
+                    fence_start = line_start
+                    if ((index > 0 and _MARKER_ALONE.fullmatch(lines[index - 1]))
+                            or (index + 1 < len(lines) and _SETEXT_UNDERLINE.fullmatch(lines[index + 1]))
+                            or text.rfind("[", 0, line_start) > text.rfind("]", 0, line_start)):
+                        # The fence line may be the content of a list item or quote marker, part of
+                        # a Setext heading or of a link: only the end of the response tells, so all
+                        # of it is held
+                        break
+            elif _FENCE_CLOSING.fullmatch(line):
+                fence_start = None
+            line_start += len(line) + 1
+        if fence_start is not None:
+            hold = fence_start
+
+        last_closing_bracket = text.rfind("]")
+        opening_bracket = text.find("[", last_closing_bracket + 1)
+        if opening_bracket != -1:
+            hold = min(hold, opening_bracket)
+        link_target = text.rfind("](")
+        if link_target > text.rfind(")"):
+            hold = min(hold, text.rfind("]", 0, link_target) + 1)
+        reference = _REFERENCE_DEFINITION_END.search(text)
+        if reference is not None:
+            hold = min(hold, max(text.rfind("[", 0, reference.start()), 0))
+
+        return text.rfind("\n", 0, hold) + 1
+
+    def _render_ready(self):
+        end = self._pending.rfind("\n") + 1
+        complete = self._pending[:end]
+        # The last complete line is kept as lookahead for the lines before it
+        limit = min(complete.rfind("\n", 0, end - 1) + 1, self._hold_position(complete))
+        if limit == 0:
+            return ""
+
+        # Trailing whitespace is stripped from the response, so the end of a line is safe only once content follows
+        content_end = len(self._pending.rstrip())
+        boundaries = set()
+        line_start = 0
+        for line in complete[:limit].splitlines(keepends=True):
+            line_start += len(line)
+            if line.strip() and not _MARKER_ALONE.fullmatch(line.rstrip("\n")) and line_start < content_end:
+                boundaries.add(line_start)
+        if not boundaries:
+            return ""
+
+        tokens = list(self._lexer.get_tokens(complete))
+        token_ends = {}
+        position = 0
+        for index, (_, value) in enumerate(tokens):
+            position += len(value)
+            if position in boundaries:
+                token_ends[position] = index + 1
+
+        # A line start is a safe boundary only if the lexer starts afresh there: the lines before
+        # and after it are highlighted the same whether they are lexed together or separately
+        for boundary in sorted(token_ends, reverse=True)[:_MAX_BOUNDARY_CANDIDATES]:
+            index = token_ends[boundary]
+            if list(self._lexer.get_tokens(complete[:boundary])) != tokens[:index]:
+                continue
+            if self._format(tokens[index:]) == self._format(self._lexer.get_tokens(complete[boundary:])):
+                self._pending = self._pending[boundary:]
+                self._rendered = True
+                return self._format(tokens[:index])
+        return ""
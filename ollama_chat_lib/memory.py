@@ -1,20 +1,73 @@
 """Memory management: MemoryManager, LongTermMemoryManager, retrieve_relevant_memory."""
 
 import json
+import math
 import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-import ollama
+import numpy as np
 from appdirs import AppDirs
 from colorama import Fore, Style
 
-from ollama_chat_lib.constants import APP_NAME, APP_AUTHOR, APP_VERSION
+from ollama_chat_lib.constants import (
+    APP_NAME, APP_AUTHOR, APP_VERSION, context_chars_per_token,
+    default_long_term_memory_max_tokens, default_long_term_memory_top_k,
+    default_memory_compaction_threshold, memory_compaction_interval, memory_merge_similarity,
+)
+from ollama_chat_lib.embeddings import embed_text, embed_texts
 from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib.memory_store import LongTermMemoryStore
+from ollama_chat_lib.telemetry import telemetry_purpose
 from ollama_chat_lib.utils import extract_json
 
 
+LONG_TERM_MEMORY_TAG = "<long-term-memory>"
+SHORT_TERM_MEMORIES_TAG = "<short-term-memories>"
+
+
+def get_current_user_id():
+    """Return the name of the user running ollama-chat, used as the key of their long-term memory."""
+    try:
+        return os.getlogin()
+    except OSError:
+        return os.environ.get('USER') or os.environ.get('USERNAME') or "anonymous"
+
+
+def _ask_for_memory(ask_fn, *args, **kwargs):
+    """Call ask_fn with the LLM call tagged as a memory operation in the session telemetry."""
+    with telemetry_purpose("memory"):
+        return ask_fn(*args, **kwargs)
+
+
+def find_near_duplicate_clusters(embeddings, similarity_threshold=memory_merge_similarity):
+    """
+    Group vectors whose cosine similarity to the first vector of their group reaches the threshold.
+
+    :param embeddings: The vectors, oldest first.
+    :return: The groups, as lists of indices in increasing order; every index belongs to one group.
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1.0, norms)
+    similarities = vectors @ vectors.T
+
+    assigned = np.zeros(len(vectors), dtype=bool)
+    clusters = []
+    for index in range(len(vectors)):
+        if assigned[index]:
+            continue
+        members = np.flatnonzero(~assigned & (similarities[index] >= similarity_threshold))
+        members = sorted(set(members.tolist()) | {index})
+        assigned[members] = True
+        clusters.append(members)
+    return clusters
+
+
 class MemoryManager:
-    def __init__(self, collection_name, chroma_client, selected_model, embedding_model_name, verbose=False, num_ctx=None, long_term_memory_file="long_term_memory.json", ask_fn=None):
+    def __init__(self, collection_name, chroma_client, selected_model, embedding_model_name, verbose=False, num_ctx=None, long_term_memory_file="long_term_memory.json", ask_fn=None, compaction_threshold=default_memory_compaction_threshold):
         """
         Initialize the MemoryManager with a specific ChromaDB collection.
 
@@ -23,6 +76,7 @@ class MemoryManager:
         :param selected_model: The model used in ask_ollama for generating responses and embeddings.
         :param embedding_model_name: The name of the embedding model for generating embeddings.
         :param ask_fn: Callable matching ask_ollama signature. Injected to avoid circular imports.
+        :param compaction_threshold: Number of memories above which near-duplicates are merged automatically, 0 to disable.
         """
         self.collection_name = collection_name
         self.client = chroma_client
@@ -32,7 +86,9 @@ class MemoryManager:
         self.verbose = verbose
         self.num_ctx = num_ctx
         self._ask_fn = ask_fn
-        self.long_term_memory_manager = LongTermMemoryManager(selected_model, verbose, num_ctx, memory_file=long_term_memory_file, ask_fn=ask_fn)
+        self.compaction_threshold = compaction_threshold
+        self._count_after_compaction = 0
+        self.long_term_memory_manager = LongTermMemoryManager(selected_model, verbose, num_ctx, memory_file=long_term_memory_file, ask_fn=ask_fn, embedding_model_name=embedding_model_name)
 
     def preprocess_conversation(self, conversation):
         """
@@ -72,7 +128,7 @@ class MemoryManager:
         """
 
         # Use the ask_ollama function to summarize key points
-        summary = self._ask_fn(system_prompt, user_input, self.selected_model, temperature=0.1, no_bot_prompt=True, stream_active=False, num_ctx=self.num_ctx)
+        summary = _ask_for_memory(self._ask_fn, system_prompt, user_input, self.selected_model, temperature=0.1, no_bot_prompt=True, stream_active=False, num_ctx=self.num_ctx)
         
         return summary
 
@@ -89,77 +145,157 @@ class MemoryManager:
             if self.num_ctx:
                 ollama_options["num_ctx"] = self.num_ctx
 
-            response = ollama.embeddings(
-                prompt=text,
-                model=self.embedding_model_name,
-                options=ollama_options
-            )
-            embedding = response["embedding"]
+            embedding = embed_text(text, self.embedding_model_name, options=ollama_options)
         return embedding
 
-    def add_memory(self, conversation, metadata=None):
+    def add_memory(self, conversation, metadata=None, memory_id=None):
         """
         Preprocess and store a conversation in memory by summarizing it and storing the summary.
 
         :param conversation: The conversation array (list of role/content dictionaries).
         :param metadata: Additional metadata to store with the memory (e.g., timestamp, user info).
+        :param memory_id: Id of the memory, given by the background worker so that a retried job
+            does not store the summary again. A new id is generated by default.
+        :return: True if the conversation was added, False if it could not be summarized.
         """
-        conversation_id = datetime.now().strftime("%Y%m%d%H%M%S")
-        
-        # Preprocess the conversation to summarize the key points
-        summarized_conversation = self.preprocess_conversation(conversation)
+        # Timestamp-ordered, and unique even when several conversations are remembered within a second
+        conversation_id = memory_id or f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
 
-        if len(summarized_conversation) == 0:
+        if memory_id is not None and self.collection.get(ids=[memory_id], include=[])['ids']:
             if self.verbose:
-                on_print("Empty conversation. No memory added.", Fore.WHITE + Style.DIM)
-            return False
-        
-        # Create metadata if none is provided
-        if metadata is None:
-            # Format the metadata with a timestamp in a human-readable format (July 1, 2022, 12:00 PM)
-            timestamp = datetime.now().strftime("%A, %B %d, %Y, %I:%M %p")
-            metadata = {'timestamp': timestamp}
-
-        # Generate an embedding for the summarized conversation
-        embedding = self.generate_embedding(summarized_conversation)
-
-        # Store the summarized conversation in the ChromaDB collection
-        self.collection.upsert(
-            documents=[summarized_conversation],
-            metadatas=[metadata],
-            ids=[conversation_id],
-            embeddings=[embedding]
-        )
-        
-        if self.verbose:
-            on_print(f"Memory for conversation {conversation_id} added. Summary: {summarized_conversation}", Fore.WHITE + Style.DIM)
+                on_print(f"Memory for conversation {conversation_id} already stored.", Fore.WHITE + Style.DIM)
+        else:
+            # Preprocess the conversation to summarize the key points
+            summarized_conversation = self.preprocess_conversation(conversation)
 
-        user_id = "anonymous"
-        try:
-            user_id = os.getlogin()
-        except:
-            user_id = os.environ['USER']
+            if len(summarized_conversation) == 0:
+                if self.verbose:
+                    on_print("Empty conversation. No memory added.", Fore.WHITE + Style.DIM)
+                return False
+
+            # Create metadata if none is provided
+            if metadata is None:
+                # Format the metadata with a timestamp in a human-readable format (July 1, 2022, 12:00 PM)
+                timestamp = datetime.now().strftime("%A, %B %d, %Y, %I:%M %p")
+                metadata = {'timestamp': timestamp}
+
+            # Generate an embedding for the summarized conversation
+            embedding = self.generate_embedding(summarized_conversation)
+
+            # Store the summarized conversation in the ChromaDB collection
+            self.collection.upsert(
+                documents=[summarized_conversation],
+                metadatas=[metadata],
+                ids=[conversation_id],
+                embeddings=[embedding]
+            )
 
-        self.long_term_memory_manager.process_conversation(user_id, conversation)
+            if self.verbose:
+                on_print(f"Memory for conversation {conversation_id} added. Summary: {summarized_conversation}", Fore.WHITE + Style.DIM)
+
+        self.long_term_memory_manager.process_conversation(get_current_user_id(), conversation)
 
         if self.verbose:
             on_print(f"Long-term memory updated.", Fore.WHITE + Style.DIM)
 
+        if self.compaction_threshold:
+            count = self.collection.count()
+            if count > self.compaction_threshold and count - self._count_after_compaction >= memory_compaction_interval:
+                self.compact_memory()
+
         return True
 
-    def retrieve_relevant_memory(self, query_text, top_k=3, answer_distance_threshold=200):
+    def compact_memory(self, similarity_threshold=memory_merge_similarity):
+        """
+        Merge near-duplicate memories into consolidated summaries.
+
+        Memories are grouped by the cosine similarity of their embeddings; each group is replaced
+        by a single memory whose summary merges them, with provenance metadata: the ids of the
+        merged memories (merged_from), their number (merged_count) and the time of the oldest
+        and newest (first_timestamp, timestamp).
+
+        :return: The number of (groups merged, memories removed).
+        """
+        records = self.collection.get(include=['documents', 'metadatas', 'embeddings'])
+        ids = records.get('ids') or []
+        documents = records.get('documents') or []
+        metadatas = records.get('metadatas') or [None] * len(ids)
+        embeddings = records.get('embeddings')
+        if len(ids) < 2 or embeddings is None or len(embeddings) != len(ids):
+            self._count_after_compaction = len(ids)
+            return 0, 0
+
+        merged_groups = 0
+        removed = 0
+        for cluster in find_near_duplicate_clusters(embeddings, similarity_threshold):
+            if len(cluster) < 2:
+                continue
+            # Ids sort by time: oldest first, so that the newest memory comes last
+            cluster = sorted(cluster, key=lambda index: ids[index])
+            cluster_ids = [ids[index] for index in cluster]
+            cluster_metadatas = [metadatas[index] or {} for index in cluster]
+            merged_summary = self._merge_summaries([documents[index] for index in cluster])
+            if not merged_summary:
+                continue
+
+            provenance = []
+            origins = []
+            for memory_id, metadata in zip(cluster_ids, cluster_metadatas):
+                merged_from = json.loads(metadata['merged_from']) if metadata.get('merged_from') else [memory_id]
+                provenance.extend(merged_from)
+                origins.append(min(merged_from))
+            # A merged memory is placed at its newest member, so the oldest one is found from the provenance ids
+            oldest_metadata = cluster_metadatas[origins.index(min(origins))]
+            metadata = {
+                'timestamp': cluster_metadatas[-1].get('timestamp') or datetime.now().strftime("%A, %B %d, %Y, %I:%M %p"),
+                'first_timestamp': oldest_metadata.get('first_timestamp') or oldest_metadata.get('timestamp') or "",
+                'merged_from': json.dumps(provenance),
+                'merged_count': len(provenance),
+            }
+
+            # The merged memory keeps the place of the newest one, without stacking suffixes when it was merged before
+            merged_id = f"{re.sub(r'(_merged)+$', '', cluster_ids[-1])}_merged"
+            self.collection.upsert(documents=[merged_summary], metadatas=[metadata], ids=[merged_id], embeddings=[self.generate_embedding(merged_summary)])
+            obsolete_ids = [memory_id for memory_id in cluster_ids if memory_id != merged_id]
+            self.collection.delete(ids=obsolete_ids)
+            merged_groups += 1
+            removed += len(cluster_ids) - 1
+
+            if self.verbose:
+                on_print(f"Merged {len(cluster_ids)} similar memories into {merged_id}: {merged_summary}", Fore.WHITE + Style.DIM)
+
+        self._count_after_compaction = len(ids) - removed
+        return merged_groups, removed
+
+    def _merge_summaries(self, summaries):
+        system_prompt = """
+        You are a memory assistant consolidating notes about past conversations with the same user. The notes below overlap.
+        Merge them into a single summary that keeps every distinct fact, user intent, decision, follow-up task and personal detail, and drops repetitions.
+        If two notes contradict each other, keep the most recent one, which comes last.
+        Important: ensure the summary is generated in the language of the notes. Answer with the merged summary only.
+        """
+        notes = "\n\n".join(f"Note {index + 1}:\n{summary}" for index, summary in enumerate(summaries))
+        try:
+            return (_ask_for_memory(self._ask_fn, system_prompt, notes, self.selected_model, temperature=0.1, no_bot_prompt=True, stream_active=False, num_ctx=self.num_ctx) or "").strip()
+        except Exception as e:
+            on_print(f"Could not merge memories: {e}", Fore.YELLOW + Style.DIM)
+            return ""
+
+    def retrieve_relevant_memory(self, query_text, top_k=3, answer_distance_threshold=200, query_embedding=None):
         """
         Retrieve the most relevant memories based on the given query.
 
         :param query_text: The query or question for which relevant memories should be retrieved.
         :param top_k: Number of relevant memories to retrieve.
+        :param query_embedding: The embedding of the query, if already computed.
         :return: A list of the top-k most relevant memories.
         """
         if self.verbose:
             on_print(f"Retrieving relevant memories for query: {query_text}", Fore.WHITE + Style.DIM)
 
         # Generate an embedding for the query
-        query_embedding = self.generate_embedding(query_text)
+        if query_embedding is None:
+            query_embedding = self.generate_embedding(query_text)
 
         if query_embedding is None:
             return [], []
@@ -197,70 +333,72 @@ class MemoryManager:
 
     def handle_user_query(self, conversation, query=None):
         """
-        Handle a user query by updating the 'system' part of the conversation with relevant memories in XML markup.
-        
-        :param conversation: The current conversation array (list of role/content dictionaries).
-        :return: Updated conversation with a modified system prompt containing memory placeholders in XML format.
+        Handle a user query by injecting the relevant long-term facts about the user and the relevant memories, in XML markup,
+        as a message placed just before the latest user message.
+
+        The system prompt and the earlier messages are left untouched, so that Ollama can reuse the
+        prompt cache of the previous turn; the memory message of the previous turn is replaced.
+
+        :param conversation: The current conversation array (list of role/content dictionaries), updated in place.
         """
         import json as _json
 
+        memory_start_tag = SHORT_TERM_MEMORIES_TAG
+        memory_end_tag = "</short-term-memories>"
+
+        # Remove the memories injected for the previous user query
+        conversation[:] = [entry for entry in conversation if not (entry['role'] == 'system' and str(entry.get('content') or '').startswith((LONG_TERM_MEMORY_TAG, SHORT_TERM_MEMORIES_TAG)))]
+
+        # Conversations saved before memories were injected as a separate message carry them in the system prompt
+        for entry in conversation:
+            if entry['role'] == 'system':
+                for legacy_marker in (memory_start_tag, "\n\nLong-term memory: {'users'"):
+                    if legacy_marker in (entry.get('content') or ''):
+                        entry['content'] = entry['content'].split(legacy_marker)[0].strip()
+            break
+
         # Find the latest user input from the conversation (role 'user')
         user_input = query
-        for entry in reversed(conversation):
-            if entry['role'] == 'user':
-                user_input = entry['content']
+        user_input_index = len(conversation)
+        for index in range(len(conversation) - 1, -1, -1):
+            if conversation[index]['role'] == 'user':
+                user_input = conversation[index]['content']
+                user_input_index = index
                 break
 
         if not user_input or len(user_input.strip()) == 0:
             return
 
-        # Retrieve relevant memories based on the current user query
-        relevant_memories, memory_metadata = self.retrieve_relevant_memory(user_input)
+        # Retrieve relevant memories and long-term facts based on the current user query
+        query_embedding = self.generate_embedding(user_input)
+        relevant_memories, memory_metadata = self.retrieve_relevant_memory(user_input, query_embedding=query_embedding)
+        relevant_facts = self.long_term_memory_manager.retrieve_relevant_facts(get_current_user_id(), user_input, query_embedding=query_embedding)
 
-        # Find the existing 'system' prompt in the conversation
-        system_prompt_entry = None
-        for entry in conversation:
-            if entry['role'] == 'system':
-                system_prompt_entry = entry
-                break
-
-        if system_prompt_entry:
-            # Keep the initial system prompt unchanged and remove the old memory section
-            original_system_prompt = system_prompt_entry['content']
+        sections = []
+        if relevant_facts:
+            sections.append(f"{LONG_TERM_MEMORY_TAG}\nWhat we know about the user:\n{self.long_term_memory_manager.format_facts(relevant_facts)}\n</long-term-memory>")
 
-            # Define the memory section using XML-style tags
-            memory_start_tag = "<short-term-memories>"
-            memory_end_tag = "</short-term-memories>"
-            
-            # Remove any previous memory section if it exists
-            if memory_start_tag in original_system_prompt:
-                original_system_prompt = original_system_prompt.split(memory_start_tag)[0].strip()
+        # Format the memory content in XML markup, including metadata serialization
+        memory_text = ""
+        for i, memory in enumerate(relevant_memories):
+            metadata_str = _json.dumps(memory_metadata[i], indent=2) if i < len(memory_metadata) else "{}"
+            memory_text += f"Memory {i+1}:\n{memory}\nMetadata: {metadata_str}\n\n"
 
-            # Format the new memory content in XML markup, including metadata serialization
-            memory_text = ""
-            for i, memory in enumerate(relevant_memories):
-                metadata_str = _json.dumps(memory_metadata[i], indent=2) if i < len(memory_metadata) else "{}"
-                memory_text += f"Memory {i+1}:\n{memory}\nMetadata: {metadata_str}\n\n"
+        if memory_text:
+            sections.append(f"{memory_start_tag}\nIn the past we talked about...\n{memory_text.strip()}\n{memory_end_tag}")
 
-            if memory_text:
-                memory_section = f"{memory_start_tag}\nIn the past we talked about...\n{memory_text.strip()}\n{memory_end_tag}"
+        if sections:
+            memory_section = "\n\n".join(sections)
+            conversation.insert(user_input_index, {"role": "system", "content": memory_section})
 
-                # Update the system prompt with the new memory section
-                system_prompt_entry['content'] = f"{original_system_prompt}\n\n{memory_section}"
-
-                if self.verbose:
-                    on_print(f"System prompt updated with relevant memories:\n{system_prompt_entry['content']}", Fore.WHITE + Style.DIM)
-            else:
-                if self.verbose:
-                    on_print("No relevant memories found for the user query.", Fore.WHITE + Style.DIM)
-                system_prompt_entry['content'] = original_system_prompt
-        else:
-            # If no system prompt exists, raise an exception (or create one, depending on desired behavior)
-            raise ValueError("No system prompt found in the conversation")
+            if self.verbose:
+                on_print(f"Relevant memories added to the conversation:\n{memory_section}", Fore.WHITE + Style.DIM)
+        elif self.verbose:
+            on_print("No relevant memories found for the user query.", Fore.WHITE + Style.DIM)
 
 
 class LongTermMemoryManager:
-    def __init__(self, selected_model, verbose=False, num_ctx=None, memory_file="long_term_memory.json", ask_fn=None):
+    def __init__(self, selected_model, verbose=False, num_ctx=None, memory_file="long_term_memory.json", ask_fn=None, embedding_model_name=None):
         # Initialize app directories using appdirs
         dirs = AppDirs(APP_NAME, APP_AUTHOR, version=APP_VERSION)
 
@@ -270,39 +408,93 @@ class LongTermMemoryManager:
         # Ensure the directory exists
         os.makedirs(prefs_dir, exist_ok=True)
 
-        # Path to the preferences file
+        # The former JSON memory file is migrated to a SQLite database next to it
         self.memory_file = os.path.join(prefs_dir, memory_file)
-        self.memory = self._load_memory()
+        self.store = LongTermMemoryStore(os.path.splitext(self.memory_file)[0] + ".sqlite")
+        imported = self.store.import_json(self.memory_file)
         self.selected_model = selected_model
         self.verbose = verbose
         self.num_ctx = num_ctx
         self._ask_fn = ask_fn
+        self.embedding_model_name = embedding_model_name
 
-    def _load_memory(self):
-        """Loads the long-term memory from the JSON file."""
-        if os.path.exists(self.memory_file):
-            with open(self.memory_file, 'r') as file:
-                return json.load(file)
-        else:
-            return {"users": {}}
+        if imported and self.verbose:
+            on_print(f"Migrated {imported} long-term memory entries from {self.memory_file}", Fore.WHITE + Style.DIM)
+
+    @property
+    def memory(self):
+        """Snapshot of the memory of every user: {"users": {user_id: {key: value}}}."""
+        return self.store.to_dict()
+
+    def get_user_memory(self, user_id):
+        """Return the long-term memory of a single user."""
+        return self.store.get_user(user_id)
+
+    @staticmethod
+    def _fact_text(key, value):
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(item) for item in value)
+        elif isinstance(value, dict):
+            value = json.dumps(value, ensure_ascii=False)
+        return f"{key}: {value}"
+
+    def format_facts(self, facts):
+        """Format facts as a bullet list."""
+        return "\n".join(f"- {self._fact_text(key, value)}" for key, value in facts.items())
 
-    def _save_memory(self):
-        """Saves the current memory state to the JSON file."""
-        with open(self.memory_file, 'w') as file:
-            json.dump(self.memory, file, indent=4)
+    def retrieve_relevant_facts(self, user_id, query_text, query_embedding=None, top_k=default_long_term_memory_top_k, max_tokens=default_long_term_memory_max_tokens):
+        """
+        Select the facts of a user most relevant to a query.
 
-    def _update_user_memory(self, user_id, new_info):
-        """Updates or adds key-value pairs in the user's long-term memory."""
-        if user_id not in self.memory["users"]:
-            self.memory["users"][user_id] = {}
+        Each fact is embedded once, and its embedding stored with it; the facts are ranked by cosine
+        similarity to the query, or by recency when no embedding model is set, and the selection is
+        capped at top_k facts and max_tokens estimated tokens.
 
-        if isinstance(new_info, dict):
-            # Update the user's memory with new info
-            for key, value in new_info.items():
-                self.memory["users"][user_id][key] = value
+        :param query_embedding: The embedding of the query, if already computed.
+        :return: Dictionary of the selected facts, most relevant first.
+        """
+        entries = self.store.get_user_entries(user_id)
+        if not entries:
+            return {}
+
+        if self.embedding_model_name and query_text:
+            options = {"num_ctx": self.num_ctx} if self.num_ctx else None
+            try:
+                if query_embedding is None:
+                    query_embedding = embed_text(query_text, self.embedding_model_name, options=options)
+                missing = [(key, value) for key, value, embedding, embedding_model in entries if embedding is None or embedding_model != self.embedding_model_name]
+                if missing:
+                    vectors = embed_texts([self._fact_text(key, value) for key, value in missing], self.embedding_model_name, options=options)
+                    computed = {key: np.asarray(vector, dtype=np.float32).tobytes() for (key, _), vector in zip(missing, vectors)}
+                    self.store.set_embeddings(user_id, computed, self.embedding_model_name)
+                    entries = [(key, value, computed.get(key, embedding), self.embedding_model_name if key in computed else embedding_model) for key, value, embedding, embedding_model in entries]
+
+                query_vector = np.asarray(query_embedding, dtype=np.float32)
+                fact_vectors = np.stack([np.frombuffer(embedding, dtype=np.float32) for _, _, embedding, _ in entries])
+                norms = np.linalg.norm(fact_vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+                similarities = fact_vectors @ query_vector / np.where(norms == 0, 1.0, norms)
+                entries = [entries[index] for index in np.argsort(-similarities, kind='stable')]
+            except Exception as e:
+                if self.verbose:
+                    on_print(f"Could not rank long-term memory by relevance: {e}", Fore.YELLOW + Style.DIM)
+
+        # Entries are ordered by relevance, or by most recent update
+        selected = {}
+        used_tokens = 0
+        for key, value, _, _ in entries[:top_k]:
+            tokens = math.ceil(len(self._fact_text(key, value)) / context_chars_per_token)
+            if selected and used_tokens + tokens > max_tokens:
+                break
+            selected[key] = value
+            used_tokens += tokens
+        return selected
 
-            # Save the updated memory back to the JSON file
-            self._save_memory()
+    def _update_user_memory(self, user_id, new_info, conflicting_keys=None):
+        """Removes the conflicting keys, then updates or adds key-value pairs in the user's long-term memory, in one transaction."""
+        if not isinstance(new_info, dict):
+            new_info = None
+        if new_info or conflicting_keys:
+            self.store.apply(user_id, updates=new_info, removed_keys=conflicting_keys)
 
     def process_conversation(self, user_id, conversation):
         """
@@ -319,24 +511,22 @@ class LongTermMemoryManager:
         # Convert conversation array into a string for GPT prompt
         conversation_str = "\n".join([f"{msg['role']}: {msg['content']}" for msg in filtered_conversation if 'role' in msg and 'content' in msg])
 
-        # Step 1: Extract key-value information
+        # Extract key-value information and check for contradictions with the existing memory in parallel,
+        # as the conflict check only depends on the memory stored before this conversation
         system_prompt_extract = self._get_extraction_prompt()
-        extracted_info = extract_json(self._ask_fn(system_prompt_extract, conversation_str, self.selected_model, temperature=0.1, no_bot_prompt=True, stream_active=False, num_ctx=self.num_ctx))
+        existing_memory = self.get_user_memory(user_id)
+        system_prompt_conflict = self._get_conflict_check_prompt(existing_memory, conversation_str)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            extraction = executor.submit(_ask_for_memory, self._ask_fn, system_prompt_extract, conversation_str, self.selected_model, temperature=0.1, no_bot_prompt=True, stream_active=False, num_ctx=self.num_ctx)
+            conflict_check = executor.submit(_ask_for_memory, self._ask_fn, system_prompt_conflict, conversation_str, self.selected_model, temperature=0.1, no_bot_prompt=True, stream_active=False, num_ctx=self.num_ctx)
+            extracted_info = extract_json(extraction.result())
+            conflicting_info = extract_json(conflict_check.result())
 
         if self.verbose:
             on_print(f"Extracted information: {extracted_info}", Fore.WHITE + Style.DIM)
 
-        # Step 2: Check for contradictions with existing memory
-        existing_memory = self.memory["users"].get(user_id, {})
-        system_prompt_conflict = self._get_conflict_check_prompt(existing_memory, conversation_str)
-        conflicting_info = extract_json(self._ask_fn(system_prompt_conflict, conversation_str, self.selected_model, temperature=0.1, no_bot_prompt=True, stream_active=False, num_ctx=self.num_ctx))
-
-        # Remove conflicting info from memory if flagged by GPT
-        if conflicting_info:
-            self._remove_conflicting_info(user_id, conflicting_info)
-
-        # Update user's long-term memory with the newly extracted info
-        self._update_user_memory(user_id, extracted_info)
+        # Remove conflicting info flagged by GPT and store the newly extracted info
+        self._update_user_memory(user_id, extracted_info, self._conflicting_keys(conflicting_info))
 
     def _get_extraction_prompt(self):
         """
@@ -395,11 +585,15 @@ class LongTermMemoryManager:
         ```
         """
 
+    @staticmethod
+    def _conflicting_keys(conflicting_info):
+        """Return the keys listed by the conflict check, which answers with a JSON array (or object) of keys."""
+        if isinstance(conflicting_info, (list, dict)):
+            return [key for key in conflicting_info if isinstance(key, str)]
+        return []
+
     def _remove_conflicting_info(self, user_id, conflicting_keys):
         """Removes conflicting keys from the user's memory."""
-        if isinstance(conflicting_keys, dict):
-            if user_id in self.memory["users"]:
-                for key in conflicting_keys:
-                    if key in self.memory["users"][user_id]:
-                        del self.memory["users"][user_id][key]
-                self._save_memory()
+        keys = self._conflicting_keys(conflicting_keys)
+        if keys:
+            self.store.apply(user_id, removed_keys=keys)
@@ -0,0 +1,144 @@
+"""Transactional SQLite storage of the long-term memory facts of each user."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LongTermMemoryStore:
+    """
+    Long-term memory facts stored as one SQLite row per (user, key), with the embedding of each fact.
+
+    Updates are written in short transactions instead of rewriting a whole file, and facts are
+    looked up per user, so the cost of a change does not grow with the number of users. The
+    database uses write-ahead logging and every write takes the write lock up front
+    (BEGIN IMMEDIATE), so several ollama-chat processes can share it safely.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The SQLite database file (created if needed), or ":memory:".
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS facts ("
+                "user_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (user_id, key))"
+            )
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(facts)")}
+            if "embedding" not in columns:
+                self._connection.execute("ALTER TABLE facts ADD COLUMN embedding BLOB")
+                self._connection.execute("ALTER TABLE facts ADD COLUMN embedding_model TEXT")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def get_user(self, user_id):
+        """Return the facts of a user as a dictionary."""
+        with self._lock:
+            rows = self._connection.execute("SELECT key, value FROM facts WHERE user_id = ? ORDER BY key", (user_id,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def get_user_entries(self, user_id):
+        """Return the facts of a user as (key, value, embedding bytes or None, embedding model) tuples."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, value, embedding, embedding_model FROM facts WHERE user_id = ? ORDER BY updated_at DESC, key", (user_id,)
+            ).fetchall()
+        return [(key, json.loads(value), embedding, embedding_model) for key, value, embedding, embedding_model in rows]
+
+    def set_embeddings(self, user_id, embeddings, embedding_model):
+        """Store the embeddings of facts of a user, given as a dictionary key -> embedding bytes."""
+        with self._transaction() as connection:
+            connection.executemany(
+                "UPDATE facts SET embedding = ?, embedding_model = ? WHERE user_id = ? AND key = ?",
+                [(embedding, embedding_model, user_id, key) for key, embedding in embeddings.items()]
+            )
+
+    def users(self):
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT DISTINCT user_id FROM facts ORDER BY user_id")]
+
+    def to_dict(self):
+        """Return the facts of every user, in the layout of the former JSON file: {"users": {user: {key: value}}}."""
+        with self._lock:
+            rows = self._connection.execute("SELECT user_id, key, value FROM facts ORDER BY user_id, key").fetchall()
+        memory = {"users": {}}
+        for user_id, key, value in rows:
+            memory["users"].setdefault(user_id, {})[key] = json.loads(value)
+        return memory
+
+    def apply(self, user_id, updates=None, removed_keys=None):
+        """
+        Remove and update facts of a user in a single transaction.
+
+        :param updates: Dictionary of facts to add or replace.
+        :param removed_keys: Keys of the facts to delete, applied before the updates.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            if removed_keys:
+                connection.executemany("DELETE FROM facts WHERE user_id = ? AND key = ?", [(user_id, str(key)) for key in removed_keys])
+            if updates:
+                connection.executemany(
+                    "INSERT INTO facts (user_id, key, value, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (user_id, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at, "
+                    "embedding = CASE WHEN value = excluded.value THEN embedding END",
+                    [(user_id, str(key), json.dumps(value), now) for key, value in updates.items()]
+                )
+
+    def import_json(self, json_file):
+        """
+        Migrate the facts of a former long_term_memory.json file, once.
+
+        The import runs in one transaction and is recorded in the database, so that concurrent
+        processes do not import it twice; the file is then renamed with a .migrated suffix.
+
+        :return: The number of imported facts.
+        """
+        if not os.path.exists(json_file):
+            return 0
+        imported = 0
+        with self._transaction() as connection:
+            source = os.path.abspath(json_file)
+            if connection.execute("SELECT 1 FROM meta WHERE key = ?", (f"migrated:{source}",)).fetchone() is None:
+                with open(json_file, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                now = time.time()
+                rows = [
+                    (str(user_id), str(key), json.dumps(value), now)
+                    for user_id, facts in (data.get("users") or {}).items() if isinstance(facts, dict)
+                    for key, value in facts.items()
+                ]
+                connection.executemany("INSERT OR REPLACE INTO facts (user_id, key, value, updated_at) VALUES (?, ?, ?, ?)", rows)
+                connection.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (f"migrated:{source}", str(now)))
+                imported = len(rows)
+        try:
+            os.replace(json_file, json_file + ".migrated")
+        except OSError:
+            pass
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
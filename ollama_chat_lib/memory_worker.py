@@ -0,0 +1,256 @@
+"""Background consolidation of conversations into memory, backed by a persistent job queue."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from appdirs import AppDirs
+from colorama import Fore, Style
+
+from ollama_chat_lib import state
+from ollama_chat_lib.constants import APP_NAME, APP_AUTHOR, APP_VERSION, memory_job_max_attempts, memory_job_lease
+from ollama_chat_lib.io_hooks import on_print
+
+
+def create_memory_job_queue(queue_file="memory_jobs.sqlite"):
+    """
+    Open the memory job queue stored in the user data directory.
+
+    :return: The MemoryJobQueue, or None if it cannot be opened.
+    """
+    dirs = AppDirs(APP_NAME, APP_AUTHOR, version=APP_VERSION)
+    try:
+        return MemoryJobQueue(os.path.join(dirs.user_data_dir, queue_file))
+    except Exception as e:
+        on_print(f"Background memory worker disabled: {e}", Fore.YELLOW)
+        return None
+
+
+class MemoryJobQueue:
+    """
+    Persistent FIFO of conversations waiting to be added to memory.
+
+    Jobs are stored in SQLite, so that conversations queued by /remember or on exit are still
+    processed after a restart. A job is 'pending' until a worker claims it ('running'); it is
+    deleted once processed, and marked 'failed' after too many unsuccessful attempts.
+
+    Several sessions may share the queue file: a claim reserves the job for lease seconds,
+    which its worker renews while processing it. Running jobs whose lease has expired, left
+    by an interrupted session, are claimed again. All methods are thread-safe.
+    """
+
+    def __init__(self, path, lease=memory_job_lease):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS memory_jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, conversation TEXT NOT NULL, created_at REAL NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, error TEXT, "
+                "owner INTEGER, lease_expires_at REAL)"
+            )
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(memory_jobs)")}
+            if "lease_expires_at" not in columns:
+                self._connection.execute("ALTER TABLE memory_jobs ADD COLUMN owner INTEGER")
+                self._connection.execute("ALTER TABLE memory_jobs ADD COLUMN lease_expires_at REAL")
+
+    def put(self, conversation):
+        """Queue a conversation; return the job id."""
+        data = json.dumps(conversation, default=lambda o: vars(o))
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO memory_jobs (conversation, created_at) VALUES (?, ?)", (data, time.time())
+            )
+            return cursor.lastrowid
+
+    def claim(self):
+        """
+        Mark the oldest pending job, or running job whose lease has expired, as running.
+
+        :return: (job id, conversation, memory id), or None. The memory id is the same for every
+            attempt of the job, so that a retried job does not store the conversation twice.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            # Reserve the database for writing first, so that two sessions cannot claim the same job
+            self._connection.execute("BEGIN IMMEDIATE")
+            row = self._connection.execute(
+                "SELECT id, conversation, created_at FROM memory_jobs "
+                "WHERE status = 'pending' OR (status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < ?)) "
+                "ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE memory_jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_expires_at = ? WHERE id = ?",
+                (os.getpid(), now + self.lease, row[0])
+            )
+        job_id, conversation, created_at = row
+        memory_id = f"{time.strftime('%Y%m%d%H%M%S', time.localtime(created_at))}_job{job_id}"
+        return job_id, json.loads(conversation), memory_id
+
+    def renew(self, job_id):
+        """Extend the lease of a running job claimed by this process."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE memory_jobs SET lease_expires_at = ? WHERE id = ? AND status = 'running' AND owner = ?",
+                (time.time() + self.lease, job_id, os.getpid())
+            )
+
+    def complete(self, job_id):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM memory_jobs WHERE id = ?", (job_id,))
+
+    def fail(self, job_id, error, max_attempts=memory_job_max_attempts):
+        """Record the error of a job; it is retried until it has been attempted max_attempts times."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE memory_jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ? WHERE id = ?",
+                (max_attempts, str(error), job_id)
+            )
+
+    def jobs(self):
+        """Return the queued jobs as (id, status, created_at, attempts, error, number of messages) tuples."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, status, created_at, attempts, error, conversation FROM memory_jobs ORDER BY id"
+            ).fetchall()
+        return [(job_id, status, created_at, attempts, error, len(json.loads(conversation))) for job_id, status, created_at, attempts, error, conversation in rows]
+
+    def counts(self):
+        """Return the number of jobs per status."""
+        with self._lock:
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM memory_jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class MemoryWorker:
+    """
+    Daemon thread adding the queued conversations to memory, one at a time.
+
+    The memory manager is looked up for every job, so that the worker follows the manager
+    replaced by /model or /memory; while memory is deactivated, jobs stay queued.
+    """
+
+    def __init__(self, job_queue, get_memory_manager, verbose=False, poll_interval=5):
+        """
+        :param job_queue: The MemoryJobQueue.
+        :param get_memory_manager: Callable returning the current MemoryManager, or None.
+        """
+        self.job_queue = job_queue
+        self.get_memory_manager = get_memory_manager
+        self.verbose = verbose
+        self.poll_interval = poll_interval
+        self.current_job = None
+        self._wake_up = threading.Event()
+        self._stop = threading.Event()
+        self._idle = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="memory-worker", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the worker after its current job; queued jobs are processed at the next start."""
+        self._stop.set()
+        self._wake_up.set()
+
+    def submit(self, conversation):
+        """Queue a conversation for consolidation into memory and return immediately."""
+        job_id = self.job_queue.put(conversation)
+        self._wake_up.set()
+        return job_id
+
+    def wait_until_idle(self, timeout=None):
+        """Wait until no job is pending or running; return True if the queue was drained."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self.current_job is not None or self.job_queue.counts().get('pending', 0):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining if remaining is not None else self.poll_interval)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            memory_manager = self.get_memory_manager()
+            with self._idle:
+                job = self.job_queue.claim() if memory_manager is not None else None
+                if job is None:
+                    self._idle.notify_all()
+                else:
+                    self.current_job = job[0]
+            if job is None:
+                self._wake_up.wait(self.poll_interval)
+                self._wake_up.clear()
+                continue
+
+            job_id, conversation, memory_id = job
+            done = threading.Event()
+            threading.Thread(target=self._keep_lease, args=(job_id, done), name="memory-lease", daemon=True).start()
+            try:
+                if not memory_manager.add_memory(conversation, memory_id=memory_id):
+                    raise RuntimeError("the conversation could not be summarized")
+                self.job_queue.complete(job_id)
+                if self.verbose:
+                    on_print(f"Memory job {job_id} processed.", Fore.WHITE + Style.DIM)
+            except Exception as e:
+                self.job_queue.fail(job_id, e)
+                on_print(f"Memory job {job_id} failed: {e}", Fore.YELLOW + Style.DIM)
+            finally:
+                done.set()
+                with self._idle:
+                    self.current_job = None
+                    self._idle.notify_all()
+
+    def _keep_lease(self, job_id, done):
+        """Renew the lease of a job until it is processed, so that other sessions do not claim it."""
+        while not done.wait(self.job_queue.lease / 3):
+            self.job_queue.renew(job_id)
+
+    def format_status(self):
+        """Return a description of the queued jobs, for /memory_status."""
+        jobs = self.job_queue.jobs()
+        if not jobs:
+            return "No memory jobs pending."
+        lines = []
+        counts = self.job_queue.counts()
+        lines.append(", ".join(f"{count} {status}" for status, count in sorted(counts.items())) + " memory jobs:")
+        for job_id, status, created_at, attempts, error, message_count in jobs:
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
+            line = f"  #{job_id} {status}, {message_count} messages, queued {created}"
+            if attempts:
+                line += f", {attempts} attempts"
+            if error and status != 'running':
+                line += f", last error: {error}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def get_memory_worker():
+    """Return the background memory worker, opening its queue and starting it on first use; None when disabled."""
+    if not state.background_memory:
+        return None
+    if state.memory_worker is None:
+        job_queue = create_memory_job_queue()
+        if job_queue is None:
+            state.background_memory = False
+            return None
+        state.memory_worker = MemoryWorker(job_queue, lambda: state.memory_manager, verbose=state.verbose_mode)
+    state.memory_worker.start()
+    return state.memory_worker
@@ -1,9 +1,18 @@
 """Model selection helpers – choose / validate Ollama or OpenAI models."""
 
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
 import ollama
+from appdirs import AppDirs
 from colorama import Fore, Style
 
 from ollama_chat_lib import state
+from ollama_chat_lib.constants import APP_NAME, APP_AUTHOR, APP_VERSION, default_model_registry_ttl, model_registry_miss_refresh_interval
 from ollama_chat_lib.io_hooks import on_print, on_stdout_write, on_stdout_flush, on_user_input
 from ollama_chat_lib.utils import bytes_to_gibibytes
 
@@ -98,7 +107,193 @@ def prompt_for_ollama_model(default_model, current_model):
     return selected_model
 
 
+class ModelRegistry:
+    """
+    Cached catalog of the models installed on the Ollama server, with their capabilities.
+
+    The catalog (ollama.list()) is loaded once and refreshed when it is older than ttl
+    seconds, or when an unknown model name is looked up (at most once every
+    miss_refresh_interval seconds, so that OpenAI model names do not trigger a request on
+    every call). Failed reloads are throttled the same way. Capabilities and context length come from ollama.show() and are fetched
+    once per model digest. The registry is persisted to a JSON file between runs.
+
+        {
+            "refreshed_at": 1700000000.0,
+            "models": {
+                "llama3.1:latest": {
+                    "size": 4920753328, "digest": "...",
+                    "capabilities": ["completion", "tools"], "context_length": 131072
+                }
+            }
+        }
+    """
+
+    def __init__(self, registry_file=None, ttl=default_model_registry_ttl, miss_refresh_interval=model_registry_miss_refresh_interval):
+        self.registry_file = registry_file
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self._lock = threading.RLock()
+        self._last_refresh_attempt = 0.0
+        self.refreshed_at, self.models = self._load()
+
+    @classmethod
+    def for_host(cls, ttl=default_model_registry_ttl):
+        """Open the registry of the Ollama server given by OLLAMA_HOST, in the user data directory."""
+        dirs = AppDirs(APP_NAME, APP_AUTHOR, version=APP_VERSION)
+        registry_dir = os.path.join(dirs.user_data_dir, "model_registry")
+        os.makedirs(registry_dir, exist_ok=True)
+        host = os.environ.get("OLLAMA_HOST") or "localhost:11434"
+        safe_name = re.sub(r'[^\w\-]', '_', host)
+        return cls(os.path.join(registry_dir, f"{safe_name}.json"), ttl=ttl)
+
+    def _load(self):
+        if self.registry_file and os.path.exists(self.registry_file):
+            try:
+                with open(self.registry_file, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                return data.get("refreshed_at", 0.0), data.get("models", {})
+            except (OSError, ValueError):
+                pass
+        return 0.0, {}
+
+    def save(self):
+        """Write the registry atomically. Failures are ignored: the registry is only a cache."""
+        if not self.registry_file:
+            return
+        with self._lock:
+            data = {"refreshed_at": self.refreshed_at, "models": self.models}
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.registry_file) or ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                    json.dump(data, file)
+                os.replace(temp_path, self.registry_file)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def is_stale(self):
+        return time.time() - self.refreshed_at > self.ttl
+
+    def refresh(self):
+        """
+        Reload the model catalog from the Ollama server. Capabilities are kept for models
+        whose digest did not change.
+
+        :return: True if the catalog could be loaded.
+        """
+        try:
+            models = ollama.list()["models"]
+        except Exception:
+            return False
+
+        with self._lock:
+            catalog = {}
+            for model in models:
+                name = model["model"]
+                previous = self.models.get(name, {})
+                digest = model.get("digest")
+                entry = {"size": model.get("size"), "digest": digest}
+                if previous.get("digest") == digest:
+                    for key in ("capabilities", "context_length", "unsupported"):
+                        if key in previous:
+                            entry[key] = previous[key]
+                catalog[name] = entry
+            self.models = catalog
+            self.refreshed_at = time.time()
+        if state.verbose_mode:
+            on_print(f"Model catalog refreshed: {len(catalog)} models.", Fore.WHITE + Style.DIM)
+        self.save()
+        return True
+
+    def has_model(self, model_name):
+        """Check whether a model is installed on the Ollama server."""
+        if not model_name:
+            return False
+        if self.is_stale() or model_name not in self.models:
+            # Throttled, so that unknown names and an unreachable server do not cost a request per call
+            now = time.time()
+            if now - self._last_refresh_attempt > self.miss_refresh_interval:
+                self._last_refresh_attempt = now
+                self.refresh()
+        return model_name in self.models
+
+    def digest(self, model_name):
+        """Return the digest of an installed model, which changes when the model is pulled again, or None."""
+        if not self.has_model(model_name):
+            return None
+        return self.models[model_name].get("digest")
+
+    def _details(self, model_name):
+        """Return the registry entry of a model, fetching its capabilities with ollama.show() if needed."""
+        if not self.has_model(model_name):
+            return None
+        entry = self.models[model_name]
+        if "capabilities" in entry:
+            return entry
+
+        try:
+            details = ollama.show(model_name)
+        except Exception:
+            return entry
+
+        capabilities = details.get("capabilities")
+        model_info = details.get("modelinfo") or details.get("model_info") or {}
+        context_length = next((value for key, value in model_info.items() if key.endswith(".context_length")), None)
+        with self._lock:
+            entry["capabilities"] = list(capabilities) if capabilities is not None else None
+            entry["context_length"] = context_length
+        self.save()
+        return entry
+
+    def supports(self, model_name, capability):
+        """
+        Check whether a model has a capability ("tools", "thinking", "vision", "embedding"...).
+
+        :return: True or False, or None if unknown (not an Ollama model, or capabilities not reported).
+        """
+        entry = self._details(model_name)
+        if entry is None:
+            return None
+        if entry.get("capabilities") is None:
+            return False if capability in entry.get("unsupported", ()) else None
+        return capability in entry["capabilities"]
+
+    def set_capability(self, model_name, capability, supported):
+        """
+        Record a capability learnt from a server response (e.g. a "does not support tools" error).
+
+        When the capabilities of the model are not known, a missing capability is recorded apart,
+        so that they are still fetched and the other capabilities stay unknown.
+        """
+        with self._lock:
+            entry = self.models.get(model_name)
+            if entry is None:
+                return
+            if isinstance(entry.get("capabilities"), list):
+                capabilities = set(entry["capabilities"])
+                if supported:
+                    capabilities.add(capability)
+                else:
+                    capabilities.discard(capability)
+                entry["capabilities"] = sorted(capabilities)
+            else:
+                unsupported = set(entry.get("unsupported", ()))
+                if supported:
+                    unsupported.discard(capability)
+                else:
+                    unsupported.add(capability)
+                entry["unsupported"] = sorted(unsupported)
+        self.save()
+
+    def context_length(self, model_name):
+        """Return the maximum context length of a model, or None if unknown."""
+        entry = self._details(model_name)
+        return entry.get("context_length") if entry else None
+
+
 def is_model_an_ollama_model(model_name):
+    if state.model_registry is not None:
+        return state.model_registry.has_model(model_name)
     try:
         models = ollama.list()["models"]
     except Exception:
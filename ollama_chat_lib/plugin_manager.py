@@ -6,7 +6,7 @@ import os
 from colorama import Fore, Style
 
 from ollama_chat_lib import state
-from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib.io_hooks import on_print, register_plugin_hooks
 
 
 def discover_plugins(plugin_folder=None, load_plugins=True, web_crawler_cls=None):
@@ -61,4 +61,7 @@ def discover_plugins(plugin_folder=None, load_plugins=True, web_crawler_cls=None
                         state.custom_tools.append(obj().get_tool_definition())
                         if state.verbose_mode:
                             on_print(f"Discovered tool: {name}", Fore.WHITE + Style.DIM)
+
+    # Resolve the hooks implemented by each plugin once, rather than on every call
+    register_plugin_hooks(state.plugins)
     return state.plugins
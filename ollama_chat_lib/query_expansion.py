@@ -0,0 +1,87 @@
+"""Query expansion for vector database retrieval, memoized in an optional disk cache."""
+
+import hashlib
+import json
+import os
+
+from appdirs import AppDirs
+from colorama import Fore
+
+from ollama_chat_lib import state
+from ollama_chat_lib.cache import DiskCache
+from ollama_chat_lib.constants import APP_NAME, APP_AUTHOR, APP_VERSION
+from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib.telemetry import telemetry_purpose
+
+EXPANSION_SYSTEM_PROMPT = "You are an assistant that helps expand and clarify user questions to improve information retrieval. When a user provides a question, your task is to write a short passage that elaborates on the query by adding relevant background information, inferred details, and related concepts that can help with retrieval. The passage should remain concise and focused, without changing the original meaning of the question.\r\nGuidelines:\r\n1. Expand the question briefly by including additional context or background, staying relevant to the user's original intent.\r\n2. Incorporate inferred details or related concepts that help clarify or broaden the query in a way that aids retrieval.\r\n3. Keep the passage short, usually no more than 2-3 sentences, while maintaining clarity and depth.\r\n4. Avoid introducing unrelated or overly specific topics. Keep the expansion concise and to the point."
+
+
+def create_query_expansion_cache(max_entries, ttl_hours, cache_file="query_expansions.sqlite"):
+    """
+    Open the query expansion cache stored in the user cache directory.
+
+    :return: The DiskCache, or None if it cannot be opened.
+    """
+    dirs = AppDirs(APP_NAME, APP_AUTHOR, version=APP_VERSION)
+    try:
+        return DiskCache(
+            os.path.join(dirs.user_cache_dir, cache_file),
+            max_entries=max_entries or None,
+            ttl=ttl_hours * 3600 if ttl_hours else None
+        )
+    except Exception as e:
+        on_print(f"Query expansion cache disabled: {e}", Fore.YELLOW)
+        return None
+
+
+def get_expansion_model():
+    """Return the model used to expand queries: the thinking model if one is set, the current model otherwise."""
+    if state.thinking_model is not None and state.thinking_model != state.current_model:
+        return state.thinking_model
+    return state.current_model
+
+
+def make_expansion_key(question, question_context, model):
+    """Cache key of an expansion; the question is compared case- and whitespace-insensitively."""
+    normalized_question = " ".join(question.lower().split())
+    normalized_context = " ".join((question_context or "").split())
+    return hashlib.sha256(json.dumps([normalized_question, normalized_context, model]).encode('utf-8')).hexdigest()
+
+
+def get_cached_expansion(question, question_context=None):
+    """Return the cached expansion of a question, or None."""
+    cache = state.query_expansion_cache
+    if cache is None:
+        return None
+    value = cache.get(make_expansion_key(question, question_context, get_expansion_model()))
+    return value.decode('utf-8') if value is not None else None
+
+
+def expand_query(question, question_context=None, ask_fn=None):
+    """
+    Write a short passage elaborating on a question, to improve retrieval.
+
+    :param question: The user question.
+    :param question_context: Optional additional context about the question.
+    :param ask_fn: Callable with the same signature as ``ask_ollama``.
+    :return: The expansion passage, or None.
+    """
+    cached_expansion = get_cached_expansion(question, question_context)
+    if cached_expansion is not None:
+        return cached_expansion
+
+    system_prompt = EXPANSION_SYSTEM_PROMPT
+    if question_context:
+        system_prompt += f"\n\nAdditional context about the user query:\n{question_context}"
+
+    model = get_expansion_model()
+    with telemetry_purpose("expansion"):
+        if model != state.current_model and "deepseek-r1" in model:
+            prompt = f"""{system_prompt}\n{question}"""
+            expanded_query = ask_fn("", prompt, selected_model=model, no_bot_prompt=True, stream_active=False)
+        else:
+            expanded_query = ask_fn(system_prompt, question, selected_model=model, no_bot_prompt=True, stream_active=False)
+
+    if expanded_query and state.query_expansion_cache is not None:
+        state.query_expansion_cache.set(make_expansion_key(question, question_context, model), expanded_query.encode('utf-8'))
+    return expanded_query
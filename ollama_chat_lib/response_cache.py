@@ -0,0 +1,98 @@
+"""Content-addressed cache of non-streamed LLM responses, with record and replay modes."""
+
+import hashlib
+import json
+import os
+
+from appdirs import AppDirs
+from colorama import Fore
+
+from ollama_chat_lib.cache import DiskCache
+from ollama_chat_lib.constants import APP_NAME, APP_AUTHOR, APP_VERSION, response_cache_max_temperature
+from ollama_chat_lib.io_hooks import on_print
+
+RESPONSE_CACHE_MODES = ("off", "on", "record", "replay")
+
+
+def _jsonable(value):
+    """Serialize the Ollama message and tool call objects found in conversations and responses."""
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(exclude_none=True)
+    return str(value)
+
+
+class ResponseCache(DiskCache):
+    """
+    Cache of the messages returned by non-streamed Ollama chat requests. Keys are derived from
+    (model, messages, options, tools, think), so that any change to the request is a miss. The
+    model digest is part of the key when known, so that a model updated by ollama pull does not
+    keep answering with the responses of its previous version.
+
+    Modes:
+    - "on": reuse cached responses and store new ones, for requests at a temperature of at
+      most response_cache_max_temperature.
+    - "record": always query the model and store every response.
+    - "replay": answer only from the cache, so that a recorded run (document indexing,
+      benchmarks) can be replayed without an LLM.
+    """
+
+    def __init__(self, path, mode="on", max_bytes=None, max_entries=None):
+        if mode not in RESPONSE_CACHE_MODES[1:]:
+            raise ValueError(f"Unsupported response cache mode: {mode}")
+        super().__init__(path, max_bytes=max_bytes, max_entries=max_entries)
+        self.mode = mode
+
+    @staticmethod
+    def make_key(model, messages, options=None, tools=None, think=False, model_digest=None):
+        if model_digest:
+            model = f"{model}@{model_digest}"
+        request = json.dumps([model, messages, options or {}, tools or [], bool(think)], sort_keys=True, default=_jsonable)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def accepts(self, options):
+        """Return True if requests made with these options go through the cache."""
+        if self.mode != "on":
+            return True
+        temperature = (options or {}).get("temperature")
+        return temperature is None or temperature <= response_cache_max_temperature
+
+    def get_response(self, key):
+        """Return the cached message of a request, or None. Nothing is read in record mode."""
+        if self.mode == "record":
+            return None
+        value = self.get(key)
+        return json.loads(value.decode('utf-8')) if value is not None else None
+
+    def set_response(self, key, message):
+        """Store the message of a response. Nothing is written in replay mode."""
+        if self.mode == "replay":
+            return
+        self.set(key, json.dumps(message, default=_jsonable).encode('utf-8'))
+
+    def format_stats(self):
+        stats = self.stats()
+        lookups = stats['hits'] + stats['misses']
+        return (f"Response cache ({self.mode}): {stats['hits']}/{lookups} hits ({stats['hit_rate']:.0%}), "
+                f"{stats['entries']} entries, {stats['bytes'] / (1024 * 1024):.1f} MB")
+
+
+def create_response_cache(mode, max_megabytes, path=None, cache_file="responses.sqlite"):
+    """
+    Open the response cache, stored in the user cache directory unless a path is given.
+
+    :return: The ResponseCache, or None if the mode is "off" or the cache cannot be opened.
+    """
+    if mode == "off":
+        return None
+    if path is None:
+        dirs = AppDirs(APP_NAME, APP_AUTHOR, version=APP_VERSION)
+        path = os.path.join(dirs.user_cache_dir, cache_file)
+    try:
+        return ResponseCache(
+            path,
+            mode=mode,
+            max_bytes=int(max_megabytes * 1024 * 1024) if max_megabytes else None
+        )
+    except Exception as e:
+        on_print(f"Response cache disabled: {e}", Fore.YELLOW)
+        return None
@@ -15,13 +15,16 @@ import readline
 import tempfile
 import platform
 import argparse
+import copy
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from colorama import Fore, Style
 
 from ollama_chat_lib import state
+from ollama_chat_lib.constants import default_embed_batch_size, default_upsert_batch_size, default_inference_workers, default_embedding_cache_size_mb, default_response_cache_size_mb, default_model_registry_ttl, default_query_expansion_cache_entries, default_query_expansion_cache_ttl_hours, default_web_crawler_workers, default_web_crawler_timeout, default_web_crawler_deadline, default_web_cache_max_chunks, default_web_cache_max_size_mb, default_web_cache_ttl_hours, default_web_cache_eviction, default_max_tool_workers, default_tool_timeout, default_tool_cache_entries, default_context_budget_ratio, default_memory_compaction_threshold
 from ollama_chat_lib.io_hooks import (
     completer, on_user_input, on_print, on_stdout_write,
-    on_prompt, on_stdout_flush,
+    on_prompt, on_stdout_flush, capture_output, replay_output, plugin_hooks,
 )
 from ollama_chat_lib.conversation import (
     colorize, print_possible_prompt_commands,
@@ -29,8 +32,14 @@ from ollama_chat_lib.conversation import (
     save_conversation_to_file,
     DEFAULT_CHATBOTS,
 )
+from ollama_chat_lib.tool_cache import ToolResultCache
+from ollama_chat_lib.telemetry import TelemetryCollector
+from ollama_chat_lib.warmup import ModelWarmup, parse_keep_alive
+from ollama_chat_lib.llm_core import response_rendered_live
+from ollama_chat_lib.context_window import ContextWindowManager, PromptCacheStats
+from ollama_chat_lib.memory_worker import get_memory_worker
 from ollama_chat_lib.model_selection import (
-    select_ollama_model_if_available, select_openai_model_if_available,
+    select_ollama_model_if_available, select_openai_model_if_available, ModelRegistry,
     prompt_for_model,
 )
 from ollama_chat_lib.vector_db import (
@@ -38,6 +47,9 @@ from ollama_chat_lib.vector_db import (
     prompt_for_vector_database_collection, delete_collection,
     edit_collection_metadata,
 )
+from ollama_chat_lib.embeddings import create_embedding_cache
+from ollama_chat_lib.query_expansion import create_query_expansion_cache
+from ollama_chat_lib.response_cache import RESPONSE_CACHE_MODES, create_response_cache
 from ollama_chat_lib.tools import generate_chain_of_thoughts_system_prompt
 from ollama_chat_lib.utils import get_personal_info
 
@@ -67,16 +79,24 @@ def parse_args():
     parser.add_argument('--additional-chatbots', type=str, help='Path to a JSON file containing additional chatbots', default=None)
     parser.add_argument('--chatbot', type=str, help='Preferred chatbot personality', default=None)
     parser.add_argument('--verbose', type=bool, help='Enable verbose mode', default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--metrics-file', type=str, help='Append the timings and token counts of every LLM call and vector database query to this JSONL file', default=None)
     parser.add_argument('--embeddings-model', type=str, help='Sentence embeddings model to use for vector database queries', default=None)
     parser.add_argument('--system-prompt', type=str, help='System prompt message', default=None)
     parser.add_argument('--system-prompt-placeholders-json', type=str, help='A JSON file containing a dictionary of key-value pairs to fill system prompt placeholders', default=None)
     parser.add_argument('--prompt', type=str, help='User prompt message', default=None)
     parser.add_argument('--model', type=str, help='Preferred Ollama model', default=None)
+    parser.add_argument('--model-registry', type=bool, help='Cache the list of installed Ollama models and their capabilities instead of querying the server on every request', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--parallel-alternate-model', type=bool, help='Generate the responses of the current model and of the alternate model (/model2) concurrently; disable it if the server cannot serve both models at once', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--keep-alive', type=str, help='How long Ollama keeps the models loaded after each request: a duration such as 30m, a number of seconds, or -1 to keep them loaded (default: server setting)', default=None)
+    parser.add_argument('--warmup', type=bool, help='Preload the chat, embeddings and thinking models in the background during startup', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--model-registry-ttl', type=int, help='Seconds after which the cached list of installed Ollama models is reloaded', default=default_model_registry_ttl)
     parser.add_argument('--thinking-model', type=str, help='Alternate model to use for more thoughtful responses, like OpenAI o1 or o3 models', default=None)
     parser.add_argument('--thinking-model-reasoning-pattern', type=str, help='Reasoning pattern used by the thinking model', default=None)
     parser.add_argument('--conversations-folder', type=str, help='Folder to save conversations to', default=None)
     parser.add_argument('--auto-save', type=bool, help='Automatically save conversations to a file at the end of the chat', default=False, action=argparse.BooleanOptionalAction)
     parser.add_argument('--syntax-highlighting', type=bool, help='Use syntax highlighting', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--live-highlighting', type=bool, help='Highlight streamed responses line by line as they arrive, instead of once they are complete', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--token-batch-ms', type=int, help='Coalesce streamed tokens during this many milliseconds before writing them and passing them to plugins (0 to disable)', default=state.token_batch_ms)
     parser.add_argument('--index-documents', type=str, help='Root folder to index text files', default=None)
     parser.add_argument('--chunk-documents', type=bool, help='Enable chunking for large documents during indexing', default=True, action=argparse.BooleanOptionalAction)
     parser.add_argument('--skip-existing', type=bool, help='Skip indexing of documents that already exist in the collection', default=True, action=argparse.BooleanOptionalAction)
@@ -85,9 +105,26 @@ def parse_args():
     parser.add_argument('--split-paragraphs', type=bool, help='Split markdown content into paragraphs during indexing', default=False, action=argparse.BooleanOptionalAction)
     parser.add_argument('--add-summary', type=bool, help='Generate and prepend summaries to document chunks during indexing', default=True, action=argparse.BooleanOptionalAction)
     parser.add_argument('--store-full-docs', type=bool, help='Store full original documents for each chunk during indexing (embeddings still computed from chunks)', default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--embed-batch-size', type=int, help='Number of chunks sent to the embeddings model per request during indexing', default=default_embed_batch_size)
+    parser.add_argument('--upsert-batch-size', type=int, help='Number of chunks written to ChromaDB per upsert during indexing', default=default_upsert_batch_size)
+    parser.add_argument('--embedding-cache', type=bool, help='Cache computed embeddings on disk and reuse them for identical texts', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--embedding-cache-size', type=int, help='Maximum size of the embedding cache in megabytes (least recently used entries are evicted)', default=default_embedding_cache_size_mb)
+    parser.add_argument('--embedding-cache-dtype', type=str, choices=['float32', 'float16'], help='Storage precision of cached embeddings (float16 halves the cache size)', default='float32')
+    parser.add_argument('--response-cache', type=str, choices=RESPONSE_CACHE_MODES, help='Cache the responses of non-streamed LLM calls (summaries, query expansions, memory, tool fallback) on disk: on reuses responses of low-temperature calls, record stores every response, replay answers only from the cache', default='on')
+    parser.add_argument('--response-cache-size', type=int, help='Maximum size of the response cache in megabytes (least recently used entries are evicted)', default=default_response_cache_size_mb)
+    parser.add_argument('--response-cache-file', type=str, help='SQLite file of the response cache, e.g. to keep the recording of a benchmark (default: in the user cache directory)', default=None)
+    parser.add_argument('--manifest', type=bool, help='Track indexed files in a manifest to skip unchanged files, re-embed only changed chunks and delete stale chunks', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--pipeline', type=bool, help='Run text extraction, summaries and embeddings concurrently during indexing', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--extraction-workers', type=int, help='Number of processes extracting text from documents during pipelined indexing (default: CPU count)', default=None)
+    parser.add_argument('--inference-workers', type=int, help='Number of concurrent summary/embedding requests during pipelined indexing (match OLLAMA_NUM_PARALLEL)', default=default_inference_workers)
     parser.add_argument('--query', type=str, help='Query the vector database and exit (non-interactive mode)', default=None)
     parser.add_argument('--query-n-results', type=int, help='Number of results to return from vector database query', default=None)
     parser.add_argument('--query-distance-threshold', type=float, help='Distance threshold for filtering query results', default=0.0)
+    parser.add_argument('--query-expansion-cache', type=bool, help='Cache query expansion passages on disk and reuse them for the same question', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--query-expansion-cache-ttl', type=float, help='Hours after which a cached query expansion expires', default=default_query_expansion_cache_ttl_hours)
+    parser.add_argument('--parallel-query-expansion', type=bool, help='Search with the raw question while the query expansion is generated, then merge both result sets', default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--query-expansion-timeout', type=float, help='With --parallel-query-expansion, maximum seconds to wait for the expansion before answering from the raw question results', default=None)
+    parser.add_argument('--lexical-index', type=bool, help='Maintain a BM25 index of each collection and fuse its results with vector search (hybrid retrieval)', default=True, action=argparse.BooleanOptionalAction)
     parser.add_argument('--expand-query', type=bool, help='Expand query for better retrieval', default=True, action=argparse.BooleanOptionalAction)
     parser.add_argument('--interactive', type=bool, help='Use interactive mode', default=True, action=argparse.BooleanOptionalAction)
     parser.add_argument('--plugins-folder', type=str, default=None, help='Path to the plugins folder')
@@ -99,8 +136,12 @@ def parse_args():
     parser.add_argument('--anonymous', type=bool, help='Do not use the user name from the environment variables', default=False, action=argparse.BooleanOptionalAction)
     parser.add_argument('--memory', type=str, help='Use memory manager for context management', default=False, action=argparse.BooleanOptionalAction)
     parser.add_argument('--context-window', type=int, help='Ollama context window size, if not specified, the default value is used, which is 2048 tokens', default=None) 
+    parser.add_argument('--context-budget', type=float, help=f'Fraction of the context window the conversation may use before its oldest turns are summarized or dropped, 0 to send the whole conversation (default: {default_context_budget_ratio})', default=default_context_budget_ratio)
+    parser.add_argument('--context-summaries', type=bool, help='Summarize the oldest turns of the conversation when they no longer fit in the context window, instead of dropping them', default=True, action=argparse.BooleanOptionalAction)
     parser.add_argument('--auto-start', type=bool, help="Start the conversation automatically", default=False, action=argparse.BooleanOptionalAction)
     parser.add_argument('--tools', type=str, help="List of tools to activate and use in the conversation, separated by commas", default=None)
+    parser.add_argument('--background-memory', type=bool, help='Add conversations to memory (/remember, exit) in a background worker with a persistent job queue, instead of waiting for it', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--memory-compaction-threshold', type=int, help=f'Number of memories above which similar memories are merged automatically, 0 to only merge them with /compact_memory (default: {default_memory_compaction_threshold})', default=default_memory_compaction_threshold)
     parser.add_argument('--memory-collection-name', type=str, help="Name of the memory collection to use for context management", default=state.memory_collection_name)
     parser.add_argument('--long-term-memory-file', type=str, help="Long-term memory file name", default=state.long_term_memory_file)
     parser.add_argument('--disable-plugins', type=bool, help='Disable external plugins to speed up execution (plugins will still be loaded if required by requested tools)', default=False, action=argparse.BooleanOptionalAction)
@@ -114,10 +155,22 @@ def parse_args():
     parser.add_argument('--agent-description', type=str, help='Description of the agent', default=None)
 
     # Web search arguments
+    parser.add_argument('--parallel-tool-calls', type=bool, help='Run the independent tool calls of one model response concurrently', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--max-tool-workers', type=int, help=f'Maximum number of tool calls running at the same time (default: {default_max_tool_workers})', default=default_max_tool_workers)
+    parser.add_argument('--tool-cache', type=bool, help='Reuse the results of identical calls to idempotent tools (web_search, query_vector_database, read_file, summarize_text_file) during the session', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--tool-timeout', type=float, help=f'Seconds to wait for a tool call running concurrently with others, 0 to wait indefinitely (default: {default_tool_timeout})', default=default_tool_timeout)
     parser.add_argument('--web-search', type=str, help='Perform a web search with the given query and answer using search results', default=None)
     parser.add_argument('--web-search-results', type=int, help='Number of web search results to fetch (default: 5)', default=5)
     parser.add_argument('--web-search-region', type=str, help='Region for web search (default: wt-wt for worldwide)', default='wt-wt')
     parser.add_argument('--web-search-show-intermediate', type=bool, help='Show intermediate results during web search (URLs, crawled content, etc.)', default=False, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--web-search-summaries', type=bool, help='Generate a summary of each crawled page and prepend it to its chunks before indexing', default=True, action=argparse.BooleanOptionalAction)
+    parser.add_argument('--web-cache-max-chunks', type=int, help=f'Maximum number of chunks kept in the web search cache, 0 for no limit (default: {default_web_cache_max_chunks})', default=default_web_cache_max_chunks)
+    parser.add_argument('--web-cache-max-size', type=float, help=f'Maximum size of the text kept in the web search cache in megabytes, 0 for no limit (default: {default_web_cache_max_size_mb})', default=default_web_cache_max_size_mb)
+    parser.add_argument('--web-cache-ttl', type=float, help=f'Hours after which cached web pages expire, 0 to never expire (default: {default_web_cache_ttl_hours})', default=default_web_cache_ttl_hours)
+    parser.add_argument('--web-cache-eviction', type=str, choices=['lru', 'lfu'], help='Which chunks to evict when the web search cache is full: least recently used (lru) or least frequently used (lfu)', default=default_web_cache_eviction)
+    parser.add_argument('--web-crawler-workers', type=int, help=f'Number of web pages fetched concurrently (default: {default_web_crawler_workers})', default=default_web_crawler_workers)
+    parser.add_argument('--web-crawler-timeout', type=float, help=f'Seconds allowed for each web page request (default: {default_web_crawler_timeout})', default=default_web_crawler_timeout)
+    parser.add_argument('--web-crawler-deadline', type=float, help=f'Seconds after which a web crawl keeps the pages fetched so far and skips the slower ones (default: {default_web_crawler_deadline})', default=default_web_crawler_deadline)
 
     args = parser.parse_args()
     return args
@@ -280,6 +333,8 @@ def initialize(args, mod):
     conversations_folder = args.conversations_folder
     auto_save = args.auto_save
     state.syntax_highlighting = args.syntax_highlighting
+    state.live_highlighting = args.live_highlighting
+    state.token_batch_ms = args.token_batch_ms
     state.interactive_mode = args.interactive
     state.embeddings_model = args.embeddings_model
     state.plugins_folder = args.plugins_folder
@@ -295,6 +350,47 @@ def initialize(args, mod):
     auto_start_conversation = args.auto_start
     state.memory_collection_name = args.memory_collection_name
     state.long_term_memory_file = args.long_term_memory_file
+    state.background_memory = args.background_memory
+    state.memory_compaction_threshold = args.memory_compaction_threshold
+
+    if args.embedding_cache:
+        state.embedding_cache = create_embedding_cache(args.embedding_cache_size, args.embedding_cache_dtype)
+    state.response_cache = create_response_cache(args.response_cache, args.response_cache_size, args.response_cache_file)
+
+    state.parallel_alternate_model = args.parallel_alternate_model
+    state.parallel_tool_calls = args.parallel_tool_calls
+    state.max_tool_workers = args.max_tool_workers
+    state.tool_timeout = args.tool_timeout
+    state.tool_result_cache = ToolResultCache(default_tool_cache_entries) if args.tool_cache else None
+    state.telemetry = TelemetryCollector(args.metrics_file)
+    state.web_search_summaries = args.web_search_summaries
+    state.web_cache_max_chunks = args.web_cache_max_chunks
+    state.web_cache_max_size_mb = args.web_cache_max_size
+    state.web_cache_ttl_hours = args.web_cache_ttl
+    state.web_cache_eviction = args.web_cache_eviction
+    state.web_crawler_workers = args.web_crawler_workers
+    state.web_crawler_timeout = args.web_crawler_timeout
+    state.web_crawler_deadline = args.web_crawler_deadline
+    state.use_lexical_index = args.lexical_index
+    state.parallel_query_expansion = args.parallel_query_expansion
+    state.query_expansion_timeout = args.query_expansion_timeout
+    if args.query_expansion_cache:
+        state.query_expansion_cache = create_query_expansion_cache(default_query_expansion_cache_entries, args.query_expansion_cache_ttl)
+
+    if args.model_registry:
+        try:
+            state.model_registry = ModelRegistry.for_host(ttl=args.model_registry_ttl)
+        except OSError as e:
+            on_print(f"Model registry disabled: {e}", Fore.YELLOW)
+
+    state.keep_alive = parse_keep_alive(args.keep_alive)
+    if args.warmup:
+        # The embeddings and thinking models load while plugins, ChromaDB and the chatbot are set up;
+        # the chat model is added once it is selected
+        state.model_warmup = ModelWarmup(state.keep_alive)
+        state.model_warmup.start(state.embeddings_model, "embeddings", embedding=True)
+        if not state.use_openai and not state.use_azure_openai and args.thinking_model:
+            state.model_warmup.start(state.thinking_model, "thinking")
 
     if state.verbose_mode and num_ctx:
         on_print(f"Ollama context window size: {num_ctx}", Fore.WHITE + Style.DIM)
@@ -382,6 +478,10 @@ def initialize(args, mod):
             on_print(f"Split paragraphs: {args.split_paragraphs}", Fore.WHITE + Style.DIM)
             on_print(f"Add summary: {args.add_summary}", Fore.WHITE + Style.DIM)
             on_print(f"Store full docs: {args.store_full_docs}", Fore.WHITE + Style.DIM)
+            on_print(f"Embed batch size: {args.embed_batch_size}", Fore.WHITE + Style.DIM)
+            on_print(f"Upsert batch size: {args.upsert_batch_size}", Fore.WHITE + Style.DIM)
+            on_print(f"Manifest: {args.manifest}", Fore.WHITE + Style.DIM)
+            on_print(f"Pipeline: {args.pipeline}", Fore.WHITE + Style.DIM)
 
         document_indexer = mod.DocumentIndexer(
             args.index_documents, 
@@ -401,11 +501,23 @@ def initialize(args, mod):
             extract_start=args.extract_start,
             extract_end=args.extract_end,
             add_summary=args.add_summary,
-            store_full_docs=args.store_full_docs
+            store_full_docs=args.store_full_docs,
+            embed_batch_size=args.embed_batch_size,
+            upsert_batch_size=args.upsert_batch_size,
+            pipeline=args.pipeline,
+            extraction_workers=args.extraction_workers,
+            inference_workers=args.inference_workers,
+            use_manifest=args.manifest
         )
 
         on_print(f"Indexing completed for folder: {args.index_documents}", Fore.GREEN)
 
+        if state.verbose_mode and state.embedding_cache is not None:
+            cache_stats = state.embedding_cache.stats()
+            on_print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['entries']} entries, {cache_stats['bytes'] / (1024 * 1024):.1f} MB", Fore.WHITE + Style.DIM)
+        if state.verbose_mode and state.response_cache is not None:
+            on_print(state.response_cache.format_stats(), Fore.WHITE + Style.DIM)
+
         # If only indexing (no query or interactive mode), exit
         if not args.query and not state.interactive_mode:
             sys.exit(0)
@@ -693,6 +805,8 @@ def initialize(args, mod):
         conversation = []
 
     state.current_model = selected_model
+    if state.model_warmup is not None and not state.use_openai and not state.use_azure_openai:
+        state.model_warmup.start(state.current_model, "chat")
 
     answer_and_exit = False
     if not state.interactive_mode and state.user_prompt:
@@ -702,16 +816,19 @@ def initialize(args, mod):
         load_chroma_client()
 
         if state.chroma_client:
-            state.memory_manager = mod.MemoryManager(state.memory_collection_name, state.chroma_client, state.current_model, state.embeddings_model, state.verbose_mode, num_ctx=num_ctx, long_term_memory_file=state.long_term_memory_file)
+            state.memory_manager = mod.MemoryManager(state.memory_collection_name, state.chroma_client, state.current_model, state.embeddings_model, state.verbose_mode, num_ctx=num_ctx, long_term_memory_file=state.long_term_memory_file, compaction_threshold=state.memory_compaction_threshold)
 
-            if state.initial_message:
-                # Add long-term memory to the system prompt
-                long_term_memory = state.memory_manager.long_term_memory_manager.memory
-
-                state.initial_message["content"] += f"\n\nLong-term memory: {long_term_memory}"
+            # Process the memory jobs left by a previous session
+            get_memory_worker()
         else:
             use_memory_manager = False
 
+    if args.context_budget and args.context_budget > 0:
+        state.context_window_manager = ContextWindowManager(args.context_budget, summarize=args.context_summaries, model=state.current_model, ask_fn=mod.ask_ollama, verbose=state.verbose_mode)
+    else:
+        state.context_window_manager = None
+    state.prompt_cache_stats = PromptCacheStats(state.context_window_manager)
+
     if state.initial_message and state.verbose_mode:
         on_print("System prompt: " + state.initial_message["content"], Fore.WHITE + Style.DIM)
 
@@ -872,6 +989,10 @@ def initialize(args, mod):
         if not state.interactive_mode:
             sys.exit(0)
 
+    if state.model_warmup is not None and (state.interactive_mode or state.verbose_mode):
+        report = state.model_warmup.format_report()
+        if report:
+            on_print(report, Fore.WHITE + Style.DIM)
 
     return {
         "selected_model": selected_model,
@@ -894,6 +1015,91 @@ def initialize(args, mod):
     }
 
 
+def save_conversation_to_memory(conversation, wait=False):
+    """
+    Add the conversation to memory, in the background memory worker when it is enabled.
+
+    :param wait: Wait for the queued memory jobs to be processed (on exit); Ctrl+C leaves them
+                 queued for the next session.
+    """
+    memory_worker = get_memory_worker()
+    if memory_worker is None:
+        on_print("Saving conversation to memory...", Fore.WHITE + Style.DIM)
+        if state.memory_manager.add_memory(conversation):
+            on_print("Conversation saved to memory.", Fore.WHITE + Style.DIM)
+            on_print("", Style.RESET_ALL)
+        return
+
+    job_id = memory_worker.submit(conversation)
+    if not wait:
+        on_print(f"Conversation queued for memory (job {job_id}), see /memory_status.", Fore.WHITE + Style.DIM)
+        return
+
+    on_print("Saving conversation to memory (press Ctrl+C to finish at the next start)...", Fore.WHITE + Style.DIM)
+    try:
+        drained = memory_worker.wait_until_idle()
+    except KeyboardInterrupt:
+        drained = False
+    memory_worker.stop()
+    if drained:
+        on_print("Conversation saved to memory.", Fore.WHITE + Style.DIM)
+    else:
+        on_print("Memory jobs left in the queue will be processed at the next start.", Fore.WHITE + Style.DIM)
+    on_print("", Style.RESET_ALL)
+
+
+def ask_current_and_alternate_models(mod, conversation, selected_model, stream_active=True, num_ctx=None):
+    """
+    Generate the responses of the current model and of the alternate model.
+
+    Each model works on its own copy of the conversation, since tool calls append messages to it.
+    With state.parallel_alternate_model, the alternate model runs in a worker thread while the
+    current model streams to the terminal; its output is buffered and written once the current
+    model is done, below the primary response. Otherwise the two models run one after another.
+    In both cases, an error of the alternate model is reported without interrupting the turn.
+
+    :return: (bot_response, alternate_bot_response, conversation of the current model, conversation of the alternate model)
+    """
+    primary_conversation = copy.deepcopy(conversation)
+    alternate_conversation = copy.deepcopy(conversation)
+
+    def ask_primary():
+        return mod.ask_ollama_with_conversation(primary_conversation, selected_model, temperature=state.temperature, prompt_template=state.prompt_template, tools=state.selected_tools, stream_active=stream_active, num_ctx=num_ctx)
+
+    def ask_alternate():
+        return mod.ask_ollama_with_conversation(alternate_conversation, state.alternate_model, temperature=state.temperature, prompt_template=state.prompt_template, tools=state.selected_tools, prompt="\nAlt", prompt_color=Fore.CYAN, stream_active=stream_active, num_ctx=num_ctx)
+
+    def ask_alternate_safely():
+        try:
+            return ask_alternate()
+        except Exception as e:
+            on_print(f"Error generating the response of the alternate model {state.alternate_model}: {e}", Fore.RED)
+            return None
+
+    if not state.parallel_alternate_model:
+        bot_response = ask_primary()
+        return bot_response, ask_alternate_safely(), primary_conversation, alternate_conversation
+
+    def ask_alternate_buffered():
+        with capture_output() as buffer:
+            return ask_alternate_safely(), buffer
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future = executor.submit(ask_alternate_buffered)
+        try:
+            bot_response = ask_primary()
+        except Exception:
+            # Write the output of the alternate model before the error of the current one propagates
+            replay_output(future.result()[1])
+            raise
+        alternate_bot_response, buffer = future.result()
+    finally:
+        executor.shutdown(wait=False)
+    replay_output(buffer)
+    return bot_response, alternate_bot_response, primary_conversation, alternate_conversation
+
+
 def main_loop(ctx, mod):
     """Interactive conversation loop."""
     selected_model = ctx["selected_model"]
@@ -964,10 +1170,7 @@ def main_loop(ctx, mod):
         if user_input.lower() in ['/quit', '/exit', '/bye', 'quit', 'exit', 'bye', 'goodbye', 'stop'] or re.search(r'\b(bye|goodbye)\b', user_input, re.IGNORECASE):
             on_print("Goodbye!", Style.RESET_ALL)
             if state.memory_manager:
-                on_print("Saving conversation to memory...", Fore.WHITE + Style.DIM)
-                if state.memory_manager.add_memory(conversation):
-                    on_print("Conversation saved to memory.", Fore.WHITE + Style.DIM)
-                    on_print("", Style.RESET_ALL)
+                save_conversation_to_memory(conversation, wait=True)
             break
 
         if user_input.lower() in ['/reset', '/clear', '/restart', 'reset', 'clear', 'restart']:
@@ -981,11 +1184,10 @@ def main_loop(ctx, mod):
             user_input = ""
             continue
 
-        for plugin in state.plugins:
-            if hasattr(plugin, "on_user_input_done") and callable(getattr(plugin, "on_user_input_done")):
-                user_input_from_plugin = plugin.on_user_input_done(user_input, verbose_mode=state.verbose_mode)
-                if user_input_from_plugin:
-                    user_input = user_input_from_plugin
+        for on_user_input_done in plugin_hooks("on_user_input_done"):
+            user_input_from_plugin = on_user_input_done(user_input, verbose_mode=state.verbose_mode)
+            if user_input_from_plugin:
+                user_input = user_input_from_plugin
 
         # Allow for /context command to be used to set the context window size
         if user_input.startswith("/context"):
@@ -1043,6 +1245,9 @@ def main_loop(ctx, mod):
 
             document_indexer = mod.DocumentIndexer(folder_to_index, state.current_collection_name, state.chroma_client, state.embeddings_model, verbose=state.verbose_mode, summary_model=state.current_model)
             document_indexer.index_documents(num_ctx=num_ctx)
+            if state.tool_result_cache is not None:
+                # Cached query_vector_database results may not reflect the new documents
+                state.tool_result_cache.clear()
 
             if temp_folder:
                 # Remove the temporary folder and its contents
@@ -1123,7 +1328,7 @@ def main_loop(ctx, mod):
                 load_chroma_client()
 
                 if state.chroma_client:
-                    state.memory_manager = mod.MemoryManager(state.memory_collection_name, state.chroma_client, state.current_model, state.embeddings_model, state.verbose_mode, num_ctx=num_ctx, long_term_memory_file=state.long_term_memory_file)
+                    state.memory_manager = mod.MemoryManager(state.memory_collection_name, state.chroma_client, state.current_model, state.embeddings_model, state.verbose_mode, num_ctx=num_ctx, long_term_memory_file=state.long_term_memory_file, compaction_threshold=state.memory_compaction_threshold)
                 else:
                     use_memory_manager = False
             continue
@@ -1138,9 +1343,10 @@ def main_loop(ctx, mod):
                 load_chroma_client()
 
                 if state.chroma_client:
-                    state.memory_manager = mod.MemoryManager(state.memory_collection_name, state.chroma_client, state.current_model, state.embeddings_model, state.verbose_mode, num_ctx=num_ctx, long_term_memory_file=state.long_term_memory_file)
+                    state.memory_manager = mod.MemoryManager(state.memory_collection_name, state.chroma_client, state.current_model, state.embeddings_model, state.verbose_mode, num_ctx=num_ctx, long_term_memory_file=state.long_term_memory_file, compaction_threshold=state.memory_compaction_threshold)
                     use_memory_manager = True
                     on_print("Memory manager activated.", Fore.WHITE + Style.DIM)
+                    get_memory_worker()
                 else:
                     on_print("ChromaDB client not initialized.", Fore.RED)
 
@@ -1232,10 +1438,31 @@ def main_loop(ctx, mod):
             continue
 
         if state.memory_manager and (user_input == "/remember" or user_input == "/memorize"):
-            on_print("Saving conversation to memory...", Fore.WHITE + Style.DIM)
-            if state.memory_manager.add_memory(conversation):
-                on_print("Conversation saved to memory.", Fore.WHITE + Style.DIM)
-                on_print("", Style.RESET_ALL)
+            save_conversation_to_memory(conversation)
+            continue
+
+        if state.memory_manager and user_input == "/compact_memory":
+            on_print("Merging similar memories...", Fore.WHITE + Style.DIM)
+            merged_groups, removed = state.memory_manager.compact_memory()
+            on_print(f"{merged_groups} groups of similar memories merged, {removed} memories removed.", Fore.WHITE + Style.DIM)
+            continue
+
+        if user_input == "/stats":
+            on_print(state.telemetry.format_stats() if state.telemetry else "No statistics collected.", Fore.WHITE + Style.DIM)
+            if state.prompt_cache_stats is not None:
+                on_print(state.prompt_cache_stats.format_stats(), Fore.WHITE + Style.DIM)
+            if state.tool_result_cache is not None:
+                on_print(state.tool_result_cache.format_stats(), Fore.WHITE + Style.DIM)
+            if state.response_cache is not None:
+                on_print(state.response_cache.format_stats(), Fore.WHITE + Style.DIM)
+            continue
+
+        if user_input == "/memory_status":
+            memory_worker = get_memory_worker()
+            if memory_worker:
+                on_print(memory_worker.format_status(), Fore.WHITE + Style.DIM)
+            else:
+                on_print("Background memory worker disabled.", Fore.WHITE + Style.DIM)
             continue
 
         if state.memory_manager and user_input == "/forget":
@@ -1409,20 +1636,33 @@ def main_loop(ctx, mod):
             # Add the chain of thoughts to the conversation, as an assistant message
             conversation.append({"role": "assistant", "content": thoughts})
 
-        # Generate response
-        bot_response = mod.ask_ollama_with_conversation(conversation, selected_model, temperature=state.temperature, prompt_template=state.prompt_template, tools=state.selected_tools, stream_active=stream_active, num_ctx=num_ctx)
+        # The model gets a trimmed copy of the conversation, the history is kept whole
+        request_conversation = conversation
+        if state.context_window_manager:
+            state.context_window_manager.model = state.current_model
+            state.context_window_manager.verbose = state.verbose_mode
+            context_length = state.model_registry.context_length(selected_model) if state.model_registry is not None else None
+            request_conversation = state.context_window_manager.fit(conversation, num_ctx, context_length)
+        request_length = len(request_conversation)
 
+        # Generate response
         alternate_bot_response = None
         if state.alternate_model:
-            alternate_bot_response = mod.ask_ollama_with_conversation(conversation, state.alternate_model, temperature=state.temperature, prompt_template=state.prompt_template, tools=state.selected_tools, prompt="\nAlt", prompt_color=Fore.CYAN, stream_active=stream_active, num_ctx=num_ctx)
+            bot_response, alternate_bot_response, primary_conversation, alternate_conversation = ask_current_and_alternate_models(mod, request_conversation, selected_model, stream_active=stream_active, num_ctx=num_ctx)
+        else:
+            bot_response = mod.ask_ollama_with_conversation(request_conversation, selected_model, temperature=state.temperature, prompt_template=state.prompt_template, tools=state.selected_tools, stream_active=stream_active, num_ctx=num_ctx)
+            if request_conversation is not conversation:
+                # Keep the tool call messages added to the trimmed copy
+                conversation.extend(request_conversation[request_length:])
+        # Highlighted responses may already have been displayed while they were streamed
+        bot_response_displayed = response_rendered_live()
 
         bot_response_handled_by_plugin = False
-        for plugin in state.plugins:
-            if hasattr(plugin, "on_llm_response") and callable(getattr(plugin, "on_llm_response")):
-                plugin_response = getattr(plugin, "on_llm_response")(bot_response)
-                bot_response_handled_by_plugin = bot_response_handled_by_plugin or plugin_response
+        for on_llm_response in plugin_hooks("on_llm_response"):
+            plugin_response = on_llm_response(bot_response)
+            bot_response_handled_by_plugin = bot_response_handled_by_plugin or plugin_response
 
-        if not bot_response_handled_by_plugin:
+        if not bot_response_handled_by_plugin and not bot_response_displayed:
             if state.syntax_highlighting:
                 on_print(colorize(bot_response), Style.RESET_ALL, "\rBot: " if state.interactive_mode else "")
 
@@ -1439,7 +1679,13 @@ def main_loop(ctx, mod):
             # Ask user to select the preferred response
             on_print(f"Select the preferred response:\n1. Original model ({state.current_model})\n2. Alternate model ({state.alternate_model})", Fore.WHITE + Style.DIM)
             choice = on_user_input("Enter the number of your preferred response [1]: ") or "1"
-            bot_response = bot_response if choice == "1" else alternate_bot_response
+            if choice != "1":
+                bot_response = alternate_bot_response
+                primary_conversation = alternate_conversation
+
+        if state.alternate_model:
+            # Keep the tool call messages of the selected model
+            conversation.extend(primary_conversation[request_length:])
 
         # Add bot response to conversation history
         conversation.append({"role": "assistant", "content": bot_response})
@@ -1466,9 +1712,16 @@ def main_loop(ctx, mod):
 
 
     # Stop plugins, calling on_exit if available
-    for plugin in state.plugins:
-        if hasattr(plugin, "on_exit") and callable(getattr(plugin, "on_exit")):
-            getattr(plugin, "on_exit")()
+    for on_exit in plugin_hooks("on_exit"):
+        on_exit()
+
+    if state.model_warmup is not None:
+        state.model_warmup.shutdown()
+
+    if state.telemetry is not None:
+        if state.verbose_mode:
+            on_print(state.telemetry.format_stats(), Fore.WHITE + Style.DIM)
+        state.telemetry.close()
 
     if auto_save:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
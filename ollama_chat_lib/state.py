@@ -32,6 +32,7 @@ chroma_db_path = None
 # ── Model selection ───────────────────────────────────────────────────────
 current_model = None
 alternate_model = None
+parallel_alternate_model = True  # Generate the current and alternate model responses concurrently
 thinking_model = None
 thinking_model_reasoning_pattern = None
 embeddings_model = None
@@ -39,11 +40,21 @@ embeddings_model = None
 # ── Conversation / generation settings ────────────────────────────────────
 temperature = 0.1
 number_of_documents_to_return_from_vector_db = 8
+use_lexical_index = False    # Maintain and query per-collection BM25 indexes (hybrid retrieval)
+parallel_query_expansion = False  # Search with the raw question while the query expansion is generated
+query_expansion_timeout = None    # Seconds to wait for a parallel query expansion (None: no limit)
 think_mode_on = False
+context_window_manager = None  # ContextWindowManager trimming the conversation to the token budget
+prompt_cache_stats = None      # PromptCacheStats measured from the prompt_eval_count of Ollama responses
+telemetry = None               # TelemetryCollector of the LLM calls and retrievals of the session
+keep_alive = None              # How long Ollama keeps the models loaded after a request (None: server default)
+model_warmup = None            # ModelWarmup preloading the models of the session in the background
 
 # ── UI / output ───────────────────────────────────────────────────────────
 verbose_mode = False
 syntax_highlighting = True
+live_highlighting = True     # Highlight streamed responses line by line instead of once complete
+token_batch_ms = 0           # Coalesce streamed tokens passed to the output hooks during this many milliseconds (0 to disable)
 interactive_mode = True
 
 # ── Plugins & tools ───────────────────────────────────────────────────────
@@ -51,11 +62,36 @@ plugins = []
 plugins_folder = None
 selected_tools = []          # Initially no tools selected
 custom_tools = []
+parallel_tool_calls = True   # Run independent tool calls of one response concurrently
+max_tool_workers = None      # None: default_max_tool_workers
+tool_timeout = None          # None: default_tool_timeout
+tool_result_cache = None     # ToolResultCache of idempotent tool calls, for the session
 
 # ── Memory ────────────────────────────────────────────────────────────────
 memory_manager = None
 memory_collection_name = "memory"
 long_term_memory_file = "long_term_memory.json"
+background_memory = True     # Add conversations to memory in a background worker
+memory_compaction_threshold = None  # Number of memories above which similar ones are merged automatically
+memory_worker = None         # MemoryWorker processing the persistent memory job queue
+
+# ── Caches ────────────────────────────────────────────────────────────────
+embedding_cache = None       # EmbeddingCache shared by indexing, retrieval and memory
+query_expansion_cache = None # DiskCache of query expansion passages
+response_cache = None        # ResponseCache of non-streamed LLM responses
+lexical_indexes = {}         # Open LexicalIndex objects, by file path
+model_registry = None        # ModelRegistry: installed Ollama models and their capabilities
+
+# ── Web crawling ─────────────────────────────────────────────────────────
+web_crawler_workers = None       # None: default_web_crawler_workers
+web_crawler_per_host_limit = None
+web_crawler_timeout = None
+web_crawler_deadline = None
+web_cache_max_chunks = None     # None: default_web_cache_max_chunks
+web_cache_max_size_mb = None
+web_cache_ttl_hours = None
+web_cache_eviction = None
+web_search_summaries = True      # Prepend an LLM summary to the chunks of crawled pages
 
 # ── Networking / multi-instance ───────────────────────────────────────────
 other_instance_url = None
@@ -0,0 +1,214 @@
+"""Per-call telemetry of LLM requests and vector database queries."""
+
+import json
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from colorama import Fore
+
+from ollama_chat_lib.constants import telemetry_window, model_load_stall_seconds
+from ollama_chat_lib.io_hooks import on_print
+
+_purpose = threading.local()
+
+
+@contextmanager
+def telemetry_purpose(purpose):
+    """
+    Tag the LLM calls made by the current thread within the block with a purpose.
+
+    Purposes are 'chat' (the default), 'expansion', 'summary', 'memory', 'tool-fallback' and
+    'agent'; vector database queries are recorded as 'retrieval' and model preloads as 'warmup'.
+    """
+    previous = getattr(_purpose, 'value', None)
+    _purpose.value = purpose
+    try:
+        yield
+    finally:
+        _purpose.value = previous
+
+
+def current_purpose():
+    return getattr(_purpose, 'value', None) or "chat"
+
+
+def _count(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def _seconds(nanoseconds):
+    return nanoseconds / 1e9 if isinstance(nanoseconds, (int, float)) and not isinstance(nanoseconds, bool) else None
+
+
+def ollama_metrics(response):
+    """Return the token counts and durations (in seconds) reported in a final Ollama response."""
+    return {
+        "prompt_tokens": _count(response.get('prompt_eval_count')),
+        "prompt_eval_duration": _seconds(response.get('prompt_eval_duration')),
+        "eval_count": _count(response.get('eval_count')),
+        "eval_duration": _seconds(response.get('eval_duration')),
+        "load_duration": _seconds(response.get('load_duration')),
+    }
+
+
+def openai_metrics(usage):
+    """Return the token counts of the usage reported by the OpenAI chat completions or Responses API."""
+    if isinstance(usage, dict):
+        get = usage.get
+    else:
+        def get(name):
+            return getattr(usage, name, None)
+    prompt_tokens = _count(get('prompt_tokens'))
+    eval_count = _count(get('completion_tokens'))
+    return {
+        "prompt_tokens": prompt_tokens if prompt_tokens is not None else _count(get('input_tokens')),
+        "eval_count": eval_count if eval_count is not None else _count(get('output_tokens')),
+    }
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of a list of numbers, or None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class TelemetryCollector:
+    """
+    Statistics of the LLM calls and vector database queries of the session.
+
+    Each call is recorded with its purpose, duration, time to first token, token counts and the
+    load, prompt evaluation and generation durations reported by Ollama. Percentiles are computed
+    over the last calls of each purpose, while the time spent per purpose covers the whole session.
+    Records are also appended to a JSONL file when metrics_file is set.
+    All methods are thread-safe.
+    """
+
+    def __init__(self, metrics_file=None, window=telemetry_window):
+        self.metrics_file = metrics_file
+        self._records = defaultdict(lambda: deque(maxlen=window))
+        self._calls = defaultdict(int)
+        self._seconds = defaultdict(float)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def record(self, duration, model=None, backend="ollama", purpose=None, ttft=None, prompt_tokens=None,
+               prompt_eval_duration=None, eval_count=None, eval_duration=None, load_duration=None):
+        """
+        Record a call that took duration seconds.
+
+        When the time to first token is unknown (non-streamed call), it is estimated from the
+        load and prompt evaluation durations reported by the server.
+
+        :return: The recorded entry.
+        """
+        if ttft is None and prompt_eval_duration is not None:
+            ttft = (load_duration or 0.0) + prompt_eval_duration
+        record = {
+            "timestamp": round(time.time(), 3),
+            "purpose": purpose or current_purpose(),
+            "backend": backend,
+            "model": model,
+            "duration": duration,
+            "ttft": ttft,
+            "prompt_tokens": prompt_tokens,
+            "prompt_eval_duration": prompt_eval_duration,
+            "eval_count": eval_count,
+            "eval_duration": eval_duration,
+            "load_duration": load_duration,
+            "tokens_per_second": eval_count / eval_duration if eval_count is not None and eval_duration else None,
+        }
+        with self._lock:
+            self._records[record["purpose"]].append(record)
+            self._calls[record["purpose"]] += 1
+            self._seconds[record["purpose"]] += duration
+            if self.metrics_file:
+                self._write(record)
+        return record
+
+    def _write(self, record):
+        try:
+            if self._file is None:
+                self._file = open(self.metrics_file, "a", encoding="utf-8")
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+        except OSError as e:
+            on_print(f"Cannot write metrics to {self.metrics_file}: {e}", Fore.YELLOW)
+            self.metrics_file = None
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def summary(self):
+        """
+        Return the statistics per purpose: number of calls, total seconds, share of the time of
+        the session, p50/p95 of the duration and time to first token, p50/p5 of the generated
+        tokens/s, and the number of calls stalled by a model load.
+        """
+        with self._lock:
+            records = {purpose: list(entries) for purpose, entries in self._records.items()}
+            calls = dict(self._calls)
+            seconds = dict(self._seconds)
+        total_seconds = sum(seconds.values())
+        summary = {}
+        for purpose, entries in records.items():
+            values = defaultdict(list)
+            for entry in entries:
+                for metric in ("duration", "ttft", "tokens_per_second", "load_duration"):
+                    if entry[metric] is not None:
+                        values[metric].append(entry[metric])
+            summary[purpose] = {
+                "calls": calls[purpose],
+                "seconds": seconds[purpose],
+                "share": seconds[purpose] / total_seconds if total_seconds else 0.0,
+                "duration_p50": percentile(values["duration"], 0.5),
+                "duration_p95": percentile(values["duration"], 0.95),
+                "ttft_p50": percentile(values["ttft"], 0.5),
+                "ttft_p95": percentile(values["ttft"], 0.95),
+                "tokens_per_second_p50": percentile(values["tokens_per_second"], 0.5),
+                "tokens_per_second_p5": percentile(values["tokens_per_second"], 0.05),
+                "load_stalls": sum(1 for load in values["load_duration"] if load >= model_load_stall_seconds),
+            }
+        return summary
+
+    def format_stats(self):
+        """Return a table of the statistics per purpose, by decreasing time spent."""
+        summary = self.summary()
+        if not summary:
+            return "No LLM calls or retrievals recorded yet."
+
+        def fmt(value, unit="s", digits=2):
+            return "-" if value is None else f"{value:.{digits}f}{unit}"
+
+        lines = [f"{'Purpose':<14}{'Calls':>6}{'Time':>10}{'Share':>7}{'Duration p50/p95':>20}{'TTFT p50/p95':>16}{'Tokens/s p50/p5':>18}{'Load stalls':>13}"]
+        for purpose, stats in sorted(summary.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            lines.append(
+                f"{purpose:<14}{stats['calls']:>6}{fmt(stats['seconds'], 's', 1):>10}{stats['share']:>7.0%}"
+                f"{fmt(stats['duration_p50']) + '/' + fmt(stats['duration_p95']):>20}"
+                f"{fmt(stats['ttft_p50']) + '/' + fmt(stats['ttft_p95']):>16}"
+                f"{fmt(stats['tokens_per_second_p50'], '', 1) + '/' + fmt(stats['tokens_per_second_p5'], '', 1):>18}"
+                f"{stats['load_stalls']:>13}"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def format_call(record):
+        """Return a one-line description of a recorded call."""
+        parts = [f"{record['purpose']} call to {record['model'] or record['backend']}: {record['duration']:.2f}s"]
+        if record["ttft"] is not None:
+            parts.append(f"first token after {record['ttft']:.2f}s")
+        if record["prompt_tokens"] is not None:
+            parts.append(f"{record['prompt_tokens']} prompt tokens")
+        if record["eval_count"] is not None:
+            rate = f" at {record['tokens_per_second']:.1f} tokens/s" if record["tokens_per_second"] is not None else ""
+            parts.append(f"{record['eval_count']} tokens generated{rate}")
+        if record["load_duration"] is not None and record["load_duration"] >= model_load_stall_seconds:
+            parts.append(f"model loaded in {record['load_duration']:.2f}s")
+        return ", ".join(parts)
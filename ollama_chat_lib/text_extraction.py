@@ -338,6 +338,46 @@ def extract_text_from_pptx(pptx_path):
     # Join all lines into a single Markdown string
     return "\n".join(markdown_lines)
 
+def extract_text_from_file(file_path):
+    """
+    Extract the text content of a file on disk.
+    Supports plain text, PDF, DOCX, PPTX, XLSX, and CSV files.
+
+    This is a module-level function so it can be sent to worker processes
+    during pipelined indexing. Errors are raised to the caller.
+    """
+    lower_path = file_path.lower()
+
+    # Handle PDF files
+    if lower_path.endswith('.pdf'):
+        reader = PdfReader(file_path)
+        text = ''
+        for page in reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text
+        return re.sub(r'\n+', '\n', text)
+
+    # Handle DOCX files
+    if lower_path.endswith('.docx'):
+        return extract_text_from_docx(file_path)
+
+    # Handle PPTX files
+    if lower_path.endswith('.pptx'):
+        return extract_text_from_pptx(file_path)
+
+    # Handle XLSX files
+    if lower_path.endswith('.xlsx'):
+        return extract_text_from_xlsx(file_path)
+
+    # Handle CSV files
+    if lower_path.endswith('.csv'):
+        return extract_text_from_csv(file_path)
+
+    # Default: read as text
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return file.read()
+
 
 # ---------------------------------------------------------------------------
 # File-type detection
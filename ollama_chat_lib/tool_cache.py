@@ -0,0 +1,100 @@
+"""Session-scoped memoization of idempotent tool calls."""
+
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class ToolResultCache:
+    """
+    In-memory cache of tool results, keyed by tool name and canonicalized arguments.
+
+    Only tools declared with the cached_tool decorator are cached, each with its own TTL.
+    A tool can also declare a fingerprint function (e.g. the modification time of the file
+    it reads), which is part of the key: a cached result is reused only while the
+    fingerprint is unchanged.
+    All methods are thread-safe, so concurrent tool calls can share the cache.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    @staticmethod
+    def make_key(tool_name, parameters, fingerprint=None):
+        return json.dumps([tool_name, parameters, fingerprint], sort_keys=True, default=str)
+
+    @staticmethod
+    def _policy(func):
+        """Return the (ttl, fingerprint function) declared by a tool, or None if it is not cacheable."""
+        ttl = getattr(func, 'cache_ttl', None)
+        if not isinstance(ttl, (int, float)) or ttl <= 0:
+            return None
+        return ttl, getattr(func, 'cache_fingerprint', None)
+
+    @staticmethod
+    def _fingerprint(fingerprint_fn, parameters):
+        if fingerprint_fn is None:
+            return None
+        try:
+            return fingerprint_fn(parameters)
+        except Exception:
+            return None
+
+    def get(self, tool_name, parameters, func):
+        """
+        Look up the result of a tool call.
+
+        :return: (True, result) on a hit, (False, None) otherwise.
+        """
+        policy = self._policy(func)
+        if policy is None:
+            return False, None
+        ttl, fingerprint_fn = policy
+        key = self.make_key(tool_name, parameters, self._fingerprint(fingerprint_fn, parameters))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if time.monotonic() - stored_at <= ttl:
+                    self._entries.move_to_end(key)
+                    self.hits[tool_name] += 1
+                    return True, result
+                del self._entries[key]
+            self.misses[tool_name] += 1
+        return False, None
+
+    def set(self, tool_name, parameters, func, result):
+        """Store the result of a tool call, if the tool is cacheable and the result is not None."""
+        policy = self._policy(func)
+        if policy is None or result is None:
+            return
+        _, fingerprint_fn = policy
+        key = self.make_key(tool_name, parameters, self._fingerprint(fingerprint_fn, parameters))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def format_stats(self):
+        """Return a one-line summary of the hit rate, overall and per tool."""
+        with self._lock:
+            hits = sum(self.hits.values())
+            lookups = hits + sum(self.misses.values())
+            tools = sorted(set(self.hits) | set(self.misses))
+            per_tool = ", ".join(f"{tool}: {self.hits[tool]}/{self.hits[tool] + self.misses[tool]}" for tool in tools)
+        rate = hits / lookups if lookups else 0.0
+        return f"Tool cache: {hits}/{lookups} hits ({rate:.0%}){' - ' + per_tool if per_tool else ''}"
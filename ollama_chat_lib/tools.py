@@ -1,19 +1,17 @@
 """Tool definitions, selection helpers, chain-of-thought prompt, and web search."""
 
-import os
-import re
-import tempfile
-
 from colorama import Fore, Style
 from ddgs import DDGS
 
 from ollama_chat_lib import state
 from ollama_chat_lib.io_hooks import on_print, on_user_input
+from ollama_chat_lib.web_cache import WebCacheManager
 from ollama_chat_lib.constants import (
     web_cache_collection_name,
     min_quality_results_threshold,
     min_average_bm25_threshold,
 )
+from ollama_chat_lib.telemetry import telemetry_purpose
 
 
 # ---------------------------------------------------------------------------
@@ -582,6 +580,14 @@ def web_search(query=None, n_results=5, region="wt-wt", web_embedding_model=None
     if web_embedding_model is None or web_embedding_model == "":
         web_embedding_model = state.embeddings_model
 
+    cache_manager = None
+    try:
+        cache_manager = WebCacheManager.from_state(state.chroma_client.get_or_create_collection(name=web_cache_collection))
+        cache_manager.expire()
+    except Exception as e:
+        if state.verbose_mode:
+            on_print(f"Web cache maintenance failed: {e}", Fore.YELLOW + Style.DIM)
+
     # OPTIMIZATION: Check cache first
     cache_check_results = ""
     cache_metadata = {}
@@ -627,6 +633,8 @@ def web_search(query=None, n_results=5, region="wt-wt", web_embedding_model=None
         skip_web_crawl = False
 
     if skip_web_crawl and cache_check_results:
+        if cache_manager is not None:
+            cache_manager.record_hits(cache_metadata.get('results'))
         if return_intermediate:
             intermediate_data = {
                 'cache_hit': True,
@@ -681,25 +689,26 @@ def web_search(query=None, n_results=5, region="wt-wt", web_embedding_model=None
     webCrawler.crawl()
     articles = webCrawler.get_articles()
 
-    temp_folder = tempfile.mkdtemp()
-    additional_metadata = {}
-    for i, article in enumerate(articles):
-        temp_file_name = re.sub(r'[<>:"/\\|?*]', '', article['url'])
-        temp_file_path = os.path.join(temp_folder, f"{temp_file_name}_{i}.txt")
-        with open(temp_file_path, 'w', encoding='utf-8') as f:
-            f.write(article['text'])
-            additional_metadata[temp_file_path] = {'url': article['url']}
-
     if web_embedding_model is None or web_embedding_model == "":
         web_embedding_model = state.embeddings_model
 
-    document_indexer = document_indexer_cls(temp_folder, web_cache_collection, state.chroma_client, web_embedding_model, verbose=state.verbose_mode, summary_model=state.current_model)
-    document_indexer.index_documents(no_chunking_confirmation=True, additional_metadata=additional_metadata)
-
-    for file in os.listdir(temp_folder):
-        file_path = os.path.join(temp_folder, file)
-        os.remove(file_path)
-    os.rmdir(temp_folder)
+    # Crawled articles are indexed straight from memory, without temporary files
+    document_indexer = document_indexer_cls(None, web_cache_collection, state.chroma_client, web_embedding_model, verbose=state.verbose_mode, summary_model=state.current_model)
+    if cache_manager is not None:
+        # Pages crawled again replace their previous chunks, so there are no indexed chunks to skip
+        cache_manager.replace_urls([article['url'] for article in articles])
+    document_indexer.index_records(
+        [(article['text'], WebCacheManager.stamp({'url': article['url']})) for article in articles],
+        add_summary=state.web_search_summaries,
+        skip_existing=cache_manager is None
+    )
+    if cache_manager is not None:
+        try:
+            cache_manager.record_added([article['url'] for article in articles])
+            cache_manager.enforce()
+        except Exception as e:
+            if state.verbose_mode:
+                on_print(f"Web cache eviction failed: {e}", Fore.YELLOW + Style.DIM)
 
     results, result_metadata = query_vector_database_fn(
         query,
@@ -710,8 +719,12 @@ def web_search(query=None, n_results=5, region="wt-wt", web_embedding_model=None
         return_metadata=True
     )
 
+    if cache_manager is not None and result_metadata:
+        cache_manager.record_hits(result_metadata.get('results'))
+
     if not results:
-        new_query = ask_fn("", f"No relevant information found. Please provide a refined search query: {query}", state.current_model, temperature=0.7, no_bot_prompt=True, stream_active=False, num_ctx=num_ctx)
+        with telemetry_purpose("expansion"):
+            new_query = ask_fn("", f"No relevant information found. Please provide a refined search query: {query}", state.current_model, temperature=0.7, no_bot_prompt=True, stream_active=False, num_ctx=num_ctx)
         if new_query:
             if state.verbose_mode:
                 on_print(f"Refined search query: {new_query}", Fore.WHITE + Style.DIM)
@@ -13,6 +13,38 @@ def find_latest_user_message(conversation):
             return message["content"]
     return None  # If no user message is found
 
+def not_concurrency_safe(func):
+    """Mark a tool function (or plugin method) as unsafe to run concurrently with other tool calls."""
+    func.concurrency_safe = False
+    return func
+
+
+def cached_tool(ttl, fingerprint=None):
+    """
+    Declare a tool as idempotent: identical calls within *ttl* seconds reuse the previous
+    result (see ToolResultCache).
+
+    :param fingerprint: Optional callable receiving the call arguments; a cached result is
+                        only reused while it returns the same value (e.g. a file mtime).
+    """
+    def decorator(func):
+        func.cache_ttl = ttl
+        func.cache_fingerprint = fingerprint
+        return func
+    return decorator
+
+
+def file_fingerprint(parameter_name):
+    """Return a cached_tool fingerprint that changes whenever the file named by a call argument changes."""
+    def fingerprint(parameters):
+        try:
+            file_stat = os.stat(parameters.get(parameter_name))
+        except (OSError, TypeError):
+            return None
+        return [file_stat.st_mtime_ns, file_stat.st_size]
+    return fingerprint
+
+
 def render_tools(tools):
     """Convert tools into a string format suitable for the system prompt."""
     tool_descriptions = []
@@ -1,22 +1,28 @@
 """ChromaDB / vector-database helpers – loading, querying, collection management."""
 
 import os
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 
 import chromadb
-import ollama
 from colorama import Fore, Style
 from rank_bm25 import BM25Okapi
 
-from ollama_chat_lib import state
+from ollama_chat_lib import query_expansion, state
+from ollama_chat_lib.embeddings import embed_text
 from ollama_chat_lib.io_hooks import on_print, on_user_input
+from ollama_chat_lib.lexical_index import get_lexical_index, delete_lexical_index, preprocess_text
 from ollama_chat_lib.constants import (
-    web_cache_collection_name, stop_words,
-    adaptive_distance_multiplier, distance_percentile_threshold, semantic_weight,
+    web_cache_collection_name,
+    adaptive_distance_multiplier, distance_percentile_threshold, semantic_weight, rrf_k,
 )
 
 
+_collection_switch_lock = threading.RLock()
+
+
 def load_chroma_client():
     if state.chroma_client:
         return
@@ -150,22 +156,101 @@ def delete_collection(collection_name):
         return
     try:
         state.chroma_client.delete_collection(name=collection_name)
+        delete_lexical_index(collection_name)
         on_print(f"Collection {collection_name} deleted.", Fore.GREEN)
     except Exception:
         on_print(f"Collection {collection_name} not found.", Fore.RED)
 
 
-def preprocess_text(text):
-    if not text or len(text) == 0:
-        return []
-    text = text.lower()
-    text = re.sub(r'[^\w\s.,]', ' ', text)
-    text = re.sub(r'\. |, ', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    words = text.split()
-    words = [word[:-1] if word.endswith('.') else word for word in words]
-    words = [word for word in words if word not in stop_words]
-    return words
+def _get_current_lexical_index(collection=None, collection_name=None):
+    """
+    Return the LexicalIndex of a collection (the current one by default), synchronized with
+    it, or None if hybrid retrieval is disabled or the index cannot be opened.
+    """
+    collection = collection or state.collection
+    collection_name = collection_name or state.current_collection_name
+    if not state.use_lexical_index or not collection_name or not collection:
+        return None
+    try:
+        lexical_index = get_lexical_index(collection_name)
+        # The IDs are compared once per session, then only the number of documents
+        if not lexical_index.is_in_sync(collection, compare_ids=not lexical_index.ids_verified):
+            added, removed = lexical_index.sync(collection)
+            if state.verbose_mode:
+                on_print(f"Lexical index synchronized: {added} documents added, {removed} removed", Fore.WHITE + Style.DIM)
+        return lexical_index
+    except Exception as e:
+        if state.verbose_mode:
+            on_print(f"Lexical index unavailable: {e}", Fore.YELLOW + Style.DIM)
+        return None
+
+
+def _query_collection(question, query_embedding, n_results, ids=None, collection=None):
+    collection = collection or state.collection
+    query_kwargs = {'n_results': n_results}
+    if ids is not None:
+        query_kwargs['ids'] = ids
+    if query_embedding is None:
+        return collection.query(query_texts=[question], **query_kwargs)
+    return collection.query(query_embeddings=[query_embedding], **query_kwargs)
+
+
+def _merge_query_results(first, second):
+    """Merge two ChromaDB query results, keeping the smallest distance of each document, closest first."""
+    merged = {}
+    for result in (first, second):
+        for doc_id, metadata, distance, document in zip(result["ids"][0], result["metadatas"][0], result["distances"][0], result["documents"][0]):
+            if doc_id not in merged or distance < merged[doc_id][1]:
+                merged[doc_id] = (metadata, distance, document)
+    ordered = sorted(merged.items(), key=lambda item: item[1][1])
+    return {
+        "ids": [[doc_id for doc_id, _ in ordered]],
+        "metadatas": [[row[0] for _, row in ordered]],
+        "distances": [[row[1] for _, row in ordered]],
+        "documents": [[row[2] for _, row in ordered]],
+    }
+
+
+def _fuse_with_lexical_results(lexical_index, lexical_query, question, query_embedding, ids, metadatas, distances, documents, n_candidates=25, collection=None):
+    """
+    Merge the vector search results with the best BM25 matches of the whole collection,
+    using reciprocal rank fusion. Lexical matches missing from the vector results are
+    fetched from the collection with their distance to the query.
+
+    :return: List of (metadata, distance, document, bm25_score, hybrid_score, lexical_match).
+    """
+    bm25_scores = lexical_index.get_scores(lexical_query)
+    lexical_ranking = sorted(bm25_scores.items(), key=lambda item: item[1], reverse=True)[:n_candidates]
+    lexical_ranks = {doc_id: rank for rank, (doc_id, _) in enumerate(lexical_ranking, start=1)}
+
+    candidates = {doc_id: (metadata, distance, document) for doc_id, metadata, distance, document in zip(ids, metadatas, distances, documents)}
+    extra_ids = [doc_id for doc_id in lexical_ranks if doc_id not in candidates]
+    if extra_ids:
+        try:
+            extra = _query_collection(question, query_embedding, len(extra_ids), ids=extra_ids, collection=collection)
+            extra_rows = list(zip(extra["ids"][0], extra["metadatas"][0], extra["distances"][0], extra["documents"][0]))
+        except Exception:
+            # Without distances (e.g. a ChromaDB server that cannot filter queries by ID)
+            extra = (collection or state.collection).get(ids=extra_ids, include=['documents', 'metadatas'])
+            extra_rows = [(doc_id, metadata, None, document) for doc_id, metadata, document in zip(extra["ids"], extra["metadatas"], extra["documents"])]
+        for doc_id, metadata, distance, document in extra_rows:
+            candidates[doc_id] = (metadata or {}, distance, document)
+        if state.verbose_mode:
+            on_print(f"Lexical search added {len(extra_rows)} results not found by vector search", Fore.WHITE + Style.DIM)
+
+    semantic_ranking = sorted((doc_id for doc_id, candidate in candidates.items() if candidate[1] is not None), key=lambda doc_id: candidates[doc_id][1])
+    semantic_ranks = {doc_id: rank for rank, doc_id in enumerate(semantic_ranking, start=1)}
+
+    fused = []
+    for doc_id, (metadata, distance, document) in candidates.items():
+        score = 0.0
+        if doc_id in semantic_ranks:
+            score += semantic_weight / (rrf_k + semantic_ranks[doc_id])
+        if doc_id in lexical_ranks:
+            score += (1 - semantic_weight) / (rrf_k + lexical_ranks[doc_id])
+        # Scaled so that a result ranked first in both lists scores 1
+        fused.append((metadata, distance, document, bm25_scores.get(doc_id, 0.0), score * (rrf_k + 1), doc_id in lexical_ranks))
+    return fused
 
 
 def query_vector_database(question, collection_name=None, n_results=None, answer_distance_threshold=0,
@@ -173,6 +258,19 @@ def query_vector_database(question, collection_name=None, n_results=None, answer
                           use_adaptive_filtering=True, return_metadata=False, ask_fn=None):
     """Query the vector database.  *ask_fn* must be a callable with the same
     signature as ``ask_ollama`` (used for query expansion)."""
+    started = time.perf_counter()
+    try:
+        return _query_vector_database(question, collection_name, n_results, answer_distance_threshold,
+                                      query_embeddings_model, expand_query, question_context,
+                                      use_adaptive_filtering, return_metadata, ask_fn)
+    finally:
+        if state.telemetry is not None:
+            state.telemetry.record(time.perf_counter() - started, model=collection_name or state.current_collection_name, backend="chromadb", purpose="retrieval")
+
+
+def _query_vector_database(question, collection_name, n_results, answer_distance_threshold,
+                           query_embeddings_model, expand_query, question_context,
+                           use_adaptive_filtering, return_metadata, ask_fn):
     if collection_name is None:
         collection_name = state.current_collection_name
     if n_results is None:
@@ -211,36 +309,37 @@ def query_vector_database(question, collection_name=None, n_results=None, answer
     if not query_embeddings_model:
         query_embeddings_model = state.embeddings_model
 
-    if not state.collection and collection_name:
-        set_current_collection(collection_name, create_new_collection_if_not_found=False)
-
-    if not state.collection:
-        on_print("No ChromaDB collection loaded.", Fore.RED)
-        collection_name, _ = prompt_for_vector_database_collection()
-        if not collection_name:
-            if return_metadata:
-                return "", {}
-            return ""
-
-    if collection_name and collection_name != state.current_collection_name:
-        set_current_collection(collection_name, create_new_collection_if_not_found=False)
+    # The collection is selected under a lock and used through local variables, so that
+    # concurrent tool calls querying different collections do not query each other's
+    with _collection_switch_lock:
+        if not state.collection and collection_name:
+            set_current_collection(collection_name, create_new_collection_if_not_found=False)
+
+        if not state.collection:
+            on_print("No ChromaDB collection loaded.", Fore.RED)
+            collection_name, _ = prompt_for_vector_database_collection()
+            if not collection_name:
+                if return_metadata:
+                    return "", {}
+                return ""
+
+        if collection_name and collection_name != state.current_collection_name:
+            set_current_collection(collection_name, create_new_collection_if_not_found=False)
+        collection = state.collection
+        collection_name = state.current_collection_name
 
+    expansion_future = None
     if expand_query:
         if ask_fn is None:
             raise ValueError("ask_fn is required for query expansion")
-        expanded_query = None
-        system_prompt = "You are an assistant that helps expand and clarify user questions to improve information retrieval. When a user provides a question, your task is to write a short passage that elaborates on the query by adding relevant background information, inferred details, and related concepts that can help with retrieval. The passage should remain concise and focused, without changing the original meaning of the question.\r\nGuidelines:\r\n1. Expand the question briefly by including additional context or background, staying relevant to the user's original intent.\r\n2. Incorporate inferred details or related concepts that help clarify or broaden the query in a way that aids retrieval.\r\n3. Keep the passage short, usually no more than 2-3 sentences, while maintaining clarity and depth.\r\n4. Avoid introducing unrelated or overly specific topics. Keep the expansion concise and to the point."
-        if question_context:
-            system_prompt += f"\n\nAdditional context about the user query:\n{question_context}"
-
-        if not state.thinking_model is None and state.thinking_model != state.current_model:
-            if "deepseek-r1" in state.thinking_model:
-                prompt = f"""{system_prompt}\n{question}"""
-                expanded_query = ask_fn("", prompt, selected_model=state.thinking_model, no_bot_prompt=True, stream_active=False)
-            else:
-                expanded_query = ask_fn(system_prompt, question, selected_model=state.thinking_model, no_bot_prompt=True, stream_active=False)
-        else:
-            expanded_query = ask_fn(system_prompt, question, selected_model=state.current_model, no_bot_prompt=True, stream_active=False)
+        expanded_query = query_expansion.get_cached_expansion(question, question_context)
+        if expanded_query is None and state.parallel_query_expansion:
+            # Search with the raw question while the expansion is being written
+            expansion_executor = ThreadPoolExecutor(max_workers=1)
+            expansion_future = expansion_executor.submit(query_expansion.expand_query, question, question_context, ask_fn)
+            expansion_executor.shutdown(wait=False)
+        elif expanded_query is None:
+            expanded_query = query_expansion.expand_query(question, question_context, ask_fn)
         if expanded_query:
             question += "\n" + expanded_query
             if state.verbose_mode:
@@ -250,20 +349,30 @@ def query_vector_database(question, collection_name=None, n_results=None, answer
     if state.verbose_mode:
         on_print(f"Using query embeddings model: {query_embeddings_model}", Fore.WHITE + Style.DIM)
 
-    if query_embeddings_model is None:
-        result = state.collection.query(
-            query_texts=[question],
-            n_results=25
-        )
-    else:
-        response = ollama.embeddings(
-            prompt=question,
-            model=query_embeddings_model
-        )
-        result = state.collection.query(
-            query_embeddings=[response["embedding"]],
-            n_results=25
-        )
+    query_embedding = None
+    if query_embeddings_model is not None:
+        query_embedding = embed_text(question, query_embeddings_model)
+    result = _query_collection(question, query_embedding, 25, collection=collection)
+
+    if expansion_future is not None:
+        try:
+            expanded_query = expansion_future.result(timeout=state.query_expansion_timeout or None)
+        except FutureTimeoutError:
+            # The expansion keeps running in the background and is cached for the next query
+            expanded_query = None
+            if state.verbose_mode:
+                on_print(f"Query expansion not ready after {state.query_expansion_timeout}s, using the raw question only.", Fore.WHITE + Style.DIM)
+        except Exception as e:
+            expanded_query = None
+            on_print(f"Query expansion failed: {e}", Fore.YELLOW)
+        if expanded_query:
+            question += "\n" + expanded_query
+            if state.verbose_mode:
+                on_print("Expanded query:", Fore.WHITE + Style.DIM)
+                on_print(question, Fore.WHITE + Style.DIM)
+            if query_embeddings_model is not None:
+                query_embedding = embed_text(question, query_embeddings_model)
+            result = _merge_query_results(result, _query_collection(question, query_embedding, 25, collection=collection))
 
     documents = result["documents"][0]
     distances = result["distances"][0]
@@ -297,29 +406,41 @@ def query_vector_database(question, collection_name=None, n_results=None, answer
     else:
         effective_threshold = float('inf')
 
-    initial_question_preprocessed = preprocess_text(initial_question)
-    preprocessed_docs = [preprocess_text(doc) for doc in documents]
+    lexical_index = _get_current_lexical_index(collection, collection_name)
+    if lexical_index is not None and result.get("ids"):
+        # Hybrid retrieval: BM25 over the whole collection, fused with the vector results
+        candidates = _fuse_with_lexical_results(lexical_index, initial_question, question, query_embedding, result["ids"][0], metadatas, distances, documents, collection=collection)
+    else:
+        # BM25 re-ranking of the vector search candidates only
+        initial_question_preprocessed = preprocess_text(initial_question)
+        preprocessed_docs = [preprocess_text(doc) for doc in documents]
 
-    bm25 = BM25Okapi(preprocessed_docs)
-    bm25_scores = bm25.get_scores(initial_question_preprocessed)
+        bm25 = BM25Okapi(preprocessed_docs)
+        bm25_scores = bm25.get_scores(initial_question_preprocessed)
 
-    max_dist = max(distances) if len(distances) > 0 and max(distances) > 0 else 1
-    normalized_semantic_scores = [1 - (d / max_dist) for d in distances]
+        max_dist = max(distances) if len(distances) > 0 and max(distances) > 0 else 1
+        normalized_semantic_scores = [1 - (d / max_dist) for d in distances]
 
-    bm25_scores_list = list(bm25_scores) if hasattr(bm25_scores, '__iter__') else []
-    max_bm25 = max(bm25_scores_list) if len(bm25_scores_list) > 0 and max(bm25_scores_list) > 0 else 1
-    normalized_bm25_scores = [score / max_bm25 for score in bm25_scores_list]
+        bm25_scores_list = list(bm25_scores) if hasattr(bm25_scores, '__iter__') else []
+        max_bm25 = max(bm25_scores_list) if len(bm25_scores_list) > 0 and max(bm25_scores_list) > 0 else 1
+        normalized_bm25_scores = [score / max_bm25 for score in bm25_scores_list]
 
-    hybrid_scores = [
-        semantic_weight * sem + (1 - semantic_weight) * lex
-        for sem, lex in zip(normalized_semantic_scores, normalized_bm25_scores)
-    ]
+        hybrid_scores = [
+            semantic_weight * sem + (1 - semantic_weight) * lex
+            for sem, lex in zip(normalized_semantic_scores, normalized_bm25_scores)
+        ]
+        candidates = [
+            (metadata, distance, document, bm25_score, hybrid_score, False)
+            for metadata, distance, document, bm25_score, hybrid_score in zip(metadatas, distances, documents, bm25_scores_list, hybrid_scores)
+        ]
 
     reranked_results = []
-    for idx, (metadata, distance, document, bm25_score, hybrid_score) in enumerate(
-        zip(metadatas, distances, documents, bm25_scores_list, hybrid_scores)
-    ):
-        if use_adaptive_filtering and distance > effective_threshold:
+    for idx, (metadata, distance, document, bm25_score, hybrid_score, lexical_match) in enumerate(candidates):
+        if distance is None:
+            reranked_results.append((idx, metadata, distance, document, bm25_score, hybrid_score))
+            continue
+        # Top lexical matches are kept even when their embedding is far from the query
+        if use_adaptive_filtering and not lexical_match and distance > effective_threshold:
             if state.verbose_mode:
                 on_print(f"Filtered out result with distance {distance:.4f} > {effective_threshold:.4f}", Fore.WHITE + Style.DIM)
             continue
@@ -337,7 +458,8 @@ def query_vector_database(question, collection_name=None, n_results=None, answer
 
     for idx, metadata, distance, document, bm25_score, hybrid_score in reranked_results:
         if state.verbose_mode:
-            on_print(f"Result - Distance: {distance:.4f}, BM25: {bm25_score:.4f}, Hybrid: {hybrid_score:.4f}", Fore.WHITE + Style.DIM)
+            distance_str = f"{distance:.4f}" if distance is not None else "n/a"
+            on_print(f"Result - Distance: {distance_str}, BM25: {bm25_score:.4f}, Hybrid: {hybrid_score:.4f}", Fore.WHITE + Style.DIM)
 
         title = metadata.get("title", "")
         url = metadata.get("url", "")
@@ -367,7 +489,8 @@ def query_vector_database(question, collection_name=None, n_results=None, answer
     if return_metadata:
         avg_bm25 = sum(x[4] for x in reranked_results) / len(reranked_results) if reranked_results else 0.0
         avg_hybrid = sum(x[5] for x in reranked_results) / len(reranked_results) if reranked_results else 0.0
-        avg_distance = sum(x[2] for x in reranked_results) / len(reranked_results) if reranked_results else 0.0
+        known_distances = [x[2] for x in reranked_results if x[2] is not None]
+        avg_distance = sum(known_distances) / len(known_distances) if known_distances else 0.0
         return result_text, {
             'num_results': len(answers),
             'results': metadata_list,
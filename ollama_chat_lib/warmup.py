@@ -0,0 +1,112 @@
+"""Background preloading of the Ollama models used by the session."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ollama
+
+from ollama_chat_lib import state
+from ollama_chat_lib.telemetry import ollama_metrics, telemetry_purpose
+
+
+def parse_keep_alive(value):
+    """
+    Convert a --keep-alive value for Ollama: a number of seconds (negative to keep the models
+    loaded indefinitely, 0 to unload them after each request) or a duration such as '30m'.
+    """
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+class ModelWarmup:
+    """
+    Load Ollama models in the background, so that the first request to each does not wait for it.
+
+    A chat model is loaded by a chat request without messages, which Ollama answers as soon as
+    the model is in memory; an embeddings model by embedding a short text. Both requests pass
+    keep_alive, so that the models stay loaded as long as the following requests keep them.
+    Each model is loaded once, whatever the number of roles it has. All methods are thread-safe.
+    """
+
+    def __init__(self, keep_alive=None, max_workers=3):
+        self.keep_alive = keep_alive
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warmup")
+        self._lock = threading.Lock()
+        self._models = {}  # model name -> {"roles", "kind", "future", "seconds", "load_duration", "error"}
+
+    def start(self, model, role, embedding=False):
+        """Start loading a model in the background, unless it is already loading or loaded."""
+        if not model:
+            return
+        with self._lock:
+            entry = self._models.get(model)
+            if entry is not None:
+                if role not in entry["roles"]:
+                    entry["roles"].append(role)
+                return
+            entry = {"roles": [role], "embedding": embedding, "seconds": None, "load_duration": None, "error": None}
+            self._models[model] = entry
+            entry["future"] = self._executor.submit(self._load, model, entry)
+
+    def _load(self, model, entry):
+        started = time.perf_counter()
+        try:
+            if entry["embedding"]:
+                response = ollama.embed(model=model, input="warm-up", keep_alive=self.keep_alive)
+            else:
+                response = ollama.chat(model=model, messages=[], keep_alive=self.keep_alive)
+            metrics = ollama_metrics(response)
+        except Exception as e:
+            entry["error"] = str(e)
+            return
+        finally:
+            entry["seconds"] = time.perf_counter() - started
+        entry["load_duration"] = metrics["load_duration"]
+        if state.telemetry is not None:
+            with telemetry_purpose("warmup"):
+                state.telemetry.record(entry["seconds"], model=model, load_duration=metrics["load_duration"])
+
+    def wait(self, timeout=None):
+        """Wait until the models started so far are loaded; return False if the timeout expired first."""
+        with self._lock:
+            futures = [entry["future"] for entry in self._models.values()]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for future in futures:
+            try:
+                future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except Exception:
+                return False
+        return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def format_report(self):
+        """Return a one-line readiness report of the models, or an empty string if none was started."""
+        with self._lock:
+            entries = [(model, dict(entry)) for model, entry in self._models.items()]
+        ready, loading, failed = [], [], []
+        for model, entry in entries:
+            label = f"{model} ({', '.join(entry['roles'])})"
+            if not entry["future"].done():
+                loading.append(label)
+            elif entry["error"] is not None:
+                failed.append(f"{label}: {entry['error']}")
+            else:
+                ready.append(f"{label} in {entry['seconds']:.1f}s")
+        parts = []
+        if ready:
+            parts.append("ready: " + ", ".join(ready))
+        if loading:
+            parts.append("loading: " + ", ".join(loading))
+        if failed:
+            parts.append("failed: " + ", ".join(failed))
+        return "Models " + "; ".join(parts) if parts else ""
@@ -0,0 +1,253 @@
+"""Size- and age-bounded eviction for the web search cache collection."""
+
+import json
+import os
+import time
+from datetime import datetime
+
+from colorama import Fore, Style
+
+from ollama_chat_lib import state
+from ollama_chat_lib.constants import (
+    default_web_cache_eviction,
+    default_web_cache_max_chunks,
+    default_web_cache_max_size_mb,
+    default_web_cache_ttl_hours,
+    web_cache_eviction_headroom,
+    web_cache_scan_interval,
+)
+from ollama_chat_lib.index_manifest import collection_data_file
+from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib.lexical_index import get_lexical_index
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+
+def _timestamp(metadata):
+    """Fetch time of a chunk; chunks cached before fetch times were recorded fall back to their publication date."""
+    fetched_at = metadata.get('fetched_at')
+    if isinstance(fetched_at, (int, float)):
+        return float(fetched_at)
+    try:
+        return datetime.fromisoformat(metadata.get('published', '')).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class WebCacheManager:
+    """
+    Keep the web cache collection bounded.
+
+    Every cached chunk records its fetch time, last hit time and hit count in its metadata.
+    Chunks older than the TTL are deleted, and when the collection holds more chunks or bytes
+    than allowed, the least recently (LRU) or least frequently (LFU) used chunks are evicted.
+    Pages crawled again replace their previous chunks instead of accumulating copies.
+
+    Scanning the whole collection costs time proportional to its size, so the total size of
+    the chunks is kept in a usage file next to the collection: it is measured by each scan,
+    then increased by the size of the pages added since. The collection is only scanned again
+    when a limit is exceeded or the scan interval has passed. Deletions outside of a scan are
+    not subtracted, so the total can only overestimate the size of the cache.
+    """
+
+    def __init__(self, collection, max_chunks=None, max_bytes=None, ttl=None, policy="lru", verbose=False, usage_file=None):
+        """
+        :param collection: The ChromaDB web cache collection.
+        :param max_chunks: Maximum number of chunks, or None for no limit.
+        :param max_bytes: Maximum total size of the stored chunk texts, or None for no limit.
+        :param ttl: Seconds after which a chunk expires, or None to keep chunks until evicted.
+        :param policy: "lru" or "lfu".
+        :param usage_file: The JSON file recording the size of the cache and the time of the last scan
+                           (default: next to the collection data).
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown web cache eviction policy: {policy}")
+        self.collection = collection
+        self.max_chunks = max_chunks or None
+        self.max_bytes = max_bytes or None
+        self.ttl = ttl or None
+        self.policy = policy
+        self.verbose = verbose
+        self.usage_file = usage_file or collection_data_file(collection.name, "web_cache", ".json")
+
+    @classmethod
+    def from_state(cls, collection):
+        """Build a manager with the limits configured on the command line."""
+        max_chunks = state.web_cache_max_chunks if state.web_cache_max_chunks is not None else default_web_cache_max_chunks
+        max_size_mb = state.web_cache_max_size_mb if state.web_cache_max_size_mb is not None else default_web_cache_max_size_mb
+        ttl_hours = state.web_cache_ttl_hours if state.web_cache_ttl_hours is not None else default_web_cache_ttl_hours
+        return cls(
+            collection,
+            max_chunks=max_chunks,
+            max_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb else None,
+            ttl=ttl_hours * 3600 if ttl_hours else None,
+            policy=state.web_cache_eviction or default_web_cache_eviction,
+            verbose=state.verbose_mode
+        )
+
+    @staticmethod
+    def stamp(metadata, now=None):
+        """Return a copy of the metadata of a freshly fetched page, with its cache bookkeeping fields."""
+        now = time.time() if now is None else now
+        return dict(metadata, fetched_at=now, last_hit=now, hit_count=0)
+
+    def _delete(self, ids, reason):
+        if not ids:
+            return
+        if self.verbose:
+            on_print(f"Web cache: removing {len(ids)} {reason} chunks", Fore.WHITE + Style.DIM)
+        self.collection.delete(ids=ids)
+        lexical_index = get_lexical_index(self.collection.name, create=False)
+        if lexical_index is not None:
+            lexical_index.remove_documents(ids)
+
+    def replace_urls(self, urls):
+        """Delete the cached chunks of pages that are about to be indexed again."""
+        urls = list(dict.fromkeys(url for url in urls if url))
+        if not urls:
+            return 0
+        existing = self.collection.get(where={'url': {'$in': urls}}, include=[])
+        ids = existing.get('ids') or []
+        self._delete(ids, "re-crawled")
+        return len(ids)
+
+    def record_hits(self, results, now=None):
+        """
+        Update the hit count and last hit time of the chunks returned by a query.
+
+        :param results: The 'results' list of query_vector_database(..., return_metadata=True).
+        """
+        now = time.time() if now is None else now
+        ids = []
+        metadatas = []
+        for result in results or []:
+            metadata = result.get('metadata') or {}
+            document_id = metadata.get('id')
+            if not document_id:
+                continue
+            chunk_index = metadata.get('chunk_index')
+            ids.append(f"{document_id}_{chunk_index}" if chunk_index is not None else document_id)
+            metadatas.append(dict(metadata, last_hit=now, hit_count=int(metadata.get('hit_count') or 0) + 1))
+        if ids:
+            try:
+                self.collection.update(ids=ids, metadatas=metadatas)
+            except Exception as e:
+                if self.verbose:
+                    on_print(f"Web cache: could not record hits: {e}", Fore.YELLOW + Style.DIM)
+
+    def expire(self, now=None):
+        """
+        Delete the chunks fetched before the TTL, using a metadata filter rather than a full scan.
+
+        :return: The number of expired chunks.
+        """
+        if not self.ttl:
+            return 0
+        now = time.time() if now is None else now
+        expired = self.collection.get(where={'fetched_at': {'$lt': now - self.ttl}}, include=[])
+        ids = expired.get('ids') or []
+        self._delete(ids, "expired")
+        return len(ids)
+
+    def _entries(self, batch_size=1000):
+        include = ['metadatas', 'documents'] if self.max_bytes else ['metadatas']
+        offset = 0
+        while True:
+            batch = self.collection.get(include=include, limit=batch_size, offset=offset)
+            ids = batch.get('ids') or []
+            metadatas = batch.get('metadatas') or [None] * len(ids)
+            documents = batch.get('documents') or [None] * len(ids)
+            for chunk_id, metadata, document in zip(ids, metadatas, documents):
+                yield chunk_id, metadata or {}, len(document.encode('utf-8')) if document else 0
+            if len(ids) < batch_size:
+                break
+            offset += batch_size
+
+    def _eviction_key(self, entry):
+        _, metadata, _ = entry
+        fetched_at = _timestamp(metadata)
+        last_hit = metadata.get('last_hit')
+        last_hit = float(last_hit) if isinstance(last_hit, (int, float)) else fetched_at
+        if self.policy == "lfu":
+            return (int(metadata.get('hit_count') or 0), last_hit)
+        return (last_hit,)
+
+    def _load_usage(self):
+        try:
+            with open(self.usage_file, 'r', encoding='utf-8') as file:
+                usage = json.load(file)
+            return usage if isinstance(usage.get('bytes'), int) and isinstance(usage.get('scanned_at'), (int, float)) else None
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _save_usage(self, usage):
+        try:
+            with open(self.usage_file, 'w', encoding='utf-8') as file:
+                json.dump(usage, file)
+        except OSError as e:
+            if self.verbose:
+                on_print(f"Web cache: could not save its usage: {e}", Fore.YELLOW + Style.DIM)
+
+    def record_added(self, urls):
+        """Add the size of the chunks of newly indexed pages to the recorded size of the cache."""
+        urls = list(dict.fromkeys(url for url in urls if url))
+        usage = self._load_usage()
+        if not urls or usage is None or not self.max_bytes:
+            return
+        added = self.collection.get(where={'url': {'$in': urls}}, include=['documents'])
+        usage['bytes'] += sum(len(document.encode('utf-8')) for document in added.get('documents') or [] if document)
+        self._save_usage(usage)
+
+    def _scan_needed(self, now):
+        """Check, without scanning the collection, whether a limit may be exceeded or a scan is due."""
+        usage = self._load_usage()
+        if usage is None or now - usage['scanned_at'] >= web_cache_scan_interval:
+            return True
+        if self.max_bytes is not None and usage['bytes'] > self.max_bytes:
+            return True
+        return self.max_chunks is not None and self.collection.count() > self.max_chunks
+
+    def enforce(self, now=None, force=False):
+        """
+        Delete expired chunks, then evict chunks until the cache is within its size limits.
+        An eviction frees some headroom below the limits (web_cache_eviction_headroom).
+
+        :param force: Scan the collection even if no limit seems to be exceeded.
+        :return: The number of (expired, evicted) chunks.
+        """
+        if not (self.ttl or self.max_chunks or self.max_bytes):
+            return 0, 0
+        now = time.time() if now is None else now
+        if not force and not self._scan_needed(now):
+            return 0, 0
+
+        entries = list(self._entries())
+        expired = []
+        if self.ttl:
+            cutoff = now - self.ttl
+            expired = [entry[0] for entry in entries if _timestamp(entry[1]) < cutoff]
+            if expired:
+                expired_ids = set(expired)
+                entries = [entry for entry in entries if entry[0] not in expired_ids]
+        self._delete(expired, "expired")
+
+        evicted = []
+        total_bytes = sum(entry[2] for entry in entries)
+        count = len(entries)
+        max_chunks = self.max_chunks
+        if max_chunks is not None and count > max_chunks:
+            max_chunks -= int(max_chunks * web_cache_eviction_headroom)
+        max_bytes = self.max_bytes
+        if max_bytes is not None and total_bytes > max_bytes:
+            max_bytes -= int(max_bytes * web_cache_eviction_headroom)
+        for entry in sorted(entries, key=self._eviction_key):
+            over_count = max_chunks is not None and count > max_chunks
+            over_size = max_bytes is not None and total_bytes > max_bytes
+            if not (over_count or over_size):
+                break
+            evicted.append(entry[0])
+            count -= 1
+            total_bytes -= entry[2]
+        self._delete(evicted, f"least {'frequently' if self.policy == 'lfu' else 'recently'} used")
+        self._save_usage({'bytes': total_bytes, 'scanned_at': now})
+        return len(expired), len(evicted)
@@ -2,20 +2,54 @@
 import base64
 import getpass
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 
 import requests
 import chardet
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from colorama import Fore, Style
 from markdownify import MarkdownConverter  # noqa: F401 — used by extract_text_from_html
 from urllib.parse import urljoin, urlparse
 
-from ollama_chat_lib.io_hooks import on_print
+from ollama_chat_lib import state
+from ollama_chat_lib.constants import default_web_crawler_workers, default_web_crawler_per_host_limit, default_web_crawler_timeout, default_web_crawler_deadline
+from ollama_chat_lib.io_hooks import on_print, plugin_hooks
 from ollama_chat_lib.text_extraction import extract_text_from_html, extract_text_from_pdf
 
 
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    Return the HTTP session shared by all crawlers, so that connections to the same host
+    are kept alive and reused across pages and web searches.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max(default_web_crawler_workers, 10))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
 class SimpleWebCrawler:
-    def __init__(self, urls, llm_enabled=False, system_prompt='', selected_model='', temperature=0.1, verbose=False, plugins=[], num_ctx=None, ask_fn=None):
+    def __init__(self, urls, llm_enabled=False, system_prompt='', selected_model='', temperature=0.1, verbose=False, plugins=None, num_ctx=None, ask_fn=None,
+                 max_workers=None, per_host_limit=None, timeout=None, deadline=None):
+        """
+        :param plugins: Plugins whose stop_generation hook interrupts the crawl, the loaded plugins by default.
+        :param max_workers: Number of pages fetched and extracted concurrently.
+        :param per_host_limit: Maximum number of simultaneous requests to the same host.
+        :param timeout: Seconds allowed for each page request.
+        :param deadline: Seconds after which crawl() stops waiting and keeps the pages fetched so far.
+        """
         self.urls = urls
         self.articles = []
         self.llm_enabled = llm_enabled
@@ -23,13 +57,23 @@ class SimpleWebCrawler:
         self.selected_model = selected_model
         self.temperature = temperature
         self.verbose = verbose
-        self.plugins = plugins
+        self.plugins = state.plugins if plugins is None else plugins
+        # Hooks of plugins other than the loaded ones, which plugin_hooks does not cover
+        self._stop_hooks = tuple(
+            hook for hook in (getattr(plugin, "stop_generation", None) for plugin in self.plugins) if callable(hook)
+        )
         self.num_ctx = num_ctx
         self._ask_fn = ask_fn
-
-    def fetch_page(self, url):
+        self.max_workers = max_workers or state.web_crawler_workers or default_web_crawler_workers
+        self.per_host_limit = per_host_limit or state.web_crawler_per_host_limit or default_web_crawler_per_host_limit
+        self.timeout = timeout or state.web_crawler_timeout or default_web_crawler_timeout
+        self.deadline = deadline or state.web_crawler_deadline or default_web_crawler_deadline
+        self._host_semaphores = {}
+        self._host_semaphores_lock = threading.Lock()
+
+    def fetch_page(self, url, timeout=None):
         try:
-            response = requests.get(url, timeout=10)
+            response = get_http_session().get(url, timeout=timeout or self.timeout)
             response.raise_for_status()
             return response.content
         except requests.exceptions.RequestException as e:
@@ -63,42 +107,85 @@ class SimpleWebCrawler:
                 on_print(f"Error decoding content with {detected_encoding}, using ISO-8859-1 as fallback.", Fore.RED)
             return content.decode('ISO-8859-1')
 
-    def crawl(self, task=None):
-        for url in self.urls:
-            continue_response_generation = True
-            for plugin in self.plugins:
-                if hasattr(plugin, "stop_generation") and callable(getattr(plugin, "stop_generation")):
-                    plugin_response = getattr(plugin, "stop_generation")()
-                    if plugin_response:
-                        continue_response_generation = False
+    def _stop_requested(self):
+        hooks = plugin_hooks("stop_generation") if self.plugins is state.plugins else self._stop_hooks
+        return any(hook() for hook in hooks)
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._host_semaphores_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.Semaphore(self.per_host_limit)
+            return self._host_semaphores[host]
+
+    def _fetch_and_extract(self, url, deadline_time):
+        """Fetch a page and extract its text; runs in a worker thread, so extraction overlaps with other fetches."""
+        with self._host_semaphore(url):
+            remaining = deadline_time - time.monotonic()
+            if remaining <= 0:
+                return None
+            if self.verbose:
+                on_print(f"Fetching URL: {url}", Fore.WHITE + Style.DIM)
+            content = self.fetch_page(url, timeout=min(self.timeout, remaining))
+        if not content:
+            return None
+
+        if url.lower().endswith('.pdf'):
+            if self.verbose:
+                on_print(f"Extracting text from PDF: {url}", Fore.WHITE + Style.DIM)
+            extracted_text = extract_text_from_pdf(content)
+        else:
+            if self.verbose:
+                on_print(f"Extracting text from HTML: {url}", Fore.WHITE + Style.DIM)
+            decoded_content = self.decode_content(content)
+            extracted_text = extract_text_from_html(decoded_content)
+        return {'url': url, 'text': extracted_text}
+
+    def iter_articles(self, task=None):
+        """
+        Fetch all URLs concurrently and yield the articles in completion order.
+
+        Stops early when a plugin's stop_generation() returns True, or when the crawl
+        deadline is reached; pages still in flight are then abandoned.
+        """
+        if not self.urls or self._stop_requested():
+            return
+
+        deadline_time = time.monotonic() + self.deadline
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.urls)), thread_name_prefix="web-crawler")
+        try:
+            futures = {executor.submit(self._fetch_and_extract, url, deadline_time): url for url in self.urls}
+            try:
+                for future in as_completed(futures, timeout=max(0.0, deadline_time - time.monotonic())):
+                    try:
+                        article = future.result()
+                    except Exception as e:
+                        if self.verbose:
+                            on_print(f"Error processing URL {futures[future]}: {e}", Fore.RED)
+                        article = None
+
+                    if self._stop_requested():
                         break
 
-            if not continue_response_generation:
-                break
+                    if article is None:
+                        continue
 
-            if self.verbose:
-                on_print(f"Fetching URL: {url}", Fore.WHITE + Style.DIM)
-            content = self.fetch_page(url)
-            if content:
-                if url.lower().endswith('.pdf'):
-                    if self.verbose:
-                        on_print(f"Extracting text from PDF: {url}", Fore.WHITE + Style.DIM)
-                    extracted_text = extract_text_from_pdf(content)
-                else:
-                    if self.verbose:
-                        on_print(f"Extracting text from HTML: {url}", Fore.WHITE + Style.DIM)
-                    decoded_content = self.decode_content(content)
-                    extracted_text = extract_text_from_html(decoded_content)
-
-                article = {'url': url, 'text': extracted_text}
-
-                if self.llm_enabled and task:
-                    if self.verbose:
-                        on_print(Fore.WHITE + Style.DIM + f"Using LLM to process the content. Task: {task}")
-                    llm_result = self.ask_llm(content=extracted_text, user_input=task)
-                    article['llm_result'] = llm_result
-
-                self.articles.append(article)
+                    if self.llm_enabled and task:
+                        if self.verbose:
+                            on_print(Fore.WHITE + Style.DIM + f"Using LLM to process the content. Task: {task}")
+                        article['llm_result'] = self.ask_llm(content=article['text'], user_input=task)
+
+                    yield article
+            except FutureTimeoutError:
+                if self.verbose:
+                    pending = [url for future, url in futures.items() if not future.done()]
+                    on_print(f"Web crawl deadline of {self.deadline}s reached, skipping: {', '.join(pending)}", Fore.YELLOW + Style.DIM)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def crawl(self, task=None):
+        for article in self.iter_articles(task):
+            self.articles.append(article)
 
     def get_articles(self):
         return self.articles
@@ -42,7 +42,12 @@ def reset_globals():
         "other_instance_url", "listening_port", "user_prompt",
         "plugins_folder", "interactive_mode", "temperature",
         "session_created_files", "chroma_db_path",
-        "chroma_client_host", "chroma_client_port",
+        "chroma_client_host", "chroma_client_port", "model_registry",
+        "web_crawler_workers", "web_crawler_per_host_limit",
+        "web_crawler_timeout", "web_crawler_deadline", "web_search_summaries",
+        "tool_result_cache", "web_cache_max_chunks", "web_cache_max_size_mb", "web_cache_ttl_hours", "web_cache_eviction",
+        "alternate_model", "parallel_alternate_model", "context_window_manager", "prompt_cache_stats",
+        "background_memory", "memory_worker", "memory_compaction_threshold", "live_highlighting", "token_batch_ms", "telemetry", "keep_alive", "model_warmup", "response_cache",
     ]
     for n in names:
         saved[n] = getattr(state, n, None)
@@ -0,0 +1,144 @@
+"""Tests for the token-aware context window manager."""
+from unittest.mock import MagicMock
+
+from ollama_chat_lib.context_window import ContextWindowManager, SUMMARY_PREFIX
+
+
+def _conversation(turns, words=100):
+    conversation = [{"role": "system", "content": "You are a helpful assistant."}]
+    for i in range(turns):
+        conversation.append({"role": "user", "content": f"question {i} " + "word " * words})
+        conversation.append({"role": "assistant", "content": f"answer {i} " + "word " * words})
+    return conversation
+
+
+class TestContextWindowManager:
+
+    def test_conversation_within_budget_unchanged(self):
+        manager = ContextWindowManager(0.75)
+        conversation = _conversation(2)
+        assert manager.fit(conversation, num_ctx=2048) is conversation
+
+    def test_budget_capped_by_model_context_length(self):
+        manager = ContextWindowManager(0.5)
+        assert manager.get_budget(8192) == 4096
+        assert manager.get_budget(8192, context_length=4096) == 2048
+        assert manager.get_budget(None, context_length=131072) == manager.get_budget()
+
+    def test_token_counts_cached_per_message(self):
+        manager = ContextWindowManager(0.75)
+        message = {"role": "user", "content": "hello " * 100}
+        assert manager.count_message_tokens(message) == manager.count_message_tokens(dict(message))
+        assert len(manager._token_cache) == 1
+
+    def test_oldest_turns_dropped_without_summarizer(self):
+        manager = ContextWindowManager(0.75, summarize=False)
+        conversation = _conversation(20)
+        conversation.append({"role": "user", "content": "current question"})
+        trimmed = manager.fit(conversation, num_ctx=2048)
+        assert manager.count_tokens(trimmed) <= manager.get_budget(2048)
+        assert trimmed[0]["content"] == "You are a helpful assistant."
+        assert trimmed[-1]["content"] == "current question"
+        assert not any(message["content"].startswith("question 0 ") for message in trimmed)
+        assert trimmed[1]["content"].startswith("question ")
+
+    def test_history_left_whole(self):
+        manager = ContextWindowManager(0.75, summarize=False)
+        conversation = _conversation(20)
+        conversation.append({"role": "user", "content": "current question"})
+        expected = [dict(message) for message in conversation]
+        manager.fit(conversation, num_ctx=2048)
+        assert conversation == expected
+
+    def test_dropped_turns_summarized(self):
+        ask_fn = MagicMock(return_value="The user asked many questions.")
+        manager = ContextWindowManager(0.75, model="model", ask_fn=ask_fn)
+        conversation = _conversation(20)
+        conversation.append({"role": "user", "content": "current question"})
+        trimmed = manager.fit(conversation, num_ctx=2048)
+        ask_fn.assert_called_once()
+        assert "question 0" in ask_fn.call_args.args[1]
+        assert trimmed[1] == {"role": "system", "content": f"{SUMMARY_PREFIX}\nThe user asked many questions."}
+
+        # The next trim updates the existing summary instead of adding another one
+        ask_fn.return_value = "Updated summary."
+        conversation.extend(_conversation(20)[1:])
+        conversation.append({"role": "user", "content": "next question"})
+        trimmed = manager.fit(conversation, num_ctx=2048)
+        assert SUMMARY_PREFIX in ask_fn.call_args.args[1]
+        assert sum(1 for message in trimmed if message["content"].startswith(SUMMARY_PREFIX)) == 1
+        assert trimmed[1]["content"].endswith("Updated summary.")
+        assert not any(message["content"].startswith(SUMMARY_PREFIX) for message in conversation)
+
+    def test_replaced_history_forgets_summary(self):
+        ask_fn = MagicMock(return_value="summary")
+        manager = ContextWindowManager(0.75, model="model", ask_fn=ask_fn)
+        conversation = _conversation(20)
+        conversation.append({"role": "user", "content": "current question"})
+        manager.fit(conversation, num_ctx=2048)
+
+        conversation = [{"role": "system", "content": "You are a helpful assistant."}, {"role": "user", "content": "new question"}]
+        assert manager.fit(conversation, num_ctx=2048) is conversation
+
+    def test_injected_memories_kept_with_current_turn(self):
+        manager = ContextWindowManager(0.75, summarize=False)
+        conversation = _conversation(20)
+        conversation.append({"role": "system", "content": "Relevant memories"})
+        conversation.append({"role": "user", "content": "current question"})
+        assert manager.fit(conversation, num_ctx=2048)[-2:] == conversation[-2:]
+
+    def test_trims_below_budget_for_several_turns(self):
+        ask_fn = MagicMock(return_value="summary")
+        manager = ContextWindowManager(0.75, model="model", ask_fn=ask_fn)
+        conversation = _conversation(20)
+        conversation.append({"role": "user", "content": "current question"})
+        first = manager.fit(conversation, num_ctx=2048)
+        conversation.append({"role": "assistant", "content": "short answer"})
+        conversation.append({"role": "user", "content": "short follow-up"})
+        second = manager.fit(conversation, num_ctx=2048)
+        ask_fn.assert_called_once()
+        # Same prefix from one request to the next, so that the server can reuse its prompt cache
+        assert second[:len(first)] == first
+
+    def test_past_tool_outputs_shortened(self):
+        manager = ContextWindowManager(0.75, summarize=False)
+        conversation = [
+            {"role": "system", "content": "system"},
+            {"role": "user", "content": "search the web"},
+            {"role": "tool", "content": "result " * 2000},
+            {"role": "assistant", "content": "done"},
+            {"role": "user", "content": "thanks"},
+        ]
+        trimmed = manager.fit(conversation, num_ctx=4096)
+        assert trimmed[1]["content"] == "search the web"
+        assert "tokens of tool output omitted" in trimmed[2]["content"]
+        assert len(trimmed) == 5
+        assert conversation[2]["content"] == "result " * 2000
+
+    def test_current_turn_tool_output_kept(self):
+        manager = ContextWindowManager(0.75, summarize=False)
+        tool_output = "result " * 2000
+        conversation = [
+            {"role": "system", "content": "system"},
+            {"role": "user", "content": "search the web"},
+            {"role": "tool", "content": tool_output},
+        ]
+        assert manager.fit(conversation, num_ctx=2048)[2]["content"] == tool_output
+
+
+class TestPromptCacheStats:
+
+    def test_hit_rate_from_prompt_eval_count(self):
+        from ollama_chat_lib.context_window import PromptCacheStats
+        stats = PromptCacheStats()
+        conversation = [{"role": "user", "content": "x" * 384}]  # ~100 tokens
+        assert stats.record(conversation, 100) == 0
+        assert stats.record(conversation, 10) == 0.9
+        assert stats.hit_rate == 1 - 110 / 200
+        assert "over 2 requests" in stats.format_stats()
+
+    def test_missing_prompt_eval_count_ignored(self):
+        from ollama_chat_lib.context_window import PromptCacheStats
+        stats = PromptCacheStats()
+        assert stats.record([{"role": "user", "content": "hi"}], None) is None
+        assert stats.requests == 0
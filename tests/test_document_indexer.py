@@ -0,0 +1,374 @@
+"""Tests for DocumentIndexer batching and the pipelined ingestion engine."""
+import pytest
+from unittest.mock import patch, MagicMock
+from ollama_chat_lib.document_indexer import DocumentIndexer
+
+
+def _make_indexer(tmp_path, existing_ids=None, embeddings_model="embed-model"):
+    client = MagicMock()
+    collection = MagicMock()
+    collection.name = "test"
+    collection.get.return_value = {"ids": list(existing_ids or [])}
+    client.get_or_create_collection.return_value = collection
+    return DocumentIndexer(str(tmp_path), "test", client, embeddings_model)
+
+
+def _fake_embed(model, input, options=None):
+    return {"embeddings": [[float(len(text))] for text in input]}
+
+
+def _write_docs(tmp_path, count, text="Some plain text content."):
+    for i in range(count):
+        (tmp_path / f"doc{i}.txt").write_text(f"{text} {i}")
+
+
+class TestIndexDocumentsBatching:
+
+    def test_documents_embedded_in_batches(self, tmp_path):
+        _write_docs(tmp_path, 5)
+        indexer = _make_indexer(tmp_path)
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            indexer.index_documents(allow_chunks=False, no_chunking_confirmation=True,
+                                    skip_existing=False, embed_batch_size=2, upsert_batch_size=10)
+        assert [len(c.kwargs["input"]) for c in mock_embed.call_args_list] == [2, 2, 1]
+        assert indexer.collection.upsert.call_count == 1
+        kwargs = indexer.collection.upsert.call_args.kwargs
+        assert len(kwargs["ids"]) == 5
+        assert len(kwargs["embeddings"]) == 5
+
+    def test_upserts_split_by_upsert_batch_size(self, tmp_path):
+        _write_docs(tmp_path, 5)
+        indexer = _make_indexer(tmp_path)
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed):
+            indexer.index_documents(allow_chunks=False, no_chunking_confirmation=True,
+                                    skip_existing=False, embed_batch_size=8, upsert_batch_size=2)
+        sizes = [len(c.kwargs["ids"]) for c in indexer.collection.upsert.call_args_list]
+        assert sum(sizes) == 5
+        assert max(sizes) <= 2
+
+    def test_embeddings_match_stored_documents(self, tmp_path):
+        (tmp_path / "a.txt").write_text("short")
+        (tmp_path / "b.txt").write_text("a much longer document")
+        indexer = _make_indexer(tmp_path)
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed):
+            indexer.index_documents(allow_chunks=False, no_chunking_confirmation=True, skip_existing=False)
+        kwargs = indexer.collection.upsert.call_args.kwargs
+        for document, embedding in zip(kwargs["documents"], kwargs["embeddings"]):
+            assert embedding == [float(len(document))]
+
+    def test_chunks_skip_existing_uses_single_lookup(self, tmp_path):
+        _write_docs(tmp_path, 1, text="word " * 400)
+        indexer = _make_indexer(tmp_path)
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed):
+            indexer.index_documents(no_chunking_confirmation=True, add_summary=False)
+        # One lookup for the whole document instead of one per chunk
+        assert indexer.collection.get.call_count == 1
+        ids = indexer.collection.upsert.call_args.kwargs["ids"]
+        assert len(ids) > 1
+        assert all(chunk_id.endswith(f"_{i}") for i, chunk_id in enumerate(ids))
+
+    def test_existing_chunks_not_reembedded(self, tmp_path):
+        _write_docs(tmp_path, 1, text="word " * 400)
+        indexer = _make_indexer(tmp_path)
+        document_id = indexer._generate_document_id(str(tmp_path / "doc0.txt"))
+        indexer.collection.get.return_value = {"ids": [f"{document_id}_0"]}
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed):
+            indexer.index_documents(no_chunking_confirmation=True, add_summary=False)
+        ids = indexer.collection.upsert.call_args.kwargs["ids"]
+        assert f"{document_id}_0" not in ids
+
+    def test_no_embeddings_model_upserts_without_embeddings(self, tmp_path):
+        _write_docs(tmp_path, 2)
+        indexer = _make_indexer(tmp_path, embeddings_model=None)
+        with patch("ollama_chat_lib.embeddings.ollama.embed") as mock_embed:
+            indexer.index_documents(allow_chunks=False, no_chunking_confirmation=True, skip_existing=False)
+        mock_embed.assert_not_called()
+        assert "embeddings" not in indexer.collection.upsert.call_args.kwargs
+
+    def test_failed_batch_reported(self, tmp_path):
+        _write_docs(tmp_path, 2)
+        indexer = _make_indexer(tmp_path)
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=RuntimeError("boom")), \
+             patch("ollama_chat_lib.document_indexer.on_print") as mock_print:
+            indexer.index_documents(allow_chunks=False, no_chunking_confirmation=True, skip_existing=False)
+        indexer.collection.upsert.assert_not_called()
+        assert any("boom" in str(c.args[0]) for c in mock_print.call_args_list)
+
+
+class TestIngestionPipeline:
+
+    def _run(self, tmp_path, **kwargs):
+        indexer = _make_indexer(tmp_path)
+        options = dict(allow_chunks=False, no_chunking_confirmation=True, skip_existing=False,
+                       pipeline=True, extraction_workers=0, inference_workers=2, embed_batch_size=2)
+        options.update(kwargs)
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            indexer.index_documents(**options)
+        return indexer, mock_embed
+
+    def _upserted_ids(self, indexer):
+        return [i for c in indexer.collection.upsert.call_args_list for i in c.kwargs["ids"]]
+
+    def test_all_documents_indexed(self, tmp_path):
+        _write_docs(tmp_path, 5)
+        indexer, mock_embed = self._run(tmp_path)
+        assert sorted(self._upserted_ids(indexer)) == [f"doc{i}" for i in range(5)]
+        assert all(len(c.kwargs["input"]) <= 2 for c in mock_embed.call_args_list)
+
+    def test_matches_sequential_records(self, tmp_path):
+        _write_docs(tmp_path, 2, text="word " * 400)
+        sequential, _ = self._run(tmp_path, pipeline=False, allow_chunks=True, add_summary=False)
+        pipelined, _ = self._run(tmp_path, allow_chunks=True, add_summary=False)
+        assert sorted(self._upserted_ids(sequential)) == sorted(self._upserted_ids(pipelined))
+
+    def test_summaries_generated_in_pipeline(self, tmp_path):
+        _write_docs(tmp_path, 3)
+        ask_fn = MagicMock(return_value="A summary.")
+        client = MagicMock()
+        client.get_or_create_collection.return_value.get.return_value = {"ids": []}
+        indexer = DocumentIndexer(str(tmp_path), "test", client, "embed-model", summary_model="chat", ask_fn=ask_fn)
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed):
+            indexer.index_documents(no_chunking_confirmation=True, pipeline=True, extraction_workers=0)
+        assert ask_fn.call_count == 3
+        documents = [d for c in indexer.collection.upsert.call_args_list for d in c.kwargs["documents"]]
+        assert all(d.startswith("[Document Summary: A summary.]") for d in documents)
+
+    def test_extraction_in_process_pool(self, tmp_path):
+        _write_docs(tmp_path, 3)
+        indexer, _ = self._run(tmp_path, extraction_workers=1)
+        assert len(self._upserted_ids(indexer)) == 3
+
+    def test_unreadable_file_reported(self, tmp_path):
+        _write_docs(tmp_path, 1)
+        (tmp_path / "broken.pdf").write_bytes(b"not a pdf")
+        with patch("ollama_chat_lib.ingestion_pipeline.on_print") as mock_print:
+            indexer, _ = self._run(tmp_path)
+        assert self._upserted_ids(indexer) == ["doc0"]
+        assert any("broken.pdf" in str(c.args[0]) for c in mock_print.call_args_list)
+
+    def test_report_lists_stages(self, tmp_path):
+        from ollama_chat_lib.ingestion_pipeline import IngestionPipeline
+        pipeline = IngestionPipeline(MagicMock(), extraction_workers=0)
+        report = pipeline.report()
+        for stage in ("extract", "summary", "embed", "upsert"):
+            assert stage in report
+
+
+class TestIndexManifest:
+
+    @pytest.fixture()
+    def docs(self, tmp_path, reset_globals):
+        from ollama_chat_lib import state
+        state.chroma_db_path = str(tmp_path / "db")
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        return docs
+
+    def _indexer(self, docs, stored):
+        """Build an indexer whose collection keeps upserted embeddings in `stored`."""
+        indexer = _make_indexer(docs)
+
+        def get(ids=None, include=None):
+            found = [i for i in ids if i in stored]
+            return {"ids": found, "embeddings": [stored[i] for i in found]}
+
+        def upsert(ids, documents, metadatas, embeddings=None):
+            for i, record_id in enumerate(ids):
+                stored[record_id] = embeddings[i] if embeddings else None
+
+        def delete(ids):
+            for record_id in ids:
+                stored.pop(record_id, None)
+
+        indexer.collection.get.side_effect = get
+        indexer.collection.upsert.side_effect = upsert
+        indexer.collection.delete.side_effect = delete
+        return indexer
+
+    def _index(self, indexer, **kwargs):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            indexer.index_documents(no_chunking_confirmation=True, add_summary=False, use_manifest=True, **kwargs)
+        return [text for c in mock_embed.call_args_list for text in c.kwargs["input"]]
+
+    def test_unchanged_files_skipped_without_reading(self, docs):
+        _write_docs(docs, 2)
+        stored = {}
+        self._index(self._indexer(docs, stored))
+        indexer = self._indexer(docs, stored)
+        with patch.object(indexer, "read_file") as mock_read:
+            embedded = self._index(indexer)
+        mock_read.assert_not_called()
+        assert embedded == []
+
+    def test_only_changed_chunks_embedded(self, docs):
+        paragraphs = [f"Paragraph {i}. " + "lorem ipsum " * 70 for i in range(3)]
+        path = docs / "doc.txt"
+        path.write_text("\n\n".join(paragraphs))
+        stored = {}
+        first = self._index(self._indexer(docs, stored))
+        assert len(first) == 3
+
+        paragraphs[1] = "Paragraph 1 was edited. " + "dolor sit " * 80
+        path.write_text("\n\n".join(paragraphs))
+        second = self._index(self._indexer(docs, stored))
+        assert len(second) == 1
+        assert "edited" in second[0]
+
+    def test_changed_file_with_summaries_fully_reembedded(self, docs):
+        paragraphs = [f"Paragraph {i}. " + "lorem ipsum " * 70 for i in range(3)]
+        path = docs / "doc.txt"
+        path.write_text("\n\n".join(paragraphs))
+        stored = {}
+        for version, summary in enumerate(["First summary.", "Second summary."]):
+            if version:
+                paragraphs[1] = "Paragraph 1 was edited. " + "dolor sit " * 80
+                path.write_text("\n\n".join(paragraphs))
+            indexer = self._indexer(docs, stored)
+            indexer.summary_model = "chat"
+            indexer._ask_fn = MagicMock(return_value=summary)
+            with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+                indexer.index_documents(no_chunking_confirmation=True, add_summary=True, use_manifest=True)
+            embedded = [text for c in mock_embed.call_args_list for text in c.kwargs["input"]]
+            assert len(embedded) == 3
+            assert all(text.startswith(f"[Document Summary: {summary}]") for text in embedded)
+        indexer.collection.get.assert_not_called()
+
+    def test_stale_chunks_deleted_when_file_shrinks(self, docs):
+        path = docs / "doc.txt"
+        path.write_text("word " * 600)
+        stored = {}
+        self._index(self._indexer(docs, stored))
+        assert len(stored) > 1
+
+        path.write_text("word " * 10)
+        indexer = self._indexer(docs, stored)
+        self._index(indexer)
+        assert sorted(stored) == ["doc_0"]
+        indexer.collection.delete.assert_called_once()
+
+    def test_deleted_file_chunks_removed(self, docs):
+        _write_docs(docs, 2)
+        stored = {}
+        self._index(self._indexer(docs, stored))
+        (docs / "doc1.txt").unlink()
+        self._index(self._indexer(docs, stored))
+        assert sorted(stored) == ["doc0_0"]
+
+    def test_deleted_file_keeps_chunks_of_same_named_file(self, docs):
+        (docs / "a").mkdir()
+        (docs / "b").mkdir()
+        (docs / "a" / "notes.txt").write_text("Notes of a.")
+        (docs / "b" / "notes.txt").write_text("Notes of b.")
+        stored = {}
+        self._index(self._indexer(docs, stored))
+        (docs / "a" / "notes.txt").unlink()
+        indexer = self._indexer(docs, stored)
+        self._index(indexer)
+        assert sorted(stored) == ["notes_0"]
+        indexer.collection.delete.assert_not_called()
+
+    def test_touched_file_with_same_content_not_reindexed(self, docs):
+        import os
+        _write_docs(docs, 1)
+        stored = {}
+        self._index(self._indexer(docs, stored))
+        path = docs / "doc0.txt"
+        os.utime(path, (1, 1))
+        indexer = self._indexer(docs, stored)
+        with patch.object(indexer, "read_file") as mock_read:
+            self._index(indexer)
+        mock_read.assert_not_called()
+
+    def test_manifest_used_by_pipeline(self, docs):
+        _write_docs(docs, 3)
+        stored = {}
+        self._index(self._indexer(docs, stored), pipeline=True, extraction_workers=0)
+        assert len(stored) == 3
+        embedded = self._index(self._indexer(docs, stored), pipeline=True, extraction_workers=0)
+        assert embedded == []
+
+    def test_interrupted_pipeline_keeps_unwritten_files_pending(self, docs):
+        from ollama_chat_lib.ingestion_pipeline import IngestionPipeline
+        _write_docs(docs, 3)
+        stored = {}
+        submit_embeddings = IngestionPipeline._submit_embeddings
+
+        def interrupt_once_queued(pipeline, final=False):
+            if pipeline._embed_queue:
+                raise KeyboardInterrupt
+            return submit_embeddings(pipeline, final)
+
+        with patch.object(IngestionPipeline, "_submit_embeddings", interrupt_once_queued):
+            self._index(self._indexer(docs, stored), pipeline=True, extraction_workers=0)
+        assert stored == {}
+        embedded = self._index(self._indexer(docs, stored), pipeline=True, extraction_workers=0)
+        assert len(embedded) == 3
+
+    def test_changed_embedding_model_reindexes(self, docs):
+        _write_docs(docs, 1)
+        stored = {}
+        self._index(self._indexer(docs, stored))
+        indexer = self._indexer(docs, stored)
+        indexer.model = "other-model"
+        assert len(self._index(indexer)) == 1
+
+
+class TestIndexRecords:
+
+    def _index(self, indexer, records, **kwargs):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            written = indexer.index_records(records, **kwargs)
+        return written, mock_embed
+
+    def test_records_indexed_without_files(self, tmp_path):
+        indexer = DocumentIndexer(None, "test", MagicMock(**{"get_or_create_collection.return_value.get.return_value": {"ids": []}}), "embed-model")
+        records = [("First page. " * 200, {"url": "https://example.com/a"}), ("Second page.", {"url": "https://example.com/b"})]
+        with patch("ollama_chat_lib.document_indexer.os.listdir") as mock_listdir:
+            written, mock_embed = self._index(indexer, records, embed_batch_size=64)
+        mock_listdir.assert_not_called()
+        ids = [i for c in indexer.collection.upsert.call_args_list for i in c.kwargs["ids"]]
+        metadatas = [m for c in indexer.collection.upsert.call_args_list for m in c.kwargs["metadatas"]]
+        assert written == len(ids) > 2
+        assert "https_example_com_b_0" in ids
+        assert {m["url"] for m in metadatas} == {"https://example.com/a", "https://example.com/b"}
+        assert all("filePath" not in m for m in metadatas)
+        assert mock_embed.call_count == 1
+
+    def test_long_urls_get_bounded_stable_ids(self, tmp_path):
+        indexer = _make_indexer(tmp_path)
+        url = "https://example.com/" + "segment/" * 20
+        first = indexer._generate_record_id(url)
+        assert len(first) <= 63
+        assert first == indexer._generate_record_id(url)
+        assert first != indexer._generate_record_id(url + "other")
+
+    def test_summaries_optional_and_concurrent(self, tmp_path):
+        import threading
+        barrier = threading.Barrier(3, timeout=5)
+
+        def ask_fn(*args, **kwargs):
+            barrier.wait()
+            return "A summary."
+
+        client = MagicMock()
+        client.get_or_create_collection.return_value.get.return_value = {"ids": []}
+        indexer = DocumentIndexer(None, "test", client, "embed-model", summary_model="chat", ask_fn=ask_fn)
+        records = [(f"Page {i}.", {"url": f"https://example.com/{i}"}) for i in range(3)]
+        with patch.object(indexer, "_generate_document_summary", wraps=indexer._generate_document_summary) as mock_summary:
+            self._index(indexer, records, add_summary=True, workers=3)
+        assert all(c.args[1] is None for c in mock_summary.call_args_list)
+        documents = [d for c in indexer.collection.upsert.call_args_list for d in c.kwargs["documents"]]
+        assert len(documents) == 3
+        assert all(d.startswith("[Document Summary: A summary.]") for d in documents)
+
+        indexer.collection.upsert.reset_mock()
+        self._index(indexer, records)
+        documents = [d for c in indexer.collection.upsert.call_args_list for d in c.kwargs["documents"]]
+        assert sorted(documents) == ["Page 0.", "Page 1.", "Page 2."]
+
+    def test_fully_indexed_records_skipped(self, tmp_path):
+        indexer = _make_indexer(tmp_path, existing_ids=["https_example_com_a_0"])
+        written, mock_embed = self._index(indexer, [("Short page.", {"url": "https://example.com/a"})])
+        assert written == 0
+        mock_embed.assert_not_called()
+        indexer.collection.upsert.assert_not_called()
@@ -0,0 +1,144 @@
+"""Tests for the disk cache and the embedding service."""
+import time
+import pytest
+from unittest.mock import patch
+from ollama_chat_lib import state
+from ollama_chat_lib.cache import DiskCache
+from ollama_chat_lib.embeddings import EmbeddingCache, embed_texts, embed_text
+
+
+def _fake_embed(model, input, options=None):
+    return {"embeddings": [[float(len(text)), 0.5] for text in input]}
+
+
+@pytest.fixture()
+def embedding_cache(tmp_path):
+    saved = state.embedding_cache
+    state.embedding_cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    yield state.embedding_cache
+    state.embedding_cache.close()
+    state.embedding_cache = saved
+
+
+# ── DiskCache ────────────────────────────────────────────────────────────
+
+class TestDiskCache:
+
+    def test_set_and_get(self, tmp_path):
+        cache = DiskCache(str(tmp_path / "c.sqlite"))
+        cache.set("a", b"1")
+        assert cache.get("a") == b"1"
+        assert cache.get("b") is None
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "c.sqlite")
+        cache = DiskCache(path)
+        cache.set("a", b"1")
+        cache.close()
+        assert DiskCache(path).get("a") == b"1"
+
+    def test_lru_eviction_by_entries(self, tmp_path):
+        cache = DiskCache(str(tmp_path / "c.sqlite"), max_entries=2)
+        cache.set("a", b"1")
+        time.sleep(0.01)
+        cache.set("b", b"2")
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.set("c", b"3")
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1"
+        assert cache.evictions == 1
+
+    def test_eviction_by_bytes(self, tmp_path):
+        cache = DiskCache(str(tmp_path / "c.sqlite"), max_bytes=10)
+        cache.set("a", b"x" * 6)
+        time.sleep(0.01)
+        cache.set("b", b"y" * 6)
+        assert cache.total_bytes() <= 10
+        assert cache.get("b") == b"y" * 6
+
+    def test_ttl_expiry(self, tmp_path):
+        cache = DiskCache(str(tmp_path / "c.sqlite"), ttl=0.01)
+        cache.set("a", b"1")
+        time.sleep(0.05)
+        assert cache.get("a") is None
+
+    def test_stats(self, tmp_path):
+        cache = DiskCache(str(tmp_path / "c.sqlite"))
+        cache.set("a", b"12")
+        cache.get("a")
+        stats = cache.stats()
+        assert stats["entries"] == 1
+        assert stats["bytes"] == 2
+        assert stats["hit_rate"] == 1.0
+
+
+# ── EmbeddingCache / embed_texts ─────────────────────────────────────────
+
+class TestEmbeddingService:
+
+    def test_without_cache(self):
+        saved = state.embedding_cache
+        state.embedding_cache = None
+        try:
+            with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+                assert embed_text("abc", "m") == [3.0, 0.5]
+            mock_embed.assert_called_once()
+        finally:
+            state.embedding_cache = saved
+
+    def test_cached_texts_not_recomputed(self, embedding_cache):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            first = embed_texts(["a", "bb"], "m")
+            second = embed_texts(["bb", "a", "ccc"], "m")
+        assert second == [first[1], first[0], [3.0, 0.5]]
+        assert [c.kwargs["input"] for c in mock_embed.call_args_list] == [["a", "bb"], ["ccc"]]
+
+    def test_duplicate_texts_embedded_once(self, embedding_cache):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            vectors = embed_texts(["header", "header", "row"], "m")
+        assert vectors[0] == vectors[1]
+        assert mock_embed.call_args.kwargs["input"] == ["header", "row"]
+
+    def test_key_depends_on_model_and_options(self, embedding_cache):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            embed_text("a", "m1")
+            embed_text("a", "m2")
+            embed_text("a", "m1", options={"num_ctx": 512})
+            embed_text("a", "m1")
+        assert mock_embed.call_count == 3
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    def test_updated_model_not_served_from_cache(self, mock_registry_ollama, embedding_cache, tmp_path, reset_globals):
+        from ollama_chat_lib.model_selection import ModelRegistry
+        state.model_registry = ModelRegistry(str(tmp_path / "registry.json"))
+        mock_registry_ollama.list.return_value = {"models": [{"model": "m:latest", "digest": "abc"}]}
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            embed_text("a", "m:latest")
+            embed_text("a", "m:latest")
+            assert mock_embed.call_count == 1
+
+            mock_registry_ollama.list.return_value = {"models": [{"model": "m:latest", "digest": "def"}]}
+            state.model_registry.refresh()
+            embed_text("a", "m:latest")
+        assert mock_embed.call_count == 2
+        assert EmbeddingCache.make_key("m", "a") == EmbeddingCache.make_key("m", "a", model_digest=None)
+
+    def test_batches_requests(self, embedding_cache):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed) as mock_embed:
+            embed_texts([f"t{i}" for i in range(5)], "m", batch_size=2)
+        assert [len(c.kwargs["input"]) for c in mock_embed.call_args_list] == [2, 2, 1]
+
+    def test_float16_storage(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "e.sqlite"), dtype="float16")
+        cache.set_vectors("m", {"a": [0.1, 0.5, 1.0]})
+        vector = cache.get_vectors("m", ["a"])["a"]
+        assert vector == pytest.approx([0.1, 0.5, 1.0], abs=1e-3)
+        assert cache.total_bytes() == 1 + 3 * 2
+
+    def test_invalid_dtype(self, tmp_path):
+        with pytest.raises(ValueError):
+            EmbeddingCache(str(tmp_path / "e.sqlite"), dtype="int8")
@@ -0,0 +1,71 @@
+"""Tests for the fake Ollama server used by the benchmarks."""
+import pytest
+import ollama
+from benchmarks.fake_ollama_server import FakeOllamaServer, deterministic_embedding
+
+
+@pytest.fixture()
+def server():
+    with FakeOllamaServer(dimensions=8) as fake:
+        yield fake
+
+
+@pytest.fixture()
+def client(server):
+    return ollama.Client(host=server.url)
+
+
+class TestFakeOllamaServer:
+
+    def test_embed_is_deterministic(self, client):
+        first = client.embed(model="fake-embed", input=["a", "b"])["embeddings"]
+        second = client.embed(model="fake-embed", input="a")["embeddings"]
+        assert len(first) == 2
+        assert len(first[0]) == 8
+        assert first[0] == second[0]
+        assert first[0] != first[1]
+
+    def test_legacy_embeddings_endpoint(self, client):
+        response = client.embeddings(model="fake-embed", prompt="a")
+        assert response["embedding"] == pytest.approx(deterministic_embedding("a", 8))
+
+    def test_chat_non_streaming(self, client):
+        response = client.chat(model="fake-chat", messages=[{"role": "user", "content": "hello"}], stream=False)
+        assert response["message"]["content"] == "Echo: hello"
+        assert response["prompt_eval_count"] >= 1
+
+    def test_chat_streaming(self, client):
+        chunks = list(client.chat(model="fake-chat", messages=[{"role": "user", "content": "hello world"}], stream=True))
+        assert "".join(chunk["message"]["content"] for chunk in chunks).strip() == "Echo: hello world"
+        assert chunks[-1]["done"] is True
+
+    def test_tools_unsupported_error(self, client):
+        tools = [{"type": "function", "function": {"name": "f", "description": "", "parameters": {"type": "object", "properties": {}}}}]
+        with pytest.raises(ollama.ResponseError, match="does not support tools"):
+            client.chat(model="fake-embed", messages=[{"role": "user", "content": "x"}], tools=tools, stream=False)
+
+    def test_list_and_show(self, client):
+        names = [model["model"] for model in client.list()["models"]]
+        assert names == ["fake-chat", "fake-embed"]
+        assert "tools" in client.show("fake-chat")["capabilities"]
+
+    def test_unknown_model(self, client):
+        with pytest.raises(ollama.ResponseError):
+            client.embed(model="missing", input="a")
+
+    def test_request_counters(self, server, client):
+        client.embed(model="fake-embed", input=["a", "b", "c"])
+        client.chat(model="fake-chat", messages=[{"role": "user", "content": "x"}], stream=False)
+        assert server.stats["requests"] == {"embed": 1, "chat": 1}
+        assert server.stats["embedded_inputs"] == 3
+
+
+class TestBenchCorpus:
+
+    def test_generated_corpus_is_indexable(self, tmp_path):
+        from benchmarks.bench_indexing import generate_corpus, FORMATS
+        from ollama_chat_lib.text_extraction import extract_text_from_file
+        count = generate_corpus(str(tmp_path), files_per_format=1, paragraphs_per_file=2)
+        assert count == len(FORMATS)
+        for path in tmp_path.iterdir():
+            assert extract_text_from_file(str(path)).strip()
@@ -4,7 +4,7 @@ import pytest
 from unittest.mock import patch, MagicMock
 from io import StringIO
 import ollama_chat as oc
-from ollama_chat_lib import state
+from ollama_chat_lib import io_hooks, state
 
 
 class TestOnPrint:
@@ -194,3 +194,122 @@ class TestOnPrompt:
         with patch.object(sys, "stdout", buf):
             oc.on_prompt(">> ", style="S")
         assert "S>> " in buf.getvalue()
+
+
+class TestCaptureOutput:
+
+    def test_output_buffered_until_replayed(self, reset_globals):
+        from ollama_chat_lib.io_hooks import capture_output, replay_output
+        state.plugins = []
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            with capture_output() as buffer:
+                oc.on_print("line", prompt="Alt: ")
+                oc.on_llm_token_response("token")
+                oc.on_stdout_flush()
+            assert mock_stdout.getvalue() == ""
+            replay_output(buffer)
+            assert mock_stdout.getvalue() == "Alt: line\ntoken"
+
+    def test_capture_is_per_thread(self, reset_globals):
+        import threading
+        from ollama_chat_lib.io_hooks import capture_output
+        state.plugins = []
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            with capture_output() as buffer:
+                thread = threading.Thread(target=oc.on_print, args=("other thread",))
+                thread.start()
+                thread.join()
+            assert buffer == []
+            assert "other thread" in mock_stdout.getvalue()
+
+
+class TestPluginHooks:
+
+    def test_table_built_by_discover_plugins(self, reset_globals, tmp_path):
+        from ollama_chat_lib import io_hooks
+        (tmp_path / "sample.py").write_text(
+            "class SamplePlugin:\n"
+            "    def on_print(self, message):\n"
+            "        return True\n"
+        )
+        plugins = oc.discover_plugins(plugin_folder=str(tmp_path))
+        assert io_hooks._hook_table[0] is plugins
+        assert len(io_hooks.plugin_hooks("on_print")) == 1
+        assert io_hooks.plugin_hooks("stop_generation") == ()
+
+    def test_table_rebuilt_when_plugins_change(self, reset_globals, dummy_plugin, handling_plugin, capsys):
+        from ollama_chat_lib.io_hooks import plugin_hooks
+        state.plugins = []
+        assert plugin_hooks("on_print") == ()
+        state.plugins = [dummy_plugin]
+        oc.on_print("first")
+        state.plugins.append(handling_plugin)
+        oc.on_print("second")
+        captured = capsys.readouterr()
+        assert "first" in captured.out
+        assert "second" not in captured.out
+        assert dummy_plugin.calls["on_print"] == ["first", "second"]
+
+
+class TestTokenBatching:
+
+    def test_tokens_coalesced_until_end_of_line(self, reset_globals, dummy_plugin):
+        state.plugins = [dummy_plugin]
+        state.token_batch_ms = 60000
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            for token in ["Hel", "lo", " wor", "ld\n", "next"]:
+                oc.on_llm_token_response(token)
+            assert mock_stdout.getvalue() == "Hello world\n"
+            assert dummy_plugin.calls["on_llm_token_response"] == ["Hello world\n"]
+            oc.on_print("done")
+            assert mock_stdout.getvalue() == "Hello world\nnext" + "done\n"
+
+    def test_batch_delivered_once_interval_elapsed(self, reset_globals):
+        state.plugins = []
+        state.token_batch_ms = 10
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout, \
+                patch("ollama_chat_lib.io_hooks.time.monotonic", side_effect=[0.0, 0.005, 0.005, 0.02]):
+            oc.on_llm_token_response("a")
+            oc.on_llm_token_response("b")
+            assert mock_stdout.getvalue() == ""
+            oc.on_llm_token_response("c")
+            assert mock_stdout.getvalue() == "abc"
+
+    def test_stdout_flush_delivers_pending_tokens(self, reset_globals, dummy_plugin):
+        state.plugins = [dummy_plugin]
+        state.token_batch_ms = 60000
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            oc.on_llm_token_response("tail of")
+            oc.on_llm_token_response(" a line")
+            assert mock_stdout.getvalue() == ""
+            oc.on_stdout_flush()
+            assert mock_stdout.getvalue() == "tail of a line"
+            assert dummy_plugin.calls["on_stdout_flush"] == [True]
+
+    def test_token_flush_waits_for_the_batch(self, reset_globals, dummy_plugin):
+        state.plugins = [dummy_plugin]
+        state.token_batch_ms = 60000
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            for token in ["Hel", "lo\n", "next"]:
+                oc.on_llm_token_response(token)
+                io_hooks.on_token_flush()
+            assert mock_stdout.getvalue() == "Hello\n"
+            assert dummy_plugin.calls["on_stdout_flush"] == [True]
+            oc.on_stdout_flush()
+            assert mock_stdout.getvalue() == "Hello\nnext"
+
+    def test_style_change_starts_a_new_batch(self, reset_globals):
+        state.plugins = []
+        state.token_batch_ms = 60000
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            oc.on_llm_thinking_token_response("think", "T")
+            oc.on_llm_token_response("answer", "A", "Bot: ")
+            oc.on_llm_token_response(" more", "A")
+            oc.on_llm_token_response("\n", "A")
+            assert mock_stdout.getvalue() == "TthinkABot: answer more\n"
+
+    def test_disabled_by_default(self, reset_globals):
+        state.plugins = []
+        with patch("sys.stdout", new_callable=StringIO) as mock_stdout:
+            oc.on_llm_token_response("tok")
+            assert mock_stdout.getvalue() == "tok"
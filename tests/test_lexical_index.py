@@ -0,0 +1,184 @@
+"""Tests for the BM25 lexical index and hybrid retrieval."""
+import math
+import pytest
+from unittest.mock import patch
+
+import chromadb
+
+import ollama_chat as oc
+from ollama_chat_lib import state
+from ollama_chat_lib.document_indexer import DocumentIndexer
+from ollama_chat_lib.lexical_index import LexicalIndex, get_lexical_index, delete_lexical_index
+
+
+def _unit(index, dimensions=8):
+    return [1.0 if i == index else 0.0 for i in range(dimensions)]
+
+
+def _fake_embed(model, input, options=None):
+    return {"embeddings": [_unit(len(text) % 8) for text in input]}
+
+
+@pytest.fixture()
+def chroma(tmp_path, reset_globals):
+    state.chroma_db_path = str(tmp_path / "db")
+    state.lexical_indexes = {}
+    state.use_lexical_index = True
+    client = chromadb.PersistentClient(path=state.chroma_db_path)
+    yield client
+    for lexical_index in state.lexical_indexes.values():
+        lexical_index.close()
+    state.lexical_indexes = {}
+    state.use_lexical_index = False
+
+
+class TestLexicalIndex:
+
+    def test_rare_terms_rank_first(self):
+        index = LexicalIndex(":memory:")
+        index.add_documents(
+            ["a", "b", "c"],
+            ["common words about retrieval", "common words about zephyr retrieval", "common words only"]
+        )
+        results = index.search("zephyr retrieval")
+        assert [doc_id for doc_id, _ in results] == ["b", "a"]
+        assert results[0][1] > results[1][1] > 0
+
+    def test_idf_uses_whole_corpus(self):
+        index = LexicalIndex(":memory:")
+        index.add_documents(["a", "b"], ["alpha beta", "alpha gamma"])
+        # df(alpha) = 2, df(beta) = 1 over N = 2 documents
+        scores = index.get_scores("beta")
+        expected_idf = math.log((2 - 1 + 0.5) / (1 + 0.5) + 1.0)
+        assert scores == {"a": pytest.approx(expected_idf)}
+
+    def test_replace_and_remove_update_statistics(self):
+        index = LexicalIndex(":memory:")
+        index.add_documents(["a", "b"], ["alpha beta", "alpha gamma"])
+        index.add_documents(["a"], ["delta"])
+        assert len(index) == 2
+        assert set(index.get_scores("alpha")) == {"b"}
+        assert set(index.get_scores("delta")) == {"a"}
+
+        index.remove_documents(["b", "missing"])
+        assert len(index) == 1
+        assert index.get_scores("alpha") == {}
+
+    def test_empty_query_and_index(self):
+        index = LexicalIndex(":memory:")
+        assert index.search("anything") == []
+        index.add_documents(["a"], ["alpha"])
+        assert index.search("the and") == []
+
+    def test_persisted(self, tmp_path):
+        path = str(tmp_path / "lexical.sqlite")
+        index = LexicalIndex(path)
+        index.add_documents(["a"], ["persistent alpha"])
+        index.close()
+        assert LexicalIndex(path).search("alpha")[0][0] == "a"
+
+    def test_sync_with_collection(self, chroma):
+        collection = chroma.get_or_create_collection("sync")
+        collection.add(ids=["a", "b"], documents=["alpha one", "beta two"], embeddings=[_unit(0), _unit(1)])
+        index = get_lexical_index("sync")
+        index.add_documents(["stale"], ["gamma"])
+        assert not index.is_in_sync(collection)
+
+        assert index.sync(collection) == (2, 1)
+        assert index.is_in_sync(collection)
+        assert index.ids() == {"a", "b"}
+
+    def test_replaced_document_detected(self, chroma):
+        collection = chroma.get_or_create_collection("replaced")
+        collection.add(ids=["a", "c"], documents=["alpha one", "gamma three"], embeddings=[_unit(0), _unit(2)])
+        index = get_lexical_index("replaced")
+        index.add_documents(["a", "b"], ["alpha one", "beta two"])
+        assert index.is_in_sync(collection, compare_ids=False)
+        assert not index.is_in_sync(collection)
+        assert index.sync(collection) == (1, 1)
+        assert index.ids() == {"a", "c"}
+
+    def test_sync_indexes_embedded_text(self, chroma):
+        collection = chroma.get_or_create_collection("full_docs")
+        collection.add(ids=["doc_0"], documents=["The whole document about zeppelins and turbines."],
+                       metadatas=[{"store_full_docs": True, "embedded_text": "The chunk about turbines."}], embeddings=[_unit(0)])
+        index = get_lexical_index("full_docs")
+        index.sync(collection)
+        assert index.search("turbines")[0][0] == "doc_0"
+        assert index.search("zeppelins") == []
+
+    def test_delete_lexical_index(self, chroma):
+        index = get_lexical_index("deleted")
+        index.add_documents(["a"], ["alpha"])
+        delete_lexical_index("deleted")
+        assert get_lexical_index("deleted", create=False) is None
+
+
+class TestLexicalIndexMaintenance:
+
+    def _index(self, chroma, docs):
+        indexer = DocumentIndexer(str(docs), "docs", chroma, "embed-model")
+        with patch("ollama_chat_lib.embeddings.ollama.embed", side_effect=_fake_embed):
+            indexer.index_documents(no_chunking_confirmation=True, add_summary=False, use_manifest=True)
+        return indexer
+
+    def test_indexer_keeps_index_in_sync(self, chroma, tmp_path):
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        (docs / "a.txt").write_text("The quarterly report mentions the XJ9000 turbine.")
+        (docs / "b.txt").write_text("Notes about gardening and tomatoes.")
+        indexer = self._index(chroma, docs)
+
+        lexical_index = get_lexical_index("docs")
+        assert lexical_index.is_in_sync(indexer.collection)
+        assert lexical_index.search("xj9000")[0][0] == "a_0"
+
+        (docs / "a.txt").unlink()
+        (docs / "b.txt").write_text("Notes about gardening and cucumbers.")
+        self._index(chroma, docs)
+        assert lexical_index.ids() == {"b_0"}
+        assert lexical_index.search("xj9000") == []
+        assert lexical_index.search("cucumbers")[0][0] == "b_0"
+
+    def test_existing_collection_backfilled(self, chroma, tmp_path):
+        collection = chroma.get_or_create_collection("docs")
+        collection.add(ids=["old"], documents=["legacy document about zeppelins"], embeddings=[_unit(3)])
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        (docs / "new.txt").write_text("A new document.")
+        self._index(chroma, docs)
+        assert get_lexical_index("docs").search("zeppelins")[0][0] == "old"
+
+
+class TestHybridQuery:
+
+    def test_lexical_match_outside_vector_candidates_returned(self, chroma):
+        collection = chroma.get_or_create_collection("hybrid")
+        ids = [f"near_{i}" for i in range(30)]
+        documents = [f"Generic text number {i} about machines." for i in range(30)]
+        embeddings = [[1.0, 0.01 * i] + [0.0] * 6 for i in range(30)]
+        ids.append("exact")
+        documents.append("Maintenance manual of the XJ9000 turbine.")
+        embeddings.append(_unit(5))
+        collection.add(ids=ids, documents=documents, embeddings=embeddings, metadatas=[{"id": doc_id} for doc_id in ids])
+
+        state.collection = collection
+        state.current_collection_name = "hybrid"
+        state.embeddings_model = "embed-model"
+        with patch("ollama_chat_lib.vector_db.embed_text", return_value=_unit(0)):
+            result, metadata = oc.query_vector_database("XJ9000 turbine", n_results=5, expand_query=False, return_metadata=True)
+
+        assert "XJ9000" in result.split("\n\n")[0]
+        assert metadata["results"][0]["bm25_score"] > 0
+        assert metadata["results"][0]["distance"] is not None
+
+    def test_falls_back_to_candidate_reranking_when_disabled(self, chroma):
+        state.use_lexical_index = False
+        collection = chroma.get_or_create_collection("plain")
+        collection.add(ids=["a"], documents=["alpha"], embeddings=[_unit(0)], metadatas=[{"id": "a"}])
+        state.collection = collection
+        state.current_collection_name = "plain"
+        with patch("ollama_chat_lib.vector_db.embed_text", return_value=_unit(0)):
+            result = oc.query_vector_database("alpha", query_embeddings_model="embed-model", expand_query=False)
+        assert result == "alpha"
+        assert get_lexical_index("plain", create=False) is None
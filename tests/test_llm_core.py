@@ -1,10 +1,16 @@
 """Safety-net tests for LLM core functions BEFORE extraction."""
 
+import threading
+import time
+
+import ollama
 import pytest
 from unittest.mock import patch, MagicMock, PropertyMock
 
 import ollama_chat as oc
 from ollama_chat_lib import state
+from ollama_chat_lib.llm_core import handle_tool_response, _tool_is_concurrency_safe
+from ollama_chat_lib.utils import not_concurrency_safe
 
 
 # ── ask_ollama ───────────────────────────────────────────────────────────
@@ -96,6 +102,114 @@ class TestHandleToolResponse:
         assert result is None
 
 
+class TestParallelToolCalls:
+
+    @staticmethod
+    def _tool(name):
+        return {"type": "function", "function": {"name": name, "description": name, "parameters": {"type": "object", "properties": {"query": {"type": "string"}}}}}
+
+    @pytest.fixture()
+    def parallel(self, reset_globals):
+        saved = (state.parallel_tool_calls, state.max_tool_workers, state.tool_timeout)
+        state.verbose_mode = False
+        state.plugins = []
+        state.parallel_tool_calls = True
+        state.max_tool_workers = 4
+        state.tool_timeout = None
+        yield
+        state.parallel_tool_calls, state.max_tool_workers, state.tool_timeout = saved
+
+    def _handle(self, calls, functions):
+        conversation = []
+        tools = [self._tool(name) for name in functions]
+        with patch("ollama_chat_lib.llm_core.ask_ollama_with_conversation", return_value="final answer"):
+            result = handle_tool_response(calls, True, conversation, "model", 0.1, None, tools, False, globals_fn=lambda: functions)
+        return result, conversation
+
+    def test_calls_run_concurrently_in_order(self, parallel):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def search(query):
+            barrier.wait()
+            time.sleep(0.05 if query == "first" else 0)
+            return f"results for {query}"
+
+        calls = [{"function": {"name": "search", "arguments": {"query": q}}, "id": q} for q in ("first", "second", "third")]
+        result, conversation = self._handle(calls, {"search": search})
+        assert result == "final answer"
+        assert [m["content"] for m in conversation] == ["results for first", "results for second", "results for third"]
+        assert [m["tool_call_id"] for m in conversation] == ["first", "second", "third"]
+
+    def test_unsafe_tools_run_alone(self, parallel):
+        running = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def track(name):
+            with lock:
+                if running:
+                    overlaps.append((name, list(running)))
+                running.append(name)
+            time.sleep(0.05)
+            with lock:
+                running.remove(name)
+            return name
+
+        def search(query):
+            return track(f"search {query}")
+
+        @not_concurrency_safe
+        def write(query):
+            return track("write")
+
+        calls = [{"function": {"name": name, "arguments": {"query": q}}} for name, q in (("search", "a"), ("search", "b"), ("write", "c"), ("search", "d"))]
+        _, conversation = self._handle(calls, {"search": search, "write": write})
+        assert [m["content"] for m in conversation] == ["search a", "search b", "write", "search d"]
+        assert overlaps == [("search b", ["search a"])] or overlaps == [("search a", ["search b"])]
+
+    def test_timeout_reported_to_model(self, parallel):
+        state.tool_timeout = 0.1
+        release = threading.Event()
+
+        def slow(query):
+            release.wait(5)
+            return "too late"
+
+        def fast(query):
+            return "fast result"
+
+        calls = [{"function": {"name": "slow", "arguments": {"query": "x"}}}, {"function": {"name": "fast", "arguments": {"query": "y"}}}]
+        with patch("ollama_chat_lib.llm_core.on_print"):
+            _, conversation = self._handle(calls, {"slow": slow, "fast": fast})
+        release.set()
+        assert "did not respond within 0.1 seconds" in conversation[0]["content"]
+        assert conversation[1]["content"] == "fast result"
+
+    def test_plugin_can_opt_out(self, parallel):
+        class Plugin:
+            concurrency_safe = False
+
+            def plugin_tool(self, query):
+                return query
+
+        state.plugins = [Plugin()]
+        assert not _tool_is_concurrency_safe("plugin_tool")
+        assert _tool_is_concurrency_safe("search", lambda: {"search": lambda query: query})
+        assert not _tool_is_concurrency_safe("create_file", lambda: {"create_file": oc.create_file})
+
+    def test_sequential_when_disabled(self, parallel):
+        state.parallel_tool_calls = False
+        threads = []
+
+        def search(query):
+            threads.append(threading.current_thread())
+            return query
+
+        calls = [{"function": {"name": "search", "arguments": {"query": q}}} for q in ("a", "b")]
+        self._handle(calls, {"search": search})
+        assert threads == [threading.current_thread()] * 2
+
+
 # ── ask_ollama_with_conversation (OpenAI path) ───────────────────────────
 
 class TestAskOllamaWithConversation:
@@ -137,6 +251,185 @@ class TestAskOllamaWithConversation:
         result = oc.ask_ollama_with_conversation(conversation, "llama3:latest", tools=tools, stream_active=False)
         assert result == "Hello from Ollama!"
 
+    @patch("ollama_chat_lib.llm_core.handle_tool_response", return_value="tool result")
+    @patch("ollama_chat_lib.llm_core.generate_tool_response", return_value=[{"function": {"name": "test", "arguments": {}}}])
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    def test_known_tool_less_model_skips_native_tool_call(self, mock_ollama, mock_is_ollama, mock_generate, mock_handle, reset_globals):
+        state.use_openai = False
+        state.use_azure_openai = False
+        state.syntax_highlighting = True
+        state.think_mode_on = False
+        state.model_registry = MagicMock()
+        state.model_registry.supports.return_value = False
+
+        conversation = [{"role": "user", "content": "Hi"}]
+        tools = [{"type": "function", "function": {"name": "test", "description": "t"}}]
+        result = oc.ask_ollama_with_conversation(conversation, "gemma:latest", tools=tools, stream_active=False)
+        assert result == "tool result"
+        mock_ollama.chat.assert_not_called()
+        state.model_registry.supports.assert_called_once_with("gemma:latest", "tools")
+        assert mock_handle.call_args[0][1] is False  # model_support_tools
+
+    @patch("ollama_chat_lib.llm_core.handle_tool_response", return_value="tool result")
+    @patch("ollama_chat_lib.llm_core.generate_tool_response", return_value=[{"function": {"name": "test", "arguments": {}}}])
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama.chat", side_effect=ollama.ResponseError("gemma does not support tools"))
+    def test_tools_error_recorded_in_registry(self, mock_chat, mock_is_ollama, mock_generate, mock_handle, reset_globals):
+        state.use_openai = False
+        state.use_azure_openai = False
+        state.syntax_highlighting = True
+        state.think_mode_on = False
+        state.model_registry = MagicMock()
+        state.model_registry.supports.return_value = None
+
+        conversation = [{"role": "user", "content": "Hi"}]
+        tools = [{"type": "function", "function": {"name": "test", "description": "t"}}]
+        result = oc.ask_ollama_with_conversation(conversation, "gemma:latest", tools=tools, stream_active=False)
+        assert result == "tool result"
+        state.model_registry.set_capability.assert_called_once_with("gemma:latest", "tools", False)
+
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    @patch("ollama_chat_lib.llm_core.on_prompt")
+    @patch("ollama_chat_lib.llm_core.on_stdout_flush")
+    @patch("ollama_chat_lib.llm_core.on_llm_token_response")
+    def test_streaming_records_prompt_eval_count(self, mock_token, mock_flush, mock_prompt, mock_ollama, mock_is_ollama, reset_globals):
+        from ollama_chat_lib.context_window import PromptCacheStats
+        state.use_openai = False
+        state.use_azure_openai = False
+        state.syntax_highlighting = False
+        state.interactive_mode = False
+        state.plugins = []
+        state.think_mode_on = False
+        state.prompt_cache_stats = PromptCacheStats()
+
+        mock_ollama.chat.return_value = iter([
+            {"message": {"content": "Hello"}, "done": False},
+            {"message": {"content": ""}, "done": True, "prompt_eval_count": 10},
+        ])
+
+        conversation = [{"role": "system", "content": "system " * 200}, {"role": "user", "content": "Hi"}]
+        result = oc.ask_ollama_with_conversation(conversation, "llama3:latest", stream_active=True)
+        assert result == "Hello"
+        assert state.prompt_cache_stats.requests == 1
+        assert state.prompt_cache_stats.evaluated_tokens == 10
+        assert state.prompt_cache_stats.hit_rate > 0.9
+
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    @patch("ollama_chat_lib.llm_core.on_prompt")
+    @patch("ollama_chat_lib.llm_core.on_stdout_flush")
+    @patch("ollama_chat_lib.llm_core.on_llm_token_response")
+    def test_streaming_records_telemetry(self, mock_token, mock_flush, mock_prompt, mock_ollama, mock_is_ollama, reset_globals):
+        from ollama_chat_lib.telemetry import TelemetryCollector, telemetry_purpose
+        state.use_openai = False
+        state.use_azure_openai = False
+        state.syntax_highlighting = False
+        state.interactive_mode = False
+        state.plugins = []
+        state.think_mode_on = False
+        state.verbose_mode = False
+        state.telemetry = TelemetryCollector()
+
+        mock_ollama.chat.return_value = iter([
+            {"message": {"content": "Hello"}, "done": False},
+            {"message": {"content": ""}, "done": True, "prompt_eval_count": 10, "prompt_eval_duration": 50_000_000,
+             "eval_count": 20, "eval_duration": 400_000_000, "load_duration": 2_000_000_000},
+        ])
+
+        with telemetry_purpose("summary"):
+            oc.ask_ollama_with_conversation([{"role": "user", "content": "Hi"}], "llama3:latest", stream_active=True)
+        stats = state.telemetry.summary()["summary"]
+        assert stats["calls"] == 1
+        assert stats["tokens_per_second_p50"] == pytest.approx(50.0)
+        assert stats["ttft_p50"] is not None
+        assert stats["load_stalls"] == 1
+
+
+class TestResponseCache:
+
+    @pytest.fixture
+    def ollama_state(self, reset_globals):
+        state.use_openai = False
+        state.use_azure_openai = False
+        state.syntax_highlighting = False
+        state.interactive_mode = False
+        state.plugins = []
+        state.think_mode_on = False
+        state.verbose_mode = False
+
+    def _ask(self, temperature=0.1, stream_active=False):
+        return oc.ask_ollama("Summarize.", "Some document", "llama3:latest", temperature, no_bot_prompt=True, stream_active=stream_active)
+
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    def test_second_call_served_from_cache(self, mock_ollama, mock_is_ollama, ollama_state):
+        from ollama_chat_lib.response_cache import ResponseCache
+        from ollama_chat_lib.telemetry import TelemetryCollector
+        state.response_cache = ResponseCache(":memory:")
+        state.telemetry = TelemetryCollector()
+        mock_ollama.chat.return_value = {"message": {"role": "assistant", "content": "A summary."}}
+
+        assert self._ask() == "A summary."
+        assert self._ask() == "A summary."
+        mock_ollama.chat.assert_called_once()
+        assert state.response_cache.hits == 1
+        assert [record["backend"] for record in state.telemetry._records["chat"]] == ["ollama", "response-cache"]
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    def test_updated_model_not_served_from_cache(self, mock_ollama, mock_is_ollama, mock_registry_ollama, ollama_state, tmp_path):
+        from ollama_chat_lib.response_cache import ResponseCache
+        state.response_cache = ResponseCache(":memory:")
+        state.model_registry = oc.ModelRegistry(str(tmp_path / "registry.json"), miss_refresh_interval=0)
+        mock_registry_ollama.list.return_value = {"models": [{"model": "llama3:latest", "digest": "abc"}]}
+        mock_ollama.chat.return_value = {"message": {"role": "assistant", "content": "Old summary."}}
+        assert self._ask() == "Old summary."
+        assert self._ask() == "Old summary."
+
+        mock_registry_ollama.list.return_value = {"models": [{"model": "llama3:latest", "digest": "def"}]}
+        state.model_registry.refresh()
+        mock_ollama.chat.return_value = {"message": {"role": "assistant", "content": "New summary."}}
+        assert self._ask() == "New summary."
+        assert mock_ollama.chat.call_count == 2
+
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    def test_streamed_and_high_temperature_calls_not_cached(self, mock_ollama, mock_is_ollama, ollama_state):
+        from ollama_chat_lib.response_cache import ResponseCache
+        state.response_cache = ResponseCache(":memory:")
+        mock_ollama.chat.side_effect = lambda **kwargs: iter([{"message": {"content": "Hi"}, "done": True}]) if kwargs["stream"] else {"message": {"content": "Hi"}}
+
+        self._ask(temperature=0.8)
+        self._ask(temperature=0.8)
+        self._ask(stream_active=True)
+        self._ask(stream_active=True)
+        assert mock_ollama.chat.call_count == 4
+        assert len(state.response_cache) == 0
+
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    def test_record_then_replay(self, mock_ollama, mock_is_ollama, ollama_state, tmp_path):
+        from ollama_chat_lib.response_cache import ResponseCache
+        path = str(tmp_path / "responses.sqlite")
+        mock_ollama.chat.return_value = {"message": {"role": "assistant", "content": "Recorded."}}
+        state.response_cache = ResponseCache(path, mode="record")
+        assert self._ask(temperature=0.9) == "Recorded."
+        assert self._ask(temperature=0.9) == "Recorded."
+        assert mock_ollama.chat.call_count == 2
+        state.response_cache.close()
+
+        mock_ollama.chat.reset_mock()
+        state.response_cache = ResponseCache(path, mode="replay")
+        with patch("ollama_chat_lib.llm_core.on_print") as mock_print:
+            assert self._ask(temperature=0.9) == "Recorded."
+            assert self._ask(temperature=0.5) == ""
+        mock_ollama.chat.assert_not_called()
+        assert "replay" in mock_print.call_args[0][0]
+        state.response_cache.close()
+
 
 # ── ask_openai_with_conversation ─────────────────────────────────────────
 
@@ -175,3 +468,60 @@ class TestAskOpenaiWithConversation:
         )
         assert result == ""
         assert done is True
+
+
+# ── live highlighting of streamed responses ──────────────────────────────
+
+class TestLiveHighlighting:
+
+    def _ask(self, mock_ollama, chunks):
+        mock_ollama.chat.return_value = iter([{"message": {"content": chunk}, "done": False} for chunk in chunks] + [{"message": {"content": ""}, "done": True}])
+        return oc.ask_ollama_with_conversation([{"role": "user", "content": "Hi"}], "llama3:latest", stream_active=True)
+
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    @patch("ollama_chat_lib.llm_core.on_llm_token_response")
+    @patch("ollama_chat_lib.llm_core.on_stdout_flush")
+    @patch("ollama_chat_lib.llm_core.on_stdout_write")
+    def test_response_highlighted_while_streamed(self, mock_write, mock_flush, mock_token, mock_ollama, mock_is_ollama, reset_globals):
+        from ollama_chat_lib.llm_core import response_rendered_live
+        state.use_openai = False
+        state.use_azure_openai = False
+        state.syntax_highlighting = True
+        state.live_highlighting = True
+        state.interactive_mode = True
+        state.alternate_model = None
+        state.plugins = []
+        state.think_mode_on = False
+
+        with patch("ollama_chat_lib.llm_core.print_spinning_wheel"):
+            result = self._ask(mock_ollama, ["# Title", "\nSome **bold**", " text\n", "Last line"])
+        assert result == "# Title\nSome **bold** text\nLast line"
+        assert response_rendered_live()
+        written = [c.args[0] for c in mock_write.call_args_list]
+        assert len(written) >= 2
+        assert "".join(written) == oc.colorize(result)
+        assert mock_write.call_args_list[0].args[2] == "\rBot: "
+
+    @patch("ollama_chat_lib.llm_core.is_model_an_ollama_model", return_value=True)
+    @patch("ollama_chat_lib.llm_core.ollama")
+    @patch("ollama_chat_lib.llm_core.on_llm_token_response")
+    @patch("ollama_chat_lib.llm_core.on_stdout_flush")
+    @patch("ollama_chat_lib.llm_core.on_stdout_write")
+    def test_spinner_when_disabled(self, mock_write, mock_flush, mock_token, mock_ollama, mock_is_ollama, reset_globals):
+        from ollama_chat_lib.llm_core import response_rendered_live
+        state.use_openai = False
+        state.use_azure_openai = False
+        state.syntax_highlighting = True
+        state.live_highlighting = False
+        state.interactive_mode = True
+        state.alternate_model = None
+        state.plugins = []
+        state.think_mode_on = False
+
+        with patch("ollama_chat_lib.llm_core.print_spinning_wheel") as mock_spinner:
+            result = self._ask(mock_ollama, ["Hello", "\nworld"])
+        assert result == "Hello\nworld"
+        assert not response_rendered_live()
+        mock_spinner.assert_called()
+        mock_write.assert_not_called()
@@ -0,0 +1,82 @@
+"""Tests for the streaming Markdown renderer."""
+import random
+
+import pytest
+
+from ollama_chat_lib.conversation import colorize
+from ollama_chat_lib.markdown_renderer import StreamingMarkdownRenderer
+
+RESPONSE = """Here is an example:
+
+## Setup
+
+1. Install the package
+2. Run **the** command
+- [ ] check the `output`
+
+```python
+def double(x):
+    return x * 2
+```
+
+Summary
+=======
+
+> See [the docs](http://example.com/docs)
+for *more* details.
+"""
+
+PIECES = [
+    "# Title\n", "Para with **bold**, *it* and `code`.\n", "\n", "- item\n", "*\n", ">\n", "> quote\n",
+    "```python\nprint('x')\n```\n", "```\nplain\n```\n", "Heading\n===\n", "Sub\n---\n", "**Bold** start\n",
+    "[multi\nline](http://a\n)\n", "[ref]:\n\nhttp://r\n", "unclosed [ bracket\n", "a\r\nb\r\n", "  \n", "tail  ",
+]
+
+
+def _stream(text, sizes):
+    renderer = StreamingMarkdownRenderer()
+    output = []
+    position = 0
+    while position < len(text):
+        size = next(sizes)
+        output.append(renderer.feed(text[position:position + size]))
+        position += size
+    output.append(renderer.finish())
+    return output
+
+
+class TestStreamingMarkdownRenderer:
+
+    @pytest.mark.parametrize("size", [1, 3, 16, 1000])
+    def test_same_output_as_batch(self, size):
+        output = _stream(RESPONSE, iter(lambda: size, None))
+        assert "".join(output) == colorize(RESPONSE.strip())
+
+    def test_random_documents(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            text = "".join(rng.choice(PIECES) for _ in range(rng.randint(1, 10)))
+            output = _stream(text, iter(lambda: rng.randint(1, 8), None))
+            assert "".join(output) == colorize(text.strip()), repr(text)
+
+    def test_lines_rendered_before_the_end(self):
+        output = _stream(RESPONSE, iter(lambda: 4, None))
+        assert "".join(output[:-1]).startswith(colorize("Here is an example:"))
+
+    def test_code_block_rendered_once_closed(self):
+        renderer = StreamingMarkdownRenderer()
+        rendered = renderer.feed("Code:\n\n```python\nx = 1\ny = 2\n")
+        assert "x" not in rendered
+        rendered += renderer.feed("```\n\nDone.\n")
+        assert "x" in rendered and "y" in rendered
+
+    def test_text_keeps_raw_response(self):
+        renderer = StreamingMarkdownRenderer()
+        for delta in ["  Hello", " **world**\n", "bye"]:
+            renderer.feed(delta)
+        assert renderer.text == "  Hello **world**\nbye"
+
+    def test_empty_response(self):
+        renderer = StreamingMarkdownRenderer()
+        renderer.feed("  \n")
+        assert renderer.finish() == colorize("")
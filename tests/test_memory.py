@@ -4,6 +4,7 @@ import json
 import pytest
 from unittest.mock import patch, MagicMock, PropertyMock
 import ollama_chat as oc
+from ollama_chat_lib.memory import find_near_duplicate_clusters
 
 
 class TestLongTermMemoryManager:
@@ -26,16 +27,17 @@ class TestLongTermMemoryManager:
 
         assert mgr.memory["users"]["alice"]["hobby"] == "reading"
 
-    def test_save_memory(self, tmp_path):
+    def test_memory_persisted_across_instances(self, tmp_path):
         with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
             mock_dirs.return_value.user_data_dir = str(tmp_path)
             mgr = oc.LongTermMemoryManager("test-model", verbose=False)
+            mgr._update_user_memory("bob", {"name": "Bob"})
+            mgr.store.close()
 
-        mgr.memory["users"]["bob"] = {"name": "Bob"}
-        mgr._save_memory()
+            mgr = oc.LongTermMemoryManager("test-model", verbose=False)
 
-        saved = json.loads((tmp_path / "long_term_memory.json").read_text())
-        assert saved["users"]["bob"]["name"] == "Bob"
+        assert mgr.memory["users"]["bob"]["name"] == "Bob"
+        assert (tmp_path / "long_term_memory.sqlite").exists()
 
     def test_update_user_memory(self, tmp_path):
         with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
@@ -44,9 +46,8 @@ class TestLongTermMemoryManager:
 
         mgr._update_user_memory("user1", {"city": "Paris"})
         assert mgr.memory["users"]["user1"]["city"] == "Paris"
-        # File should be persisted
-        saved = json.loads((tmp_path / "long_term_memory.json").read_text())
-        assert saved["users"]["user1"]["city"] == "Paris"
+        assert mgr.get_user_memory("user1") == {"city": "Paris"}
+        assert mgr.get_user_memory("user2") == {}
 
     def test_update_user_memory_merge(self, tmp_path):
         with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
@@ -68,6 +69,41 @@ class TestLongTermMemoryManager:
         assert "city" not in mgr.memory["users"]["u1"]
         assert mgr.memory["users"]["u1"]["job"] == "dev"
 
+    def test_remove_conflicting_keys_list(self, tmp_path):
+        with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
+            mock_dirs.return_value.user_data_dir = str(tmp_path)
+            mgr = oc.LongTermMemoryManager("test-model", verbose=False)
+
+        mgr._update_user_memory("u1", {"city": "Paris", "job": "dev"})
+        mgr._remove_conflicting_info("u1", ["city"])
+        assert mgr.get_user_memory("u1") == {"job": "dev"}
+
+    def test_json_file_migrated_once(self, tmp_path):
+        mem_file = tmp_path / "long_term_memory.json"
+        mem_file.write_text(json.dumps({"users": {"alice": {"hobby": "reading"}, "bob": {"friends": ["Ann"]}}}))
+
+        with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
+            mock_dirs.return_value.user_data_dir = str(tmp_path)
+            mgr = oc.LongTermMemoryManager("test-model", verbose=False)
+            mgr._update_user_memory("alice", {"hobby": "chess"})
+
+            # A stale copy of the JSON file is not imported again
+            mem_file.write_text(json.dumps({"users": {"alice": {"hobby": "reading"}}}))
+            mgr = oc.LongTermMemoryManager("test-model", verbose=False)
+
+        assert not mem_file.exists()
+        assert (tmp_path / "long_term_memory.json.migrated").exists()
+        assert mgr.get_user_memory("alice") == {"hobby": "chess"}
+        assert mgr.get_user_memory("bob") == {"friends": ["Ann"]}
+
+    def test_concurrent_processes_share_store(self, tmp_path):
+        from ollama_chat_lib.memory_store import LongTermMemoryStore
+        path = str(tmp_path / "shared.sqlite")
+        first, second = LongTermMemoryStore(path), LongTermMemoryStore(path)
+        first.apply("u1", updates={"city": "Paris"})
+        second.apply("u1", updates={"job": "dev"}, removed_keys=["city"])
+        assert first.get_user("u1") == {"job": "dev"}
+
     def test_get_extraction_prompt(self, tmp_path):
         with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
             mock_dirs.return_value.user_data_dir = str(tmp_path)
@@ -113,7 +149,7 @@ class TestMemoryManager:
                 verbose=False,
             )
 
-        with patch("ollama_chat_lib.memory.ollama.embeddings", return_value={"embedding": [0.1, 0.2, 0.3]}):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", return_value={"embeddings": [[0.1, 0.2, 0.3]]}):
             emb = mgr.generate_embedding("hello")
         assert emb == [0.1, 0.2, 0.3]
 
@@ -148,7 +184,7 @@ class TestMemoryManager:
                 verbose=False,
             )
 
-        with patch("ollama_chat_lib.memory.ollama.embeddings", return_value={"embedding": [0.1]}):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", return_value={"embeddings": [[0.1]]}):
             docs, metas = mgr.retrieve_relevant_memory("Paris")
         assert "memory about Paris" in docs
         assert metas[0]["timestamp"] == "Jan 1"
@@ -170,7 +206,218 @@ class TestMemoryManager:
                 verbose=False,
             )
 
-        with patch("ollama_chat_lib.memory.ollama.embeddings", return_value={"embedding": [0.1]}):
+        with patch("ollama_chat_lib.embeddings.ollama.embed", return_value={"embeddings": [[0.1]]}):
             docs, metas = mgr.retrieve_relevant_memory("query", answer_distance_threshold=200)
         assert len(docs) == 1
         assert docs[0] == "close"
+
+
+class TestMemoryInjection:
+
+    @pytest.fixture()
+    def mgr(self, tmp_path):
+        client = MagicMock()
+        with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
+            mock_dirs.return_value.user_data_dir = str(tmp_path)
+            mgr = oc.MemoryManager("test_mem", client, "test-model", "nomic-embed", verbose=False)
+        mgr.retrieve_relevant_memory = MagicMock(return_value=(["memory about Paris"], [{"timestamp": "Jan 1"}]))
+        mgr.generate_embedding = MagicMock(return_value=[1.0, 0.0])
+        return mgr
+
+    def test_system_prompt_and_history_unchanged(self, mgr):
+        conversation = [
+            {"role": "system", "content": "You are helpful."},
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Hi!"},
+            {"role": "user", "content": "Where did I travel?"},
+        ]
+        history = [dict(entry) for entry in conversation]
+        mgr.handle_user_query(conversation)
+        assert conversation[:3] == history[:3]
+        assert conversation[3]["role"] == "system"
+        assert conversation[3]["content"].startswith("<short-term-memories>")
+        assert "memory about Paris" in conversation[3]["content"]
+        assert conversation[4] == history[3]
+
+    def test_previous_memories_replaced(self, mgr):
+        conversation = [{"role": "system", "content": "You are helpful."}, {"role": "user", "content": "Question 1"}]
+        mgr.handle_user_query(conversation)
+        conversation += [{"role": "assistant", "content": "Answer 1"}, {"role": "user", "content": "Question 2"}]
+        mgr.retrieve_relevant_memory.return_value = ([], [])
+        mgr.handle_user_query(conversation)
+        assert [entry["content"] for entry in conversation] == ["You are helpful.", "Question 1", "Answer 1", "Question 2"]
+
+    def test_legacy_memory_section_removed_from_system_prompt(self, mgr):
+        conversation = [
+            {"role": "system", "content": "You are helpful.\n\n<short-term-memories>\nold\n</short-term-memories>"},
+            {"role": "user", "content": "Question"},
+        ]
+        mgr.handle_user_query(conversation)
+        assert conversation[0]["content"] == "You are helpful."
+        assert len(conversation) == 3
+
+    def test_relevant_long_term_facts_injected(self, mgr):
+        mgr.retrieve_relevant_memory.return_value = ([], [])
+        mgr.long_term_memory_manager._update_user_memory("alice", {"city": "Paris", "pet": "a cat named Tom"})
+        vectors = {"city: Paris": [1.0, 0.0], "pet: a cat named Tom": [0.0, 1.0]}
+        conversation = [{"role": "system", "content": "You are helpful."}, {"role": "user", "content": "Where do I live?"}]
+        with patch("ollama_chat_lib.memory.get_current_user_id", return_value="alice"), \
+                patch("ollama_chat_lib.memory.embed_texts", side_effect=lambda texts, model, options=None: [vectors[text] for text in texts]):
+            mgr.handle_user_query(conversation)
+        assert conversation[0]["content"] == "You are helpful."
+        assert conversation[1]["content"].startswith("<long-term-memory>")
+        content = conversation[1]["content"]
+        assert content.index("- city: Paris") < content.index("- pet: a cat named Tom")
+
+
+class TestRelevantLongTermFacts:
+
+    @pytest.fixture()
+    def ltm(self, tmp_path):
+        with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
+            mock_dirs.return_value.user_data_dir = str(tmp_path)
+            ltm = oc.LongTermMemoryManager("test-model", embedding_model_name="embed-model")
+        ltm._update_user_memory("alice", {"city": "Paris", "hobbies": ["chess", "piano"], "sister": "Rebecca"})
+        ltm._update_user_memory("bob", {"city": "Lyon"})
+        return ltm
+
+    VECTORS = {
+        "city: Paris": [1.0, 0.0, 0.0],
+        "hobbies: chess, piano": [0.0, 1.0, 0.0],
+        "sister: Rebecca": [0.0, 0.0, 1.0],
+        "city: Lyon": [1.0, 0.0, 0.0],
+    }
+
+    def _embed(self, texts, model, options=None):
+        return [self.VECTORS[text] for text in texts]
+
+    def test_facts_ranked_by_similarity_for_current_user_only(self, ltm):
+        with patch("ollama_chat_lib.memory.embed_texts", side_effect=self._embed):
+            facts = ltm.retrieve_relevant_facts("alice", "Which games do I play?", query_embedding=[0.1, 0.9, 0.2], top_k=2)
+        assert list(facts) == ["hobbies", "sister"]
+        assert "Lyon" not in ltm.format_facts(facts)
+
+    def test_fact_embeddings_computed_once(self, ltm):
+        with patch("ollama_chat_lib.memory.embed_texts", side_effect=self._embed) as mock_embed:
+            ltm.retrieve_relevant_facts("alice", "question", query_embedding=[1.0, 0.0, 0.0])
+            ltm.retrieve_relevant_facts("alice", "question", query_embedding=[1.0, 0.0, 0.0])
+            assert mock_embed.call_count == 1
+
+            # Changing a fact embeds it again
+            ltm._update_user_memory("alice", {"city": "Lyon"})
+            ltm._update_user_memory("alice", {"sister": "Rebecca"})
+            ltm.retrieve_relevant_facts("alice", "question", query_embedding=[1.0, 0.0, 0.0])
+            assert mock_embed.call_count == 2
+            assert mock_embed.call_args.args[0] == ["city: Lyon"]
+
+    def test_token_cap(self, ltm):
+        with patch("ollama_chat_lib.memory.embed_texts", side_effect=self._embed):
+            facts = ltm.retrieve_relevant_facts("alice", "question", query_embedding=[1.0, 0.0, 0.0], max_tokens=4)
+        assert facts == {"city": "Paris"}
+
+    def test_recency_order_without_embedding_model(self, ltm):
+        ltm.embedding_model_name = None
+        ltm._update_user_memory("alice", {"job": "developer"})
+        facts = ltm.retrieve_relevant_facts("alice", "question", top_k=1)
+        assert facts == {"job": "developer"}
+
+
+class TestMemoryCompaction:
+
+    @pytest.fixture()
+    def mgr(self, tmp_path):
+        client = MagicMock()
+        collection = MagicMock()
+        client.get_or_create_collection.return_value = collection
+        with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
+            mock_dirs.return_value.user_data_dir = str(tmp_path)
+            mgr = oc.MemoryManager("test_mem", client, "test-model", "nomic-embed",
+                                   ask_fn=MagicMock(return_value="Merged summary"), compaction_threshold=3)
+        mgr.generate_embedding = MagicMock(return_value=[1.0, 0.0])
+        yield mgr
+        mgr.long_term_memory_manager.store.close()
+
+    def test_clusters(self):
+        clusters = find_near_duplicate_clusters([[1.0, 0.0], [0.0, 1.0], [0.99, 0.05], [0.0, 0.0]], 0.9)
+        assert clusters == [[0, 2], [1], [3]]
+
+    def test_compact_merges_with_provenance(self, mgr):
+        mgr.collection.get.return_value = {
+            'ids': ["20240101000000_a", "20240102000000_b_merged", "20240103000000_c"],
+            'documents': ["likes tea", "likes green tea", "works in Paris"],
+            'metadatas': [
+                {'timestamp': "Monday"},
+                {'timestamp': "Tuesday", 'first_timestamp': "Sunday", 'merged_from': json.dumps(["x", "y"])},
+                {'timestamp': "Wednesday"},
+            ],
+            'embeddings': [[1.0, 0.0], [0.98, 0.1], [0.0, 1.0]],
+        }
+        assert mgr.compact_memory() == (1, 1)
+
+        upsert = mgr.collection.upsert.call_args.kwargs
+        assert upsert['ids'] == ["20240102000000_b_merged"]
+        assert upsert['documents'] == ["Merged summary"]
+        metadata = upsert['metadatas'][0]
+        assert json.loads(metadata['merged_from']) == ["20240101000000_a", "x", "y"]
+        assert metadata['merged_count'] == 3
+        assert metadata['timestamp'] == "Tuesday"
+        assert metadata['first_timestamp'] == "Monday"
+        mgr.collection.delete.assert_called_once_with(ids=["20240101000000_a"])
+
+    def test_compact_orders_cluster_by_time(self, mgr):
+        mgr.collection.get.return_value = {
+            'ids': ["20240105000000_c", "20240102000000_b_merged", "20240104000000_d"],
+            'documents': ["likes tea", "likes green tea", "likes black tea"],
+            'metadatas': [
+                {'timestamp': "Friday"},
+                {'timestamp': "Tuesday", 'first_timestamp': "Sunday", 'merged_from': json.dumps(["20240101000000_a", "20240102000000_b"])},
+                {'timestamp': "Thursday"},
+            ],
+            'embeddings': [[1.0, 0.0], [0.98, 0.1], [0.99, 0.05]],
+        }
+        assert mgr.compact_memory() == (1, 2)
+
+        upsert = mgr.collection.upsert.call_args.kwargs
+        assert upsert['ids'] == ["20240105000000_c_merged"]
+        metadata = upsert['metadatas'][0]
+        assert metadata['timestamp'] == "Friday"
+        assert metadata['first_timestamp'] == "Sunday"
+        assert json.loads(metadata['merged_from'])[0] == "20240101000000_a"
+
+    def test_failed_merge_keeps_memories(self, mgr):
+        mgr._ask_fn.return_value = ""
+        mgr.collection.get.return_value = {
+            'ids': ["a", "b"], 'documents': ["x", "x"], 'metadatas': [{}, {}], 'embeddings': [[1.0, 0.0], [1.0, 0.0]],
+        }
+        assert mgr.compact_memory() == (0, 0)
+        mgr.collection.delete.assert_not_called()
+
+    def test_add_memory_retry_does_not_store_twice(self, mgr):
+        mgr.preprocess_conversation = MagicMock(return_value="summary")
+        mgr.long_term_memory_manager.process_conversation = MagicMock()
+        conversation = [{"role": "user", "content": "hi"}]
+        mgr.collection.count.return_value = 1
+
+        mgr.collection.get.return_value = {'ids': []}
+        assert mgr.add_memory(conversation, memory_id="20240101000000_job1") is True
+        assert mgr.collection.upsert.call_args.kwargs["ids"] == ["20240101000000_job1"]
+
+        mgr.collection.get.return_value = {'ids': ["20240101000000_job1"]}
+        assert mgr.add_memory(conversation, memory_id="20240101000000_job1") is True
+        mgr.collection.upsert.assert_called_once()
+        assert mgr.long_term_memory_manager.process_conversation.call_count == 2
+
+    def test_add_memory_compacts_above_threshold(self, mgr):
+        mgr.preprocess_conversation = MagicMock(return_value="summary")
+        mgr.long_term_memory_manager.process_conversation = MagicMock()
+        mgr.compact_memory = MagicMock(return_value=(0, 0))
+        conversation = [{"role": "user", "content": "hi"}]
+
+        mgr.collection.count.return_value = 3
+        mgr.add_memory(conversation)
+        mgr.compact_memory.assert_not_called()
+
+        with patch("ollama_chat_lib.memory.memory_compaction_interval", 2):
+            mgr.collection.count.return_value = 4
+            mgr.add_memory(conversation)
+            mgr.compact_memory.assert_called_once()
@@ -0,0 +1,127 @@
+"""Tests for the background memory worker and its persistent job queue."""
+import threading
+import pytest
+from unittest.mock import MagicMock
+
+from ollama_chat_lib.memory_worker import MemoryJobQueue, MemoryWorker
+
+
+@pytest.fixture()
+def queue_file(tmp_path):
+    return str(tmp_path / "memory_jobs.sqlite")
+
+
+class TestMemoryJobQueue:
+
+    def test_jobs_survive_restart(self, queue_file):
+        job_queue = MemoryJobQueue(queue_file)
+        job_id = job_queue.put([{"role": "user", "content": "I live in Paris"}])
+        job_queue.close()
+
+        job_queue = MemoryJobQueue(queue_file)
+        claimed_id, conversation, memory_id = job_queue.claim()
+        assert (claimed_id, conversation) == (job_id, [{"role": "user", "content": "I live in Paris"}])
+        assert memory_id.endswith(f"_job{job_id}")
+
+    def test_running_job_not_claimed_by_another_session(self, queue_file):
+        job_queue = MemoryJobQueue(queue_file)
+        job_queue.put([{"role": "user", "content": "hello"}])
+        assert job_queue.claim() is not None
+
+        other_session = MemoryJobQueue(queue_file)
+        assert other_session.claim() is None
+        assert other_session.counts() == {"running": 1}
+
+    def test_job_with_expired_lease_claimed_again(self, queue_file):
+        job_queue = MemoryJobQueue(queue_file, lease=0)
+        job_queue.put([{"role": "user", "content": "hello"}])
+        job_id, _, memory_id = job_queue.claim()
+        job_queue.close()
+
+        assert MemoryJobQueue(queue_file).claim()[::2] == (job_id, memory_id)
+
+    def test_renewed_lease_kept(self, queue_file):
+        job_queue = MemoryJobQueue(queue_file, lease=0)
+        job_queue.put([])
+        job_id, _, _ = job_queue.claim()
+        job_queue.lease = 60
+        job_queue.renew(job_id)
+        assert MemoryJobQueue(queue_file).claim() is None
+
+    def test_failed_job_retried_then_marked_failed(self, queue_file):
+        job_queue = MemoryJobQueue(queue_file)
+        job_queue.put([])
+        for attempt in range(3):
+            job_id, _, _ = job_queue.claim()
+            job_queue.fail(job_id, "server unavailable", max_attempts=3)
+        assert job_queue.claim() is None
+        assert job_queue.jobs()[0][1:2] == ("failed",)
+
+
+class TestMemoryWorker:
+
+    def test_submit_returns_before_job_processed(self, queue_file):
+        release = threading.Event()
+        memory_manager = MagicMock()
+        memory_manager.add_memory.side_effect = lambda conversation, memory_id: release.wait(5)
+        worker = MemoryWorker(MemoryJobQueue(queue_file), lambda: memory_manager, poll_interval=0.05)
+        worker.start()
+        try:
+            worker.submit([{"role": "user", "content": "remember this"}])
+            assert not worker.wait_until_idle(timeout=0.2)
+            release.set()
+            assert worker.wait_until_idle(timeout=5)
+        finally:
+            worker.stop()
+        memory_manager.add_memory.assert_called_once()
+        assert memory_manager.add_memory.call_args[0] == ([{"role": "user", "content": "remember this"}],)
+        assert worker.job_queue.counts() == {}
+
+    def test_unsummarized_conversation_retried_with_same_memory_id(self, queue_file):
+        memory_manager = MagicMock()
+        memory_manager.add_memory.side_effect = [False, True]
+        worker = MemoryWorker(MemoryJobQueue(queue_file), lambda: memory_manager, poll_interval=0.05)
+        worker.start()
+        try:
+            worker.submit([{"role": "user", "content": "remember this"}])
+            assert worker.wait_until_idle(timeout=5)
+        finally:
+            worker.stop()
+        assert memory_manager.add_memory.call_count == 2
+        first, second = [call.kwargs["memory_id"] for call in memory_manager.add_memory.call_args_list]
+        assert first == second
+        assert worker.job_queue.counts() == {}
+
+    def test_jobs_wait_while_memory_deactivated(self, queue_file):
+        memory_manager = MagicMock()
+        current = {"manager": None}
+        worker = MemoryWorker(MemoryJobQueue(queue_file), lambda: current["manager"], poll_interval=0.05)
+        worker.start()
+        try:
+            worker.submit([{"role": "user", "content": "hello"}])
+            assert not worker.wait_until_idle(timeout=0.2)
+            assert "1 pending" in worker.format_status()
+            current["manager"] = memory_manager
+            assert worker.wait_until_idle(timeout=5)
+        finally:
+            worker.stop()
+        memory_manager.add_memory.assert_called_once()
+        assert worker.format_status() == "No memory jobs pending."
+
+
+class TestParallelLongTermMemory:
+
+    def test_extraction_and_conflict_check_run_concurrently(self, tmp_path):
+        from unittest.mock import patch
+        import ollama_chat as oc
+        barrier = threading.Barrier(2, timeout=5)
+
+        def ask(system_prompt, user_input, model, **kwargs):
+            barrier.wait()
+            return '["sister"]' if "contradicted" in system_prompt else '{"city": "Paris"}'
+
+        with patch("ollama_chat_lib.memory.AppDirs") as mock_dirs:
+            mock_dirs.return_value.user_data_dir = str(tmp_path)
+            manager = oc.LongTermMemoryManager("model", ask_fn=ask)
+        manager.process_conversation("user", [{"role": "user", "content": "I moved to Paris"}])
+        assert manager.memory["users"]["user"] == {"city": "Paris"}
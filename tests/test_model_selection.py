@@ -90,6 +90,92 @@ class TestIsModelAnOllamaModel:
         assert oc.is_model_an_ollama_model("llama3:latest") is False
 
 
+# ── ModelRegistry ────────────────────────────────────────────────────────
+
+class TestModelRegistry:
+
+    CATALOG = {"models": [{"model": "llama3:latest", "size": 4_000_000_000, "digest": "abc"}]}
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    def test_catalog_loaded_once(self, mock_ollama, tmp_path, reset_globals):
+        mock_ollama.list.return_value = self.CATALOG
+        state.model_registry = oc.ModelRegistry(str(tmp_path / "registry.json"))
+        for _ in range(5):
+            assert oc.is_model_an_ollama_model("llama3:latest") is True
+        assert mock_ollama.list.call_count == 1
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    def test_unknown_model_refresh_is_throttled(self, mock_ollama, tmp_path, reset_globals):
+        mock_ollama.list.return_value = self.CATALOG
+        registry = oc.ModelRegistry(str(tmp_path / "registry.json"))
+        for _ in range(5):
+            assert registry.has_model("gpt-4") is False
+        assert mock_ollama.list.call_count == 1
+
+        registry._last_refresh_attempt = 0.0
+        mock_ollama.list.return_value = {"models": self.CATALOG["models"] + [{"model": "gpt-4", "digest": "def"}]}
+        assert registry.has_model("gpt-4") is True
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    def test_stale_catalog_is_reloaded(self, mock_ollama, tmp_path, reset_globals):
+        mock_ollama.list.return_value = self.CATALOG
+        registry = oc.ModelRegistry(str(tmp_path / "registry.json"), ttl=60, miss_refresh_interval=0)
+        registry.has_model("llama3:latest")
+        registry.refreshed_at -= 120
+        registry.has_model("llama3:latest")
+        assert mock_ollama.list.call_count == 2
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    def test_capabilities_fetched_once_and_persisted(self, mock_ollama, tmp_path, reset_globals):
+        mock_ollama.list.return_value = self.CATALOG
+        mock_ollama.show.return_value = {"capabilities": ["completion", "tools"], "modelinfo": {"llama.context_length": 8192}}
+        registry_file = str(tmp_path / "registry.json")
+        registry = oc.ModelRegistry(registry_file)
+        assert registry.supports("llama3:latest", "tools") is True
+        assert registry.supports("llama3:latest", "vision") is False
+        assert registry.context_length("llama3:latest") == 8192
+        assert mock_ollama.show.call_count == 1
+
+        reloaded = oc.ModelRegistry(registry_file)
+        assert reloaded.supports("llama3:latest", "tools") is True
+        assert mock_ollama.list.call_count == 1
+        assert mock_ollama.show.call_count == 1
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    def test_capabilities_dropped_when_digest_changes(self, mock_ollama, tmp_path, reset_globals):
+        mock_ollama.list.return_value = self.CATALOG
+        mock_ollama.show.return_value = {"capabilities": ["completion"], "modelinfo": {}}
+        registry = oc.ModelRegistry(str(tmp_path / "registry.json"))
+        registry.supports("llama3:latest", "tools")
+        mock_ollama.list.return_value = {"models": [{"model": "llama3:latest", "digest": "new"}]}
+        registry.refresh()
+        assert "capabilities" not in registry.models["llama3:latest"]
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    def test_set_capability(self, mock_ollama, tmp_path, reset_globals):
+        mock_ollama.list.return_value = self.CATALOG
+        mock_ollama.show.side_effect = Exception("show failed")
+        registry = oc.ModelRegistry(str(tmp_path / "registry.json"))
+        assert registry.supports("llama3:latest", "tools") is None
+        registry.set_capability("llama3:latest", "tools", False)
+        assert registry.supports("llama3:latest", "tools") is False
+        assert registry.supports("llama3:latest", "vision") is None
+
+        # The capabilities are still fetched once the server answers, and the result is kept
+        mock_ollama.show.side_effect = None
+        mock_ollama.show.return_value = {"capabilities": ["completion", "vision"], "modelinfo": {"llama.context_length": 8192}}
+        assert registry.supports("llama3:latest", "vision") is True
+        assert registry.context_length("llama3:latest") == 8192
+        assert registry.supports("llama3:latest", "tools") is False
+
+    @patch("ollama_chat_lib.model_selection.ollama")
+    def test_unknown_when_ollama_down(self, mock_ollama, tmp_path, reset_globals):
+        mock_ollama.list.side_effect = Exception("connection refused")
+        registry = oc.ModelRegistry(str(tmp_path / "registry.json"))
+        assert registry.has_model("llama3:latest") is False
+        assert registry.supports("llama3:latest", "tools") is None
+
+
 # ── prompt_for_model ─────────────────────────────────────────────────────
 
 class TestPromptForModel:
@@ -0,0 +1,118 @@
+"""Tests for memoized and parallel query expansion."""
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+
+from ollama_chat_lib import state
+from ollama_chat_lib.cache import DiskCache
+from ollama_chat_lib.query_expansion import expand_query, get_cached_expansion, make_expansion_key
+from ollama_chat_lib.vector_db import query_vector_database
+
+
+@pytest.fixture()
+def expansion_state(reset_globals):
+    saved = (state.query_expansion_cache, state.parallel_query_expansion, state.query_expansion_timeout, state.thinking_model)
+    state.query_expansion_cache = DiskCache(":memory:")
+    state.current_model = "chat-model"
+    state.thinking_model = None
+    yield state
+    state.query_expansion_cache, state.parallel_query_expansion, state.query_expansion_timeout, state.thinking_model = saved
+
+
+def _query_result(ids, distances):
+    return {
+        "ids": [ids],
+        "documents": [[f"Document {doc_id}" for doc_id in ids]],
+        "metadatas": [[{"title": doc_id} for doc_id in ids]],
+        "distances": [distances],
+    }
+
+
+class TestExpansionCache:
+
+    def test_key_ignores_case_and_whitespace(self):
+        assert make_expansion_key("What is  RAG?", None, "m") == make_expansion_key(" what is rag? ", "", "m")
+        assert make_expansion_key("What is RAG?", None, "m") != make_expansion_key("What is RAG?", None, "other")
+        assert make_expansion_key("What is RAG?", None, "m") != make_expansion_key("What is RAG?", "context", "m")
+
+    def test_expansion_memoized(self, expansion_state):
+        ask_fn = MagicMock(return_value="Retrieval augmented generation.")
+        assert expand_query("What is RAG?", ask_fn=ask_fn) == "Retrieval augmented generation."
+        assert expand_query("what is rag?", ask_fn=ask_fn) == "Retrieval augmented generation."
+        ask_fn.assert_called_once()
+        assert ask_fn.call_args.kwargs["selected_model"] == "chat-model"
+
+    def test_context_and_model_are_part_of_the_key(self, expansion_state):
+        ask_fn = MagicMock(return_value="expansion")
+        expand_query("question", ask_fn=ask_fn)
+        expand_query("question", question_context="about cars", ask_fn=ask_fn)
+        state.thinking_model = "thinking-model"
+        expand_query("question", ask_fn=ask_fn)
+        assert ask_fn.call_count == 3
+        assert ask_fn.call_args.kwargs["selected_model"] == "thinking-model"
+
+    def test_empty_expansion_not_cached(self, expansion_state):
+        ask_fn = MagicMock(return_value="")
+        expand_query("question", ask_fn=ask_fn)
+        assert get_cached_expansion("question") is None
+
+    def test_expired_entries_regenerated(self, expansion_state):
+        state.query_expansion_cache = DiskCache(":memory:", ttl=-1)
+        ask_fn = MagicMock(return_value="expansion")
+        expand_query("question", ask_fn=ask_fn)
+        expand_query("question", ask_fn=ask_fn)
+        assert ask_fn.call_count == 2
+
+    def test_no_cache(self, expansion_state):
+        state.query_expansion_cache = None
+        ask_fn = MagicMock(return_value="expansion")
+        expand_query("question", ask_fn=ask_fn)
+        expand_query("question", ask_fn=ask_fn)
+        assert ask_fn.call_count == 2
+
+
+class TestQueryVectorDatabaseExpansion:
+
+    @pytest.fixture()
+    def collection(self, expansion_state):
+        collection = MagicMock()
+        state.collection = collection
+        state.current_collection_name = "test"
+        state.embeddings_model = None
+        return collection
+
+    def test_cached_expansion_skips_llm(self, collection):
+        collection.query.return_value = _query_result(["a"], [0.1])
+        ask_fn = MagicMock(return_value="expanded passage")
+        query_vector_database("What is AI?", ask_fn=ask_fn)
+        query_vector_database("What is AI?", ask_fn=ask_fn)
+        ask_fn.assert_called_once()
+        assert collection.query.call_args.kwargs["query_texts"] == ["What is AI?\nexpanded passage"]
+
+    def test_parallel_expansion_merges_results(self, collection):
+        state.parallel_query_expansion = True
+        collection.query.side_effect = [_query_result(["raw"], [0.3]), _query_result(["expanded", "raw"], [0.1, 0.2])]
+        ask_fn = MagicMock(return_value="expanded passage")
+        result = query_vector_database("question", ask_fn=ask_fn, use_adaptive_filtering=False)
+        assert collection.query.call_args_list[0].kwargs["query_texts"] == ["question"]
+        assert collection.query.call_args_list[1].kwargs["query_texts"] == ["question\nexpanded passage"]
+        assert result.count("Document raw") == 1
+        assert "Document expanded" in result
+
+    def test_parallel_expansion_timeout_uses_raw_results(self, collection):
+        state.parallel_query_expansion = True
+        state.query_expansion_timeout = 0.01
+        release = threading.Event()
+        done = threading.Event()
+
+        def slow_ask(*args, **kwargs):
+            release.wait(5)
+            return "late passage"
+
+        collection.query.return_value = _query_result(["raw"], [0.1])
+        with patch.object(state.query_expansion_cache, "set", side_effect=lambda *args: done.set()):
+            result = query_vector_database("question", ask_fn=slow_ask)
+            assert "Document raw" in result
+            assert collection.query.call_count == 1
+            release.set()
+            assert done.wait(5)
@@ -0,0 +1,61 @@
+"""Tests for the cache of non-streamed LLM responses."""
+import pytest
+from ollama import Message
+
+from ollama_chat_lib.response_cache import ResponseCache, create_response_cache
+
+
+class TestResponseCache:
+
+    def test_key_covers_the_request(self):
+        messages = [{"role": "user", "content": "Hi"}]
+        key = ResponseCache.make_key("llama3", messages, {"temperature": 0.1})
+        assert key == ResponseCache.make_key("llama3", [dict(messages[0])], {"temperature": 0.1})
+        assert key != ResponseCache.make_key("qwen3", messages, {"temperature": 0.1})
+        assert key != ResponseCache.make_key("llama3", messages, {"temperature": 0.1, "num_ctx": 8192})
+        assert key != ResponseCache.make_key("llama3", messages, {"temperature": 0.1}, tools=[{"type": "function"}])
+        assert key != ResponseCache.make_key("llama3", messages, {"temperature": 0.1}, think=True)
+        assert key == ResponseCache.make_key("llama3", messages, {"temperature": 0.1}, model_digest=None)
+        assert key != ResponseCache.make_key("llama3", messages, {"temperature": 0.1}, model_digest="abc")
+
+    def test_ollama_messages_stored_as_dicts(self):
+        cache = ResponseCache(":memory:")
+        message = Message(role="assistant", content="", tool_calls=[Message.ToolCall(function=Message.ToolCall.Function(name="web_search", arguments={"query": "x"}))])
+        key = ResponseCache.make_key("llama3", [{"role": "user", "content": "Search x"}, message])
+        cache.set_response(key, message)
+        cached = cache.get_response(key)
+        assert cached["tool_calls"][0]["function"] == {"name": "web_search", "arguments": {"query": "x"}}
+        # A cached message in the conversation gives the same key as the original object
+        assert ResponseCache.make_key("llama3", [cached]) == ResponseCache.make_key("llama3", [message])
+
+    def test_on_mode_skips_high_temperatures(self):
+        cache = ResponseCache(":memory:")
+        assert cache.accepts({"temperature": 0.1})
+        assert not cache.accepts({"temperature": 0.7})
+        assert ResponseCache(":memory:", mode="record").accepts({"temperature": 0.7})
+
+    def test_record_writes_without_reading(self):
+        cache = ResponseCache(":memory:", mode="record")
+        cache.set_response("key", {"content": "a"})
+        assert cache.get_response("key") is None
+        assert len(cache) == 1
+
+    def test_replay_reads_without_writing(self):
+        cache = ResponseCache(":memory:", mode="replay")
+        cache.set_response("key", {"content": "a"})
+        assert len(cache) == 0
+
+    def test_size_bounded(self):
+        cache = ResponseCache(":memory:", max_bytes=100)
+        for index in range(10):
+            cache.set_response(str(index), {"content": "x" * 30})
+        assert cache.total_bytes() <= 100
+        assert cache.get_response("9") == {"content": "x" * 30}
+
+    def test_modes(self, tmp_path):
+        assert create_response_cache("off", 10) is None
+        cache = create_response_cache("replay", 10, str(tmp_path / "responses.sqlite"))
+        assert cache.mode == "replay" and cache.max_bytes == 10 * 1024 * 1024
+        cache.close()
+        with pytest.raises(ValueError):
+            ResponseCache(":memory:", mode="off")
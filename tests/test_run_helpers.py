@@ -0,0 +1,108 @@
+"""Tests for the concurrent generation of the current and alternate model responses."""
+import threading
+import pytest
+from unittest.mock import MagicMock
+
+from ollama_chat_lib import state
+from ollama_chat_lib.run_helpers import ask_current_and_alternate_models
+
+
+@pytest.fixture()
+def models(reset_globals):
+    state.plugins = []
+    state.alternate_model = "alt-model"
+    state.selected_tools = []
+    return state
+
+
+def _mod(ask):
+    mod = MagicMock()
+    mod.ask_ollama_with_conversation.side_effect = ask
+    return mod
+
+
+class TestAlternateModel:
+
+    def test_models_run_concurrently(self, models):
+        state.parallel_alternate_model = True
+        barrier = threading.Barrier(2, timeout=5)
+
+        def ask(conversation, model, **kwargs):
+            # Both generations must be in flight at the same time to pass the barrier
+            barrier.wait()
+            return f"answer of {model}"
+
+        conversation = [{"role": "user", "content": "hi"}]
+        bot_response, alternate_response, _, _ = ask_current_and_alternate_models(_mod(ask), conversation, "main-model")
+        assert bot_response == "answer of main-model"
+        assert alternate_response == "answer of alt-model"
+
+    def test_each_model_gets_its_own_conversation(self, models):
+        state.parallel_alternate_model = True
+
+        def ask(conversation, model, **kwargs):
+            conversation.append({"role": "tool", "content": model})
+            return model
+
+        conversation = [{"role": "user", "content": "hi"}]
+        _, _, primary_conversation, alternate_conversation = ask_current_and_alternate_models(_mod(ask), conversation, "main-model")
+        assert conversation == [{"role": "user", "content": "hi"}]
+        assert primary_conversation[-1]["content"] == "main-model"
+        assert alternate_conversation[-1]["content"] == "alt-model"
+
+    def test_alternate_output_written_after_primary(self, models, capsys):
+        state.parallel_alternate_model = True
+        from ollama_chat_lib.io_hooks import on_print
+        alternate_printed = threading.Event()
+
+        def ask(conversation, model, **kwargs):
+            if model == "alt-model":
+                on_print("alternate output")
+                alternate_printed.set()
+            else:
+                assert alternate_printed.wait(5)
+                on_print("primary output")
+            return model
+
+        ask_current_and_alternate_models(_mod(ask), [{"role": "user", "content": "hi"}], "main-model")
+        out = capsys.readouterr().out
+        assert out.index("primary output") < out.index("alternate output")
+
+    def test_sequential_fallback(self, models):
+        state.parallel_alternate_model = False
+        threads = []
+
+        def ask(conversation, model, **kwargs):
+            threads.append(threading.current_thread())
+            return model
+
+        bot_response, alternate_response, _, _ = ask_current_and_alternate_models(_mod(ask), [{"role": "user", "content": "hi"}], "main-model")
+        assert (bot_response, alternate_response) == ("main-model", "alt-model")
+        assert threads == [threading.main_thread()] * 2
+
+    @pytest.mark.parametrize("parallel", [True, False])
+    def test_alternate_error_reported_in_both_modes(self, models, parallel, capsys):
+        state.parallel_alternate_model = parallel
+
+        def ask(conversation, model, **kwargs):
+            if model == "alt-model":
+                raise RuntimeError("model not found")
+            return model
+
+        bot_response, alternate_response, _, _ = ask_current_and_alternate_models(_mod(ask), [{"role": "user", "content": "hi"}], "main-model")
+        assert (bot_response, alternate_response) == ("main-model", None)
+        assert "model not found" in capsys.readouterr().out
+
+    def test_alternate_output_written_when_primary_fails(self, models, capsys):
+        state.parallel_alternate_model = True
+        from ollama_chat_lib.io_hooks import on_print
+
+        def ask(conversation, model, **kwargs):
+            if model == "alt-model":
+                on_print("alternate output")
+                return model
+            raise RuntimeError("primary failed")
+
+        with pytest.raises(RuntimeError):
+            ask_current_and_alternate_models(_mod(ask), [{"role": "user", "content": "hi"}], "main-model")
+        assert "alternate output" in capsys.readouterr().out
@@ -0,0 +1,114 @@
+"""Tests for the telemetry of LLM calls and retrievals."""
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from ollama_chat_lib.telemetry import (
+    TelemetryCollector, current_purpose, ollama_metrics, openai_metrics, percentile, telemetry_purpose,
+)
+
+
+class TestTelemetryPurpose:
+
+    def test_default_is_chat(self):
+        assert current_purpose() == "chat"
+
+    def test_nested_purposes_restored(self):
+        with telemetry_purpose("agent"):
+            with telemetry_purpose("tool-fallback"):
+                assert current_purpose() == "tool-fallback"
+            assert current_purpose() == "agent"
+        assert current_purpose() == "chat"
+
+    def test_purpose_is_per_thread(self):
+        purposes = []
+        with telemetry_purpose("memory"):
+            thread = threading.Thread(target=lambda: purposes.append(current_purpose()))
+            thread.start()
+            thread.join()
+        assert purposes == ["chat"]
+
+
+class TestMetrics:
+
+    def test_ollama_durations_in_seconds(self):
+        metrics = ollama_metrics({"prompt_eval_count": 12, "prompt_eval_duration": 250_000_000, "eval_count": 30,
+                                  "eval_duration": 1_500_000_000, "load_duration": 0})
+        assert metrics == {"prompt_tokens": 12, "prompt_eval_duration": 0.25, "eval_count": 30,
+                           "eval_duration": 1.5, "load_duration": 0.0}
+
+    def test_ollama_missing_metrics(self):
+        assert set(ollama_metrics({"message": {}}).values()) == {None}
+
+    def test_openai_usage(self):
+        assert openai_metrics(SimpleNamespace(prompt_tokens=5, completion_tokens=7)) == {"prompt_tokens": 5, "eval_count": 7}
+        assert openai_metrics({"input_tokens": 3, "output_tokens": 4}) == {"prompt_tokens": 3, "eval_count": 4}
+        assert openai_metrics(None) == {"prompt_tokens": None, "eval_count": None}
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.95) == 95
+        assert percentile([3.0], 0.05) == 3.0
+        assert percentile([], 0.5) is None
+
+
+class TestTelemetryCollector:
+
+    def test_summary_per_purpose(self):
+        telemetry = TelemetryCollector()
+        for duration in (1.0, 2.0, 3.0):
+            telemetry.record(duration, model="llama3", ttft=0.1 * duration, eval_count=100, eval_duration=duration)
+        telemetry.record(2.0, model="docs", backend="chromadb", purpose="retrieval")
+        with telemetry_purpose("expansion"):
+            telemetry.record(2.0, model="llama3", load_duration=5.0)
+
+        summary = telemetry.summary()
+        assert summary["chat"]["calls"] == 3
+        assert summary["chat"]["share"] == pytest.approx(0.6)
+        assert summary["chat"]["duration_p50"] == 2.0
+        assert summary["chat"]["ttft_p95"] == pytest.approx(0.3)
+        assert summary["chat"]["tokens_per_second_p5"] == pytest.approx(100 / 3)
+        assert summary["retrieval"]["share"] == pytest.approx(0.2)
+        assert summary["expansion"]["load_stalls"] == 1
+
+        table = telemetry.format_stats()
+        assert table.splitlines()[1].startswith("chat")
+        assert "retrieval" in table and "expansion" in table
+
+    def test_ttft_estimated_from_server_durations(self):
+        record = TelemetryCollector().record(3.0, prompt_eval_duration=0.5, load_duration=1.5)
+        assert record["ttft"] == 2.0
+
+    def test_percentiles_over_latest_calls(self):
+        telemetry = TelemetryCollector(window=2)
+        for duration in (10.0, 1.0, 1.0):
+            telemetry.record(duration)
+        summary = telemetry.summary()["chat"]
+        assert summary["calls"] == 3
+        assert summary["seconds"] == 12.0
+        assert summary["duration_p95"] == 1.0
+
+    def test_metrics_file(self, tmp_path):
+        metrics_file = tmp_path / "metrics.jsonl"
+        telemetry = TelemetryCollector(str(metrics_file))
+        telemetry.record(1.0, model="llama3", eval_count=10, eval_duration=0.5)
+        with telemetry_purpose("summary"):
+            telemetry.record(2.0, model="llama3")
+        telemetry.close()
+
+        records = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+        assert [record["purpose"] for record in records] == ["chat", "summary"]
+        assert records[0]["tokens_per_second"] == 20.0
+
+    def test_format_call(self):
+        record = TelemetryCollector().record(1.5, model="llama3", ttft=0.2, prompt_tokens=40, eval_count=30, eval_duration=1.0, load_duration=2.0)
+        line = TelemetryCollector.format_call(record)
+        assert line.startswith("chat call to llama3: 1.50s")
+        assert "30 tokens generated at 30.0 tokens/s" in line
+        assert "model loaded in 2.00s" in line
+
+    def test_empty(self):
+        assert TelemetryCollector().format_stats() == "No LLM calls or retrievals recorded yet."
@@ -0,0 +1,97 @@
+"""Tests for the session tool result cache."""
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+
+import ollama_chat as oc
+from ollama_chat_lib import state
+from ollama_chat_lib.llm_core import handle_tool_response
+from ollama_chat_lib.tool_cache import ToolResultCache
+from ollama_chat_lib.utils import cached_tool, file_fingerprint
+
+
+@pytest.fixture()
+def tool_cache(reset_globals):
+    state.verbose_mode = False
+    state.plugins = []
+    state.tool_result_cache = ToolResultCache()
+    return state.tool_result_cache
+
+
+def _tool(name):
+    return {"type": "function", "function": {"name": name, "description": name, "parameters": {"type": "object", "properties": {"query": {"type": "string"}, "n_results": {"type": "integer"}}}}}
+
+
+def _call(name, **arguments):
+    return {"function": {"name": name, "arguments": arguments}}
+
+
+class TestToolResultCache:
+
+    def test_identical_calls_reuse_result(self, tool_cache):
+        search = cached_tool(60)(MagicMock(return_value="results"))
+        functions = {"search": search}
+        with patch("ollama_chat_lib.llm_core.ask_ollama_with_conversation", return_value="answer"):
+            for arguments in ({"query": "q", "n_results": 3}, {"n_results": 3, "query": "q"}, {"query": "other", "n_results": 3}):
+                conversation = []
+                handle_tool_response([_call("search", **arguments)], True, conversation, "model", 0.1, None, [_tool("search")], False, globals_fn=lambda: functions)
+                assert conversation[0]["content"] == "results"
+        assert search.call_count == 2
+        assert tool_cache.hits["search"] == 1
+        assert tool_cache.misses["search"] == 2
+        assert tool_cache.format_stats() == "Tool cache: 1/3 hits (33%) - search: 1/3"
+
+    def test_undeclared_tools_not_cached(self, tool_cache):
+        def func():
+            return "value"
+        assert tool_cache.get("tool", {}, func) == (False, None)
+        tool_cache.set("tool", {}, func, "value")
+        assert len(tool_cache) == 0
+        assert tool_cache.misses["tool"] == 0
+
+    def test_ttl(self, tool_cache):
+        func = cached_tool(10)(MagicMock())
+        with patch("ollama_chat_lib.tool_cache.time.monotonic", return_value=100.0):
+            tool_cache.set("tool", {"a": 1}, func, "value")
+        with patch("ollama_chat_lib.tool_cache.time.monotonic", return_value=109.0):
+            assert tool_cache.get("tool", {"a": 1}, func) == (True, "value")
+        with patch("ollama_chat_lib.tool_cache.time.monotonic", return_value=111.0):
+            assert tool_cache.get("tool", {"a": 1}, func) == (False, None)
+
+    def test_none_results_not_cached(self, tool_cache):
+        func = cached_tool(10)(MagicMock())
+        tool_cache.set("tool", {}, func, None)
+        assert len(tool_cache) == 0
+
+    def test_lru_bound(self):
+        cache = ToolResultCache(max_entries=2)
+        func = cached_tool(10)(MagicMock())
+        for i in range(3):
+            cache.set("tool", {"i": i}, func, i)
+        assert cache.get("tool", {"i": 0}, func) == (False, None)
+        assert cache.get("tool", {"i": 2}, func) == (True, 2)
+
+    def test_read_file_invalidated_when_file_changes(self, tool_cache, tmp_path):
+        path = tmp_path / "notes.txt"
+        path.write_text("first version")
+        assert oc.read_file.cache_ttl > 0
+        assert file_fingerprint("file_path")({"file_path": str(path)}) is not None
+
+        tool_cache.set("read_file", {"file_path": str(path)}, oc.read_file, "first version")
+        assert tool_cache.get("read_file", {"file_path": str(path)}, oc.read_file) == (True, "first version")
+        path.write_text("second, longer version")
+        os.utime(path, ns=(1, 1))
+        assert tool_cache.get("read_file", {"file_path": str(path)}, oc.read_file) == (False, None)
+
+    def test_side_effect_tools_never_cached(self):
+        assert not getattr(oc.create_file, "cache_ttl", None)
+        assert not getattr(oc.delete_file, "cache_ttl", None)
+        assert not getattr(oc.run_command, "cache_ttl", None)
+
+    def test_query_vector_database_keyed_by_current_collection(self, tool_cache):
+        state.current_collection_name = "first"
+        tool_cache.set("query_vector_database", {"question": "q"}, oc.query_vector_database, "from first")
+        state.current_collection_name = "second"
+        assert tool_cache.get("query_vector_database", {"question": "q"}, oc.query_vector_database) == (False, None)
+        state.current_collection_name = "first"
+        assert tool_cache.get("query_vector_database", {"question": "q"}, oc.query_vector_database) == (True, "from first")
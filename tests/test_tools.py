@@ -104,3 +104,28 @@ class TestGetAvailableTools:
         assert "web_cache" not in enum
         assert "memory" not in enum
         assert "user_docs" in enum
+
+
+class TestWebSearchIngestion:
+
+    def test_articles_indexed_from_memory(self, reset_globals, tmp_path):
+        from ollama_chat_lib.tools import web_search
+        state.chroma_db_path = str(tmp_path)
+        state.chroma_client = MagicMock()
+        state.chroma_client.get_or_create_collection.return_value.name = "web_cache"
+        state.chroma_client.get_or_create_collection.return_value.get.return_value = {"ids": []}
+        state.web_search_summaries = False
+        crawler_cls = MagicMock()
+        crawler_cls.return_value.get_articles.return_value = [{"url": "https://example.com/a", "text": "Page A"}]
+        indexer_cls = MagicMock()
+        query_fn = MagicMock(side_effect=[("", {"num_results": 0}), ("Page A", {"num_results": 1})])
+        with patch("ollama_chat_lib.tools.DDGS") as mock_ddgs, patch("tempfile.mkdtemp") as mock_mkdtemp:
+            mock_ddgs.return_value.text.return_value = [{"href": "https://example.com/a"}]
+            result = web_search("query", ask_fn=MagicMock(), query_vector_database_fn=query_fn, web_crawler_cls=crawler_cls,
+                                document_indexer_cls=indexer_cls, load_chroma_client_fn=MagicMock())
+        assert result == "Page A"
+        mock_mkdtemp.assert_not_called()
+        assert indexer_cls.call_args.args[0] is None
+        records = indexer_cls.return_value.index_records.call_args.args[0]
+        assert [(text, metadata["url"], metadata["hit_count"]) for text, metadata in records] == [("Page A", "https://example.com/a", 0)]
+        assert indexer_cls.return_value.index_records.call_args.kwargs == {"add_summary": False, "skip_existing": False}
@@ -134,7 +134,7 @@ class TestQueryVectorDatabase:
         assert result == ""
 
     @patch("ollama_chat.ask_ollama", return_value="expanded query")
-    @patch("ollama_chat_lib.vector_db.ollama")
+    @patch("ollama_chat_lib.embeddings.ollama")
     @patch("ollama_chat_lib.vector_db.load_chroma_client")
     def test_queries_collection(self, mock_load, mock_ollama, mock_ask, reset_globals):
         import numpy as np
@@ -151,12 +151,12 @@ class TestQueryVectorDatabase:
         state.thinking_model = None
         state.current_model = "test-model"
         
-        mock_ollama.embeddings.return_value = {"embedding": [0.1] * 768}
+        mock_ollama.embed.return_value = {"embeddings": [[0.1] * 768]}
         
         result = oc.query_vector_database("What is AI?", collection_name="test")
         assert "Doc about AI" in result
 
-    @patch("ollama_chat_lib.vector_db.ollama")
+    @patch("ollama_chat_lib.embeddings.ollama")
     @patch("ollama_chat_lib.vector_db.load_chroma_client")
     def test_no_expand_query(self, mock_load, mock_ollama, reset_globals):
         mock_col = MagicMock()
@@ -169,7 +169,7 @@ class TestQueryVectorDatabase:
         state.current_collection_name = "test"
         state.embeddings_model = "test-embed"
         
-        mock_ollama.embeddings.return_value = {"embedding": [0.1] * 768}
+        mock_ollama.embed.return_value = {"embeddings": [[0.1] * 768]}
         
         result = oc.query_vector_database("query", expand_query=False)
         assert "Result" in result
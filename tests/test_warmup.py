@@ -0,0 +1,64 @@
+"""Tests for the background preloading of the models."""
+from unittest.mock import patch
+
+from ollama_chat_lib import state
+from ollama_chat_lib.telemetry import TelemetryCollector
+from ollama_chat_lib.warmup import ModelWarmup, parse_keep_alive
+
+
+class TestParseKeepAlive:
+
+    def test_values(self):
+        assert parse_keep_alive(None) is None
+        assert parse_keep_alive("-1") == -1
+        assert parse_keep_alive("0") == 0
+        assert parse_keep_alive("1.5") == 1.5
+        assert parse_keep_alive("30m") == "30m"
+
+
+class TestModelWarmup:
+
+    @patch('ollama_chat_lib.warmup.ollama')
+    def test_models_loaded_once_with_keep_alive(self, mock_ollama):
+        mock_ollama.chat.return_value = {"load_duration": 2_000_000_000}
+        mock_ollama.embed.return_value = {"load_duration": 0}
+        warmup = ModelWarmup(keep_alive="1h")
+        warmup.start("nomic-embed-text", "embeddings", embedding=True)
+        warmup.start("llama3", "thinking")
+        warmup.start("llama3", "chat")
+        assert warmup.wait(timeout=5)
+
+        mock_ollama.embed.assert_called_once_with(model="nomic-embed-text", input="warm-up", keep_alive="1h")
+        mock_ollama.chat.assert_called_once_with(model="llama3", messages=[], keep_alive="1h")
+        report = warmup.format_report()
+        assert report.startswith("Models ready: ")
+        assert "llama3 (thinking, chat)" in report
+        warmup.shutdown()
+
+    @patch('ollama_chat_lib.warmup.ollama')
+    def test_failed_model_reported(self, mock_ollama):
+        mock_ollama.chat.side_effect = Exception("model 'missing' not found")
+        warmup = ModelWarmup()
+        warmup.start("missing", "chat")
+        warmup.wait(timeout=5)
+        assert warmup.format_report() == "Models failed: missing (chat): model 'missing' not found"
+        warmup.shutdown()
+
+    @patch('ollama_chat_lib.warmup.ollama')
+    def test_load_recorded_in_telemetry(self, mock_ollama):
+        mock_ollama.chat.return_value = {"load_duration": 3_000_000_000}
+        state.telemetry = TelemetryCollector()
+        warmup = ModelWarmup()
+        warmup.start("llama3", "chat")
+        warmup.wait(timeout=5)
+        summary = state.telemetry.summary()
+        assert summary["warmup"]["calls"] == 1
+        assert summary["warmup"]["load_stalls"] == 1
+        warmup.shutdown()
+
+    def test_nothing_started(self):
+        warmup = ModelWarmup()
+        assert warmup.start(None, "thinking") is None
+        assert warmup.wait() is True
+        assert warmup.format_report() == ""
+        warmup.shutdown()
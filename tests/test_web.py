@@ -1,4 +1,9 @@
 """Tests for SimpleWebCrawler."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
 import pytest
 from unittest.mock import patch, MagicMock
 import ollama_chat as oc
@@ -17,14 +22,14 @@ class TestSimpleWebCrawler:
         mock_resp = MagicMock()
         mock_resp.content = b"<html>Hello</html>"
         mock_resp.raise_for_status = MagicMock()
-        with patch("ollama_chat_lib.web_crawler.requests.get", return_value=mock_resp):
+        with patch("ollama_chat_lib.web_crawler.get_http_session", return_value=MagicMock(get=MagicMock(return_value=mock_resp))):
             result = crawler.fetch_page("http://example.com")
         assert result == b"<html>Hello</html>"
 
     def test_fetch_page_failure(self):
         crawler = oc.SimpleWebCrawler(["http://bad.com"], verbose=False)
         import requests
-        with patch("ollama_chat_lib.web_crawler.requests.get", side_effect=requests.exceptions.ConnectionError("fail")):
+        with patch("ollama_chat_lib.web_crawler.get_http_session", return_value=MagicMock(get=MagicMock(side_effect=requests.exceptions.ConnectionError("fail")))):
             result = crawler.fetch_page("http://bad.com")
         assert result is None
 
@@ -46,7 +51,7 @@ class TestSimpleWebCrawler:
         mock_resp = MagicMock()
         mock_resp.content = b"<html><body><p>Content</p></body></html>"
         mock_resp.raise_for_status = MagicMock()
-        with patch("ollama_chat_lib.web_crawler.requests.get", return_value=mock_resp):
+        with patch("ollama_chat_lib.web_crawler.get_http_session", return_value=MagicMock(get=MagicMock(return_value=mock_resp))):
             with patch("ollama_chat_lib.web_crawler.chardet.detect", return_value={"encoding": "utf-8"}):
                 crawler.crawl()
         assert len(crawler.articles) == 1
@@ -58,7 +63,7 @@ class TestSimpleWebCrawler:
         mock_resp = MagicMock()
         mock_resp.content = b"fake-pdf-bytes"
         mock_resp.raise_for_status = MagicMock()
-        with patch("ollama_chat_lib.web_crawler.requests.get", return_value=mock_resp):
+        with patch("ollama_chat_lib.web_crawler.get_http_session", return_value=MagicMock(get=MagicMock(return_value=mock_resp))):
             with patch("ollama_chat_lib.web_crawler.extract_text_from_pdf", return_value="PDF text"):
                 crawler.crawl()
         assert len(crawler.articles) == 1
@@ -79,6 +84,115 @@ class TestSimpleWebCrawler:
         assert len(crawler.articles) == 0
 
 
+class _DelayedPageHandler(BaseHTTPRequestHandler):
+    """Serves /<name>?delay=<seconds> with a small HTML page after the given delay."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(float(parse_qs(urlparse(self.path).query).get("delay", ["0"])[0]))
+            body = f"<html><body><p>Page {urlparse(self.path).path.strip('/')}</p></body></html>".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def page_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DelayedPageHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.active = 0
+    server.max_active = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestConcurrentCrawl:
+
+    def test_pages_fetched_concurrently_in_completion_order(self, page_server, reset_globals):
+        server, base_url = page_server
+        urls = [f"{base_url}/slow?delay=0.6", f"{base_url}/fast?delay=0", f"{base_url}/medium?delay=0.3"]
+        crawler = oc.SimpleWebCrawler(urls, plugins=[], per_host_limit=3)
+        start = time.monotonic()
+        crawler.crawl()
+        elapsed = time.monotonic() - start
+        assert [article["url"] for article in crawler.get_articles()] == [urls[1], urls[2], urls[0]]
+        assert "Page slow" in crawler.get_articles()[2]["text"]
+        assert elapsed < 1.2
+
+    def test_deadline_skips_slow_pages(self, page_server, reset_globals):
+        server, base_url = page_server
+        urls = [f"{base_url}/fast?delay=0", f"{base_url}/hung?delay=3"]
+        crawler = oc.SimpleWebCrawler(urls, plugins=[], per_host_limit=2, deadline=0.5)
+        start = time.monotonic()
+        crawler.crawl()
+        assert time.monotonic() - start < 1.5
+        assert [article["url"] for article in crawler.get_articles()] == [urls[0]]
+
+    def test_per_host_limit(self, page_server, reset_globals):
+        server, base_url = page_server
+        urls = [f"{base_url}/{i}?delay=0.2" for i in range(4)]
+        crawler = oc.SimpleWebCrawler(urls, plugins=[], max_workers=4, per_host_limit=1)
+        crawler.crawl()
+        assert len(crawler.get_articles()) == 4
+        assert server.max_active == 1
+
+    def test_stop_generation_between_pages(self, page_server, reset_globals):
+        server, base_url = page_server
+
+        class StopAfterFirstPage:
+            def __init__(self):
+                self.calls = 0
+
+            def stop_generation(self):
+                self.calls += 1
+                return self.calls > 2
+
+        urls = [f"{base_url}/a?delay=0", f"{base_url}/b?delay=0.3", f"{base_url}/c?delay=0.3"]
+        crawler = oc.SimpleWebCrawler(urls, plugins=[StopAfterFirstPage()], per_host_limit=3)
+        crawler.crawl()
+        assert [article["url"] for article in crawler.get_articles()] == [urls[0]]
+
+    def test_stop_generation_of_loaded_plugins(self, page_server, reset_globals):
+        server, base_url = page_server
+
+        class StopPlugin:
+            def stop_generation(self):
+                return True
+
+        state.plugins = [StopPlugin()]
+        crawler = oc.SimpleWebCrawler([f"{base_url}/a?delay=0"])
+        crawler.crawl()
+        assert crawler.get_articles() == []
+
+    def test_llm_task_applied_to_each_article(self, reset_globals):
+        mock_resp = MagicMock(content=b"<html><body><p>Content</p></body></html>")
+        ask_fn = MagicMock(return_value="summary")
+        crawler = oc.SimpleWebCrawler(["http://a.com", "http://b.com"], llm_enabled=True, plugins=[], ask_fn=ask_fn)
+        with patch("ollama_chat_lib.web_crawler.get_http_session", return_value=MagicMock(get=MagicMock(return_value=mock_resp))):
+            with patch("ollama_chat_lib.web_crawler.chardet.detect", return_value={"encoding": "utf-8"}):
+                crawler.crawl(task="Summarize")
+        assert [article["llm_result"] for article in crawler.get_articles()] == ["summary", "summary"]
+        assert ask_fn.call_count == 2
+
+
 class TestSimpleWebScraper:
 
     def test_init_defaults(self):
@@ -0,0 +1,108 @@
+"""Tests for the web search cache eviction policy."""
+from unittest.mock import patch
+
+import pytest
+
+import chromadb
+
+from ollama_chat_lib import state
+from ollama_chat_lib.web_cache import WebCacheManager
+
+
+@pytest.fixture()
+def cache(tmp_path, reset_globals):
+    state.chroma_db_path = str(tmp_path / "db")
+    client = chromadb.PersistentClient(path=state.chroma_db_path)
+    return client.get_or_create_collection("web_cache")
+
+
+def _add(collection, chunk_id, url, fetched_at, text="cached text", hit_count=0, last_hit=None, chunk_index=0):
+    metadata = WebCacheManager.stamp({"url": url, "id": chunk_id.rsplit("_", 1)[0], "chunk_index": chunk_index}, now=fetched_at)
+    metadata["hit_count"] = hit_count
+    if last_hit is not None:
+        metadata["last_hit"] = last_hit
+    collection.add(ids=[chunk_id], documents=[text], metadatas=[metadata], embeddings=[[1.0, 0.0]])
+
+
+class TestWebCacheManager:
+
+    def test_expired_chunks_removed(self, cache):
+        _add(cache, "old_0", "https://old", fetched_at=1000)
+        _add(cache, "new_0", "https://new", fetched_at=9000)
+        manager = WebCacheManager(cache, ttl=3600)
+        assert manager.expire(now=10000) == 1
+        assert cache.get()["ids"] == ["new_0"]
+
+    def test_legacy_chunks_expire_by_publication_date(self, cache):
+        cache.add(ids=["legacy_0"], documents=["text"], metadatas=[{"url": "https://legacy", "published": "2000-01-01T00:00:00"}], embeddings=[[1.0, 0.0]])
+        _add(cache, "new_0", "https://new", fetched_at=2e9)
+        assert WebCacheManager(cache, ttl=3600).enforce(now=2e9) == (1, 0)
+        assert cache.get()["ids"] == ["new_0"]
+
+    def test_lru_evicts_least_recently_hit(self, cache):
+        for i, last_hit in enumerate([300, 100, 200]):
+            _add(cache, f"page{i}_0", f"https://page{i}", fetched_at=50, last_hit=last_hit)
+        assert WebCacheManager(cache, max_chunks=2).enforce(now=400) == (0, 1)
+        assert sorted(cache.get()["ids"]) == ["page0_0", "page2_0"]
+
+    def test_lfu_evicts_least_hit(self, cache):
+        for i, hits in enumerate([5, 1, 3]):
+            _add(cache, f"page{i}_0", f"https://page{i}", fetched_at=50, hit_count=hits, last_hit=400 - i)
+        WebCacheManager(cache, max_chunks=1, policy="lfu").enforce(now=500)
+        assert cache.get()["ids"] == ["page0_0"]
+
+    def test_size_limit(self, cache):
+        for i in range(4):
+            _add(cache, f"page{i}_0", f"https://page{i}", fetched_at=100 + i, text="x" * 100)
+        WebCacheManager(cache, max_bytes=250).enforce(now=200)
+        assert sorted(cache.get()["ids"]) == ["page2_0", "page3_0"]
+
+    def test_eviction_frees_headroom(self, cache):
+        for i in range(25):
+            _add(cache, f"page{i}_0", f"https://page{i}", fetched_at=100 + i)
+        assert WebCacheManager(cache, max_chunks=20).enforce(now=200) == (0, 7)
+        assert cache.count() == 18
+
+    def test_collection_scanned_only_when_a_limit_may_be_exceeded(self, cache):
+        for i in range(2):
+            _add(cache, f"page{i}_0", f"https://page{i}", fetched_at=100, text="x" * 100)
+        manager = WebCacheManager(cache, max_chunks=10, max_bytes=250)
+        assert manager.enforce(now=200) == (0, 0)
+
+        with patch.object(manager, "_entries", wraps=manager._entries) as mock_entries:
+            assert manager.enforce(now=300) == (0, 0)
+            mock_entries.assert_not_called()
+
+            _add(cache, "page2_0", "https://page2", fetched_at=300, text="x" * 100)
+            manager.record_added(["https://page2"])
+            assert manager.enforce(now=400) == (0, 1)
+            mock_entries.assert_called_once()
+
+            assert manager.enforce(now=400 + 3600) == (0, 0)
+            assert mock_entries.call_count == 2
+
+    def test_record_hits(self, cache):
+        _add(cache, "page_0", "https://page", fetched_at=100, chunk_index=0)
+        manager = WebCacheManager(cache)
+        metadata = cache.get(ids=["page_0"])["metadatas"][0]
+        manager.record_hits([{"metadata": metadata}], now=500)
+        updated = cache.get(ids=["page_0"])["metadatas"][0]
+        assert updated["hit_count"] == 1
+        assert updated["last_hit"] == 500
+        assert updated["url"] == "https://page"
+
+    def test_recrawled_urls_replaced(self, cache):
+        _add(cache, "page_0", "https://page", fetched_at=100)
+        _add(cache, "page_1", "https://page", fetched_at=100, chunk_index=1)
+        _add(cache, "other_0", "https://other", fetched_at=100)
+        assert WebCacheManager(cache).replace_urls(["https://page"]) == 2
+        assert cache.get()["ids"] == ["other_0"]
+
+    def test_no_limits_is_a_no_op(self, cache):
+        _add(cache, "page_0", "https://page", fetched_at=0)
+        assert WebCacheManager(cache).enforce() == (0, 0)
+        assert WebCacheManager(cache).expire() == 0
+
+    def test_unknown_policy_rejected(self, cache):
+        with pytest.raises(ValueError):
+            WebCacheManager(cache, policy="fifo")